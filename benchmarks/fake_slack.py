@@ -0,0 +1,404 @@
+"""ベンチマーク用のローカルで動作するSlack Web APIの代替サーバ
+
+conversations.list, conversations.history, conversations.replies, users.list を提供する
+メッセージは WorkspaceSpec からインデックス毎に生成するため、大きなワークスペースでもメモリを消費しない
+"""
+import base64
+import gzip
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# 生成するメッセージの ts の起点
+BASE_TS = 1600000000
+# limit が指定されなかった場合の1ページの件数
+DEFAULT_LIMIT = 100
+# メソッド毎の limit の上限
+MAX_LIMITS = {"conversations.history": 1000, "conversations.replies": 1000}
+DEFAULT_MAX_LIMIT = 200
+
+
+class WorkspaceSpec(NamedTuple):
+    """合成するワークスペースの規模"""
+
+    channels: int
+    messages_per_channel: int
+    # 何件に1件の割合でスレッドにするか（0の場合はスレッドを作らない）
+    thread_every: int = 10
+    replies_per_thread: int = 5
+    users: int = 100
+    text_size: int = 100
+
+    @property
+    def threads_per_channel(self) -> int:
+        """1チャンネルあたりのスレッド数"""
+        if not self.thread_every:
+            return 0
+        return (self.messages_per_channel + self.thread_every - 1) // self.thread_every
+
+    @property
+    def total_messages(self) -> int:
+        """全てのメッセージ数（リプライ取得時の親メッセージを含む）"""
+        replies = self.threads_per_channel * (self.replies_per_thread + 1)
+        return self.channels * (self.messages_per_channel + replies)
+
+
+class FakeWorkspace:
+    """WorkspaceSpec からSlack APIのレスポンスを生成する"""
+
+    def __init__(self, spec: WorkspaceSpec):
+        """
+        ワークスペースを作成
+
+        Parameters
+        ----------
+        spec : WorkspaceSpec
+            ワークスペースの規模
+        """
+        self.spec = spec
+        self._handlers: Dict[str, Callable[[Dict[str, str]], Dict[str, Any]]] = {
+            "conversations.list": self.conversations_list,
+            "conversations.history": self.conversations_history,
+            "conversations.replies": self.conversations_replies,
+            "users.list": self.users_list,
+        }
+
+    def call(self, method: str, params: Dict[str, str]) -> Dict[str, Any]:
+        """
+        APIを実行する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        params : Dict[str, str]
+            APIに渡されたパラメータ
+
+        Returns
+        -------
+        Dict[str, Any]
+            レスポンス
+        """
+        handler = self._handlers.get(method)
+        if handler is None:
+            return {"ok": False, "error": "unknown_method"}
+        return handler(params)
+
+    def conversations_list(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """conversations.list"""
+        start, end = _page_range(params, self.spec.channels, "conversations.list")
+        channels = [self.channel(index) for index in range(start, end)]
+        return _cursor_response("channels", channels, end, self.spec.channels)
+
+    def users_list(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """users.list"""
+        start, end = _page_range(params, self.spec.users, "users.list")
+        members = [self.user(index) for index in range(start, end)]
+        return _cursor_response("members", members, end, self.spec.users)
+
+    def conversations_history(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """conversations.history（新しい順）"""
+        channel = _parse_id(params.get("channel", ""), "C", self.spec.channels)
+        if channel is None:
+            return {"ok": False, "error": "channel_not_found"}
+        first, stop = self._index_range(params)
+        count = stop - first
+        start, end = _page_range(params, count, "conversations.history")
+        last = stop - 1
+        messages = [self.message(channel, last - position) for position in range(start, end)]
+        return _has_more_response(messages, end, count)
+
+    def conversations_replies(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """conversations.replies（親メッセージ + 古い順のリプライ）"""
+        channel = _parse_id(params.get("channel", ""), "C", self.spec.channels)
+        if channel is None:
+            return {"ok": False, "error": "channel_not_found"}
+        index = self._thread_index(params.get("ts", ""))
+        if index is None:
+            return {"ok": False, "error": "thread_not_found"}
+        count = self.spec.replies_per_thread + 1
+        start, end = _page_range(params, count, "conversations.replies")
+        messages = [
+            self.message(channel, index) if reply == 0 else self.reply(channel, index, reply)
+            for reply in range(start, end)
+        ]
+        return _has_more_response(messages, end, count)
+
+    def channel(self, index: int) -> Dict[str, Any]:
+        """チャンネル情報を生成"""
+        return {
+            "id": f"C{index:08d}",
+            "name": f"channel-{index}",
+            "is_channel": True,
+            "is_private": False,
+            "created": BASE_TS,
+            "num_members": self.spec.users,
+        }
+
+    def user(self, index: int) -> Dict[str, Any]:
+        """ユーザ情報を生成"""
+        return {
+            "id": f"U{index:08d}",
+            "name": f"user-{index}",
+            "real_name": f"User {index}",
+            "deleted": False,
+            "profile": {"display_name": f"user-{index}", "real_name": f"User {index}"},
+        }
+
+    def message(self, channel: int, index: int) -> Dict[str, Any]:
+        """チャンネルのメッセージを生成"""
+        message = {
+            "type": "message",
+            "user": f"U{index % self.spec.users:08d}",
+            "text": self._text(f"message {index} in channel-{channel}"),
+            "ts": _ts(index, 0),
+        }
+        if self._is_thread(index):
+            message.update(
+                thread_ts=message["ts"],
+                reply_count=self.spec.replies_per_thread,
+                latest_reply=_ts(index, self.spec.replies_per_thread),
+            )
+        return message
+
+    def reply(self, channel: int, index: int, reply: int) -> Dict[str, Any]:
+        """スレッドのリプライを生成"""
+        return {
+            "type": "message",
+            "user": f"U{(index + reply) % self.spec.users:08d}",
+            "text": self._text(f"reply {reply} to message {index} in channel-{channel}"),
+            "ts": _ts(index, reply),
+            "thread_ts": _ts(index, 0),
+            "parent_user_id": f"U{index % self.spec.users:08d}",
+        }
+
+    def _is_thread(self, index: int) -> bool:
+        return bool(self.spec.thread_every) and index % self.spec.thread_every == 0
+
+    def _thread_index(self, ts: str) -> Optional[int]:
+        seconds, _, micro = ts.partition(".")
+        if not seconds.isdigit() or micro != f"{0:06d}":
+            return None
+        offset = int(seconds) - BASE_TS
+        if offset % 10 or not 0 <= offset // 10 < self.spec.messages_per_channel:
+            return None
+        index = offset // 10
+        return index if self._is_thread(index) else None
+
+    def _index_range(self, params: Dict[str, str]) -> Tuple[int, int]:
+        """
+        oldest, latest, inclusive に該当するメッセージのインデックスの範囲（最後のインデックスは含まない）
+
+        NOTE: Slack と同様に oldest, latest と同じtsのメッセージは inclusive の場合のみ含める
+        """
+        inclusive = params.get("inclusive") in ("1", "true")
+        size = self.spec.messages_per_channel
+        first, stop = 0, size
+        if params.get("oldest"):
+            position = (float(params["oldest"]) - BASE_TS) / 10
+            first = math.ceil(position) if inclusive else math.floor(position) + 1
+        if params.get("latest"):
+            position = (float(params["latest"]) - BASE_TS) / 10
+            stop = math.floor(position) + 1 if inclusive else math.ceil(position)
+        first = min(max(first, 0), size)
+        return first, max(min(stop, size), first)
+
+    def _text(self, text: str) -> str:
+        return text.ljust(self.spec.text_size, "x")
+
+
+class FakeSlackServer:
+    """
+    Slack Web APIの代替サーバ
+
+    別スレッドでHTTPサーバを起動し、メソッド毎の呼び出し回数を記録する
+    rate_limit_every を指定すると、メソッド毎にN回に1回 429（Retry-After 付き）を返す
+    """
+
+    def __init__(
+        self,
+        spec: WorkspaceSpec,
+        rate_limit_every: int = 0,
+        retry_after: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """
+        サーバを作成
+
+        Parameters
+        ----------
+        spec : WorkspaceSpec
+            ワークスペースの規模
+        rate_limit_every : int, optional
+            メソッド毎に何回に1回 429 を返すか（0の場合は返さない）, by default 0
+        retry_after : int, optional
+            429 を返す際の Retry-After（秒）, by default 0
+        host : str, optional
+            待ち受けるホスト, by default "127.0.0.1"
+        port : int, optional
+            待ち受けるポート（0の場合は空いているポート）, by default 0
+        """
+        self.workspace = FakeWorkspace(spec)
+        self.calls: Dict[str, int] = {}
+        self.ratelimited: Dict[str, int] = {}
+        self.served_messages = 0
+        self._rate_limit_every = rate_limit_every
+        self._retry_after = retry_after
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_class(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """WebClient の base_url に指定するURL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    @property
+    def retry_after(self) -> int:
+        """429 を返す際の Retry-After（秒）"""
+        return self._retry_after
+
+    def start(self) -> "FakeSlackServer":
+        """
+        サーバを起動する
+
+        Returns
+        -------
+        FakeSlackServer
+            起動したサーバ
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """サーバを停止する"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeSlackServer":
+        """サーバを起動する"""
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """サーバを停止する"""
+        self.stop()
+
+    def handle(self, method: str, params: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        """
+        APIの呼び出しを処理する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        params : Dict[str, str]
+            APIに渡されたパラメータ
+
+        Returns
+        -------
+        Tuple[int, Dict[str, Any]]
+            HTTPステータスとレスポンス
+        """
+        with self._lock:
+            count = self.calls.get(method, 0) + 1
+            self.calls[method] = count
+            if self._rate_limit_every and count % self._rate_limit_every == 0:
+                self.ratelimited[method] = self.ratelimited.get(method, 0) + 1
+                return 429, {"ok": False, "error": "ratelimited"}
+        response = self.workspace.call(method, params)
+        served = len(response.get("messages", ()))
+        with self._lock:
+            self.served_messages += served
+        return 200, response
+
+
+def _handler_class(server: FakeSlackServer) -> type:
+    """サーバに呼び出しを渡すリクエストハンドラを作成"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # keep-alive でヘッダとボディを別々に送信する際に遅延しないようにする
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+            self._respond(url.path, dict(parse_qsl(url.query)))
+
+        def do_POST(self) -> None:
+            url = urlsplit(self.path)
+            params = dict(parse_qsl(url.query))
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode("utf-8")
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                params.update(json.loads(body or "{}"))
+            else:
+                params.update(parse_qsl(body))
+            self._respond(url.path, params)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # リクエスト毎のログは出力しない
+            pass
+
+        def _respond(self, path: str, params: Dict[str, str]) -> None:
+            method = path.rsplit("/", 1)[-1]
+            status, response = server.handle(method, params)
+            body = json.dumps(response).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, compresslevel=1)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", str(server.retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def _ts(index: int, reply: int) -> str:
+    # メッセージ毎に10秒ずつずらし、リプライはマイクロ秒で区別する
+    return f"{BASE_TS + index * 10}.{reply:06d}"
+
+
+def _parse_id(value: str, prefix: str, size: int) -> Optional[int]:
+    if not value.startswith(prefix) or not value[1:].isdigit():
+        return None
+    index = int(value[1:])
+    return index if index < size else None
+
+
+def _encode_cursor(offset: int) -> str:
+    return base64.b64encode(f"offset:{offset}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    return int(base64.b64decode(cursor).decode().partition(":")[2])
+
+
+def _page_range(params: Dict[str, str], count: int, method: str) -> Tuple[int, int]:
+    limit = int(params.get("limit") or 0) or DEFAULT_LIMIT
+    limit = min(limit, MAX_LIMITS.get(method, DEFAULT_MAX_LIMIT))
+    start = _decode_cursor(params["cursor"]) if params.get("cursor") else 0
+    return start, min(start + limit, count)
+
+
+def _cursor_response(key: str, items: List[Dict[str, Any]], end: int, count: int) -> Dict[str, Any]:
+    next_cursor = _encode_cursor(end) if end < count else ""
+    return {"ok": True, key: items, "response_metadata": {"next_cursor": next_cursor}}
+
+
+def _has_more_response(messages: List[Dict[str, Any]], end: int, count: int) -> Dict[str, Any]:
+    response = _cursor_response("messages", messages, end, count)
+    response["has_more"] = end < count
+    return response
@@ -0,0 +1,262 @@
+"""エクスポートのスループットを計測するベンチマーク
+
+合成したワークスペースをローカルの代替サーバ（fake_slack）で提供し、main を実行して下記を計測する
+- messages/sec（取得したメッセージ数 / 実行時間）
+- API呼び出し回数（メソッド毎、429 を返した回数）
+- 最大メモリ使用量（peak RSS）
+- 実行時間
+- 出力サイズ
+
+`python -m benchmarks.run_benchmark small medium --json result.json`
+`--baseline` に前回の結果を指定すると、許容範囲を超えて遅く（大きく）なった場合に終了コード1で終了する
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fake_slack import FakeSlackServer, WorkspaceSpec
+from get_all_message_from_slack.util.object_store import OBJECTS_DIR_NAME
+from get_all_message_from_slack.util.writer import FORMATS
+
+SCENARIOS: Dict[str, WorkspaceSpec] = {
+    "small": WorkspaceSpec(channels=5, messages_per_channel=500),
+    "medium": WorkspaceSpec(channels=20, messages_per_channel=5000),
+    "large": WorkspaceSpec(channels=50, messages_per_channel=20000),
+    # スレッドの多いワークスペース（リプライ取得の並列度の確認用）
+    "threads": WorkspaceSpec(channels=5, messages_per_channel=2000, thread_every=2),
+}
+
+ROOT_PATH = Path(__file__).resolve().parents[1]
+
+
+def run_scenario(
+    name: str,
+    spec: WorkspaceSpec,
+    config: Dict[str, Any],
+    rate_limit_every: int = 0,
+    retry_after: int = 0,
+) -> Dict[str, Any]:
+    """
+    1シナリオを実行する
+
+    Parameters
+    ----------
+    name : str
+        シナリオ名
+    spec : WorkspaceSpec
+        ワークスペースの規模
+    config : Dict[str, Any]
+        worker に渡す設定（main_kwargs の incremental_path は一時ディレクトリに設定される）
+    rate_limit_every : int, optional
+        メソッド毎に何回に1回 429 を返すか, by default 0
+    retry_after : int, optional
+        429 を返す際の Retry-After（秒）, by default 0
+
+    Returns
+    -------
+    Dict[str, Any]
+        計測結果
+    """
+    with tempfile.TemporaryDirectory() as tmp, FakeSlackServer(
+        spec, rate_limit_every, retry_after
+    ) as server:
+        tmp_path = Path(tmp)
+        config = dict(config, main_kwargs=dict(config["main_kwargs"]))
+        config["main_kwargs"]["incremental_path"] = str(tmp_path / "export")
+        config_path = tmp_path / "config.json"
+        result_path = tmp_path / "result.json"
+        with open(config_path, "w") as f:
+            json.dump(config, f)
+        python_path = os.pathsep.join(filter(None, [str(ROOT_PATH), os.environ.get("PYTHONPATH")]))
+        env = dict(
+            os.environ,
+            SLACK_API_URL=server.url,
+            SLACK_TOKEN="xoxp-benchmark",
+            PYTHONPATH=python_path,
+        )
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.worker", str(config_path), str(result_path)],
+            env=env,
+            cwd=tmp,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        with open(result_path) as f:
+            measured = json.load(f)
+        # dedup の場合のオブジェクト（objects）も含める
+        output_bytes = sum(
+            path.stat().st_size
+            for directory in ("export", OBJECTS_DIR_NAME)
+            for path in (tmp_path / directory).rglob("*")
+            if path.is_file()
+        )
+        calls = dict(server.calls)
+        ratelimited = dict(server.ratelimited)
+        messages = server.served_messages
+
+    wall_time = measured["wall_time"]
+    return {
+        "scenario": name,
+        "messages": messages,
+        "expected_messages": spec.total_messages,
+        "api_calls": sum(calls.values()),
+        "calls": calls,
+        "ratelimited": sum(ratelimited.values()),
+        "wall_time": wall_time,
+        "messages_per_sec": messages / wall_time if wall_time else 0.0,
+        "peak_rss_mb": measured["peak_rss_kb"] / 1024,
+        "output_bytes": output_bytes,
+    }
+
+
+def find_regressions(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float
+) -> List[str]:
+    """
+    前回の結果と比較し、許容範囲を超えて悪化した項目を取得
+
+    Parameters
+    ----------
+    results : List[Dict[str, Any]]
+        今回の結果
+    baseline : List[Dict[str, Any]]
+        前回の結果
+    tolerance : float
+        許容する悪化の割合（0.2 の場合は 20% まで）
+
+    Returns
+    -------
+    List[str]
+        悪化した項目の説明
+    """
+    base = {result["scenario"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = base.get(result["scenario"])
+        if before is None:
+            continue
+        name = result["scenario"]
+        if result["messages_per_sec"] < before["messages_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: messages/sec {before['messages_per_sec']:.1f}"
+                f" -> {result['messages_per_sec']:.1f}"
+            )
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak RSS {before['peak_rss_mb']:.1f}MB -> {result['peak_rss_mb']:.1f}MB"
+            )
+        if result["api_calls"] > before["api_calls"] * (1 + tolerance):
+            regressions.append(f"{name}: API calls {before['api_calls']} -> {result['api_calls']}")
+    return regressions
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """
+    結果を表形式の文字列にする
+
+    Parameters
+    ----------
+    results : List[Dict[str, Any]]
+        結果
+
+    Returns
+    -------
+    str
+        表形式の文字列
+    """
+    header = (
+        f"{'scenario':<10}{'messages':>12}{'msgs/sec':>12}{'api calls':>12}"
+        f"{'429':>6}{'peak RSS':>12}{'wall time':>12}{'output':>12}"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        missing = "" if result["messages"] >= result["expected_messages"] else " (missing)"
+        lines.append(
+            f"{result['scenario']:<10}{result['messages']:>12}"
+            f"{result['messages_per_sec']:>12.1f}{result['api_calls']:>12}"
+            f"{result['ratelimited']:>6}{result['peak_rss_mb']:>10.1f}MB"
+            f"{result['wall_time']:>11.2f}s{result['output_bytes'] / 1024 / 1024:>10.1f}MB"
+            f"{missing}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    ベンチマークを実行する
+
+    Parameters
+    ----------
+    argv : Optional[List[str]], optional
+        コマンドライン引数, by default sys.argv[1:]
+
+    Returns
+    -------
+    int
+        終了コード（悪化した項目があれば1）
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", default=["small", "medium"], choices=SCENARIOS)
+    parser.add_argument("--engine", choices=["sync", "async"], default="sync")
+    parser.add_argument("--max-workers", type=int)
+    parser.add_argument("--max-reply-workers", type=int)
+    parser.add_argument("--output-format", choices=list(FORMATS), default="json")
+    parser.add_argument("--compression", choices=["gzip", "zstd"])
+    parser.add_argument("--serializer", choices=["auto", "orjson", "ujson", "json"])
+    parser.add_argument("--thread-storage", choices=["file", "channel"])
+    parser.add_argument(
+        "--write-queue-size", type=int, default=0, help="1以上の場合は書き込みスレッドで書き込む"
+    )
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="N回に1回 429 を返す")
+    parser.add_argument("--retry-after", type=int, default=0)
+    parser.add_argument(
+        "--respect-rate-limits", action="store_true", help="SlackのTier毎のレート制限に従う"
+    )
+    parser.add_argument("--json", type=Path, help="結果を保存するファイル")
+    parser.add_argument("--baseline", type=Path, help="比較する前回の結果ファイル")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    main_kwargs: Dict[str, Any] = {
+        "output_format": args.output_format,
+        "compression": args.compression,
+    }
+    if args.serializer is not None:
+        main_kwargs["serializer"] = args.serializer
+    if args.thread_storage is not None:
+        main_kwargs["thread_storage"] = args.thread_storage
+    if args.write_queue_size:
+        main_kwargs["write_queue_size"] = args.write_queue_size
+    if args.max_workers is not None:
+        main_kwargs["max_workers"] = args.max_workers
+    if args.max_reply_workers is not None:
+        main_kwargs["max_reply_workers"] = args.max_reply_workers
+    config = {
+        "engine": args.engine,
+        "respect_rate_limits": args.respect_rate_limits,
+        "main_kwargs": main_kwargs,
+    }
+    results = [
+        run_scenario(name, SCENARIOS[name], config, args.rate_limit_every, args.retry_after)
+        for name in args.scenarios
+    ]
+    print(format_results(results))
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        regressions = find_regressions(results, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""JSONの変換の実装毎のスループットと出力サイズを計測するベンチマーク
+
+合成したメッセージ（本文は日本語）を NDJSON 形式に変換し、下記を計測する
+- messages/sec、MB/sec（変換後のサイズ / 変換にかかった時間）
+- 出力サイズ（UTF-8）
+比較のため、変更前の標準の json.dumps（日本語を Unicode エスケープする）も計測する
+
+`python -m benchmarks.serializer_benchmark --messages 100000`
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fake_slack import FakeWorkspace, WorkspaceSpec
+from get_all_message_from_slack.util.serializer import BACKENDS, Serializer, get_serializer
+
+# 変更前の出力（ASCII にエスケープ、区切り文字に空白）
+ASCII_JSON = Serializer("json (ascii)", json.dumps, json.loads)
+
+SAMPLE_TEXT = "お疲れさまです。明日の定例の資料を共有します :memo: <https://example.com/doc|資料>"
+
+
+def sample_messages(count: int, text_size: int = 200) -> List[Dict[str, Any]]:
+    """
+    計測用のメッセージを生成する
+
+    Parameters
+    ----------
+    count : int
+        メッセージ数
+    text_size : int, optional
+        本文の文字数, by default 200
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        メッセージ（10件に1件はスレッドの親メッセージ）
+    """
+    workspace = FakeWorkspace(WorkspaceSpec(channels=1, messages_per_channel=count))
+    text = (SAMPLE_TEXT * (text_size // len(SAMPLE_TEXT) + 1))[:text_size]
+    return [dict(workspace.message(0, index), text=text) for index in range(count)]
+
+
+def measure(serializer: Serializer, messages: List[Dict[str, Any]], repeat: int = 3) -> Dict:
+    """
+    1つの実装の変換を計測する
+
+    Parameters
+    ----------
+    serializer : Serializer
+        JSONの変換
+    messages : List[Dict[str, Any]]
+        変換するメッセージ
+    repeat : int, optional
+        繰り返す回数（最も速い結果を採用する）, by default 3
+
+    Returns
+    -------
+    Dict
+        計測結果
+    """
+    best = float("inf")
+    size = 0
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        data = "".join(serializer.dumps(message) + "\n" for message in messages).encode("utf-8")
+        best = min(best, time.perf_counter() - start)
+        size = len(data)
+    return {
+        "serializer": serializer.name,
+        "messages": len(messages),
+        "seconds": best,
+        "messages_per_sec": len(messages) / best if best else 0.0,
+        "mb_per_sec": size / 1024 / 1024 / best if best else 0.0,
+        "output_bytes": size,
+    }
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """
+    結果を表形式の文字列にする
+
+    Parameters
+    ----------
+    results : List[Dict[str, Any]]
+        結果
+
+    Returns
+    -------
+    str
+        表形式の文字列
+    """
+    header = f"{'serializer':<14}{'msgs/sec':>12}{'MB/sec':>10}{'output':>14}{'ratio':>8}"
+    lines = [header, "-" * len(header)]
+    base = results[0]["output_bytes"] if results else 0
+    for result in results:
+        ratio = result["output_bytes"] / base if base else 0.0
+        lines.append(
+            f"{result['serializer']:<14}{result['messages_per_sec']:>12.0f}"
+            f"{result['mb_per_sec']:>10.1f}{result['output_bytes']:>12}B{ratio:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    ベンチマークを実行する
+
+    Parameters
+    ----------
+    argv : Optional[List[str]], optional
+        コマンドライン引数, by default sys.argv[1:]
+
+    Returns
+    -------
+    int
+        終了コード
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--text-size", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    messages = sample_messages(args.messages, args.text_size)
+    serializers = [ASCII_JSON]
+    for name in reversed(BACKENDS):
+        try:
+            serializers.append(get_serializer(name))
+        except ImportError:
+            print(f"skip {name} (not installed)")
+    print(format_results([measure(s, messages, args.repeat) for s in serializers]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
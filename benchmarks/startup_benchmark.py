@@ -0,0 +1,169 @@
+"""import にかかる時間（コールドスタート）を計測するベンチマーク
+
+短時間で終わるワーカープロセスを多数起動する場合に備え、モジュール毎に新しいプロセスで import し、
+下記を計測する（SLACK_TOKEN は設定せずに実行する）
+- import にかかった時間（繰り返した中で最も速い結果）
+- 重いモジュール（slack_sdk, aiohttp）が import されたか
+
+予算（STARTUP_BUDGETS）を超えた場合、または重いモジュールが import された場合は終了コード1で終了する
+
+`python -m benchmarks.startup_benchmark --repeat 5`
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# モジュール毎の import にかかる時間の予算（秒）
+STARTUP_BUDGETS: Dict[str, float] = {
+    "get_all_message_from_slack.settings": 0.05,
+    "get_all_message_from_slack.util.slack_api": 0.15,
+    "get_all_message_from_slack.main": 0.25,
+    "get_all_message_from_slack.cli": 0.1,
+    "get_all_message_from_slack.async_main": 0.25,
+}
+
+# import した時点では読み込まないモジュール（APIを呼び出す時点で読み込む）
+HEAVY_MODULES = ("slack_sdk", "aiohttp")
+
+ROOT_PATH = Path(__file__).resolve().parents[1]
+
+# 子プロセスで実行するスクリプト（import にかかった時間と、読み込まれた重いモジュールを出力する）
+_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": seconds, "heavy_modules": heavy}}))
+"""
+
+
+def measure(module: str, repeat: int = 3) -> Dict[str, Any]:
+    """
+    1つのモジュールの import にかかる時間を計測する
+
+    Parameters
+    ----------
+    module : str
+        import するモジュール
+    repeat : int, optional
+        繰り返す回数（最も速い結果を採用する）, by default 3
+
+    Returns
+    -------
+    Dict[str, Any]
+        計測結果（seconds: 秒, heavy_modules: 読み込まれた重いモジュール）
+    """
+    env = {key: value for key, value in os.environ.items() if key != "SLACK_TOKEN"}
+    script = _SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    best: Dict[str, Any] = {}
+    for _ in range(max(1, repeat)):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=ROOT_PATH,
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        result = json.loads(output)
+        if not best or result["seconds"] < best["seconds"]:
+            best = result
+    return {"module": module, **best}
+
+
+def check_budgets(
+    results: List[Dict[str, Any]], budgets: Dict[str, float] = STARTUP_BUDGETS
+) -> List[str]:
+    """
+    予算を超えたモジュールを確認する
+
+    Parameters
+    ----------
+    results : List[Dict[str, Any]]
+        計測結果
+    budgets : Dict[str, float], optional
+        モジュール毎の予算（秒）, by default STARTUP_BUDGETS
+
+    Returns
+    -------
+    List[str]
+        予算を超えた内容（超えていない場合は空のリスト）
+    """
+    violations = []
+    for result in results:
+        module = result["module"]
+        budget = budgets.get(module)
+        if budget is not None and result["seconds"] > budget:
+            violations.append(f"{module}: {result['seconds']:.3f}s > {budget:.3f}s")
+        if result["heavy_modules"]:
+            violations.append(f"{module}: imports {', '.join(result['heavy_modules'])}")
+    return violations
+
+
+def format_results(
+    results: List[Dict[str, Any]], budgets: Dict[str, float] = STARTUP_BUDGETS
+) -> str:
+    """
+    結果を表形式の文字列にする
+
+    Parameters
+    ----------
+    results : List[Dict[str, Any]]
+        計測結果
+    budgets : Dict[str, float], optional
+        モジュール毎の予算（秒）, by default STARTUP_BUDGETS
+
+    Returns
+    -------
+    str
+        表形式の文字列
+    """
+    header = f"{'module':<44}{'ms':>8}{'budget':>8}  heavy"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        budget = budgets.get(result["module"])
+        budget_ms = f"{budget * 1000:.0f}" if budget is not None else "-"
+        lines.append(
+            f"{result['module']:<44}{result['seconds'] * 1000:>8.1f}{budget_ms:>8}"
+            f"  {', '.join(result['heavy_modules']) or '-'}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    ベンチマークを実行する
+
+    Parameters
+    ----------
+    argv : Optional[List[str]], optional
+        コマンドライン引数, by default sys.argv[1:]
+
+    Returns
+    -------
+    int
+        終了コード（予算を超えた場合は1）
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(STARTUP_BUDGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="結果を保存するファイル")
+    args = parser.parse_args(argv)
+
+    results = [measure(module, args.repeat) for module in args.modules]
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    violations = check_budgets(results)
+    for violation in violations:
+        print(f"over budget: {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
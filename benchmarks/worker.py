@@ -0,0 +1,81 @@
+"""ベンチマークの1シナリオを実行するプロセス
+
+run_benchmark から別プロセスとして起動され、エクスポートにかかった時間と最大メモリ使用量を記録する
+NOTE: 最大メモリ使用量をシナリオ毎に計測するため、シナリオ毎にプロセスを分ける
+
+`python -m benchmarks.worker <config.json> <result.json>`
+"""
+import json
+import resource
+import sys
+import time
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+
+def run(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    設定に従ってエクスポートを実行する
+
+    NOTE: 接続先（SLACK_API_URL）と SLACK_TOKEN は環境変数で渡される
+
+    Parameters
+    ----------
+    config : Dict[str, Any]
+        エクスポートの設定
+        - engine: "sync" または "async"
+        - respect_rate_limits: Falseの場合はSlackのレート制限（Tier）に従わない
+        - main_kwargs: main に渡す引数（sync の場合は ExportConfig の引数）
+
+    Returns
+    -------
+    Dict[str, Any]
+        計測結果（wall_time: 秒, peak_rss_kb: KB）
+    """
+    if not config.get("respect_rate_limits", False):
+        _disable_rate_limits()
+    if config.get("engine", "sync") == "async":
+        from get_all_message_from_slack.async_main import main as async_export
+
+        export = partial(async_export, **config["main_kwargs"])
+    else:
+        from get_all_message_from_slack.main import main
+        from get_all_message_from_slack.util.export_config import ExportConfig
+
+        export = partial(main, ExportConfig(**config["main_kwargs"]))
+
+    start = time.perf_counter()
+    export()
+    wall_time = time.perf_counter() - start
+    # NOTE: Linux では KB 単位
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"wall_time": wall_time, "peak_rss_kb": peak_rss_kb}
+
+
+def _disable_rate_limits() -> None:
+    """ローカルのサーバに対してはレート制限を行わないように、全てのTierの上限を引き上げる"""
+    from get_all_message_from_slack.util.rate_limiter import TIER_LIMITS
+
+    for tier in TIER_LIMITS:
+        TIER_LIMITS[tier] = (1e9, 1e9)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    設定ファイルを読み込んで実行し、結果をファイルに書き込む
+
+    Parameters
+    ----------
+    argv : Optional[List[str]], optional
+        [設定ファイルのPath, 結果ファイルのPath], by default sys.argv[1:]
+    """
+    config_path, result_path = sys.argv[1:] if argv is None else argv
+    with open(config_path) as f:
+        config = json.load(f)
+    result = run(config)
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
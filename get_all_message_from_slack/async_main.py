@@ -0,0 +1,386 @@
+"""asyncio版のmain
+
+1スレッドで多数のAPI呼び出しを同時に行い、コネクションプールを共有する
+ファイルの書き込みはイベントループを止めないように、既定の executor のスレッドで行う（_run_io を参照）
+NOTE: aiohttp が必要（`pip install "get_all_message_from_slack[async]"`）
+NOTE: aiohttp は任意の依存のため、実行する時点で import する
+"""
+import asyncio
+from logging import config, getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TypeVar
+
+import get_all_message_from_slack.settings as settings
+from get_all_message_from_slack.logging_conf import LOGGING_CONFIG
+from get_all_message_from_slack.main import (
+    ExportContext,
+    _create_base_path,
+    _load_state,
+    _resume_base_path,
+    _save_metrics,
+    _select_threads,
+    _write_saved_messages,
+)
+from get_all_message_from_slack.util.async_slack_api import (
+    get_all_public_channels,
+    import_aiohttp,
+    iter_all_users,
+    iter_channel_message,
+    iter_replies,
+    use_session,
+)
+from get_all_message_from_slack.util.checkpoint import Checkpoint
+from get_all_message_from_slack.util.export_state import summarize_messages
+from get_all_message_from_slack.util.metrics import metrics
+from get_all_message_from_slack.util.selection import ExportFilter
+from get_all_message_from_slack.util.slack_api import lookup_cache
+from get_all_message_from_slack.util.writer import OutputFormat
+
+if TYPE_CHECKING:
+    from slack_sdk.web.async_client import AsyncWebClient
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def main(**kwargs):
+    """
+    main_async を実行する
+
+    Parameters
+    ----------
+    kwargs : Dict[str, Any]
+        main_async の引数
+    """
+    config.dictConfig(LOGGING_CONFIG)  # type: ignore
+    asyncio.run(main_async(**kwargs))
+
+
+async def main_async(
+    max_workers: int = 10,
+    max_connections: int = 100,
+    incremental_path: Optional[str] = None,
+    lookback_seconds: int = 0,
+    output_format: str = "json",
+    compression: Optional[str] = None,
+    max_file_bytes: Optional[int] = None,
+    max_reply_workers: int = 10,
+    resume_path: Optional[str] = None,
+    export_filter: Optional[ExportFilter] = None,
+    prometheus_path: Optional[str] = None,
+    serializer: str = "auto",
+    thread_storage: str = "file",
+    client: Optional["AsyncWebClient"] = None,
+):
+    """
+    main（asyncio版）
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        同時に取得するチャンネル数, by default 10
+    max_connections : int, optional
+        コネクションプールのサイズ（同時に実行するAPI呼び出しの最大数）, by default 100
+    incremental_path : Optional[str], optional
+        差分取得を行う場合の出力先, by default None
+    lookback_seconds : int, optional
+        差分取得時に前回取得した最新のメッセージから遡って取得する秒数, by default 0
+    output_format : str, optional
+        出力形式（"json", "ndjson", "sqlite"）, by default "json"
+    compression : Optional[str], optional
+        圧縮形式（None, "gzip", "zstd"）, by default None
+    max_file_bytes : Optional[int], optional
+        ndjson の場合の1ファイルあたりの最大サイズ（圧縮前）, by default None
+    max_reply_workers : int, optional
+        1チャンネル内で同時に取得するスレッド数, by default 10
+    resume_path : Optional[str], optional
+        中断したエクスポートを再開する場合の出力先, by default None
+        取得済みのチャンネル・スレッドは飛ばすが、途中まで取得したチャンネルは最初のページから取得し直す
+    export_filter : Optional[ExportFilter], optional
+        エクスポートするチャンネル・期間, by default None（全て）
+    prometheus_path : Optional[str], optional
+        API呼び出しの計測を Prometheus のテキスト形式で保存する場合の保存先, by default None
+    serializer : str, optional
+        出力するJSONの変換の実装（"auto", "orjson", "ujson", "json"）, by default "auto"
+    thread_storage : str, optional
+        スレッドのリプライの保存方法（"file", "channel"）, by default "file"
+    client : Optional[AsyncWebClient], optional
+        APIを呼び出すクライアント, by default None（async_slack_api.get_client で共有するクライアント）
+        セッション（コネクションプール）はこのクライアントに設定する
+
+    NOTE: 引数の詳細は同じ名前の ExportConfig（get_all_message_from_slack.util.export_config）の項目を参照
+    """
+    # aiohttp がインストールされていない場合は、出力先を作成する前にエラーにする
+    import_aiohttp()
+    logger.info("get all message from slack (async) start.")
+    metrics.reset()
+    if resume_path is not None:
+        base_path = _resume_base_path(resume_path)
+        checkpoint = Checkpoint.load(base_path)
+    else:
+        base_path = _create_base_path(incremental_path)
+        checkpoint = Checkpoint.create(base_path)
+    context = ExportContext(
+        base_path,
+        _load_state(base_path, checkpoint),
+        checkpoint,
+        OutputFormat(
+            output_format,
+            compression,
+            max_file_bytes,
+            serializer=serializer,
+            thread_storage=thread_storage,
+        ),
+        lookback_seconds,
+        max_reply_workers,
+        export_filter=ExportFilter() if export_filter is None else export_filter,
+        client=client,
+    )
+    # 受信したバイト数はセッションで数える（settings.create_async_session を参照）
+    async with settings.create_async_session(max_connections) as session:
+        use_session(session, client)
+        try:
+            channels = await _get_channels(context)
+            await _get_users(context)
+            # 保存したチャンネル・ユーザ一覧は、検索用キャッシュで検索する時点で登録する
+            lookup_cache.add_masters(base_path, context.output_format)
+            failed_channels = await _get_all_channel_message(context, channels, max_workers)
+        finally:
+            use_session(None, client)
+            await _run_io(context.output_format.close)
+            # 全てのチャンネルの状態をまとめて保存する（main を参照）
+            await _run_io(context.state.save)
+            await _run_io(_save_metrics, base_path, prometheus_path)
+    if failed_channels:
+        logger.warning(f"failed channels: {failed_channels}")
+    logger.info("get all message from slack (async) finished")
+
+
+async def _get_channels(context: ExportContext) -> List[Dict[str, Any]]:
+    """
+    全てのpublicチャンネル情報を取得
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        全てのpublicチャンネル情報
+    """
+    channel_path = context.base_path / "channel_master"
+    if context.checkpoint.is_done("channel_master"):
+        logger.info(f"load saved public channels. path: {channel_path}")
+        return list(context.output_format.iter_items(channel_path))
+    logger.info("get all public channels.")
+    channels = await get_all_public_channels(
+        context.export_filter.skip_archived, client=context.client
+    )
+    channels = context.export_filter.select_channels(channels)
+    logger.info(f"save all public channels. path: {channel_path}")
+    with context.output_format.writer(channel_path) as writer:
+        await _run_io(writer.write_all, channels)
+    context.checkpoint.mark_done("channel_master")
+    return channels
+
+
+async def _get_users(context: ExportContext) -> Path:
+    """
+    全てのユーザ情報を取得
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+
+    Returns
+    -------
+    Path
+        保存されたPath（拡張子を除く）
+    """
+    users_path = context.base_path / "user_master"
+    if context.checkpoint.is_done("user_master"):
+        logger.info(f"skip all users (already saved). path: {users_path}")
+        return users_path
+    logger.info("get all users.")
+    logger.info(f"save all users. path: {users_path}")
+    with context.output_format.writer(users_path) as writer:
+        async for users in iter_all_users(client=context.client):
+            await _run_io(writer.write_all, users)
+    context.checkpoint.mark_done("user_master")
+    return users_path
+
+
+async def _get_all_channel_message(
+    context: ExportContext, channels: List[Dict[str, Any]], max_workers: int
+) -> List[str]:
+    """
+    全てのチャンネルのメッセージを同時に取得
+
+    NOTE: 1チャンネルの失敗で他のチャンネルの取得は中断しない
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channels : List[Dict[str, Any]]
+        取得対象のチャンネル情報
+    max_workers : int
+        同時に取得するチャンネル数
+
+    Returns
+    -------
+    List[str]
+        取得に失敗したチャンネルID
+    """
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def run(channel: Dict[str, Any]) -> Optional[str]:
+        async with semaphore:
+            try:
+                await _get_channel_message(context, channel["id"], channel["name"])
+            except Exception:
+                logger.exception(f"failed to get channel message. id:{channel['id']}")
+                return channel["id"]
+        return None
+
+    results = await asyncio.gather(*(run(channel) for channel in channels))
+    return [channel_id for channel_id in results if channel_id is not None]
+
+
+async def _get_channel_message(context: ExportContext, channel_id: str, channel_name: str) -> None:
+    """
+    チャンネル情報を取得
+
+    NOTE: リプライは max_reply_workers 件ずつ同時に取得し、取得できたスレッドから保存する
+    NOTE: 取得済みのチャンネル・スレッドはチェックポイントに記録する（ページ単位の再開は同期版のみ）
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channel_id : str
+        チャンネルID
+    channel_name : str
+        チャンネル名
+    """
+    state = context.state
+    channel_info = f"id:{channel_id}, name: {channel_name}"
+    if context.checkpoint.is_channel_done(channel_id):
+        logger.info(f"skip channel_message (already done). {channel_info}")
+        return
+    oldest = context.export_filter.history_oldest(
+        state.oldest(channel_id, context.lookback_seconds)
+    )
+    latest = context.export_filter.latest
+    logger.info(f"get channel_message. {channel_info}, oldest: {oldest}, latest: {latest}")
+
+    messages_path = context.base_path / channel_id
+    messages_path.mkdir(exist_ok=True)
+    channel_message_path = messages_path / "nomal_messages"
+    logger.info(f"save channel message. {channel_info}, path: {channel_message_path}")
+    merge = context.output_format.exists(channel_message_path)
+    fetched_ts = set()
+    fetched_threads = context.checkpoint.threads_done(channel_id)
+    semaphore = asyncio.Semaphore(max(1, context.max_reply_workers))
+    summary = None
+    try:
+        with context.output_format.writer(channel_message_path) as writer:
+            async for messages in iter_channel_message(
+                channel_id, oldest, latest, client=context.client
+            ):
+                # 書き込みの間もリプライを取得する（次のページは書き込みが終わってから書き込む）
+                write = asyncio.ensure_future(_run_io(writer.write_all, messages))
+                if merge:
+                    fetched_ts.update(message["ts"] for message in messages)
+                try:
+                    await asyncio.gather(
+                        *(
+                            _get_replies(
+                                context, messages_path, message, channel_id, channel_info, semaphore
+                            )
+                            for message in _select_threads(
+                                context, channel_id, messages, fetched_threads
+                            )
+                        )
+                    )
+                finally:
+                    # リプライの取得に失敗した場合も、書き込み中のまま書き込み先を閉じない
+                    await write
+                summary = summarize_messages(messages, summary)
+            if merge:
+                await _run_io(
+                    _write_saved_messages, context, writer, channel_message_path, fetched_ts
+                )
+    finally:
+        await _run_io(context.output_format.close_channel, messages_path)
+    if summary is not None:
+        state.apply(channel_id, summary)
+    # 状態は main_async の最後に保存する（main._get_channel_message を参照）
+    context.checkpoint.mark_channel_done(channel_id, summary)
+
+
+async def _get_replies(
+    context: ExportContext,
+    base_path: Path,
+    message: Dict[str, Any],
+    channel_id: str,
+    channel_info: str,
+    semaphore: asyncio.Semaphore,
+) -> None:
+    """
+    リプライメッセージを取得
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    base_path : Path
+        出力先のBaseとなるPath
+    message : Dict[str, Any]
+        メッセージ情報
+    channel_id : str
+        チャンネルID
+    channel_info : str
+        チャンネル情報
+    semaphore : asyncio.Semaphore
+        同時に取得するスレッド数の制限
+    """
+    thread_ts = message.get("thread_ts", "")
+    # リプライがついていない場合はファイルを作成しない
+    async with semaphore:
+        with context.output_format.replies_writer(base_path, thread_ts) as writer:
+            async for replies in iter_replies(channel_id, message, client=context.client):
+                await _run_io(writer.write_all, replies)
+    context.checkpoint.mark_thread_done(channel_id, message["thread_ts"])
+    if writer.count:
+        logger.info(f"save replies message. {channel_info}, thread_ts: {thread_ts}")
+
+
+async def _run_io(func: Callable[..., T], *args: Any) -> T:
+    """
+    ファイルの書き込み等を既定の executor のスレッドで実行する
+
+    NOTE: 書き込みの間もイベントループで他のAPI呼び出しを進めるため、同期的なI/Oはこの関数を通す
+    NOTE: 同じ書き込み先への書き込みは、前の書き込みを待ってから呼び出す
+
+    Parameters
+    ----------
+    func : Callable[..., T]
+        実行する関数
+    args : Any
+        関数の引数
+
+    Returns
+    -------
+    T
+        関数の戻り値
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""コマンドラインから実行する
+
+`get_all_message_from_slack --output-dir ./work --workers 8 --format ndjson --include "proj-*"`
+`get_all_message_from_slack --dry-run --include "proj-*" --days 30`
+`get_all_message_from_slack --profile ./work/export.prof`
+`get_all_message_from_slack --verify ./work/nightly`
+
+NOTE: `--help` 等を速く表示するため、main は実行する時点で import する
+"""
+import argparse
+import sys
+from typing import Any, List, Optional
+
+from get_all_message_from_slack.util.export_config import ExportConfig
+from get_all_message_from_slack.util.selection import ExportFilter, days_ago
+from get_all_message_from_slack.util.writer import COMPRESSIONS, FORMATS, THREAD_STORAGES
+
+SERIALIZERS = ("auto", "orjson", "ujson", "json")
+SHARD_STRATEGIES = ("hash", "volume")
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """
+    引数の定義を作成
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        引数の定義
+    """
+    parser = argparse.ArgumentParser(
+        prog="get_all_message_from_slack",
+        description="Slack の public チャンネルから全てのメッセージを取得する",
+    )
+    output = parser.add_argument_group("output")
+    output.add_argument(
+        "-o",
+        "--output-dir",
+        default="./work",
+        help="出力先（この下に実行日時のディレクトリを作成）",
+    )
+    output.add_argument("--incremental", metavar="PATH", help="差分取得する出力先（固定）")
+    output.add_argument("--resume", metavar="PATH", help="中断したエクスポートの出力先")
+    output.add_argument("--lookback-seconds", type=int, default=0, help="差分取得時に遡る秒数")
+    output.add_argument("-f", "--format", choices=FORMATS, default="json", help="出力形式")
+    output.add_argument(
+        "--compression", choices=[c for c in COMPRESSIONS if c is not None], help="圧縮形式"
+    )
+    output.add_argument("--max-file-bytes", type=int, help="ndjson の1ファイルの最大サイズ")
+    output.add_argument("--serializer", choices=SERIALIZERS, default="auto", help="JSONの変換")
+    output.add_argument(
+        "--thread-storage", choices=THREAD_STORAGES, default="file", help="リプライの保存方法"
+    )
+    output.add_argument("--write-queue-size", type=int, default=0, help="書き込みキューの長さ")
+    output.add_argument("--prometheus", metavar="PATH", help="計測を Prometheus 形式で保存")
+    output.add_argument(
+        "--fingerprints", action="store_true", help="編集・削除の検証用のフィンガープリントを保存"
+    )
+
+    concurrency = parser.add_argument_group("concurrency")
+    concurrency.add_argument(
+        "-w", "--workers", type=int, default=1, help="並列に取得するチャンネル数"
+    )
+    concurrency.add_argument(
+        "--reply-workers", type=int, default=1, help="1チャンネル内で並列に取得するスレッド数"
+    )
+    concurrency.add_argument("--shard-index", type=int, help="このプロセスが取得するシャード")
+    concurrency.add_argument(
+        "--shard-count",
+        type=int,
+        default=1,
+        help="シャード数（各プロセスは Tier 毎のレート制限をシャード数で割った範囲で呼び出す）",
+    )
+    concurrency.add_argument(
+        "--shard-strategy", choices=SHARD_STRATEGIES, default="hash", help="シャードの分割方法"
+    )
+
+    selection = parser.add_argument_group("channel selection")
+    selection.add_argument(
+        "--include", action="append", default=[], metavar="PATTERN", help="対象のチャンネル名"
+    )
+    selection.add_argument(
+        "--exclude", action="append", default=[], metavar="PATTERN", help="除外するチャンネル名"
+    )
+    selection.add_argument(
+        "--skip-archived", action="store_true", help="アーカイブされたチャンネルを除外"
+    )
+    selection.add_argument("--min-members", type=int, default=0, help="最小のメンバー数")
+    selection.add_argument("--days", type=float, help="指定された日数前以降のメッセージのみ取得")
+    selection.add_argument("--oldest", metavar="TS", help="このts以降のメッセージのみ取得")
+    selection.add_argument("--latest", metavar="TS", help="このts以前のメッセージのみ取得")
+
+    run = parser.add_argument_group("run")
+    run.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="取得せずにチャンネル一覧から呼び出し回数と所要時間を見積もる",
+    )
+    run.add_argument(
+        "--messages-per-member",
+        type=float,
+        help="見積もりに使用する1メンバーあたりのメッセージ数",
+    )
+    run.add_argument(
+        "--verify",
+        metavar="PATH",
+        help="取得せずに出力先のメッセージの編集・削除をフィンガープリントで検証する",
+    )
+    run.add_argument(
+        "--profile", metavar="PATH", help="cProfile の計測結果（pstats 形式）を保存する"
+    )
+    return parser
+
+
+def export_filter(args: argparse.Namespace) -> ExportFilter:
+    """
+    引数からエクスポートの対象を作成
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        引数
+
+    Returns
+    -------
+    ExportFilter
+        エクスポートの対象
+
+    Raises
+    ------
+    ValueError
+        --days と --oldest の両方が指定された場合
+    """
+    if args.days is not None and args.oldest is not None:
+        raise ValueError("--days and --oldest cannot be specified together.")
+    return ExportFilter(
+        include=tuple(args.include),
+        exclude=tuple(args.exclude),
+        skip_archived=args.skip_archived,
+        min_members=args.min_members,
+        oldest=days_ago(args.days) if args.days is not None else args.oldest,
+        latest=args.latest,
+    )
+
+
+def export_config(args: argparse.Namespace) -> ExportConfig:
+    """
+    引数からエクスポートの設定を作成
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        引数
+
+    Returns
+    -------
+    ExportConfig
+        エクスポートの設定（main, estimate, verify に渡す）
+    """
+    return ExportConfig(
+        max_workers=args.workers,
+        incremental_path=args.incremental,
+        lookback_seconds=args.lookback_seconds,
+        output_format=args.format,
+        compression=args.compression,
+        max_file_bytes=args.max_file_bytes,
+        max_reply_workers=args.reply_workers,
+        resume_path=args.resume,
+        shard_index=args.shard_index,
+        shard_count=args.shard_count,
+        shard_strategy=args.shard_strategy,
+        export_filter=export_filter(args),
+        prometheus_path=args.prometheus,
+        write_queue_size=args.write_queue_size,
+        serializer=args.serializer,
+        thread_storage=args.thread_storage,
+        output_dir=args.output_dir,
+        fingerprints=args.fingerprints,
+    )
+
+
+def format_estimate(estimate: Any) -> str:
+    """
+    見積もりを表示用の文字列にする
+
+    Parameters
+    ----------
+    estimate : ExportEstimate
+        見積もり
+
+    Returns
+    -------
+    str
+        表示用の文字列
+    """
+    minutes, seconds = divmod(round(estimate.seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    lines = [
+        f"channels: {estimate.channels}",
+        f"messages (estimated): {estimate.messages}",
+        f"threads (estimated): {estimate.threads}",
+        f"calls (estimated): {estimate.total_calls}",
+    ]
+    lines.extend(f"  {method}: {count}" for method, count in estimate.calls.items())
+    lines.append(f"time (estimated): {hours}:{minutes:02d}:{seconds:02d}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    コマンドラインから実行する
+
+    Parameters
+    ----------
+    argv : Optional[List[str]], optional
+        コマンドライン引数, by default sys.argv[1:]
+
+    Returns
+    -------
+    int
+        終了コード
+    """
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    try:
+        config = export_config(args)
+    except ValueError as e:
+        parser.error(str(e))
+    _configure_logging()
+    if args.dry_run:
+        return _dry_run(config, args.messages_per_member)
+    if args.verify is not None:
+        return _verify(args.verify, config)
+    if args.profile is None:
+        return _run(config)
+
+    from get_all_message_from_slack.util.profiling import Profiler
+
+    profiler = Profiler()
+    try:
+        with profiler:
+            return _run(config)
+    finally:
+        path = profiler.dump(args.profile)
+        print(profiler.summary(), file=sys.stderr)
+        print(f"profile saved: {path}", file=sys.stderr)
+
+
+def _configure_logging() -> None:
+    """
+    ログを設定する（logging_conf.LOGGING_CONFIG）
+
+    NOTE: main 等はログを設定しないため、コマンドラインから実行する場合のみ設定する
+    """
+    from logging import config
+
+    from get_all_message_from_slack.logging_conf import LOGGING_CONFIG
+
+    config.dictConfig(LOGGING_CONFIG)  # type: ignore
+
+
+def _run(config: ExportConfig) -> int:
+    """エクスポートを実行する"""
+    from get_all_message_from_slack.main import main as export
+
+    export(config)
+    return 0
+
+
+def _dry_run(config: ExportConfig, messages_per_member: Optional[float]) -> int:
+    """見積もりを表示する"""
+    from get_all_message_from_slack.main import estimate
+
+    if messages_per_member is None:
+        result = estimate(config)
+    else:
+        result = estimate(config, messages_per_member=messages_per_member)
+    print(format_estimate(result))
+    return 0
+
+
+def _verify(path: str, config: ExportConfig) -> int:
+    """検証の結果を表示する"""
+    from get_all_message_from_slack.main import verify
+
+    report = verify(path, config)
+    print("\n".join(f"{key}: {value}" for key, value in report["summary"].items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,135 +1,857 @@
 """main"""
 import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime
-from logging import config, getLogger
+from itertools import groupby
+from logging import getLogger
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import get_all_message_from_slack.settings as settings
-from get_all_message_from_slack.logging_conf import LOGGING_CONFIG
+from get_all_message_from_slack.util.checkpoint import Checkpoint
+from get_all_message_from_slack.util.estimate import (
+    MESSAGES_PER_MEMBER,
+    ExportEstimate,
+    estimate_export,
+)
+from get_all_message_from_slack.util.export_config import DEFAULT_OUTPUT_DIR, ExportConfig
+from get_all_message_from_slack.util.export_state import ExportState, summarize_messages
+from get_all_message_from_slack.util.fingerprint import (
+    ChannelFingerprint,
+    Fingerprints,
+    changed_windows,
+    diff_messages,
+    fingerprint_channel,
+    fingerprint_messages,
+    is_thread_changed,
+    merge_fingerprints,
+    window_key,
+)
+from get_all_message_from_slack.util.metrics import metrics
+from get_all_message_from_slack.util.rate_limiter import rate_limiter
+from get_all_message_from_slack.util.selection import ExportFilter
+from get_all_message_from_slack.util.sharding import Shard
 from get_all_message_from_slack.util.slack_api import (
+    Page,
     get_all_public_channels,
-    get_all_users,
-    get_channel_message,
     get_replies,
+    iter_all_users,
+    iter_channel_message,
+    iter_replies,
+    lookup_cache,
 )
+from get_all_message_from_slack.util.thread_plan import plan_threads
+from get_all_message_from_slack.util.writer import BaseWriter, OutputFormat
+
+if TYPE_CHECKING:
+    from slack_sdk.web.async_client import AsyncWebClient
+    from slack_sdk.web.client import WebClient
 
-config.dictConfig(LOGGING_CONFIG)  # type: ignore
 logger = getLogger(__name__)
-client = settings.client
+
+METRICS_FILE_NAME = "metrics.json"
+VERIFICATION_FILE_NAME = "verification.json"
+# 1チャンネル内で実行中・実行待ちにできるリプライの取得数（max_reply_workers に対する倍数）
+REPLY_QUEUE_FACTOR = 4
+
+
+class ExportContext(NamedTuple):
+    """エクスポート全体で共有する設定と状態"""
+
+    base_path: Path
+    state: ExportState
+    checkpoint: Checkpoint
+    output_format: OutputFormat = OutputFormat()
+    lookback_seconds: int = 0
+    max_reply_workers: int = 1
+    shard: Optional[Shard] = None
+    export_filter: ExportFilter = ExportFilter()
+    # APIを呼び出すクライアント（Noneの場合は settings.get_client で共有するクライアント）
+    # NOTE: async_main の場合は AsyncWebClient（Noneの場合は async_slack_api.get_client）
+    client: Optional[Union["WebClient", "AsyncWebClient"]] = None
+    # 編集・削除を検出するためのフィンガープリント（Noneの場合は保存しない）
+    fingerprints: Optional[Fingerprints] = None
 
 
-def main():
+def main(config: Optional[ExportConfig] = None, client: Optional["WebClient"] = None):
     """
     main
+
+    NOTE: ログの設定は行わない（cli で行う）
+
+    Parameters
+    ----------
+    config : Optional[ExportConfig], optional
+        エクスポートの設定, by default None（ExportConfig の既定値）
+        各設定の詳細は ExportConfig を参照
+    client : Optional[WebClient], optional
+        APIを呼び出すクライアント, by default None（settings.get_client で共有するクライアント）
+        コネクションプールを持つ場合（PooledWebClient）は、並列数に合わせてサイズを変更する
     """
+    config = ExportConfig() if config is None else config
     logger.info("get all message from slack start.")
-    base_path = _create_base_path()
-    channels = _get_channels(base_path)
-    _get_users(base_path)
-    for channel in channels:
-        _get_channel_message(base_path, channel["id"], channel["name"])
+    metrics.reset()
+    lookup_cache.set_path(settings.lookup_cache_path(config.output_dir))
+    shard = _create_shard(config.shard_index, config.shard_count, config.shard_strategy)
+    # レート制限はワークスペース単位のため、全てのシャードで分け合う
+    rate_limiter.set_share(1.0 if shard is None else 1 / shard.count)
+    pool = getattr(settings.get_client() if client is None else client, "pool", None)
+    if pool is not None:
+        # チャンネル毎のスレッドと、その中のリプライ取得のスレッドが同時にAPIを呼び出す
+        pool.resize(max(1, config.max_workers) * (1 + max(1, config.max_reply_workers)))
+    if config.resume_path is not None:
+        base_path = _resume_base_path(config.resume_path, shard)
+        checkpoint = Checkpoint.load(base_path)
+    else:
+        base_path = _create_base_path(config.incremental_path, shard, config.output_dir)
+        checkpoint = Checkpoint.create(base_path)
+    context = ExportContext(
+        base_path,
+        _load_state(base_path, checkpoint),
+        checkpoint,
+        OutputFormat(
+            config.output_format,
+            config.compression,
+            config.max_file_bytes,
+            config.write_queue_size,
+            config.serializer,
+            config.thread_storage,
+        ),
+        config.lookback_seconds,
+        config.max_reply_workers,
+        shard,
+        config.export_filter,
+        client,
+        Fingerprints.load(base_path) if config.fingerprints else None,
+    )
+    try:
+        channels = _get_channels(context)
+        _get_users(context)
+        # 保存したチャンネル・ユーザ一覧は、検索用キャッシュで検索する時点で登録する
+        lookup_cache.add_masters(base_path, context.output_format)
+        failed_channels = _get_all_channel_message(context, channels, config.max_workers)
+    finally:
+        context.output_format.close()
+        # 全てのチャンネルの状態をまとめて保存する（チャンネル毎に保存するとファイル全体を何度も書き直す）
+        context.state.save()
+        if context.fingerprints is not None:
+            # 保存前に中断したチャンネルは、次回のエクスポートで保存済みのメッセージから作成し直す
+            context.fingerprints.save()
+        _save_metrics(base_path, config.prometheus_path)
+    if failed_channels:
+        logger.warning(f"failed channels: {failed_channels}")
     logger.info("get all message from slack finished")
 
 
-def _create_base_path() -> Path:
+def estimate(
+    config: Optional[ExportConfig] = None,
+    client: Optional["WebClient"] = None,
+    messages_per_member: float = MESSAGES_PER_MEMBER,
+) -> ExportEstimate:
+    """
+    エクスポートを実行せずに、APIの呼び出し回数と所要時間を見積もる（dry-run）
+
+    NOTE: チャンネル一覧（conversations.list）のみ取得し、出力先には何も書き込まない
+    NOTE: 設定のうち max_workers, incremental_path, lookback_seconds, max_reply_workers,
+          shard_*, export_filter を使用する
+
+    Parameters
+    ----------
+    config : Optional[ExportConfig], optional
+        エクスポートの設定, by default None（ExportConfig の既定値）
+    client : Optional[WebClient], optional
+        APIを呼び出すクライアント, by default None（settings.get_client で共有するクライアント）
+    messages_per_member : float, optional
+        メッセージ数を見積もる際の1メンバーあたりのメッセージ数, by default MESSAGES_PER_MEMBER
+
+    Returns
+    -------
+    ExportEstimate
+        見積もり
+    """
+    config = ExportConfig() if config is None else config
+    shard = _create_shard(config.shard_index, config.shard_count, config.shard_strategy)
+    export_filter = config.export_filter
+    state = None
+    if config.incremental_path is not None:
+        state_path = Path(config.incremental_path)
+        state = ExportState.load(state_path if shard is None else state_path / shard.name)
+    listed = get_all_public_channels(export_filter.skip_archived, client=client)
+    channels = export_filter.select_channels(listed)
+    if shard is not None:
+        channels = shard.select(channels)
+    return estimate_export(
+        channels,
+        export_filter,
+        state,
+        config.lookback_seconds,
+        config.max_workers,
+        config.max_reply_workers,
+        messages_per_member,
+        len(listed),
+        rate_share=1.0 if shard is None else 1 / shard.count,
+    )
+
+
+def _save_metrics(base_path: Path, prometheus_path: Optional[str] = None) -> None:
+    """
+    API呼び出しの計測を保存する
+
+    Parameters
+    ----------
+    base_path : Path
+        出力先のBaseとなるPath（metrics.json に保存する）
+    prometheus_path : Optional[str], optional
+        Prometheus のテキスト形式で保存する場合の保存先, by default None
+    """
+    summary = metrics.summary()
+    total = summary["total"]
+    logger.info(
+        f"api calls: {total['calls']}, latency: {total['latency_seconds']:.1f}s,"
+        f" rate limit wait: {total['wait_seconds']:.1f}s, retries: {total['retries']},"
+        f" received: {total['received_bytes']} bytes"
+    )
+    threads = summary["threads"]
+    logger.info(
+        f"threads fetched: {threads['fetched']},"
+        f" conversations.replies calls saved: {threads['calls_saved']} {threads['skipped']}"
+    )
+    objects = summary["objects"]
+    if objects["stored"] or objects["reused"]:
+        logger.info(
+            f"objects stored: {objects['stored']} ({objects['stored_bytes']} bytes),"
+            f" reused: {objects['reused']} ({objects['reused_bytes']} bytes)"
+        )
+    metrics.save(base_path / METRICS_FILE_NAME)
+    if prometheus_path is not None:
+        metrics.save_prometheus(Path(prometheus_path))
+
+
+def _create_shard(index: Optional[int], count: int, strategy: str) -> Optional[Shard]:
+    """
+    取得するシャードを作成
+
+    Parameters
+    ----------
+    index : Optional[int]
+        シャードのインデックス（Noneの場合は分担しない）
+    count : int
+        シャード数
+    strategy : str
+        チャンネルの分割方法
+
+    Returns
+    -------
+    Optional[Shard]
+        取得するシャード
+
+    Raises
+    ------
+    ValueError
+        インデックスがシャード数の範囲外の場合
+    """
+    if index is None:
+        return None
+    if not 0 <= index < count:
+        raise ValueError(f"shard index out of range. index: {index}, count: {count}")
+    return Shard(index, count, strategy)
+
+
+def _create_base_path(
+    incremental_path: Optional[str] = None,
+    shard: Optional[Shard] = None,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+) -> Path:
     """
     出力ファイルのBaseとなるPathを作成
 
+    Parameters
+    ----------
+    incremental_path : Optional[str], optional
+        差分取得を行う場合の出力先, by default None
+    shard : Optional[Shard], optional
+        分担して取得する場合のシャード, by default None
+        incremental_path 以下のシャードのディレクトリを出力先とする
+    output_dir : str, optional
+        incremental_path が指定されていない場合の出力先, by default "./work"
+        この下に実行日時のディレクトリを作成する
+
     Returns
     -------
     Path
         baseとなるPath
+
+    Raises
+    ------
+    ValueError
+        シャードが指定され、incremental_path が指定されていない場合
     """
+    if shard is not None:
+        if incremental_path is None:
+            raise ValueError("incremental_path is required for shard export.")
+        incremental_path = str(Path(incremental_path) / shard.name)
+    if incremental_path is not None:
+        base_path = Path(incremental_path)
+        logger.info(f"save base path (incremental): {base_path}")
+        base_path.mkdir(parents=True, exist_ok=True)
+        return base_path
     now = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base_path = Path(f"./work/{now}")
+    base_path = Path(output_dir) / now
     logger.info(f"save base path: {base_path}")
     base_path.mkdir(parents=True)
     return base_path
 
 
-def _get_channels(base_path: Path) -> List[Dict[str, Any]]:
+def _resume_base_path(resume_path: str, shard: Optional[Shard] = None) -> Path:
     """
-    全てのpublicチャンネル情報を取得
+    再開する出力ファイルのBaseとなるPathを取得
+
+    Parameters
+    ----------
+    resume_path : str
+        中断したエクスポートの出力先
+    shard : Optional[Shard], optional
+        分担して取得する場合のシャード, by default None
+        resume_path 以下のシャードのディレクトリを出力先とする
+
+    Returns
+    -------
+    Path
+        baseとなるPath
+
+    Raises
+    ------
+    FileNotFoundError
+        出力先が存在しない場合
+    """
+    base_path = Path(resume_path)
+    if shard is not None:
+        base_path = base_path / shard.name
+    if not base_path.is_dir():
+        raise FileNotFoundError(f"resume path not found: {base_path}")
+    logger.info(f"save base path (resume): {base_path}")
+    return base_path
+
+
+def _load_state(base_path: Path, checkpoint: Checkpoint) -> ExportState:
+    """
+    出力先のエクスポート状態を読み込む
+
+    NOTE: エクスポート状態は最後にまとめて保存するため、中断したエクスポートの場合は
+          チェックポイントに記録された取得済みのチャンネルの集計を反映する
 
     Parameters
     ----------
     base_path : Path
         出力先のBaseとなるPath
+    checkpoint : Checkpoint
+        チェックポイント
+
+    Returns
+    -------
+    ExportState
+        エクスポート状態
+    """
+    state = ExportState.load(base_path)
+    for channel_id, summary in checkpoint.channel_summaries().items():
+        state.apply(channel_id, summary)
+    return state
+
+
+def _get_channels(context: ExportContext) -> List[Dict[str, Any]]:
+    """
+    全てのpublicチャンネル情報を取得
+
+    NOTE: 再開時に保存済みの場合は保存されたチャンネル情報を読み込む
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
 
     Returns
     -------
     List[Dict[str, Any]]
         全てのpublicチャンネル情報
     """
+    channel_path = context.base_path / "channel_master"
+    if context.checkpoint.is_done("channel_master"):
+        logger.info(f"load saved public channels. path: {channel_path}")
+        return list(context.output_format.iter_items(channel_path))
     logger.info("get all public channels.")
-    channels = get_all_public_channels()
-    channel_path = base_path / "channel_master.json"
+    channels = get_all_public_channels(context.export_filter.skip_archived, client=context.client)
+    channels = context.export_filter.select_channels(channels)
+    if context.shard is not None:
+        channels = context.shard.select(channels)
+        logger.info(f"shard {context.shard.name}: {len(channels)} channels.")
     logger.info(f"save all public channels. path: {channel_path}")
-    _save_to_json(channels, channel_path)
+    with context.output_format.writer(channel_path) as writer:
+        writer.write_all(channels)
+    context.checkpoint.mark_done("channel_master")
     return channels
 
 
-def _get_users(base_path: Path) -> List[Dict[str, Any]]:
+def _get_users(context: ExportContext) -> Path:
     """
     全てのユーザ情報を取得
 
+    NOTE: 1ページずつ取得しながら保存する
+
     Parameters
     ----------
-    base_path : Path
-        出力先のBaseとなるPath
+    context : ExportContext
+        エクスポートの設定と状態
 
     Returns
     -------
-    List[Dict[str, Any]]
-        全てのユーザ情報
+    Path
+        保存されたPath（拡張子を除く）
     """
+    users_path = context.base_path / "user_master"
+    if context.checkpoint.is_done("user_master"):
+        logger.info(f"skip all users (already saved). path: {users_path}")
+        return users_path
+    if context.shard is not None and context.shard.index != 0:
+        logger.info("skip all users (saved by the first shard).")
+        return users_path
     logger.info("get all users.")
-    users = get_all_users()
-    users_path = base_path / "user_master.json"
     logger.info(f"save all users. path: {users_path}")
-    _save_to_json(users, users_path)
-    return users
+    with context.output_format.writer(users_path) as writer:
+        for users in iter_all_users(client=context.client):
+            writer.write_all(users)
+    context.checkpoint.mark_done("user_master")
+    return users_path
+
+
+def _get_all_channel_message(
+    context: ExportContext, channels: List[Dict[str, Any]], max_workers: int
+) -> List[str]:
+    """
+    全てのチャンネルのメッセージをワーカープールで並列に取得
+
+    NOTE: 1チャンネルの失敗で他のチャンネルの取得は中断しない
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channels : List[Dict[str, Any]]
+        取得対象のチャンネル情報
+    max_workers : int
+        最大ワーカー数
+
+    Returns
+    -------
+    List[str]
+        取得に失敗したチャンネルID
+    """
+    failed_channels = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {}
+        for channel in channels:
+            future = executor.submit(_get_channel_message, context, channel["id"], channel["name"])
+            futures[future] = channel["id"]
+        for future in as_completed(futures):
+            channel_id = futures[future]
+            try:
+                future.result()
+            except Exception:
+                logger.exception(f"failed to get channel message. id:{channel_id}")
+                failed_channels.append(channel_id)
+    return failed_channels
 
 
-def _get_channel_message(base_path: Path, channel_id: str, channel_name: str) -> None:
+def _get_channel_message(context: ExportContext, channel_id: str, channel_name: str) -> None:
     """
     チャンネル情報を取得
 
-    NOTE: 全てメモリに乗せるためメモリ不足に注意
+    NOTE: 1ページずつ取得しながら保存するため、メモリに乗るのは1ページ分のみ
+    NOTE: 前回取得済みの場合は差分のみ取得し、前回のメッセージにマージする
+    NOTE: リプライはワーカープールで並列に取得し、取得できたスレッドから保存する
+          取得待ちのスレッドが溜まった場合は、空くまで次のページを取得しない
+    NOTE: ページとそのスレッドが保存される毎にチェックポイントに記録し、中断した場合は続きから再開する
 
     Parameters
     ----------
-    base_path : Path
-        出力先のBaseとなるPath
+    context : ExportContext
+        エクスポートの設定と状態
     channel_id : str
         チャンネルID
     channel_name : str
         チャンネル名
     """
+    state = context.state
+    checkpoint = context.checkpoint
     channel_info = f"id:{channel_id}, name: {channel_name}"
-    logger.info(f"get channel_message. {channel_info}")
-    messages = get_channel_message(channel_id)
+    if checkpoint.is_channel_done(channel_id):
+        logger.info(f"skip channel_message (already done). {channel_info}")
+        return
+    oldest = context.export_filter.history_oldest(
+        state.oldest(channel_id, context.lookback_seconds)
+    )
+    latest = context.export_filter.latest
+    logger.info(f"get channel_message. {channel_info}, oldest: {oldest}, latest: {latest}")
 
-    messages_path = base_path / channel_id
-    messages_path.mkdir()
-    channel_message_path = messages_path / "nomal_messages.json"
+    messages_path = context.base_path / channel_id
+    messages_path.mkdir(exist_ok=True)
+    channel_message_path = messages_path / "nomal_messages"
     logger.info(f"save channel message. {channel_info}, path: {channel_message_path}")
-    _save_to_json(messages, channel_message_path)  # type: ignore
+    merge = context.output_format.exists(channel_message_path)
+    fetched_threads = checkpoint.threads_done(channel_id)
+    pending: List[Tuple[List[Future], Dict[str, Any]]] = []
+    executor = ThreadPoolExecutor(max_workers=max(1, context.max_reply_workers))
+    slots = threading.BoundedSemaphore(max(1, context.max_reply_workers) * REPLY_QUEUE_FACTOR)
+    try:
+        # NOTE: 書き込み先を閉じた後、リプライの取得が全て終わるまで待機する
+        with executor, context.output_format.writer(channel_message_path) as writer:
+            progress = _resume_channel(writer, checkpoint.channel_progress(channel_id))
+            fetched_ts = set(progress["ts"])
+            summary = progress["summary"]
+            fingerprint = _channel_fingerprint(context, channel_id, progress)
+            pages: Iterable[Page] = []
+            if progress["cursor"] is not None or progress["position"] is None:
+                pages = iter_channel_message(
+                    channel_id, oldest, progress["cursor"], latest, client=context.client
+                )
+            for messages in pages:
+                writer.write_all(messages if fingerprint is None else fingerprint.scan(messages))
+                page_futures = [
+                    _submit_replies(
+                        executor,
+                        slots,
+                        context,
+                        messages_path,
+                        message,
+                        channel_id,
+                        channel_info,
+                        fingerprint,
+                    )
+                    for message in _select_threads(context, channel_id, messages, fetched_threads)
+                ]
+                summary = summarize_messages(messages, summary)
+                ts = [message["ts"] for message in messages] if merge else []
+                fetched_ts.update(ts)
+                # 書き込みスレッドで書き込む場合は、書き込みを待たずに次のページを取得する
+                position = writer.checkpoint_async()
+                page = {
+                    "cursor": messages.next_cursor,
+                    "position": position,
+                    "summary": summarize_messages(messages),
+                    "ts": ts,
+                }
+                pending.append((page_futures + [position], page))
+                _mark_pages(checkpoint, channel_id, pending)
+            if merge:
+                _write_saved_messages(
+                    context, writer, channel_message_path, fetched_ts, fingerprint
+                )
+            # 失敗したスレッドがあればチャンネルの取得を失敗とする
+            _wait_pages(pending)
+        if context.fingerprints is not None:
+            _update_fingerprint(context, channel_id, fingerprint)
+    finally:
+        # 中断された場合も、スレッドまで保存済みのページは記録する
+        _mark_pages(checkpoint, channel_id, pending)
+        context.output_format.close_channel(messages_path)
+    if summary is not None:
+        state.apply(channel_id, summary)
+    # 状態は main の最後に保存する（保存前に中断した場合は、ここで記録する集計から復元する）
+    checkpoint.mark_channel_done(channel_id, summary)
+
+
+def _channel_fingerprint(
+    context: ExportContext, channel_id: str, progress: Dict[str, Any]
+) -> Optional[ChannelFingerprint]:
+    """
+    保存しながらチャンネルのフィンガープリントを作成する場合に作成する
+
+    NOTE: 途中から再開した場合は書き込み済みのページを追加できないため作成しない
 
-    logger.info(f"get replies_message. {channel_info}")
-    for message in messages:
-        _get_replies(messages_path, message, channel_id, channel_info)
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channel_id : str
+        チャンネルID
+    progress : Dict[str, Any]
+        再開する進捗（_resume_channel の戻り値）
+
+    Returns
+    -------
+    Optional[ChannelFingerprint]
+        チャンネルのフィンガープリント
+        フィンガープリントを保存しない、または途中から再開した場合はNone
+    """
+    if context.fingerprints is None or progress["position"] is not None:
+        return None
+    return ChannelFingerprint(
+        context.fingerprints.window_seconds, context.fingerprints.get(channel_id)
+    )
+
+
+def _update_fingerprint(
+    context: ExportContext, channel_id: str, fingerprint: Optional[ChannelFingerprint]
+) -> None:
+    """
+    チャンネルのフィンガープリントを更新する
+
+    NOTE: 保存しながら作成した場合は、今回取得しなかったスレッドのうち
+          保存済みのフィンガープリントを引き継げないもののみリプライを読み込む
+          途中から再開した場合（fingerprint がNone）は保存したメッセージ・リプライを全て読み込む
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channel_id : str
+        チャンネルID
+    fingerprint : Optional[ChannelFingerprint]
+        保存しながら作成したフィンガープリント（_channel_fingerprint の戻り値）
+    """
+    fingerprints = cast(Fingerprints, context.fingerprints)
+    messages_path = context.base_path / channel_id
+
+    def replies(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return _saved_replies(context, messages_path, message["thread_ts"])
+
+    if fingerprint is None:
+        fingerprints.update_channel(
+            channel_id, context.output_format.iter_items(messages_path / "nomal_messages"), replies
+        )
+    else:
+        fingerprints.set(channel_id, fingerprint.result(replies))
+
+
+def _resume_channel(writer: BaseWriter, progress: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    チェックポイントの進捗から書き込みを再開する
+
+    NOTE: 書き込み途中のファイルが無い（既に置き換えられた等）場合は最初から取得し直す
+
+    Parameters
+    ----------
+    writer : BaseWriter
+        書き込み先
+    progress : Optional[Dict[str, Any]]
+        チャンネルの進捗（Checkpoint.channel_progress の戻り値）
+
+    Returns
+    -------
+    Dict[str, Any]
+        再開する進捗
+        最初から取得する場合は cursor, position, summary がNone、ts が空の進捗
+    """
+    if progress is not None:
+        try:
+            writer.resume(progress["position"])
+            return progress
+        except FileNotFoundError:
+            logger.warning("temporary file for resume not found. restart the channel.")
+    return {"cursor": None, "position": None, "summary": None, "ts": []}
+
+
+def _mark_pages(
+    checkpoint: Checkpoint,
+    channel_id: str,
+    pending: List[Tuple[List[Future], Dict[str, Any]]],
+) -> None:
+    """
+    スレッドまで全て保存されたページを先頭から順にチェックポイントに記録する
+
+    NOTE: 未保存のスレッドが残るページより後ろは記録しない（再開時に取得し直す）
+    NOTE: ページの書き込み位置（position）は書き込み完了後に結果が得られる Future
+
+    Parameters
+    ----------
+    checkpoint : Checkpoint
+        チェックポイント
+    channel_id : str
+        チャンネルID
+    pending : List[Tuple[List[Future], Dict[str, Any]]]
+        記録待ちのページ（スレッド取得と書き込みの Future と進捗）
+        記録したページは取り除かれる
+    """
+    while pending and all(future.done() for future in pending[0][0]):
+        if any(future.exception() is not None for future in pending[0][0]):
+            # 失敗したスレッドがあるページ以降は記録しない
+            return
+        _, page = pending.pop(0)
+        checkpoint.mark_page(channel_id, **dict(page, position=page["position"].result()))
+
+
+def _wait_pages(pending: List[Tuple[List[Future], Dict[str, Any]]]) -> None:
+    """
+    記録待ちのページのスレッドの取得と書き込みが全て終わるまで待機する
+
+    NOTE: 記録済みのページはスレッドまで保存済みのため、記録待ちのページのみ待機する
+
+    Parameters
+    ----------
+    pending : List[Tuple[List[Future], Dict[str, Any]]]
+        記録待ちのページ（_mark_pages を参照）
+
+    Raises
+    ------
+    Exception
+        失敗したスレッドの取得・書き込みの例外
+    """
+    for futures, _ in pending:
+        for future in futures:
+            future.result()
+
+
+def _select_threads(
+    context: ExportContext,
+    channel_id: str,
+    messages: List[Dict[str, Any]],
+    fetched_threads: Set[str],
+) -> List[Dict[str, Any]]:
+    """
+    リプライを取得する必要のあるスレッドの親メッセージを選択する
+
+    判断の詳細は thread_plan.plan_threads を参照
+    省略したスレッド数は計測（metrics.json の threads）に記録する
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channel_id : str
+        チャンネルID
+    messages : List[Dict[str, Any]]
+        1ページ分のメッセージ
+    fetched_threads : Set[str]
+        取得済みのスレッドの thread_ts
+        選択したスレッドの thread_ts が追加される
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        リプライを取得する必要のあるスレッドの親メッセージ
+    """
+    plan = plan_threads(
+        messages,
+        fetched_threads,
+        lambda message: context.state.is_thread_updated(channel_id, message),
+    )
+    metrics.record_threads(len(plan.fetch), plan.skipped)
+    return plan.fetch
+
+
+def _write_saved_messages(
+    context: ExportContext,
+    writer: BaseWriter,
+    path: Path,
+    fetched_ts: Set[str],
+    fingerprint: Optional[ChannelFingerprint] = None,
+) -> None:
+    """
+    保存済みのメッセージのうち、今回取得しなかったものを書き込む（前回のメッセージとのマージ）
+
+    NOTE: 保存済みのメッセージは今回取得したメッセージより古いため、後ろに書き込めば新しい順が保たれる
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    writer : BaseWriter
+        書き込み先
+    path : Path
+        保存済みのメッセージのPath（拡張子を除く）
+    fetched_ts : Set[str]
+        今回取得したメッセージのts
+    fingerprint : Optional[ChannelFingerprint], optional
+        書き込んだメッセージを追加するフィンガープリント, by default None
+    """
+    messages = (
+        message
+        for message in context.output_format.iter_items(path)
+        if message["ts"] not in fetched_ts
+    )
+    writer.write_all(messages if fingerprint is None else fingerprint.scan(messages))
+
+
+def _submit_replies(
+    executor: ThreadPoolExecutor,
+    slots: threading.BoundedSemaphore,
+    context: ExportContext,
+    base_path: Path,
+    message: Dict[str, Any],
+    channel_id: str,
+    channel_info: str,
+    fingerprint: Optional[ChannelFingerprint] = None,
+) -> Future:
+    """
+    リプライの取得をワーカープールに追加する
+
+    NOTE: 実行中・実行待ちの取得が slots の数に達している場合は、いずれかが終わるまで待機する
+          （履歴の取得がリプライの取得より先に進み、親メッセージがメモリに溜まり続けないようにする）
+
+    Parameters
+    ----------
+    executor : ThreadPoolExecutor
+        リプライを取得するワーカープール
+    slots : threading.BoundedSemaphore
+        実行中・実行待ちにできる取得数
+    context : ExportContext
+        エクスポートの設定と状態
+    base_path : Path
+        出力先のBaseとなるPath
+    message : Dict[str, Any]
+        メッセージ情報
+    channel_id : str
+        チャンネルID
+    channel_info : str
+        チャンネル情報
+    fingerprint : Optional[ChannelFingerprint], optional
+        取得したリプライを追加するフィンガープリント, by default None
+
+    Returns
+    -------
+    Future
+        リプライの取得の Future
+    """
+    slots.acquire()
+    try:
+        future = executor.submit(
+            _get_replies, context, base_path, message, channel_id, channel_info, fingerprint
+        )
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
 
 
 def _get_replies(
-    base_path: Path, message: Dict[str, Any], channel_id: str, channel_info: str
+    context: ExportContext,
+    base_path: Path,
+    message: Dict[str, Any],
+    channel_id: str,
+    channel_info: str,
+    fingerprint: Optional[ChannelFingerprint] = None,
 ) -> None:
     """
     リプライメッセージを取得
 
     Parameters
     ----------
+    context : ExportContext
+        エクスポートの設定と状態
     base_path : Path
         出力先のBaseとなるPath
     message : Dict[str, Any]
@@ -138,35 +860,310 @@ def _get_replies(
         チャンネルID
     channel_info : str
         チャンネル情報
+    fingerprint : Optional[ChannelFingerprint], optional
+        取得したリプライを追加するフィンガープリント, by default None
     """
-    replies = get_replies(channel_id, message)
-    if replies:
-        # NOTE: '1638883139.000600' のように「.」が入るとファイル名として不適格なので「_」に置換
-        thread_ts = message["thread_ts"].replace(".", "_")
-        replies_path = base_path / f"{thread_ts}.json"
-        logger.info(f"save replies message. {channel_info}, path: {replies_path}")
-        _save_to_json(replies, replies_path)  # type: ignore
+    thread_ts = message.get("thread_ts", "")
+    # リプライがついていない場合はファイルを作成しない
+    with context.output_format.replies_writer(base_path, thread_ts) as writer:
+        for replies in iter_replies(channel_id, message, client=context.client):
+            writer.write_all(replies)
+            if fingerprint is not None:
+                fingerprint.add_replies(thread_ts, replies)
+    context.checkpoint.mark_thread_done(channel_id, message["thread_ts"])
+    if writer.count:
+        logger.info(f"save replies message. {channel_info}, thread_ts: {thread_ts}")
 
 
-def _save_to_json(data: Any, path: Path) -> Path:
+def verify(
+    path: str, config: Optional[ExportConfig] = None, client: Optional["WebClient"] = None
+) -> Dict[str, Any]:
     """
-    json形式で保存する
+    保存済みのエクスポートを Slack と比較し、編集・削除されたメッセージを報告する（検証）
+
+    NOTE: 保存済みのデータは変更せず、結果を出力先の verification.json に保存する
+    NOTE: チャンネル毎に保存済みの期間のメッセージを全て取得し直し（ページングは省略できない）、
+          フィンガープリント（fingerprints.json）が異なるウィンドウのみ保存済みのメッセージと突き合わせる
+          リプライは親メッセージの reply_count, latest_reply が変わったスレッドのみ取得する
+          （フィンガープリントが保存されていない場合は保存済みのデータから作成する）
 
     Parameters
     ----------
-    data : Any
-        保存対象のデータ
-    path : Path
-        保存先
+    path : str
+        検証するエクスポートの出力先
+    config : Optional[ExportConfig], optional
+        エクスポートの設定, by default None（ExportConfig の既定値）
+        output_format, compression, serializer, thread_storage はエクスポート時と同じものを指定する
+        export_filter で検証するチャンネル、max_workers で並列に検証するチャンネル数を指定する
+    client : Optional[WebClient], optional
+        APIを呼び出すクライアント, by default None（settings.get_client で共有するクライアント）
 
     Returns
     -------
-    Path
-        保存されたPath
+    Dict[str, Any]
+        変更のあったチャンネル毎の edited, deleted, added（ts）とスレッド毎の変更（channels）、
+        全体の集計（summary）
+    """
+    config = ExportConfig() if config is None else config
+    base_path = Path(path)
+    checkpoint = Checkpoint.load(base_path)
+    export_filter = config.export_filter
+    context = ExportContext(
+        base_path,
+        _load_state(base_path, checkpoint),
+        checkpoint,
+        OutputFormat(
+            config.output_format,
+            config.compression,
+            serializer=config.serializer,
+            thread_storage=config.thread_storage,
+        ),
+        export_filter=export_filter,
+        client=client,
+        fingerprints=Fingerprints.load(base_path),
+    )
+    try:
+        saved_channels = list(context.output_format.iter_items(base_path / "channel_master"))
+        channels = export_filter.select_channels(saved_channels)
+        with ThreadPoolExecutor(max_workers=max(1, config.max_workers)) as executor:
+            results = list(
+                executor.map(lambda channel: _verify_channel(context, channel["id"]), channels)
+            )
+    finally:
+        context.output_format.close()
+    report = _verification_report(channels, results)
+    with open(base_path / VERIFICATION_FILE_NAME, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"verification finished. {report['summary']}")
+    return report
+
+
+def _verify_channel(context: ExportContext, channel_id: str) -> Dict[str, Any]:
+    """
+    チャンネルを検証する
+
+    NOTE: 保存済みの期間の履歴は全て取得し直す（Slack にはウィンドウ毎の件数・ハッシュを取得する API が無い）
+          取得したページはウィンドウ毎に比較し、保持するのは比較中のウィンドウと
+          フィンガープリントが異なったウィンドウのメッセージ、リプライを取得するスレッドの親メッセージのみ
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channel_id : str
+        チャンネルID
+
+    Returns
+    -------
+    Dict[str, Any]
+        edited, deleted, added（ts）、スレッド毎の変更（threads）と、
+        比較した・異なったウィンドウ数、取得した・省略したスレッド数
+    """
+    messages_path = context.base_path / channel_id
+    fingerprints = cast(Fingerprints, context.fingerprints)
+    fingerprint = fingerprints.get(channel_id)
+    if fingerprint is None:
+        fingerprint = fingerprint_channel(
+            context.output_format.iter_items(messages_path / "nomal_messages"),
+            lambda message: _saved_replies(context, messages_path, message["thread_ts"]),
+            fingerprints.window_seconds,
+        )
+    latest = context.state.latest_ts(channel_id)
+    result: Dict[str, Any] = {"edited": [], "deleted": [], "added": [], "threads": {}}
+    if latest is None or fingerprint["oldest_ts"] is None:
+        return {**result, "windows_checked": 0, "windows_changed": 0, "threads_fetched": 0}
+    # 保存済みの期間のみ取得し直す（比較に必要な項目のみ保持する）
+    pages = iter_channel_message(
+        channel_id, fingerprint["oldest_ts"], latest=latest, client=context.client, inclusive=True
+    )
+    threads: List[Dict[str, Any]] = []
+
+    def scan() -> Iterator[Dict[str, Any]]:
+        for page in pages:
+            for message in map(_fingerprint_fields, page):
+                if message.get("thread_ts") == message["ts"] and is_thread_changed(
+                    fingerprint["threads"].get(message["ts"]), message
+                ):
+                    threads.append(message)
+                yield message
+
+    fetched_windows, fetched = _compare_windows(
+        scan(), fingerprint["windows"], fingerprints.window_seconds
+    )
+    windows = changed_windows(fingerprint["windows"], fetched_windows)
+    if windows:
+        in_windows = (
+            lambda message: window_key(message["ts"], fingerprints.window_seconds) in windows
+        )
+        saved = context.output_format.iter_items(messages_path / "nomal_messages")
+        result.update(diff_messages(filter(in_windows, saved), filter(in_windows, fetched)))
+    for parent in threads:
+        diff = _verify_thread(context, channel_id, parent, fingerprint["threads"].get(parent["ts"]))
+        if diff is not None:
+            result["threads"][parent["ts"]] = diff
+    return {
+        **result,
+        "windows_checked": len(fetched_windows),
+        "windows_changed": len(windows),
+        "threads_fetched": len(threads),
+    }
+
+
+def _compare_windows(
+    messages: Iterable[Dict[str, Any]], saved: Dict[str, Dict[str, Any]], window_seconds: int
+) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    取得し直したメッセージをウィンドウ毎に保存済みのフィンガープリントと比較する
+
+    NOTE: conversations.history は新しい順に返すため、連続する同じウィンドウのメッセージ毎に比較し、
+          異なったウィンドウのメッセージのみ保持する
+          （同じウィンドウが分かれて返された場合は、フィンガープリントを合わせ、2つ目以降の部分は全て保持する）
+
+    Parameters
+    ----------
+    messages : Iterable[Dict[str, Any]]
+        取得し直したメッセージ
+    saved : Dict[str, Dict[str, Any]]
+        保存済みのウィンドウ毎のフィンガープリント
+    window_seconds : int
+        ウィンドウの長さ（秒）
+
+    Returns
+    -------
+    Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]
+        ウィンドウ毎のフィンガープリントと、
+        フィンガープリントが保存済みと異なった（可能性のある）ウィンドウのメッセージ
     """
-    with open(path, "w") as f:
-        json.dump(data, f)
-    return path
+    fetched: Dict[str, Dict[str, Any]] = {}
+    changed: List[Dict[str, Any]] = []
+    for key, group in groupby(messages, lambda message: window_key(message["ts"], window_seconds)):
+        window = list(group)
+        fingerprint = fingerprint_messages(window)
+        if key in fetched:
+            changed.extend(window)
+            fetched[key] = merge_fingerprints(fetched[key], fingerprint)
+            continue
+        fetched[key] = fingerprint
+        if fingerprint != saved.get(key):
+            changed.extend(window)
+    return dict(sorted(fetched.items())), changed
+
+
+def _verify_thread(
+    context: ExportContext,
+    channel_id: str,
+    parent: Dict[str, Any],
+    saved: Optional[Dict[str, Any]],
+) -> Optional[Dict[str, List[str]]]:
+    """
+    スレッドのリプライを取得し直して検証する
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channel_id : str
+        チャンネルID
+    parent : Dict[str, Any]
+        取得し直した親メッセージ
+    saved : Optional[Dict[str, Any]]
+        保存済みのスレッドのフィンガープリント
+
+    Returns
+    -------
+    Optional[Dict[str, List[str]]]
+        リプライの edited, deleted, added（ts、親メッセージは除く）
+        変更が無い場合はNone
+    """
+    replies = get_replies(channel_id, parent, client=context.client)
+    fetched = fingerprint_messages(replies)
+    if saved is not None and all(saved[key] == fetched[key] for key in fetched):
+        return None
+    saved_replies = _saved_replies(context, context.base_path / channel_id, parent["ts"])
+    diff = diff_messages(saved_replies, replies)
+    diff = {key: [ts for ts in values if ts != parent["ts"]] for key, values in diff.items()}
+    return diff if any(diff.values()) else None
+
+
+def _verification_report(
+    channels: List[Dict[str, Any]], results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    チャンネル毎の検証結果をまとめる
+
+    Parameters
+    ----------
+    channels : List[Dict[str, Any]]
+        検証したチャンネル
+    results : List[Dict[str, Any]]
+        チャンネル毎の検証結果（_verify_channel の戻り値）
+
+    Returns
+    -------
+    Dict[str, Any]
+        変更のあったチャンネル毎の結果（channels）と全体の集計（summary）
+    """
+    changes = {}
+    summary = dict.fromkeys(
+        (
+            "edited",
+            "deleted",
+            "added",
+            "replies_edited",
+            "replies_deleted",
+            "windows_checked",
+            "windows_changed",
+            "threads_fetched",
+        ),
+        0,
+    )
+    for channel, result in zip(channels, results):
+        for key in ("edited", "deleted", "added"):
+            summary[key] += len(result[key])
+        for thread in result["threads"].values():
+            summary["replies_edited"] += len(thread["edited"])
+            summary["replies_deleted"] += len(thread["deleted"])
+        for key in ("windows_checked", "windows_changed", "threads_fetched"):
+            summary[key] += result[key]
+        if any(result[key] for key in ("edited", "deleted", "added", "threads")):
+            changes[channel["id"]] = {
+                "name": channel["name"],
+                **{key: result[key] for key in ("edited", "deleted", "added", "threads")},
+            }
+    return {"channels": changes, "summary": {"channels": len(channels), **summary}}
+
+
+def _saved_replies(
+    context: ExportContext, channel_path: Path, thread_ts: str
+) -> List[Dict[str, Any]]:
+    """
+    保存済みのスレッドのリプライを読み込む
+
+    Parameters
+    ----------
+    context : ExportContext
+        エクスポートの設定と状態
+    channel_path : Path
+        チャンネルの出力先
+    thread_ts : str
+        スレッドの thread_ts
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        リプライ
+        保存されていない（リプライを取得していない）場合は空のリスト
+    """
+    try:
+        return list(context.output_format.iter_replies(channel_path, thread_ts))
+    except (FileNotFoundError, KeyError):
+        return []
+
+
+def _fingerprint_fields(message: Dict[str, Any]) -> Dict[str, Any]:
+    """フィンガープリントと比較に必要な項目のみ取り出す"""
+    keys = ("ts", "thread_ts", "edited", "subtype", "reply_count", "latest_reply")
+    return {key: message[key] for key in keys if key in message}
 
 
 if __name__ == "__main__":
@@ -1,6 +1,168 @@
-"""application settings"""
+"""application settings
+
+NOTE: import した時点ではクライアントを作成しない（SLACK_TOKEN は最初にAPIを呼び出す時点で必要）
+slack_sdk の import に時間がかかるため、クライアントを作成する時点で import する
+"""
 import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from get_all_message_from_slack.util.metrics import metrics
+from get_all_message_from_slack.util.page_size import page_sizer, parse_page_sizes
+
+if TYPE_CHECKING:
+    import aiohttp
+    from slack_sdk.web.async_client import AsyncWebClient
+    from slack_sdk.web.client import WebClient
+
+# 接続先のAPI（ベンチマーク等でローカルのサーバに接続する場合に指定する）
+# NOTE: 既定値は WebClient.BASE_URL と同じ
+SLACK_API_URL = os.environ.get("SLACK_API_URL", "https://slack.com/api/")
+# 接続・受信のタイムアウト（秒）
+# NOTE: プロキシは環境変数 HTTPS_PROXY 等で指定する
+SLACK_HTTP_TIMEOUT = int(os.environ.get("SLACK_HTTP_TIMEOUT", "30"))
+# チャンネル名・ユーザIDの検索用キャッシュの保存先と有効期間（秒）
+# NOTE: 保存先を指定しない場合は、出力先（main の output_dir）の下に保存する（lookup_cache_path を参照）
+LOOKUP_CACHE_PATH = os.environ.get("SLACK_LOOKUP_CACHE_PATH")
+LOOKUP_CACHE_FILE_NAME = "lookup_cache.json"
+LOOKUP_CACHE_TTL = float(os.environ.get("SLACK_LOOKUP_CACHE_TTL", str(24 * 60 * 60)))
+# ページングするメソッド毎のページサイズ（例: "conversations.history=200,conversations.replies=200"）
+# 指定しないメソッドは各メソッドの上限から開始し、応答に合わせて調整する
+PAGE_SIZES = parse_page_sizes(os.environ.get("SLACK_PAGE_SIZES", ""))
+page_sizer.update(PAGE_SIZES)
+
+_client: Optional["WebClient"] = None
+
+
+def lookup_cache_path(output_dir: str = "./work") -> Path:
+    """
+    検索用キャッシュの保存先
+
+    Parameters
+    ----------
+    output_dir : str, optional
+        エクスポートの出力先, by default "./work"
+
+    Returns
+    -------
+    Path
+        環境変数 SLACK_LOOKUP_CACHE_PATH が指定されている場合はそのPath
+        指定されていない場合は出力先の下の lookup_cache.json
+    """
+    if LOOKUP_CACHE_PATH is not None:
+        return Path(LOOKUP_CACHE_PATH)
+    return Path(output_dir) / LOOKUP_CACHE_FILE_NAME
+
+
+_client_lock = threading.Lock()
+
+
+def create_client(token: Optional[str] = None) -> "WebClient":
+    """
+    クライアントを作成
+
+    NOTE: 接続はプールして再利用する（プールのサイズは main で並列数に合わせて変更する）
+
+    Parameters
+    ----------
+    token : Optional[str], optional
+        Slackのトークン, by default 環境変数 SLACK_TOKEN
+
+    Returns
+    -------
+    WebClient
+        クライアント（PooledWebClient）
+    """
+    from get_all_message_from_slack.util.transport import PooledWebClient
+
+    return PooledWebClient(
+        token=os.environ["SLACK_TOKEN"] if token is None else token,
+        base_url=SLACK_API_URL,
+        timeout=SLACK_HTTP_TIMEOUT,
+        on_response=metrics.record_bytes,
+    )
+
+
+def get_client() -> "WebClient":
+    """
+    全てのAPI呼び出しで共有するクライアントを取得（最初に呼び出された時点で作成する）
+
+    Returns
+    -------
+    WebClient
+        共有するクライアント
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_client()
+        return _client
+
+
+def set_client(client: Optional["WebClient"]) -> None:
+    """
+    全てのAPI呼び出しで共有するクライアントを設定する
+
+    Parameters
+    ----------
+    client : Optional[WebClient]
+        共有するクライアント
+        Noneの場合は次に get_client が呼び出された時点で作成し直す
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def create_async_client(token: Optional[str] = None) -> "AsyncWebClient":
+    """
+    非同期版のクライアントを作成
+
+    NOTE: aiohttp が必要なため、使用する時点で import する
+    NOTE: 受信したバイト数は create_async_session で作成したセッションで数える
+          （セッションを設定しない場合は API 呼び出し毎にセッションを作成し、数えない）
+
+    Parameters
+    ----------
+    token : Optional[str], optional
+        Slackのトークン, by default 環境変数 SLACK_TOKEN
+
+    Returns
+    -------
+    AsyncWebClient
+        非同期版のクライアント
+    """
+    from slack_sdk.web.async_client import AsyncWebClient
+
+    return AsyncWebClient(
+        token=os.environ["SLACK_TOKEN"] if token is None else token,
+        base_url=SLACK_API_URL,
+        timeout=SLACK_HTTP_TIMEOUT,
+    )
+
+
+def create_async_session(max_connections: int = 100) -> "aiohttp.ClientSession":
+    """
+    非同期版のクライアントで共有するセッション（コネクションプール）を作成
+
+    NOTE: イベントループの中で呼び出す（async_slack_api.use_session で設定する）
+
+    Parameters
+    ----------
+    max_connections : int, optional
+        同時に接続する最大数, by default 100
+
+    Returns
+    -------
+    aiohttp.ClientSession
+        セッション（受信したバイト数を metrics に記録する）
+    """
+    import aiohttp
 
-from slack_sdk.web.client import WebClient
+    from get_all_message_from_slack.util.async_transport import create_trace_config
 
-client = WebClient(token=os.environ["SLACK_TOKEN"])
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=max_connections),
+        trace_configs=[create_trace_config(metrics.record_bytes)],
+    )
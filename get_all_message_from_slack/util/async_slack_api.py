@@ -0,0 +1,408 @@
+"""Slack APIを非同期に操作する関数群
+
+slack_api のasyncio版
+NOTE: aiohttp が必要（`pip install "get_all_message_from_slack[async]"`）
+NOTE: クライアントは最初にAPIを呼び出す時点で作成するため、import にトークンは不要
+NOTE: aiohttp は任意の依存のため、使用する時点で import する
+"""
+import asyncio
+import time
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from get_all_message_from_slack.settings import create_async_client
+from get_all_message_from_slack.util.metrics import metrics
+from get_all_message_from_slack.util.page_size import page_sizer
+from get_all_message_from_slack.util.rate_limiter import method_name, rate_limiter
+from get_all_message_from_slack.util.retry import (
+    TRANSIENT_ERRORS,
+    CallAttempts,
+    RetryPolicy,
+    circuit_breaker,
+)
+
+if TYPE_CHECKING:
+    import aiohttp
+    from slack_sdk.web.async_client import AsyncWebClient
+    from slack_sdk.web.async_slack_response import AsyncSlackResponse
+
+_client: Optional["AsyncWebClient"] = None
+# タイムアウトも一時的なエラーとしてリトライする（aiohttp の接続エラーは __is_transient を参照）
+retry_policy = RetryPolicy(transient_errors=TRANSIENT_ERRORS + (asyncio.TimeoutError,))
+
+
+def import_aiohttp() -> ModuleType:
+    """
+    aiohttp を import する
+
+    Returns
+    -------
+    ModuleType
+        aiohttp
+
+    Raises
+    ------
+    ImportError
+        aiohttp がインストールされていない場合
+    """
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError(
+            'the async engine requires aiohttp. `pip install "get_all_message_from_slack[async]"`'
+        ) from e
+    return aiohttp
+
+
+def get_client() -> "AsyncWebClient":
+    """
+    全てのAPI呼び出しで共有するクライアントを取得（最初に呼び出された時点で作成する）
+
+    NOTE: イベントループの1スレッドから呼び出されるため、ロックはしない
+
+    Returns
+    -------
+    AsyncWebClient
+        共有するクライアント
+    """
+    global _client
+    if _client is None:
+        _client = create_async_client()
+    return _client
+
+
+def set_client(client: Optional["AsyncWebClient"]) -> None:
+    """
+    全てのAPI呼び出しで共有するクライアントを設定する
+
+    Parameters
+    ----------
+    client : Optional[AsyncWebClient]
+        共有するクライアント
+        Noneの場合は次に get_client が呼び出された時点で作成し直す
+    """
+    global _client
+    _client = client
+
+
+def use_session(
+    session: Optional["aiohttp.ClientSession"], client: Optional["AsyncWebClient"] = None
+) -> None:
+    """
+    全てのAPI呼び出しで共有するセッション（コネクションプール）を設定する
+
+    Parameters
+    ----------
+    session : Optional[aiohttp.ClientSession]
+        共有するセッション
+        Noneの場合はAPI呼び出し毎にセッションを作成する
+    client : Optional[AsyncWebClient], optional
+        セッションを設定するクライアント, by default None（get_client で共有するクライアント）
+    """
+    __client(client).session = session
+
+
+async def get_all_users(client: Optional["AsyncWebClient"] = None) -> List[Dict[str, Any]]:
+    """
+    全てのユーザ情報を取得する
+
+    Parameters
+    ----------
+    client : Optional[AsyncWebClient], optional
+        使用するクライアント, by default None（get_client で共有するクライアント）
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        ユーザ情報
+        フォーマットは下記のchannels以下を参照
+        https://api.slack.com/methods/users.list#responses
+    """
+    return await __get_all_data_by_iterating(iter_all_users(client))
+
+
+def iter_all_users(
+    client: Optional["AsyncWebClient"] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    全てのユーザ情報を1ページずつ取得する
+
+    Parameters
+    ----------
+    client : Optional[AsyncWebClient], optional
+        使用するクライアント, by default None（get_client で共有するクライアント）
+
+    Yields
+    -------
+    List[Dict[str, Any]]
+        1ページ分のユーザ情報
+    """
+    return __iter_pages(__client(client).users_list, {}, "members", False)
+
+
+async def get_all_public_channels(
+    exclude_archived: bool = False, client: Optional["AsyncWebClient"] = None
+) -> List[Dict[str, Any]]:
+    """
+    全てのpublicチャンネル情報を取得する
+
+    Parameters
+    ----------
+    exclude_archived : bool, optional
+        アーカイブされたチャンネルを除外する, by default False
+    client : Optional[AsyncWebClient], optional
+        使用するクライアント, by default None（get_client で共有するクライアント）
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        チャンネル情報
+        フォーマットは下記のchannels以下を参照
+        https://api.slack.com/methods/conversations.list#responses
+    """
+    return await __get_all_data_by_iterating(iter_all_public_channels(exclude_archived, client))
+
+
+def iter_all_public_channels(
+    exclude_archived: bool = False, client: Optional["AsyncWebClient"] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    全てのpublicチャンネル情報を1ページずつ取得する
+
+    Parameters
+    ----------
+    exclude_archived : bool, optional
+        アーカイブされたチャンネルを除外する, by default False
+    client : Optional[AsyncWebClient], optional
+        使用するクライアント, by default None（get_client で共有するクライアント）
+
+    Yields
+    -------
+    List[Dict[str, Any]]
+        1ページ分のチャンネル情報
+    """
+    # https://api.slack.com/methods/conversations.list
+    option: Dict[str, Any] = {"type:": "public_channel"}
+    if exclude_archived:
+        option["exclude_archived"] = True
+    return __iter_pages(__client(client).conversations_list, option, "channels", False)
+
+
+async def get_channel_message(
+    channel_id: str, oldest: Optional[str] = None, client: Optional["AsyncWebClient"] = None
+) -> List[Dict[str, Any]]:
+    """
+    指定されたチャンネルのメッセージを取得
+
+    Parameters
+    ----------
+    channel_id : str
+        チャンネルID
+    oldest : Optional[str], optional
+        指定された場合はこのts以降のメッセージのみ取得, by default None
+    client : Optional[AsyncWebClient], optional
+        使用するクライアント, by default None（get_client で共有するクライアント）
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        指定されたチャンネルのメッセージ
+    """
+    return await __get_all_data_by_iterating(
+        iter_channel_message(channel_id, oldest, client=client)
+    )
+
+
+def iter_channel_message(
+    channel_id: str,
+    oldest: Optional[str] = None,
+    latest: Optional[str] = None,
+    client: Optional["AsyncWebClient"] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    指定されたチャンネルのメッセージを1ページずつ取得
+
+    Parameters
+    ----------
+    channel_id : str
+        チャンネルID
+    oldest : Optional[str], optional
+        指定された場合はこのts以降のメッセージのみ取得, by default None
+    latest : Optional[str], optional
+        指定された場合はこのts以前のメッセージのみ取得, by default None
+    client : Optional[AsyncWebClient], optional
+        使用するクライアント, by default None（get_client で共有するクライアント）
+
+    Yields
+    -------
+    List[Dict[str, Any]]
+        1ページ分のメッセージ
+    """
+    # https://api.slack.com/methods/conversations.history
+    option: Dict[str, Any] = {"channel": channel_id}
+    if oldest is not None:
+        option["oldest"] = oldest
+    if latest is not None:
+        option["latest"] = latest
+    return __iter_pages(__client(client).conversations_history, option, "messages", True)
+
+
+async def get_replies(
+    channel_id: str, message: Dict[str, Any], client: Optional["AsyncWebClient"] = None
+) -> List[Dict[str, Any]]:
+    """
+    指定されたメッセージのリプライを取得
+
+    Parameters
+    ----------
+    channel_id : str
+        チャンネルID
+    message : Dict[str, Any]
+        リプライを取得する対象のメッセージ
+    client : Optional[AsyncWebClient], optional
+        使用するクライアント, by default None（get_client で共有するクライアント）
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        リプライメッセージ
+        リプライがついていない場合は空のリスト
+    """
+    if "thread_ts" not in message:
+        return []
+    return await __get_all_data_by_iterating(iter_replies(channel_id, message, client))
+
+
+def iter_replies(
+    channel_id: str, message: Dict[str, Any], client: Optional["AsyncWebClient"] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    指定されたメッセージのリプライを1ページずつ取得
+
+    Parameters
+    ----------
+    channel_id : str
+        チャンネルID
+    message : Dict[str, Any]
+        リプライを取得する対象のメッセージ
+    client : Optional[AsyncWebClient], optional
+        使用するクライアント, by default None（get_client で共有するクライアント）
+
+    Yields
+    -------
+    List[Dict[str, Any]]
+        1ページ分のリプライメッセージ
+        リプライがついていない場合は何も返さない
+    """
+    # https://api.slack.com/methods/conversations.replies
+    option = {"channel": channel_id, "ts": message.get("thread_ts")}
+    return __iter_pages(
+        __client(client).conversations_replies, option, "messages", True, "thread_ts" in message
+    )
+
+
+def __client(client: Optional["AsyncWebClient"]) -> "AsyncWebClient":
+    """指定されたクライアント（指定されていない場合は共有するクライアント）"""
+    return get_client() if client is None else client
+
+
+async def __get_all_data_by_iterating(
+    pages: AsyncIterator[List[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """繰り返し処理ですべてのデータを取得"""
+    data_all: List[Dict[str, Any]] = []
+    async for data in pages:
+        data_all.extend(data)
+    return data_all
+
+
+async def __iter_pages(
+    func: Callable[..., Awaitable["AsyncSlackResponse"]],
+    option: Dict[str, Any],
+    data_key: str,
+    has_more_attribute: bool,
+    enabled: bool = True,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """繰り返し処理でデータを1ページずつ取得"""
+    if not enabled:
+        return
+
+    def has_more(response: Dict[str, Any]) -> bool:
+        return bool(
+            response["has_more"]
+            if has_more_attribute
+            else response["response_metadata"]["next_cursor"]
+        )
+
+    method = method_name(func)
+    response: Dict[str, Any] = (await __execute_api(func, **option)).data  # type: ignore
+    metrics.record_page(method, option.get("channel"))
+    yield response[data_key]
+
+    while has_more(response):
+        response = (
+            await __execute_api(func, **option, cursor=response["response_metadata"]["next_cursor"])
+        ).data  # type: ignore
+        metrics.record_page(method, option.get("channel"))
+        yield response[data_key]
+
+
+async def __execute_api(
+    func: Callable[..., Awaitable["AsyncSlackResponse"]], **option
+) -> "AsyncSlackResponse":
+    """
+    APIを実行する
+
+    ※メソッド毎のレート制限に従って実行し、API制限（429）や一時的なエラーの場合は
+    retry_policy に従ってリトライを行う（最大試行回数を超えた場合は例外を送出する）
+    ※ページングするメソッドは、limit が指定されていない場合は page_sizer のページサイズを指定する
+
+    Parameters
+    ----------
+    func : Callable[..., Awaitable["AsyncSlackResponse"]]
+        実行するAPI（の関数）
+    option : Dict[str, Any]
+        APIに渡されるOption
+
+    Returns
+    -------
+    AsyncSlackResponse
+        APIのレスポンス
+    """
+    method = method_name(func)
+    # 呼び出し側で limit が指定されている場合は、ページサイズを調整しない
+    call = CallAttempts(
+        method,
+        "limit" not in option,
+        retry_policy,
+        circuit_breaker,
+        rate_limiter,
+        page_sizer,
+        __is_transient,
+    )
+    while True:
+        # サーキットブレーカーが開いている間は、全てのメソッドの呼び出しを待機させる
+        delay = circuit_breaker.delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        metrics.record_wait(method, delay + await rate_limiter.acquire_async(method))
+        limit = call.limit()
+        start = time.perf_counter()
+        try:
+            if limit is None:
+                response = await func(**option)
+            else:
+                response = await func(**option, limit=limit)
+        except Exception as e:
+            delay = call.retry_delay(e, time.perf_counter() - start)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        call.record_success(time.perf_counter() - start, limit)
+        return response
+
+
+def __is_transient(error: BaseException) -> bool:
+    """一時的なエラーか（aiohttp の接続エラーも含む）"""
+    return retry_policy.is_transient(error) or isinstance(error, import_aiohttp().ClientError)
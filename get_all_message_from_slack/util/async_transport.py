@@ -0,0 +1,53 @@
+"""Slack APIの非同期の通信（aiohttp）
+
+transport の PooledWebClient と同じく、レスポンスを受信する毎に受信したバイト数を通知する
+NOTE: aiohttp は任意の依存のため、使用する時点で import する
+"""
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+def create_trace_config(on_response: Callable[[str, int], None]) -> "aiohttp.TraceConfig":
+    """
+    レスポンスの受信を通知する aiohttp のトレース設定を作成
+
+    NOTE: 受信したバイト数は PooledWebClient と同じく圧縮された状態（Content-Length）で数える
+          Content-Length が無い（chunked の）場合は、読み込んだ本文（展開後）の長さで数える
+
+    Parameters
+    ----------
+    on_response : Callable[[str, int], None]
+        レスポンスを受信する毎に (Slack APIのメソッド名, 受信したバイト数) で呼び出す関数
+
+    Returns
+    -------
+    aiohttp.TraceConfig
+        aiohttp.ClientSession の trace_configs に指定するトレース設定
+    """
+    import aiohttp
+
+    async def on_request_end(
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        context.api_method = params.url.path.rsplit("/", 1)[-1]
+        context.size = params.response.content_length
+        if context.size is not None:
+            on_response(context.api_method, context.size)
+
+    async def on_response_chunk_received(
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceResponseChunkReceivedParams,
+    ) -> None:
+        if getattr(context, "size", 0) is None:
+            on_response(context.api_method, len(params.chunk))
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_response_chunk_received.append(on_response_chunk_received)
+    return trace_config
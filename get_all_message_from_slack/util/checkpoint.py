@@ -0,0 +1,270 @@
+"""中断したエクスポートを再開するためのチェックポイントを管理する"""
+import copy
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from get_all_message_from_slack.util.export_state import merge_summaries
+
+CHECKPOINT_FILE_NAME = "checkpoint.jsonl"
+
+
+class Checkpoint:
+    """
+    チェックポイント（追記のみのジャーナル）
+
+    完了したマスタ・チャンネル・スレッドと、チャンネル毎のページングの進捗を1行ずつ記録する
+    書き込み毎にフラッシュするため、プロセスが中断しても記録済みの進捗から再開できる
+    完了したチャンネルの集計も記録するため、エクスポート状態（ExportState）の保存前に中断しても、
+    再開時に channel_summaries で復元できる
+    複数のスレッドから同時に記録可能
+    """
+
+    def __init__(self, path: Path):
+        """
+        チェックポイントを作成
+
+        Parameters
+        ----------
+        path : Path
+            ジャーナルを保存するファイルのPath
+        """
+        self.path = path
+        self._done: Set[str] = set()
+        self._channels_done: Set[str] = set()
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._threads: Dict[str, Set[str]] = {}
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, base_path: Path) -> "Checkpoint":
+        """
+        出力先に空のジャーナルを作成する
+
+        Parameters
+        ----------
+        base_path : Path
+            出力先のBaseとなるPath
+
+        Returns
+        -------
+        Checkpoint
+            空のチェックポイント
+        """
+        checkpoint = cls(base_path / CHECKPOINT_FILE_NAME)
+        checkpoint.path.write_text("")
+        return checkpoint
+
+    @classmethod
+    def load(cls, base_path: Path) -> "Checkpoint":
+        """
+        出力先に保存されているジャーナルを読み込む
+
+        NOTE: 書き込み途中で中断された最後の行は無視する
+
+        Parameters
+        ----------
+        base_path : Path
+            出力先のBaseとなるPath
+
+        Returns
+        -------
+        Checkpoint
+            チェックポイント
+            保存されていない場合は空のチェックポイント
+        """
+        checkpoint = cls(base_path / CHECKPOINT_FILE_NAME)
+        if not checkpoint.path.exists():
+            return checkpoint
+        with open(checkpoint.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                checkpoint._apply(record)
+        return checkpoint
+
+    def is_done(self, name: str) -> bool:
+        """
+        指定されたマスタ（channel_master など）が保存済みか
+
+        Parameters
+        ----------
+        name : str
+            マスタ名
+
+        Returns
+        -------
+        bool
+            保存済みの場合True
+        """
+        return name in self._done
+
+    def mark_done(self, name: str) -> None:
+        """
+        指定されたマスタを保存済みとして記録する
+
+        Parameters
+        ----------
+        name : str
+            マスタ名
+        """
+        self._record({"event": "done", "name": name})
+
+    def is_channel_done(self, channel_id: str) -> bool:
+        """
+        指定されたチャンネルが取得済みか
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+
+        Returns
+        -------
+        bool
+            取得済みの場合True
+        """
+        return channel_id in self._channels_done
+
+    def mark_channel_done(self, channel_id: str, summary: Optional[Dict[str, Any]] = None) -> None:
+        """
+        指定されたチャンネルを取得済みとして記録する
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        summary : Optional[Dict[str, Any]], optional
+            取得したメッセージの集計（export_state.summarize_messages を参照）, by default None
+        """
+        self._record({"event": "channel_done", "channel": channel_id, "summary": summary})
+
+    def channel_summaries(self) -> Dict[str, Dict[str, Any]]:
+        """
+        取得済みのチャンネルの集計を取得
+
+        NOTE: 再開時に ExportState.apply で反映し、保存前に中断したエクスポート状態を復元する
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            チャンネルID毎の集計（メッセージが無いチャンネルは含まない）
+        """
+        with self._lock:
+            return copy.deepcopy(self._summaries)
+
+    def threads_done(self, channel_id: str) -> Set[str]:
+        """
+        指定されたチャンネルで取得済みのスレッドを取得
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+
+        Returns
+        -------
+        Set[str]
+            取得済みのスレッドの thread_ts
+        """
+        with self._lock:
+            return set(self._threads.get(channel_id, ()))
+
+    def mark_thread_done(self, channel_id: str, thread_ts: str) -> None:
+        """
+        指定されたスレッドを取得済みとして記録する
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        thread_ts : str
+            スレッドの thread_ts
+        """
+        self._record({"event": "thread_done", "channel": channel_id, "thread_ts": thread_ts})
+
+    def channel_progress(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        """
+        指定されたチャンネルのページングの進捗を取得
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            進捗
+            - cursor: 次のページのカーソル（最後のページまで取得済みの場合はNone）
+            - position: 書き込み先の再開位置
+            - summary: 取得済みのメッセージの集計（export_state.summarize_messages を参照）
+            - ts: 取得済みのメッセージのts（マージする場合のみ）
+            記録されていない場合はNone
+        """
+        with self._lock:
+            progress = self._progress.get(channel_id)
+            return copy.deepcopy(progress)
+
+    def mark_page(
+        self,
+        channel_id: str,
+        cursor: Optional[str],
+        position: Dict[str, Any],
+        summary: Optional[Dict[str, Any]],
+        ts: Optional[List[str]] = None,
+    ) -> None:
+        """
+        1ページ分のメッセージ（とそのスレッド）を保存済みとして記録する
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        cursor : Optional[str]
+            次のページのカーソル（最後のページの場合はNone）
+        position : Dict[str, Any]
+            書き込み先の再開位置（BaseWriter.checkpoint の戻り値）
+        summary : Optional[Dict[str, Any]]
+            このページのメッセージの集計（export_state.summarize_messages を参照）
+        ts : Optional[List[str]], optional
+            このページのメッセージのts（マージする場合のみ）, by default None
+        """
+        self._record(
+            {
+                "event": "page",
+                "channel": channel_id,
+                "cursor": cursor,
+                "position": position,
+                "summary": summary,
+                "ts": ts or [],
+            }
+        )
+
+    def _record(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self._apply(record)
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        event = record["event"]
+        if event == "done":
+            self._done.add(record["name"])
+        elif event == "channel_done":
+            self._channels_done.add(record["channel"])
+            if record.get("summary") is not None:
+                self._summaries[record["channel"]] = record["summary"]
+            self._threads.pop(record["channel"], None)
+            self._progress.pop(record["channel"], None)
+        elif event == "thread_done":
+            self._threads.setdefault(record["channel"], set()).add(record["thread_ts"])
+        elif event == "page":
+            progress = self._progress.setdefault(record["channel"], {"summary": None, "ts": []})
+            progress["ts"].extend(record["ts"])
+            progress["summary"] = merge_summaries(progress["summary"], record["summary"])
+            progress.update(cursor=record["cursor"], position=record["position"])
@@ -0,0 +1,173 @@
+"""エクスポートの見積もり（dry-run）
+
+チャンネル一覧（conversations.list で取得したメタデータ）から、APIの呼び出し回数と所要時間を見積もる
+- メッセージ数: conversations.list ではメッセージ数を取得できないため、メンバー数と
+  チャンネルの作成日時から取得する期間の割合を掛けて推定する（messages_per_member で調整する）
+- 呼び出し回数: メソッド毎のページサイズ（page_sizer）から求める
+- 所要時間: メソッド毎のレート制限（Tier）と、並列数・レイテンシの両方から見積もり、遅い方とする
+"""
+import math
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from get_all_message_from_slack.util.export_state import ExportState
+from get_all_message_from_slack.util.page_size import page_sizer
+from get_all_message_from_slack.util.rate_limiter import DEFAULT_TIER, METHOD_TIERS, TIER_LIMITS
+from get_all_message_from_slack.util.selection import ExportFilter
+from get_all_message_from_slack.util.sharding import estimate_volume
+
+# 1メンバーあたりのメッセージ数（チャンネルの作成から現在まで）
+MESSAGES_PER_MEMBER = 50
+# リプライのついたメッセージの割合
+THREAD_RATIO = 0.1
+# limit を指定しない場合のページサイズ（Slackの既定値）
+DEFAULT_PAGE_SIZE = 100
+# 1回の呼び出しのレイテンシ（秒）
+LATENCY_SECONDS = 0.5
+
+
+class ExportEstimate(NamedTuple):
+    """エクスポートの見積もり"""
+
+    # 取得するチャンネル数
+    channels: int
+    # 取得するメッセージ数
+    messages: int
+    # リプライを取得するスレッド数
+    threads: int
+    # メソッド毎の呼び出し回数
+    calls: Dict[str, int]
+    # 所要時間（秒）
+    seconds: float
+
+    @property
+    def total_calls(self) -> int:
+        """全てのメソッドの呼び出し回数"""
+        return sum(self.calls.values())
+
+
+def estimate_messages(
+    channel: Dict[str, Any],
+    oldest: Optional[str] = None,
+    latest: Optional[str] = None,
+    messages_per_member: float = MESSAGES_PER_MEMBER,
+    now: Optional[float] = None,
+) -> int:
+    """
+    チャンネルのメッセージ数を見積もる
+
+    Parameters
+    ----------
+    channel : Dict[str, Any]
+        conversations.list で取得したチャンネル情報
+    oldest : Optional[str], optional
+        このts以降のメッセージのみ取得する場合に指定, by default None
+    latest : Optional[str], optional
+        このts以前のメッセージのみ取得する場合に指定, by default None
+    messages_per_member : float, optional
+        1メンバーあたりのメッセージ数, by default MESSAGES_PER_MEMBER
+    now : Optional[float], optional
+        現在時刻（UNIX時間）, by default time.time()
+
+    Returns
+    -------
+    int
+        メッセージ数の見積もり
+    """
+    now = time.time() if now is None else now
+    total = estimate_volume(channel) * messages_per_member
+    created = float(channel.get("created") or 0)
+    if created <= 0 or created >= now:
+        return round(total)
+    start = created if oldest is None else max(created, float(oldest))
+    end = now if latest is None else min(now, float(latest))
+    ratio = min(1.0, max(0.0, (end - start) / (now - created)))
+    return round(total * ratio)
+
+
+def estimate_export(
+    channels: List[Dict[str, Any]],
+    export_filter: Optional[ExportFilter] = None,
+    state: Optional[ExportState] = None,
+    lookback_seconds: int = 0,
+    max_workers: int = 1,
+    max_reply_workers: int = 1,
+    messages_per_member: float = MESSAGES_PER_MEMBER,
+    listed_channels: Optional[int] = None,
+    now: Optional[float] = None,
+    rate_share: float = 1.0,
+) -> ExportEstimate:
+    """
+    エクスポートを見積もる
+
+    Parameters
+    ----------
+    channels : List[Dict[str, Any]]
+        取得するチャンネル一覧（export_filter・シャードで絞り込んだ後）
+    export_filter : Optional[ExportFilter], optional
+        エクスポートする期間, by default None（全て）
+    state : Optional[ExportState], optional
+        差分取得の場合の前回までの状態（取得済みの最新のts以降のみ見積もる）, by default None
+    lookback_seconds : int, optional
+        差分取得時に遡る秒数, by default 0
+    max_workers : int, optional
+        チャンネル単位で並列に取得するワーカー数, by default 1
+    max_reply_workers : int, optional
+        1チャンネル内で並列にリプライを取得するワーカー数, by default 1
+    messages_per_member : float, optional
+        1メンバーあたりのメッセージ数, by default MESSAGES_PER_MEMBER
+    listed_channels : Optional[int], optional
+        conversations.list で取得した（絞り込む前の）チャンネル数, by default len(channels)
+    now : Optional[float], optional
+        現在時刻（UNIX時間）, by default time.time()
+    rate_share : float, optional
+        使用するレート制限の割合（シャードで分担する場合は 1 / シャード数）, by default 1.0
+
+    Returns
+    -------
+    ExportEstimate
+        見積もり
+    """
+    export_filter = ExportFilter() if export_filter is None else export_filter
+    listed = len(channels) if listed_channels is None else listed_channels
+    history_page = _page_size("conversations.history")
+    messages = 0
+    history_calls = 0
+    for channel in channels:
+        oldest = None if state is None else state.oldest(channel["id"], lookback_seconds)
+        count = estimate_messages(
+            channel,
+            export_filter.history_oldest(oldest),
+            export_filter.latest,
+            messages_per_member,
+            now,
+        )
+        messages += count
+        # メッセージが無い場合も1回は呼び出す
+        history_calls += max(1, math.ceil(count / history_page))
+    threads = round(messages * THREAD_RATIO)
+    # users.list は limit を指定しないため、最も多いメンバー数をユーザ数の目安とする
+    users = max([channel.get("num_members", 0) for channel in channels], default=0)
+    calls = {
+        "conversations.list": max(1, math.ceil(listed / _page_size("conversations.list"))),
+        "users.list": max(1, math.ceil(users / _page_size("users.list"))),
+        "conversations.history": history_calls,
+        "conversations.replies": threads,
+    }
+    concurrency = max(1, max_workers) * (1 + max(1, max_reply_workers))
+    seconds = max(
+        max(count / (_rate(method) * rate_share) for method, count in calls.items()),
+        sum(calls.values()) * LATENCY_SECONDS / concurrency,
+    )
+    return ExportEstimate(len(channels), messages, threads, calls, seconds)
+
+
+def _page_size(method: str) -> int:
+    """メソッドのページサイズ"""
+    return page_sizer.limit(method) or DEFAULT_PAGE_SIZE
+
+
+def _rate(method: str) -> float:
+    """メソッドのレート制限（1秒あたりの呼び出し回数）"""
+    per_minute, _ = TIER_LIMITS[METHOD_TIERS.get(method, DEFAULT_TIER)]
+    return per_minute / 60
@@ -0,0 +1,85 @@
+"""エクスポートの設定
+
+main, estimate, verify の引数をまとめたもの（cli でコマンドライン引数から作成する）
+NOTE: `--help` 等を速く表示するため、cli から import するモジュールは軽いものに限る
+"""
+from typing import NamedTuple, Optional
+
+from get_all_message_from_slack.util.selection import ExportFilter
+
+# 出力先（この下に実行日時のディレクトリを作成する）
+DEFAULT_OUTPUT_DIR = "./work"
+
+
+class ExportConfig(NamedTuple):
+    """
+    エクスポートの設定
+
+    例: main(ExportConfig(max_workers=8, incremental_path="./work/nightly"))
+    """
+
+    # チャンネル単位で並列に取得する際の最大ワーカー数
+    max_workers: int = 1
+    # 差分取得を行う場合の出力先
+    # 前回の出力先を指定すると、前回取得した以降のメッセージのみ取得してマージする
+    # 存在しない場合は作成して全てのメッセージを取得する
+    # 指定されない場合は「<output_dir>/<timestamp>」に全てのメッセージを取得する
+    incremental_path: Optional[str] = None
+    # 差分取得時に前回取得した最新のメッセージから遡って取得する秒数
+    # 遡った範囲の親メッセージについたリプライも取得される
+    lookback_seconds: int = 0
+    # 出力形式（"json", "ndjson", "sqlite", "dedup"）
+    # sqlite の場合は出力先の archive.sqlite3 に全てのデータを書き込む
+    # dedup の場合は output_dir の objects に内容のハッシュをキーとして重複なく書き込み、
+    # 出力先の snapshot.jsonl にオブジェクトの一覧を記録する（前回から変更の無いデータは書き込まない）
+    output_format: str = "json"
+    # 圧縮形式（None, "gzip", "zstd"）
+    compression: Optional[str] = None
+    # ndjson の場合の1ファイルあたりの最大サイズ（圧縮前）
+    # 超えた場合は「nomal_messages.part-00001.ndjson」のように次のファイルに書き込む
+    max_file_bytes: Optional[int] = None
+    # 1チャンネル内でリプライを並列に取得する際の最大ワーカー数
+    max_reply_workers: int = 1
+    # 中断したエクスポートを再開する場合の出力先
+    # 出力先のチェックポイントから、取得済みのチャンネル・スレッド・ページを飛ばして再開する
+    # 出力形式などの設定は中断したエクスポートと同じものを指定する
+    resume_path: Optional[str] = None
+    # 複数のプロセスで分担して取得する場合の、このプロセスが取得するシャード（0 から shard_count - 1）
+    # 出力先の「shard-<index>-of-<count>」以下に、シャードに割り当てられたチャンネルのみ取得する
+    # ユーザ一覧は shard_index=0 のプロセスのみ取得する
+    # incremental_path（または resume_path）に全てのプロセスで同じ出力先を指定し、
+    # 全てのシャードの取得後に util.sharding.merge_shards でマニフェストを作成する
+    shard_index: Optional[int] = None
+    # シャード数
+    # レート制限はワークスペース単位のため、各プロセスは Tier 毎のレートをシャード数で割った範囲で呼び出す
+    shard_count: int = 1
+    # チャンネルの分割方法（"hash", "volume"、詳細は util.sharding.partition_channels を参照）
+    shard_strategy: str = "hash"
+    # エクスポートするチャンネル・期間（例: ExportFilter(include=("proj-*",), oldest=days_ago(30))）
+    # チャンネルはメッセージを取得する前にチャンネル一覧から絞り込み、
+    # 期間は conversations.history の oldest, latest で指定する
+    export_filter: ExportFilter = ExportFilter()
+    # API呼び出しの計測を Prometheus のテキスト形式で保存する場合の保存先
+    # 計測のサマリは指定に関わらず出力先の metrics.json に保存する
+    prometheus_path: Optional[str] = None
+    # 書き込みスレッドのキューの長さ（ページ数）
+    # 1以上の場合は専用のスレッドでファイルに書き込み、書き込みを待たずに次のページを取得する
+    # 0の場合は取得したスレッドで書き込む
+    write_queue_size: int = 0
+    # 出力するJSONの変換の実装（"auto", "orjson", "ujson", "json"）
+    # auto の場合は orjson、ujson、標準の json の順にインストールされているものを使用する
+    # どの実装でも日本語等はエスケープせずに UTF-8 で出力する
+    serializer: str = "auto"
+    # スレッドのリプライの保存方法（"file", "channel"）
+    # file の場合はスレッド毎に「<channel_id>/<thread_ts>」に保存する
+    # channel の場合はチャンネル毎に「<channel_id>/threads.ndjson」にまとめて保存し、
+    # thread_ts から読み込むための索引を「<channel_id>/threads.index.json」に保存する
+    # （json, ndjson の圧縮しない場合のみ）
+    thread_storage: str = "file"
+    # 出力先（この下に実行日時のディレクトリを作成する）
+    # incremental_path, resume_path が指定された場合は使用しない
+    # 検索用キャッシュ（lookup_cache.json）もこの下に保存する（SLACK_LOOKUP_CACHE_PATH で変更可能）
+    output_dir: str = DEFAULT_OUTPUT_DIR
+    # 編集・削除を検出するためのフィンガープリントを出力先の fingerprints.json に保存する
+    # 保存するメッセージ・リプライから作成し、今回取得しなかったスレッドは前回のものを引き継ぐ（verify を参照）
+    fingerprints: bool = False
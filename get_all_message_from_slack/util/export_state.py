@@ -0,0 +1,250 @@
+"""差分取得のためのエクスポート状態を管理する"""
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+STATE_FILE_NAME = "export_state.json"
+
+
+def ts_key(ts: str) -> Tuple[int, int]:
+    """
+    Slackのタイムスタンプを比較可能な値に変換
+
+    NOTE: floatに変換すると桁数が多く精度が落ちるため、整数部と小数部に分けて比較する
+
+    Parameters
+    ----------
+    ts : str
+        Slackのタイムスタンプ（例: '1638883139.000600'）
+
+    Returns
+    -------
+    Tuple[int, int]
+        比較可能な値
+    """
+    seconds, _, micro = ts.partition(".")
+    return int(seconds), int(micro or 0)
+
+
+class ExportState:
+    """
+    エクスポート状態
+
+    チャンネル毎に取得済みの最新のts、スレッド毎に取得済みの latest_reply を保持する
+    複数のスレッドから同時に更新可能
+    """
+
+    def __init__(self, path: Path, channels: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        エクスポート状態を作成
+
+        Parameters
+        ----------
+        path : Path
+            状態を保存するファイルのPath
+        channels : Optional[Dict[str, Dict[str, Any]]], optional
+            チャンネル毎の状態, by default None
+        """
+        self.path = path
+        self._channels: Dict[str, Dict[str, Any]] = {} if channels is None else channels
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, base_path: Path) -> "ExportState":
+        """
+        出力先に保存されている状態を読み込む
+
+        Parameters
+        ----------
+        base_path : Path
+            出力先のBaseとなるPath
+
+        Returns
+        -------
+        ExportState
+            エクスポート状態
+            保存されていない場合は空の状態
+        """
+        path = base_path / STATE_FILE_NAME
+        if not path.exists():
+            return cls(path)
+        with open(path) as f:
+            return cls(path, json.load(f)["channels"])
+
+    def latest_ts(self, channel_id: str) -> Optional[str]:
+        """
+        指定されたチャンネルの取得済みの最新のtsを取得
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+
+        Returns
+        -------
+        Optional[str]
+            取得済みの最新のts
+            未取得の場合はNone
+        """
+        with self._lock:
+            return self._channels.get(channel_id, {}).get("latest_ts")
+
+    def oldest(self, channel_id: str, lookback_seconds: int = 0) -> Optional[str]:
+        """
+        conversations.history に渡す oldest を取得
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        lookback_seconds : int, optional
+            取得済みの最新のtsから遡る秒数, by default 0
+            遡った範囲の親メッセージについたリプライも検出できる
+
+        Returns
+        -------
+        Optional[str]
+            oldest
+            未取得の場合はNone
+        """
+        latest_ts = self.latest_ts(channel_id)
+        if latest_ts is None:
+            return None
+        seconds, micro = ts_key(latest_ts)
+        return f"{max(0, seconds - lookback_seconds)}.{micro:06d}"
+
+    def is_thread_updated(self, channel_id: str, message: Dict[str, Any]) -> bool:
+        """
+        指定されたメッセージのスレッドが前回の取得から更新されているか
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        message : Dict[str, Any]
+            メッセージ情報
+
+        Returns
+        -------
+        bool
+            更新されている（リプライを取得する必要がある）場合True
+        """
+        if "thread_ts" not in message:
+            return False
+        latest_reply = message.get("latest_reply")
+        if latest_reply is None:
+            return True
+        with self._lock:
+            threads = self._channels.get(channel_id, {}).get("threads", {})
+            return threads.get(message["thread_ts"]) != latest_reply
+
+    def update_channel(self, channel_id: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        取得したメッセージでチャンネルの状態を更新
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        messages : List[Dict[str, Any]]
+            取得したメッセージ
+        """
+        self.apply(channel_id, summarize_messages(messages))
+
+    def apply(self, channel_id: str, summary: Dict[str, Any]) -> None:
+        """
+        summarize_messages で集計した内容でチャンネルの状態を更新
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        summary : Dict[str, Any]
+            取得したメッセージの集計
+        """
+        with self._lock:
+            channel = self._channels.setdefault(channel_id, {"latest_ts": None, "threads": {}})
+            channel["latest_ts"] = _max_ts(channel["latest_ts"], summary["latest_ts"])
+            channel["threads"].update(summary["threads"])
+
+    def save(self) -> Path:
+        """
+        状態をファイルに保存する
+
+        NOTE: ファイル全体を書き直すため、チャンネル毎ではなくエクスポートの最後にまとめて呼び出す
+
+        Returns
+        -------
+        Path
+            保存されたPath
+        """
+        with self._lock:
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"channels": self._channels}, f)
+            # 書き込み途中で中断されても壊れないように置き換える
+            tmp_path.replace(self.path)
+        return self.path
+
+
+def summarize_messages(
+    messages: List[Dict[str, Any]], summary: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    状態の更新に必要な内容（最新のts、スレッド毎の latest_reply）を集計する
+
+    NOTE: ページ毎に呼び出して集計し、チャンネルの取得が完了した後に ExportState.apply で反映する
+
+    Parameters
+    ----------
+    messages : List[Dict[str, Any]]
+        取得したメッセージ
+    summary : Optional[Dict[str, Any]], optional
+        前のページまでの集計, by default None
+
+    Returns
+    -------
+    Dict[str, Any]
+        集計
+    """
+    summary = {"latest_ts": None, "threads": {}} if summary is None else summary
+    for message in messages:
+        summary["latest_ts"] = _max_ts(summary["latest_ts"], message["ts"])
+        if "latest_reply" in message:
+            summary["threads"][message["thread_ts"]] = message["latest_reply"]
+    return summary
+
+
+def merge_summaries(
+    summary: Optional[Dict[str, Any]], other: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    summarize_messages で集計した内容を合わせる
+
+    Parameters
+    ----------
+    summary : Optional[Dict[str, Any]]
+        集計（更新される）
+    other : Optional[Dict[str, Any]]
+        合わせる集計
+
+    Returns
+    -------
+    Optional[Dict[str, Any]]
+        合わせた集計
+        両方Noneの場合はNone
+    """
+    if other is None:
+        return summary
+    if summary is None:
+        return {"latest_ts": other["latest_ts"], "threads": dict(other["threads"])}
+    summary["latest_ts"] = _max_ts(summary["latest_ts"], other["latest_ts"])
+    summary["threads"].update(other["threads"])
+    return summary
+
+
+def _max_ts(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    if a is None or b is None:
+        return a if b is None else b
+    return a if ts_key(a) >= ts_key(b) else b
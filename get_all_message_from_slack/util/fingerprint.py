@@ -0,0 +1,531 @@
+"""メッセージの編集・削除を検出するためのフィンガープリント
+
+チャンネル毎に、保存したメッセージを ts の期間（ウィンドウ、既定は1日）で分け、ウィンドウ毎に
+件数・最新のts・各メッセージの ts と edited.ts のハッシュの和（順序に依存しない）を保存する
+スレッド毎には、親メッセージの reply_count, latest_reply と リプライのハッシュの和を保存する
+
+エクスポート（main.main）では保存しながら ChannelFingerprint に追加して作成し、保存済みのデータは読み込み直さない
+検証（main.verify）では取得し直したメッセージのフィンガープリントと比較し、
+異なるウィンドウのみ保存済みのメッセージと突き合わせ、親メッセージが変わったスレッドのみリプライを取得する
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from get_all_message_from_slack.util.export_state import ts_key
+
+FINGERPRINTS_FILE_NAME = "fingerprints.json"
+# ウィンドウの長さ（秒）
+WINDOW_SECONDS = 24 * 60 * 60
+HASH_MASK = (1 << 64) - 1
+# リプライのついたメッセージが削除された場合に残るメッセージの subtype
+TOMBSTONE = "tombstone"
+
+
+def message_hash(message: Dict[str, Any]) -> int:
+    """
+    メッセージのハッシュ（ts, edited.ts, subtype から計算する）
+
+    Parameters
+    ----------
+    message : Dict[str, Any]
+        メッセージ
+
+    Returns
+    -------
+    int
+        64bitのハッシュ
+    """
+    edited = (message.get("edited") or {}).get("ts", "")
+    key = f"{message['ts']}|{edited}|{message.get('subtype', '')}"
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def window_key(ts: str, window_seconds: int = WINDOW_SECONDS) -> str:
+    """
+    メッセージが含まれるウィンドウ
+
+    Parameters
+    ----------
+    ts : str
+        メッセージのts
+    window_seconds : int, optional
+        ウィンドウの長さ（秒）, by default WINDOW_SECONDS
+
+    Returns
+    -------
+    str
+        ウィンドウの開始時刻（UNIX時間）
+    """
+    seconds, _ = ts_key(ts)
+    return str(seconds - seconds % window_seconds)
+
+
+def fingerprint_messages(messages: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    メッセージのフィンガープリント
+
+    Parameters
+    ----------
+    messages : Iterable[Dict[str, Any]]
+        メッセージ
+
+    Returns
+    -------
+    Dict[str, Any]
+        件数（count）、最新のts（latest_ts）、ハッシュの和（hash）
+    """
+    fingerprint = _empty()
+    for message in messages:
+        _add(fingerprint, message)
+    return _format(fingerprint)
+
+
+def merge_fingerprints(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    2つのメッセージの集合のフィンガープリントを合わせる
+
+    Parameters
+    ----------
+    a : Dict[str, Any]
+        フィンガープリント（fingerprint_messages の戻り値）
+    b : Dict[str, Any]
+        フィンガープリント（fingerprint_messages の戻り値）
+
+    Returns
+    -------
+    Dict[str, Any]
+        両方のメッセージのフィンガープリント
+    """
+    latest = [fingerprint["latest_ts"] for fingerprint in (a, b) if fingerprint["latest_ts"]]
+    return {
+        "count": a["count"] + b["count"],
+        "latest_ts": max(latest, key=ts_key) if latest else None,
+        "hash": f"{(int(a['hash'], 16) + int(b['hash'], 16)) & HASH_MASK:016x}",
+    }
+
+
+def fingerprint_windows(
+    messages: Iterable[Dict[str, Any]], window_seconds: int = WINDOW_SECONDS
+) -> Dict[str, Dict[str, Any]]:
+    """
+    ウィンドウ毎のフィンガープリント
+
+    Parameters
+    ----------
+    messages : Iterable[Dict[str, Any]]
+        メッセージ
+    window_seconds : int, optional
+        ウィンドウの長さ（秒）, by default WINDOW_SECONDS
+
+    Returns
+    -------
+    Dict[str, Dict[str, Any]]
+        ウィンドウ -> フィンガープリント（fingerprint_messages を参照）
+    """
+    windows: Dict[str, Dict[str, Any]] = {}
+    for message in messages:
+        _add(windows.setdefault(window_key(message["ts"], window_seconds), _empty()), message)
+    return {key: _format(fingerprint) for key, fingerprint in sorted(windows.items())}
+
+
+def fingerprint_thread(parent: Dict[str, Any], replies: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    スレッドのフィンガープリント
+
+    Parameters
+    ----------
+    parent : Dict[str, Any]
+        スレッドの親メッセージ
+    replies : Iterable[Dict[str, Any]]
+        スレッドのリプライ（conversations.replies で取得したメッセージ）
+
+    Returns
+    -------
+    Dict[str, Any]
+        親メッセージの reply_count, latest_reply とリプライのフィンガープリント
+    """
+    return {
+        "reply_count": parent.get("reply_count", 0),
+        "latest_reply": parent.get("latest_reply"),
+        **fingerprint_messages(replies),
+    }
+
+
+def fingerprint_channel(
+    messages: Iterable[Dict[str, Any]],
+    replies: Callable[[Dict[str, Any]], Iterable[Dict[str, Any]]],
+    window_seconds: int = WINDOW_SECONDS,
+) -> Dict[str, Any]:
+    """
+    チャンネルのフィンガープリント
+
+    Parameters
+    ----------
+    messages : Iterable[Dict[str, Any]]
+        チャンネルのメッセージ
+    replies : Callable[[Dict[str, Any]], Iterable[Dict[str, Any]]]
+        親メッセージからスレッドのリプライを読み込む関数
+    window_seconds : int, optional
+        ウィンドウの長さ（秒）, by default WINDOW_SECONDS
+
+    Returns
+    -------
+    Dict[str, Any]
+        最も古いts（oldest_ts）、ウィンドウ毎（windows）、スレッド毎（threads）のフィンガープリント
+    """
+    fingerprint = ChannelFingerprint(window_seconds)
+    fingerprint.add_all(messages)
+    return fingerprint.result(replies)
+
+
+def changed_windows(
+    saved: Dict[str, Dict[str, Any]], fetched: Dict[str, Dict[str, Any]]
+) -> Set[str]:
+    """
+    フィンガープリントが異なるウィンドウ
+
+    Parameters
+    ----------
+    saved : Dict[str, Dict[str, Any]]
+        保存済みのウィンドウ毎のフィンガープリント
+    fetched : Dict[str, Dict[str, Any]]
+        取得し直したウィンドウ毎のフィンガープリント
+
+    Returns
+    -------
+    Set[str]
+        片方にしか無い、またはフィンガープリントが異なるウィンドウ
+    """
+    return {key for key in saved.keys() | fetched.keys() if saved.get(key) != fetched.get(key)}
+
+
+def is_thread_changed(saved: Optional[Dict[str, Any]], parent: Dict[str, Any]) -> bool:
+    """
+    親メッセージからスレッドが変わった可能性があるか
+
+    NOTE: リプライ数・最新のリプライが変わらないリプライの編集は検出できない
+
+    Parameters
+    ----------
+    saved : Optional[Dict[str, Any]]
+        保存済みのスレッドのフィンガープリント
+    parent : Dict[str, Any]
+        取得し直した親メッセージ
+
+    Returns
+    -------
+    bool
+        変わった可能性がある場合True
+    """
+    if saved is None:
+        return bool(parent.get("reply_count"))
+    return (saved["reply_count"], saved["latest_reply"]) != (
+        parent.get("reply_count", 0),
+        parent.get("latest_reply"),
+    )
+
+
+def diff_messages(
+    saved: Iterable[Dict[str, Any]], fetched: Iterable[Dict[str, Any]]
+) -> Dict[str, List[str]]:
+    """
+    保存済みのメッセージと取得し直したメッセージを突き合わせる
+
+    Parameters
+    ----------
+    saved : Iterable[Dict[str, Any]]
+        保存済みのメッセージ
+    fetched : Iterable[Dict[str, Any]]
+        取得し直したメッセージ
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        編集された（edited）、削除された（deleted）、保存されていない（added）メッセージのts
+        リプライが残っている削除されたメッセージ（subtype: tombstone）は deleted とする
+    """
+    saved_hashes = {message["ts"]: message_hash(message) for message in saved}
+    fetched_hashes = {
+        message["ts"]: message_hash(message)
+        for message in fetched
+        if message.get("subtype") != TOMBSTONE
+    }
+    edited = [ts for ts, h in fetched_hashes.items() if saved_hashes.get(ts, h) != h]
+    return {
+        "edited": sorted(edited, key=ts_key),
+        "deleted": sorted(saved_hashes.keys() - fetched_hashes.keys(), key=ts_key),
+        "added": sorted(fetched_hashes.keys() - saved_hashes.keys(), key=ts_key),
+    }
+
+
+def _empty() -> Dict[str, Any]:
+    return {"count": 0, "latest_ts": None, "hash": 0}
+
+
+def _add(fingerprint: Dict[str, Any], message: Dict[str, Any]) -> None:
+    fingerprint["count"] += 1
+    latest_ts = fingerprint["latest_ts"]
+    if latest_ts is None or ts_key(message["ts"]) > ts_key(latest_ts):
+        fingerprint["latest_ts"] = message["ts"]
+    fingerprint["hash"] = (fingerprint["hash"] + message_hash(message)) & HASH_MASK
+
+
+def _format(fingerprint: Dict[str, Any]) -> Dict[str, Any]:
+    return {**fingerprint, "hash": f"{fingerprint['hash']:016x}"}
+
+
+class ChannelFingerprint:
+    """
+    保存するメッセージ・リプライを1件ずつ追加してチャンネルのフィンガープリントを作成する
+
+    今回取得しなかったスレッドは、親メッセージの reply_count, latest_reply が変わっていなければ
+    保存済みのフィンガープリント（saved）を引き継ぐ
+    複数のスレッドから同時に追加可能
+    """
+
+    def __init__(
+        self, window_seconds: int = WINDOW_SECONDS, saved: Optional[Dict[str, Any]] = None
+    ):
+        """
+        チャンネルのフィンガープリントを作成
+
+        Parameters
+        ----------
+        window_seconds : int, optional
+            ウィンドウの長さ（秒）, by default WINDOW_SECONDS
+        saved : Optional[Dict[str, Any]], optional
+            保存済みのフィンガープリント（スレッドの引き継ぎに使用する）, by default None
+        """
+        self.window_seconds = window_seconds
+        self._saved_threads: Dict[str, Dict[str, Any]] = {} if saved is None else saved["threads"]
+        self._oldest: Optional[str] = None
+        self._windows: Dict[str, Dict[str, Any]] = {}
+        # スレッドの親メッセージ（thread_ts -> reply_count, latest_reply）
+        self._parents: Dict[str, Dict[str, Any]] = {}
+        # 今回取得したスレッドのリプライ（thread_ts -> フィンガープリント）
+        self._replies: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add_all(self, messages: Iterable[Dict[str, Any]]) -> None:
+        """
+        チャンネルのメッセージを追加する
+
+        Parameters
+        ----------
+        messages : Iterable[Dict[str, Any]]
+            チャンネルのメッセージ
+        """
+        for _ in self.scan(messages):
+            pass
+
+    def scan(self, messages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        チャンネルのメッセージを追加しながら返す（書き込みながら追加する場合に使用する）
+
+        Parameters
+        ----------
+        messages : Iterable[Dict[str, Any]]
+            チャンネルのメッセージ
+
+        Yields
+        -------
+        Dict[str, Any]
+            追加したメッセージ
+        """
+        for message in messages:
+            with self._lock:
+                if self._oldest is None or ts_key(message["ts"]) < ts_key(self._oldest):
+                    self._oldest = message["ts"]
+                key = window_key(message["ts"], self.window_seconds)
+                _add(self._windows.setdefault(key, _empty()), message)
+                if message.get("reply_count"):
+                    self._parents[message["thread_ts"]] = {
+                        "reply_count": message["reply_count"],
+                        "latest_reply": message.get("latest_reply"),
+                    }
+            yield message
+
+    def add_replies(self, thread_ts: str, replies: Iterable[Dict[str, Any]]) -> None:
+        """
+        今回取得したスレッドのリプライを追加する（1ページずつ追加可能）
+
+        Parameters
+        ----------
+        thread_ts : str
+            スレッドの thread_ts
+        replies : Iterable[Dict[str, Any]]
+            スレッドのリプライ（conversations.replies で取得したメッセージ）
+        """
+        with self._lock:
+            fingerprint = self._replies.setdefault(thread_ts, _empty())
+            for message in replies:
+                _add(fingerprint, message)
+
+    def result(
+        self, replies: Callable[[Dict[str, Any]], Iterable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        追加したメッセージ・リプライからフィンガープリントを作成する
+
+        Parameters
+        ----------
+        replies : Callable[[Dict[str, Any]], Iterable[Dict[str, Any]]]
+            今回取得せず、保存済みのフィンガープリントも引き継げないスレッドの
+            リプライを親メッセージから読み込む関数
+
+        Returns
+        -------
+        Dict[str, Any]
+            フィンガープリント（fingerprint_channel を参照）
+        """
+        with self._lock:
+            threads = {}
+            for thread_ts, parent in self._parents.items():
+                saved = self._saved_threads.get(thread_ts)
+                if thread_ts in self._replies:
+                    thread = {**parent, **_format(self._replies[thread_ts])}
+                elif saved is not None and not is_thread_changed(saved, parent):
+                    thread = saved
+                else:
+                    message = {"ts": thread_ts, "thread_ts": thread_ts, **parent}
+                    thread = fingerprint_thread(message, replies(message))
+                threads[thread_ts] = thread
+            windows = {
+                key: _format(fingerprint) for key, fingerprint in sorted(self._windows.items())
+            }
+            return {"oldest_ts": self._oldest, "windows": windows, "threads": threads}
+
+
+class Fingerprints:
+    """
+    チャンネル毎のフィンガープリント
+
+    複数のスレッドから同時に更新可能
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        channels: Optional[Dict[str, Dict[str, Any]]] = None,
+        window_seconds: int = WINDOW_SECONDS,
+    ):
+        """
+        フィンガープリントを作成
+
+        Parameters
+        ----------
+        path : Path
+            保存するファイルのPath
+        channels : Optional[Dict[str, Dict[str, Any]]], optional
+            チャンネル毎のフィンガープリント, by default None
+        window_seconds : int, optional
+            ウィンドウの長さ（秒）, by default WINDOW_SECONDS
+        """
+        self.path = path
+        self.window_seconds = window_seconds
+        self._channels: Dict[str, Dict[str, Any]] = {} if channels is None else channels
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, base_path: Path) -> "Fingerprints":
+        """
+        出力先に保存されているフィンガープリントを読み込む
+
+        Parameters
+        ----------
+        base_path : Path
+            出力先のBaseとなるPath
+
+        Returns
+        -------
+        Fingerprints
+            フィンガープリント
+            保存されていない場合は空のフィンガープリント
+        """
+        path = base_path / FINGERPRINTS_FILE_NAME
+        if not path.exists():
+            return cls(path)
+        with open(path) as f:
+            data = json.load(f)
+        return cls(path, data["channels"], data["window_seconds"])
+
+    def get(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        """
+        チャンネルのフィンガープリントを取得
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            フィンガープリント（fingerprint_channel を参照）
+            保存されていない場合はNone
+        """
+        with self._lock:
+            return self._channels.get(channel_id)
+
+    def update_channel(
+        self,
+        channel_id: str,
+        messages: Iterable[Dict[str, Any]],
+        replies: Callable[[Dict[str, Any]], Iterable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        保存したメッセージからチャンネルのフィンガープリントを作成して置き換える
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        messages : Iterable[Dict[str, Any]]
+            保存したチャンネルの全てのメッセージ
+        replies : Callable[[Dict[str, Any]], Iterable[Dict[str, Any]]]
+            親メッセージから保存したスレッドのリプライを読み込む関数
+
+        Returns
+        -------
+        Dict[str, Any]
+            フィンガープリント
+        """
+        fingerprint = fingerprint_channel(messages, replies, self.window_seconds)
+        with self._lock:
+            self._channels[channel_id] = fingerprint
+        return fingerprint
+
+    def set(self, channel_id: str, fingerprint: Dict[str, Any]) -> None:
+        """
+        チャンネルのフィンガープリントを置き換える
+
+        Parameters
+        ----------
+        channel_id : str
+            チャンネルID
+        fingerprint : Dict[str, Any]
+            フィンガープリント（ChannelFingerprint.result の戻り値）
+        """
+        with self._lock:
+            self._channels[channel_id] = fingerprint
+
+    def save(self) -> Path:
+        """
+        フィンガープリントをファイルに保存する
+
+        NOTE: ファイル全体を書き直すため、チャンネル毎ではなくエクスポートの最後にまとめて呼び出す
+
+        Returns
+        -------
+        Path
+            保存されたPath
+        """
+        with self._lock:
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"window_seconds": self.window_seconds, "channels": self._channels}, f)
+            tmp_path.replace(self.path)
+        return self.path
@@ -0,0 +1,275 @@
+"""チャンネル名・ユーザIDの検索用キャッシュ"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from get_all_message_from_slack.util.writer import OutputFormat
+
+# キャッシュの有効期間（秒）
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+CHANNELS = "channels"
+USERS = "users"
+
+
+def user_profile(user: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    キャッシュするユーザ情報を取り出す
+
+    Parameters
+    ----------
+    user : Dict[str, Any]
+        users.list, users.info で取得したユーザ情報
+
+    Returns
+    -------
+    Dict[str, Any]
+        キャッシュするユーザ情報（id, name, real_name, display_name）
+    """
+    profile = user.get("profile", {})
+    return {
+        "id": user.get("id"),
+        "name": user.get("name"),
+        "real_name": user.get("real_name", profile.get("real_name")),
+        "display_name": profile.get("display_name"),
+    }
+
+
+class LookupCache:
+    """
+    チャンネル名→チャンネルID、ユーザID→ユーザ情報のキャッシュ
+
+    チャンネル一覧・ユーザ一覧からまとめて登録し、dict で検索する
+    登録から ttl_seconds を過ぎたエントリは無効とする
+    path を指定した場合は最初に使用する時点で読み込み、save でファイルに保存する（変更が無い場合は保存しない）
+    複数のスレッドから同時に使用可能
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        キャッシュを作成
+
+        Parameters
+        ----------
+        path : Optional[Path], optional
+            キャッシュを保存するファイルのPath（Noneの場合は保存しない）, by default None
+        ttl_seconds : float, optional
+            エントリの有効期間（秒）, by default DEFAULT_TTL_SECONDS
+        clock : Callable[[], float], optional
+            現在時刻（UNIX時間）を返す関数, by default time.time
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # テーブル毎に キー -> (値, 登録時刻)
+        self._tables: Dict[str, Dict[str, Tuple[Any, float]]] = {CHANNELS: {}, USERS: {}}
+        self._loaded = path is None
+        # 最初に検索する時点で登録する channel_master, user_master の保存先
+        self._masters: List[Tuple[Path, OutputFormat]] = []
+        self._changed = False
+        self._lock = threading.Lock()
+
+    def set_path(self, path: Optional[Path]) -> None:
+        """
+        キャッシュを保存するファイルを変更する
+
+        NOTE: 登録済みのエントリは保持し、次に使用する時点で新しいファイルから読み込む
+
+        Parameters
+        ----------
+        path : Optional[Path]
+            キャッシュを保存するファイルのPath（Noneの場合は保存しない）
+        """
+        with self._lock:
+            self.path = path
+            self._loaded = path is None
+
+    def channel_id(self, name: str) -> Optional[str]:
+        """
+        チャンネル名からチャンネルIDを検索
+
+        Parameters
+        ----------
+        name : str
+            チャンネル名
+
+        Returns
+        -------
+        Optional[str]
+            チャンネルID
+            登録されていない、または有効期間を過ぎている場合はNone
+        """
+        return self._get(CHANNELS, name)
+
+    def user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ユーザIDからユーザ情報を検索
+
+        Parameters
+        ----------
+        user_id : str
+            ユーザID
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            ユーザ情報（user_profile を参照）
+            登録されていない、または有効期間を過ぎている場合はNone
+        """
+        return self._get(USERS, user_id)
+
+    def add_channels(self, channels: Iterable[Dict[str, Any]]) -> None:
+        """
+        チャンネル情報をまとめて登録する
+
+        Parameters
+        ----------
+        channels : Iterable[Dict[str, Any]]
+            conversations.list で取得したチャンネル情報
+        """
+        self._put_all(CHANNELS, ((channel["name"], channel["id"]) for channel in channels))
+
+    def add_users(self, users: Iterable[Dict[str, Any]]) -> None:
+        """
+        ユーザ情報をまとめて登録する
+
+        Parameters
+        ----------
+        users : Iterable[Dict[str, Any]]
+            users.list, users.info で取得したユーザ情報
+        """
+        self._put_all(USERS, ((user["id"], user_profile(user)) for user in users))
+
+    def load_masters(self, base_path: Path, output_format: OutputFormat) -> None:
+        """
+        エクスポートで保存された channel_master, user_master から登録する
+
+        Parameters
+        ----------
+        base_path : Path
+            エクスポートの出力先
+        output_format : OutputFormat
+            エクスポートの出力形式
+        """
+        for table, items in _read_masters(base_path, output_format):
+            self._put_all(table, items)
+
+    def add_masters(self, base_path: Path, output_format: OutputFormat) -> None:
+        """
+        エクスポートで保存された channel_master, user_master を最初に検索する時点で登録する
+
+        NOTE: 検索しない場合は読み込まない（エクスポートのみの場合は何もしない）
+
+        Parameters
+        ----------
+        base_path : Path
+            エクスポートの出力先
+        output_format : OutputFormat
+            エクスポートの出力形式
+        """
+        with self._lock:
+            self._masters.append((base_path, output_format))
+
+    def save(self) -> Optional[Path]:
+        """
+        有効期間内のエントリをファイルに保存する
+
+        Returns
+        -------
+        Optional[Path]
+            保存されたPath
+            path が指定されていない、または前回保存してから登録されたエントリが無い場合はNone
+        """
+        with self._lock:
+            if self.path is None or not self._changed:
+                return None
+            self._load()
+            self._expire()
+            tables = {
+                name: {key: list(entry) for key, entry in table.items()}
+                for name, table in self._tables.items()
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 複数のプロセス（シャード）が同じファイルに保存しても衝突しないように一時ファイルを分ける
+            tmp_path = self.path.with_name(
+                f"{self.path.name}.{os.getpid()}-{threading.get_ident()}.tmp"
+            )
+            with open(tmp_path, "w") as f:
+                json.dump(tables, f, ensure_ascii=False)
+            # 書き込み途中で中断されても壊れないように置き換える
+            tmp_path.replace(self.path)
+            self._changed = False
+        return self.path
+
+    def _get(self, table: str, key: str) -> Any:
+        with self._lock:
+            self._load()
+            self._load_masters()
+            entry = self._tables[table].get(key)
+            if entry is None:
+                return None
+            value, registered_at = entry
+            if self._clock() - registered_at > self.ttl_seconds:
+                del self._tables[table][key]
+                return None
+            return value
+
+    def _put_all(self, table: str, items: Iterable[Tuple[str, Any]]) -> None:
+        now = self._clock()
+        entries = {key: (value, now) for key, value in items}
+        with self._lock:
+            self._load()
+            self._tables[table].update(entries)
+            self._changed = True
+
+    def _load(self) -> None:
+        """ファイルから読み込む（ロックの中で呼び出す）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path) as f:
+            tables = json.load(f)
+        for name, table in self._tables.items():
+            for key, (value, registered_at) in tables.get(name, {}).items():
+                table.setdefault(key, (value, registered_at))
+        self._expire()
+
+    def _load_masters(self) -> None:
+        """add_masters で指定された channel_master, user_master から登録する（ロックの中で呼び出す）"""
+        while self._masters:
+            now = self._clock()
+            for table, items in _read_masters(*self._masters.pop(0)):
+                self._tables[table].update((key, (value, now)) for key, value in items)
+                self._changed = True
+
+    def _expire(self) -> None:
+        """有効期間を過ぎたエントリを削除する（ロックの中で呼び出す）"""
+        now = self._clock()
+        for table in self._tables.values():
+            expired = [key for key, (_, at) in table.items() if now - at > self.ttl_seconds]
+            for key in expired:
+                del table[key]
+
+
+def _read_masters(
+    base_path: Path, output_format: OutputFormat
+) -> Iterable[Tuple[str, Iterable[Tuple[str, Any]]]]:
+    """保存された channel_master, user_master からテーブル毎に (キー, 値) を読み込む"""
+    channel_path = base_path / "channel_master"
+    if output_format.exists(channel_path):
+        channels = output_format.iter_items(channel_path)
+        yield CHANNELS, ((channel["name"], channel["id"]) for channel in channels)
+    users_path = base_path / "user_master"
+    if output_format.exists(users_path):
+        users = output_format.iter_items(users_path)
+        yield USERS, ((user["id"], user_profile(user)) for user in users)
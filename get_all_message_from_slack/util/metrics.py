@@ -0,0 +1,421 @@
+"""Slack APIの呼び出しの計測
+
+メソッド毎の呼び出し回数、レイテンシ、レート制限での待機時間、リトライ、受信バイト数と、
+チャンネル毎のページ数、リプライを取得した（省略した）スレッド数、重複排除したオブジェクトの数を集計し、実行結果のサマリ（JSON）または Prometheus のテキスト形式で出力する
+"""
+import bisect
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# レイテンシのヒストグラムの上限（秒）
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 呼び出しの結果
+OK = "ok"
+ERROR = "error"
+RATELIMITED = "ratelimited"
+
+# オブジェクトの保存の結果（書き込んだ、保存済みのため書き込まなかった）
+STORED = "stored"
+REUSED = "reused"
+
+
+class Histogram:
+    """累積しないバケット毎の件数と、合計・最大を保持するヒストグラム"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        """
+        ヒストグラムを作成
+
+        Parameters
+        ----------
+        buckets : Tuple[float, ...], optional
+            バケットの上限（昇順）, by default LATENCY_BUCKETS
+        """
+        self.buckets = buckets
+        # 最後の要素は上限を超えた件数
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        値を1件記録する
+
+        Parameters
+        ----------
+        value : float
+            記録する値
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """
+        Prometheus 形式の累積件数
+
+        Returns
+        -------
+        List[Tuple[str, int]]
+            (上限（le）, 上限以下の件数) のリスト（最後は "+Inf"）
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((_format_value(bound), total))
+        result.append(("+Inf", self.count))
+        return result
+
+
+class _MethodMetrics:
+    """メソッド毎の集計"""
+
+    def __init__(self):
+        self.calls = {OK: 0, ERROR: 0, RATELIMITED: 0}
+        self.latency = Histogram()
+        self.wait_seconds = 0.0
+        self.retries = 0
+        self.retry_after_seconds = 0.0
+        self.received_bytes = 0
+        self.pages = 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": sum(self.calls.values()),
+            "errors": self.calls[ERROR],
+            "ratelimited": self.calls[RATELIMITED],
+            "retries": self.retries,
+            "retry_after_seconds": self.retry_after_seconds,
+            "latency_seconds": {
+                "total": self.latency.sum,
+                "avg": self.latency.sum / self.latency.count if self.latency.count else 0.0,
+                "max": self.latency.max,
+            },
+            "wait_seconds": self.wait_seconds,
+            "received_bytes": self.received_bytes,
+            "pages": self.pages,
+        }
+
+
+class Metrics:
+    """
+    Slack APIの呼び出しの計測
+
+    複数のスレッドから同時に記録可能
+    """
+
+    def __init__(self):
+        """空の計測を作成"""
+        self._methods: Dict[str, _MethodMetrics] = {}
+        self._channel_pages: Dict[str, int] = {}
+        self._threads_fetched = 0
+        self._threads_skipped: Dict[str, int] = {}
+        # 重複排除して保存したオブジェクト（object_store）の 結果 -> [数, バイト数]
+        self._objects: Dict[str, List[int]] = {STORED: [0, 0], REUSED: [0, 0]}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """記録を全て削除する"""
+        with self._lock:
+            self._methods.clear()
+            self._channel_pages.clear()
+            self._threads_fetched = 0
+            self._threads_skipped.clear()
+            self._objects = {STORED: [0, 0], REUSED: [0, 0]}
+
+    def record_call(self, method: str, seconds: float, status: str = OK) -> None:
+        """
+        APIの呼び出しを記録する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        seconds : float
+            呼び出しにかかった秒数（レート制限での待機を除く）
+        status : str, optional
+            結果（OK, ERROR, RATELIMITED）, by default OK
+        """
+        with self._lock:
+            method_metrics = self._method(method)
+            method_metrics.calls[status] += 1
+            method_metrics.latency.observe(seconds)
+
+    def record_wait(self, method: str, seconds: float) -> None:
+        """
+        レート制限で待機した時間を記録する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        seconds : float
+            待機した秒数
+        """
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._method(method).wait_seconds += seconds
+
+    def record_retry(self, method: str, retry_after: float) -> None:
+        """
+        429、一時的なエラーでリトライしたことを記録する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        retry_after : float
+            リトライまでに待機する秒数
+        """
+        with self._lock:
+            method_metrics = self._method(method)
+            method_metrics.retries += 1
+            method_metrics.retry_after_seconds += retry_after
+
+    def record_bytes(self, method: str, size: int) -> None:
+        """
+        受信したバイト数（圧縮されている場合は圧縮後）を記録する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        size : int
+            受信したバイト数
+        """
+        with self._lock:
+            self._method(method).received_bytes += size
+
+    def record_page(self, method: str, channel_id: Optional[str] = None) -> None:
+        """
+        ページングで1ページ取得したことを記録する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        channel_id : Optional[str], optional
+            チャンネルのメッセージ・リプライの場合はチャンネルID, by default None
+        """
+        with self._lock:
+            self._method(method).pages += 1
+            if channel_id is not None:
+                self._channel_pages[channel_id] = self._channel_pages.get(channel_id, 0) + 1
+
+    def record_threads(self, fetched: int, skipped: Dict[str, int]) -> None:
+        """
+        リプライを取得するスレッドの計画を記録する
+
+        Parameters
+        ----------
+        fetched : int
+            リプライを取得するスレッド数
+        skipped : Dict[str, int]
+            リプライの取得を省略した理由毎のスレッド数
+        """
+        with self._lock:
+            self._threads_fetched += fetched
+            for reason, count in skipped.items():
+                self._threads_skipped[reason] = self._threads_skipped.get(reason, 0) + count
+
+    def record_object(self, size: int, stored: bool) -> None:
+        """
+        オブジェクトの保存を記録する
+
+        Parameters
+        ----------
+        size : int
+            オブジェクトのサイズ（圧縮前）
+        stored : bool
+            書き込んだ場合True、同じ内容のオブジェクトが保存済みで書き込まなかった場合False
+        """
+        with self._lock:
+            counts = self._objects[STORED if stored else REUSED]
+            counts[0] += 1
+            counts[1] += size
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        実行結果のサマリ
+
+        Returns
+        -------
+        Dict[str, Any]
+            メソッド毎の集計（methods）、全体の集計（total）、チャンネル毎のページ数（channel_pages）、
+            リプライを取得した・省略したスレッド数（threads）、
+            書き込んだ・保存済みのため書き込まなかったオブジェクトの数とバイト数（objects）
+        """
+        with self._lock:
+            methods = {name: m.summary() for name, m in sorted(self._methods.items())}
+            channel_pages = dict(sorted(self._channel_pages.items()))
+            skipped = dict(sorted(self._threads_skipped.items()))
+            threads = {
+                "fetched": self._threads_fetched,
+                "skipped": skipped,
+                "calls_saved": sum(skipped.values()),
+            }
+            objects = {
+                STORED: self._objects[STORED][0],
+                REUSED: self._objects[REUSED][0],
+                f"{STORED}_bytes": self._objects[STORED][1],
+                f"{REUSED}_bytes": self._objects[REUSED][1],
+            }
+        total = {
+            key: sum(method[key] for method in methods.values())
+            for key in ("calls", "errors", "ratelimited", "retries", "received_bytes", "pages")
+        }
+        total["latency_seconds"] = sum(m["latency_seconds"]["total"] for m in methods.values())
+        total["wait_seconds"] = sum(method["wait_seconds"] for method in methods.values())
+        total["retry_after_seconds"] = sum(m["retry_after_seconds"] for m in methods.values())
+        return {
+            "methods": methods,
+            "total": total,
+            "channel_pages": channel_pages,
+            "threads": threads,
+            "objects": objects,
+        }
+
+    def prometheus(self) -> str:
+        """
+        Prometheus のテキスト形式
+
+        Returns
+        -------
+        str
+            Prometheus のテキスト形式（text/plain; version=0.0.4）
+        """
+        lines: List[str] = []
+        with self._lock:
+            methods = sorted(self._methods.items())
+            _help(lines, "slack_api_calls_total", "counter", "Slack API calls by result.")
+            for name, m in methods:
+                for status, count in m.calls.items():
+                    lines.append(
+                        f'slack_api_calls_total{{method="{name}",status="{status}"}} {count}'
+                    )
+            _help(
+                lines,
+                "slack_api_call_duration_seconds",
+                "histogram",
+                "Slack API call latency excluding rate limit waits.",
+            )
+            for name, m in methods:
+                for le, count in m.latency.cumulative():
+                    lines.append(
+                        f'slack_api_call_duration_seconds_bucket{{method="{name}",le="{le}"}}'
+                        f" {count}"
+                    )
+                lines.append(
+                    f'slack_api_call_duration_seconds_sum{{method="{name}"}}'
+                    f" {_format_value(m.latency.sum)}"
+                )
+                lines.append(
+                    f'slack_api_call_duration_seconds_count{{method="{name}"}} {m.latency.count}'
+                )
+            counters = [
+                (
+                    "slack_api_ratelimit_wait_seconds_total",
+                    "Time waited on rate limits.",
+                    "wait_seconds",
+                ),
+                ("slack_api_retries_total", "Retries after HTTP 429.", "retries"),
+                (
+                    "slack_api_retry_after_seconds_total",
+                    "Seconds waited before retries.",
+                    "retry_after_seconds",
+                ),
+                ("slack_api_received_bytes_total", "Bytes received.", "received_bytes"),
+                ("slack_api_pages_total", "Pages fetched.", "pages"),
+            ]
+            for metric, description, attribute in counters:
+                _help(lines, metric, "counter", description)
+                for name, m in methods:
+                    value = _format_value(getattr(m, attribute))
+                    lines.append(f'{metric}{{method="{name}"}} {value}')
+            self._export_lines(lines)
+        return "\n".join(lines) + "\n"
+
+    def _export_lines(self, lines: List[str]) -> None:
+        """チャンネル毎のページ数、スレッド数、オブジェクト数の Prometheus の行（ロックの中で呼び出す）"""
+        _help(lines, "slack_export_channel_pages_total", "counter", "Pages fetched per channel.")
+        for channel_id, pages in sorted(self._channel_pages.items()):
+            lines.append(f'slack_export_channel_pages_total{{channel="{channel_id}"}} {pages}')
+        _help(lines, "slack_export_threads_total", "counter", "Threads planned for replies.")
+        lines.append(f'slack_export_threads_total{{decision="fetch"}} {self._threads_fetched}')
+        for reason, count in sorted(self._threads_skipped.items()):
+            lines.append(f'slack_export_threads_total{{decision="skip",reason="{reason}"}} {count}')
+        _help(lines, "slack_export_objects_total", "counter", "Deduplicated objects by result.")
+        for result, (count, _) in self._objects.items():
+            lines.append(f'slack_export_objects_total{{result="{result}"}} {count}')
+        _help(
+            lines,
+            "slack_export_object_bytes_total",
+            "counter",
+            "Uncompressed bytes of deduplicated objects by result.",
+        )
+        for result, (_, size) in self._objects.items():
+            lines.append(f'slack_export_object_bytes_total{{result="{result}"}} {size}')
+
+    def save(self, path: Path) -> Path:
+        """
+        実行結果のサマリをJSONで保存する
+
+        Parameters
+        ----------
+        path : Path
+            保存先
+
+        Returns
+        -------
+        Path
+            保存されたPath
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+    def save_prometheus(self, path: Path) -> Path:
+        """
+        Prometheus のテキスト形式で保存する（node_exporter の textfile collector 等で読み込む）
+
+        Parameters
+        ----------
+        path : Path
+            保存先
+
+        Returns
+        -------
+        Path
+            保存されたPath
+        """
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.prometheus())
+        # 読み込み中に書き換わらないように置き換える
+        tmp_path.replace(path)
+        return path
+
+    def _method(self, method: str) -> _MethodMetrics:
+        """メソッドの集計を取得する（ロックの中で呼び出す）"""
+        method_metrics = self._methods.get(method)
+        if method_metrics is None:
+            method_metrics = self._methods[method] = _MethodMetrics()
+        return method_metrics
+
+
+def _help(lines: List[str], metric: str, metric_type: str, description: str) -> None:
+    lines.append(f"# HELP {metric} {description}")
+    lines.append(f"# TYPE {metric} {metric_type}")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = Metrics()
@@ -0,0 +1,439 @@
+"""取得したデータを内容のハッシュをキーとしたオブジェクトとして重複なく保存する（content-addressed）
+
+実行（スナップショット）毎に全てのチャンネル・スレッドを書き込むと、変更の無いデータが実行の数だけ複製されるため、
+全てのスナップショットで共有するオブジェクトと、スナップショット毎のマニフェストに分けて保存する
+- オブジェクト: 要素を NDJSON（1行1要素）にした塊（チャンク）
+  内容の SHA-256 をファイル名として出力先の親ディレクトリの objects 以下に保存し、既に存在する場合は書き込まない
+  （例: ./work/objects/3f/a2...e1.ndjson）
+- チャンクの区切り: 行の内容のハッシュで決める（content-defined chunking）
+  メッセージが追加・変更されても、それ以外のチャンクは前回と同じオブジェクトになる
+- マニフェスト: 出力先の snapshot.jsonl に、保存先（例: <channel_id>/nomal_messages）毎の
+  オブジェクトの一覧を追記する
+
+どのスナップショットからも参照されないオブジェクトは prune_objects で削除する
+"""
+import hashlib
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from get_all_message_from_slack.util.metrics import metrics
+from get_all_message_from_slack.util.serializer import JSON, Serializer
+from get_all_message_from_slack.util.writer import COMPRESSIONS, BaseWriter, iter_ndjson, open_text
+
+OBJECTS_DIR_NAME = "objects"
+SNAPSHOT_FILE_NAME = "snapshot.jsonl"
+MASTER_NAMES = ("channel_master", "user_master")
+
+# チャンクの平均の要素数（行の内容のハッシュがこの数で割り切れる行の後で区切る）
+CHUNK_ITEMS = 256
+# チャンクの最大サイズ（圧縮前）
+MAX_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def locate(base: Path) -> Tuple[Path, str]:
+    """
+    拡張子を除いた保存先（例: <channel_id>/nomal_messages）からスナップショットとマニフェストのキーを決める
+
+    - <出力先>/channel_master, <出力先>/user_master: channel_master, user_master
+    - <出力先>/<channel_id>/<name>: <channel_id>/<name>
+
+    Parameters
+    ----------
+    base : Path
+        拡張子を除いた保存先
+
+    Returns
+    -------
+    Tuple[Path, str]
+        スナップショット（出力先）のPathとキー
+    """
+    if base.name in MASTER_NAMES:
+        return base.parent, base.name
+    return base.parent.parent, f"{base.parent.name}/{base.name}"
+
+
+class ObjectStore:
+    """
+    オブジェクトの保存先
+
+    同じ内容のオブジェクトは1度だけ書き込む
+    一時ファイルに書き込んでから置き換えるため、複数のスレッド・プロセスから同時に書き込み可能
+    """
+
+    def __init__(self, path: Path, compression: Optional[str] = None):
+        """
+        保存先を指定して作成
+
+        Parameters
+        ----------
+        path : Path
+            オブジェクトを保存するディレクトリ
+        compression : Optional[str], optional
+            圧縮形式（None, "gzip", "zstd"）, by default None
+        """
+        self.path = path
+        self.compression = compression
+
+    def put(self, text: str) -> str:
+        """
+        オブジェクトを保存する（既に存在する場合は書き込まない）
+
+        Parameters
+        ----------
+        text : str
+            NDJSON形式の内容
+
+        Returns
+        -------
+        str
+            オブジェクトのハッシュ
+        """
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if path.exists():
+            metrics.record_object(len(data), stored=False)
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        with open_text(tmp_path, "w", self.compression) as f:
+            f.write(text)
+        tmp_path.replace(path)
+        metrics.record_object(len(data), stored=True)
+        return digest
+
+    def iter_items(self, digests: List[str], serializer: Serializer = JSON) -> Iterator[Any]:
+        """
+        オブジェクトの要素を1件ずつ読み込む
+
+        Parameters
+        ----------
+        digests : List[str]
+            オブジェクトのハッシュ
+        serializer : Serializer, optional
+            JSONの変換, by default JSON
+
+        Yields
+        -------
+        Any
+            要素
+        """
+        paths = (self.object_path(digest) for digest in digests)
+        return iter_ndjson(paths, self.compression, serializer)
+
+    def object_path(self, digest: str) -> Path:
+        """
+        オブジェクトのPath
+
+        Parameters
+        ----------
+        digest : str
+            オブジェクトのハッシュ
+
+        Returns
+        -------
+        Path
+            オブジェクトのPath（<保存先>/<先頭2文字>/<残り>.ndjson）
+        """
+        return self.path / digest[:2] / f"{digest[2:]}.ndjson{COMPRESSIONS[self.compression]}"
+
+
+class Snapshot:
+    """
+    スナップショットのマニフェスト（追記のみのジャーナル）
+
+    保存先毎のオブジェクトの一覧を1行ずつ記録し、同じ保存先は後の行で置き換える
+    複数のスレッドから同時に記録可能
+    """
+
+    def __init__(self, path: Path, store: ObjectStore):
+        """
+        マニフェストを読み込む（存在しない場合は空のマニフェスト）
+
+        NOTE: 書き込み途中で中断された最後の行は無視する
+
+        Parameters
+        ----------
+        path : Path
+            スナップショット（出力先）のPath
+        store : ObjectStore
+            オブジェクトの保存先
+        """
+        self.path = path / SNAPSHOT_FILE_NAME
+        self.store = store
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    self._entries[entry["key"]] = entry
+                    self._lines += 1
+
+    def exists(self, key: str) -> bool:
+        """
+        保存済みか
+
+        Parameters
+        ----------
+        key : str
+            キー（locate を参照）
+
+        Returns
+        -------
+        bool
+            保存済みの場合True
+        """
+        with self._lock:
+            return key in self._entries
+
+    def iter_items(self, key: str, serializer: Serializer = JSON) -> Iterator[Any]:
+        """
+        保存済みの要素を1件ずつ読み込む
+
+        Parameters
+        ----------
+        key : str
+            キー（locate を参照）
+        serializer : Serializer, optional
+            JSONの変換, by default JSON
+
+        Yields
+        -------
+        Any
+            要素
+
+        Raises
+        ------
+        KeyError
+            保存されていない場合
+        """
+        with self._lock:
+            digests = self._entries[key]["objects"]
+        return self.store.iter_items(digests, serializer)
+
+    def record(self, key: str, digests: List[str], count: int) -> None:
+        """
+        保存先のオブジェクトの一覧を記録する
+
+        Parameters
+        ----------
+        key : str
+            キー（locate を参照）
+        digests : List[str]
+            オブジェクトのハッシュ（要素の順）
+        count : int
+            要素数
+        """
+        entry = {"key": key, "objects": digests, "count": count}
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._entries[key] = entry
+            self._lines += 1
+
+    def digests(self) -> Set[str]:
+        """
+        参照している全てのオブジェクト
+
+        Returns
+        -------
+        Set[str]
+            オブジェクトのハッシュ
+        """
+        with self._lock:
+            return {digest for entry in self._entries.values() for digest in entry["objects"]}
+
+    def compact(self) -> None:
+        """置き換えられた古い行を削除する"""
+        with self._lock:
+            if self._lines <= len(self._entries):
+                return
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w") as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            tmp_path.replace(self.path)
+            self._lines = len(self._entries)
+
+
+class ObjectWriter(BaseWriter):
+    """
+    要素をチャンクに分けてオブジェクトとして書き込む
+
+    閉じた時点でマニフェストに記録する
+    書き込み途中のチャンクは checkpoint で「<保存先>.pending.tmp」に保存し、resume で読み込む
+    """
+
+    def __init__(
+        self,
+        snapshot: Snapshot,
+        key: str,
+        skip_empty: bool = False,
+        serializer: Serializer = JSON,
+        chunk_items: int = CHUNK_ITEMS,
+        max_chunk_bytes: int = MAX_CHUNK_BYTES,
+    ):
+        """
+        書き込み先を指定して作成
+
+        Parameters
+        ----------
+        snapshot : Snapshot
+            スナップショット
+        key : str
+            キー（locate を参照）
+        skip_empty : bool, optional
+            1件も書き込まれなかった場合にマニフェストに記録しない, by default False
+        serializer : Serializer, optional
+            JSONの変換, by default JSON
+        chunk_items : int, optional
+            チャンクの平均の要素数, by default CHUNK_ITEMS
+        max_chunk_bytes : int, optional
+            チャンクの最大サイズ（圧縮前）, by default MAX_CHUNK_BYTES
+        """
+        super().__init__(skip_empty)
+        self.snapshot = snapshot
+        self.key = key
+        self._dumps = serializer.dumps
+        self._chunk_items = chunk_items
+        self._max_chunk_bytes = max_chunk_bytes
+        self.digests: List[str] = []
+        self._lines: List[str] = []
+        self._bytes = 0
+        self._pending_path = snapshot.path.parent / f"{key}.pending.tmp"
+
+    def write(self, item: Any) -> None:
+        """
+        要素を1件書き込む
+
+        Parameters
+        ----------
+        item : Any
+            書き込む要素
+        """
+        line = self._dumps(item) + "\n"
+        data = line.encode("utf-8")
+        self._lines.append(line)
+        self._bytes += len(data)
+        self.count += 1
+        if zlib.crc32(data) % self._chunk_items == 0 or self._bytes >= self._max_chunk_bytes:
+            self._flush()
+
+    def close(self) -> Optional[Path]:
+        """
+        残りのチャンクを書き込み、マニフェストに記録する
+
+        Returns
+        -------
+        Optional[Path]
+            マニフェストのPath
+            skip_empty が指定され、1件も書き込まれなかった場合はNone
+        """
+        if self.count == 0 and self._skip_empty:
+            return None
+        self._flush()
+        self.snapshot.record(self.key, self.digests, self.count)
+        self._remove_pending()
+        return self.snapshot.path
+
+    def abort(self) -> None:
+        """書き込みを中止する（checkpoint 済みの場合は書き込み途中のチャンクを残す）"""
+        self._lines = []
+        if not self._checkpointed:
+            self._remove_pending()
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        書き込み途中のチャンクを保存し、再開するための位置を返す
+
+        Returns
+        -------
+        Dict[str, Any]
+            再開するための位置
+        """
+        self._checkpointed = True
+        self._pending_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._pending_path.with_name(self._pending_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(self._lines)
+        tmp_path.replace(self._pending_path)
+        return {"count": self.count, "objects": list(self.digests), "pending": len(self._lines)}
+
+    def resume(self, position: Dict[str, Any]) -> None:
+        """
+        checkpoint の位置から書き込みを再開する
+
+        Parameters
+        ----------
+        position : Dict[str, Any]
+            checkpoint で返された位置
+
+        Raises
+        ------
+        FileNotFoundError
+            書き込み途中のチャンクが保存されていない場合
+        """
+        lines: List[str] = []
+        if position["pending"]:
+            with open(self._pending_path, encoding="utf-8") as f:
+                lines = f.readlines()[: position["pending"]]
+        if len(lines) < position["pending"]:
+            raise FileNotFoundError(f"pending chunk not found. path: {self._pending_path}")
+        self._checkpointed = True
+        self.count = position["count"]
+        self.digests = list(position["objects"])
+        self._lines = lines
+        self._bytes = sum(len(line.encode("utf-8")) for line in lines)
+
+    def _flush(self) -> None:
+        if self._lines:
+            self.digests.append(self.snapshot.store.put("".join(self._lines)))
+            self._lines = []
+            self._bytes = 0
+
+    def _remove_pending(self) -> None:
+        if self._pending_path.exists():
+            self._pending_path.unlink()
+
+
+def prune_objects(output_dir: Path) -> int:
+    """
+    どのスナップショットからも参照されないオブジェクトを削除する
+
+    NOTE: 書き込み中のオブジェクトを削除しないよう、エクスポートの実行中には呼び出さない
+
+    Parameters
+    ----------
+    output_dir : Path
+        スナップショットの出力先（objects と各スナップショットのディレクトリを含む）
+
+    Returns
+    -------
+    int
+        削除したオブジェクトの数
+    """
+    objects_path = output_dir / OBJECTS_DIR_NAME
+    if not objects_path.exists():
+        return 0
+    referenced: Set[str] = set()
+    store = ObjectStore(objects_path)
+    # <出力先>/<実行日時>/snapshot.jsonl とシャード毎の <出力先>/<名前>/shard-*/snapshot.jsonl
+    for pattern in (f"*/{SNAPSHOT_FILE_NAME}", f"*/shard-*/{SNAPSHOT_FILE_NAME}"):
+        for path in output_dir.glob(pattern):
+            referenced |= Snapshot(path.parent, store).digests()
+    removed = 0
+    for path in objects_path.glob("*/*"):
+        digest = path.parent.name + path.name.split(".", 1)[0]
+        if digest not in referenced or path.name.endswith(".tmp"):
+            path.unlink()
+            removed += 1
+    return removed
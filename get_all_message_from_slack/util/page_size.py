@@ -0,0 +1,173 @@
+"""ページングするSlack APIのメソッド毎のページサイズ（limit）
+
+一括エクスポートでは呼び出し回数を減らすため、メソッドの上限のページサイズから開始する
+- タイムアウト等の一時的なエラー、または応答が遅い場合は、レスポンスが大きすぎるとみなして半分にする
+- 速い応答が続いた場合は、設定されたページサイズまで倍にして戻す
+"""
+import threading
+from typing import Dict, Optional
+
+# https://api.slack.com/methods/conversations.history 等
+# メソッド毎のページサイズ（各メソッドの上限）
+DEFAULT_PAGE_SIZES: Dict[str, int] = {
+    "conversations.history": 1000,
+    "conversations.replies": 1000,
+    "conversations.list": 1000,
+}
+
+# 小さくする際の下限
+MIN_PAGE_SIZE = 50
+# これより遅い応答（秒）はページサイズを小さくする
+SLOW_SECONDS = 10.0
+# 速い応答がこの回数続いた場合にページサイズを大きくする
+GROW_AFTER = 5
+
+
+def parse_page_sizes(value: str) -> Dict[str, int]:
+    """
+    ページサイズの設定を読み込む
+
+    Parameters
+    ----------
+    value : str
+        「メソッド名=ページサイズ」のカンマ区切り（例: "conversations.history=200"）
+
+    Returns
+    -------
+    Dict[str, int]
+        メソッド名 -> ページサイズ
+
+    Raises
+    ------
+    ValueError
+        形式が不正な場合
+    """
+    sizes = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        method, separator, size = item.partition("=")
+        if not separator or not size.strip().isdigit():
+            raise ValueError(f"invalid page size. expected <method>=<size>: {item}")
+        sizes[method.strip()] = int(size)
+    return sizes
+
+
+class _MethodPageSize:
+    """メソッド毎のページサイズ"""
+
+    def __init__(self, size: int):
+        self.maximum = size
+        self.current = size
+        self.fast_streak = 0
+
+
+class PageSizer:
+    """
+    メソッド毎のページサイズを応答に合わせて調整する
+
+    複数のスレッドから同時に使用可能
+    """
+
+    def __init__(
+        self,
+        sizes: Optional[Dict[str, int]] = None,
+        min_size: int = MIN_PAGE_SIZE,
+        slow_seconds: float = SLOW_SECONDS,
+        grow_after: int = GROW_AFTER,
+    ):
+        """
+        ページサイズの調整を作成
+
+        Parameters
+        ----------
+        sizes : Optional[Dict[str, int]], optional
+            メソッド毎のページサイズ（上限）, by default DEFAULT_PAGE_SIZES
+        min_size : int, optional
+            小さくする際の下限, by default MIN_PAGE_SIZE
+        slow_seconds : float, optional
+            これより遅い応答（秒）はページサイズを小さくする, by default SLOW_SECONDS
+        grow_after : int, optional
+            速い応答がこの回数続いた場合にページサイズを大きくする, by default GROW_AFTER
+        """
+        self.min_size = min_size
+        self.slow_seconds = slow_seconds
+        self.grow_after = grow_after
+        self._methods: Dict[str, _MethodPageSize] = {}
+        self._lock = threading.Lock()
+        self.update(DEFAULT_PAGE_SIZES if sizes is None else sizes)
+
+    def update(self, sizes: Dict[str, int]) -> None:
+        """
+        メソッド毎のページサイズを設定する（調整中のページサイズは設定した値に戻す）
+
+        Parameters
+        ----------
+        sizes : Dict[str, int]
+            メソッド名 -> ページサイズ（0 の場合は limit を指定しない）
+        """
+        with self._lock:
+            for method, size in sizes.items():
+                if size > 0:
+                    self._methods[method] = _MethodPageSize(size)
+                else:
+                    self._methods.pop(method, None)
+
+    def limit(self, method: str) -> Optional[int]:
+        """
+        次の呼び出しのページサイズ
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+
+        Returns
+        -------
+        Optional[int]
+            ページサイズ
+            設定されていないメソッドの場合はNone
+        """
+        with self._lock:
+            page_size = self._methods.get(method)
+            return None if page_size is None else page_size.current
+
+    def shrink(self, method: str) -> None:
+        """
+        ページサイズを半分にする（下限まで）
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        """
+        with self._lock:
+            page_size = self._methods.get(method)
+            if page_size is None:
+                return
+            page_size.current = max(min(self.min_size, page_size.maximum), page_size.current // 2)
+            page_size.fast_streak = 0
+
+    def record(self, method: str, seconds: float) -> None:
+        """
+        成功した呼び出しの応答時間を記録し、ページサイズを調整する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        seconds : float
+            応答時間（秒）
+        """
+        if seconds >= self.slow_seconds:
+            self.shrink(method)
+            return
+        with self._lock:
+            page_size = self._methods.get(method)
+            if page_size is None or page_size.current >= page_size.maximum:
+                return
+            page_size.fast_streak += 1
+            if page_size.fast_streak >= self.grow_after:
+                page_size.current = min(page_size.maximum, page_size.current * 2)
+                page_size.fast_streak = 0
+
+
+page_sizer = PageSizer()
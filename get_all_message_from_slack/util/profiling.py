@@ -0,0 +1,108 @@
+"""エクスポート全体のプロファイル
+
+cProfile は有効にしたスレッドしか計測しないため、計測中に開始したスレッド（チャンネル・リプライの
+取得、書き込みスレッド）毎にプロファイラを作成し、終了時に1つの pstats 形式のファイルにまとめる
+保存したファイルは `python -m pstats <path>` や snakeviz 等で参照できる
+"""
+import cProfile
+import io
+import pstats
+import threading
+from pathlib import Path
+from typing import Any, List, Optional, Union
+
+
+class Profiler:
+    """
+    全てのスレッドを cProfile で計測する
+
+    with 文の中で開始したスレッドも計測する
+    """
+
+    def __init__(self):
+        """プロファイラを作成"""
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "Profiler":
+        """計測を開始する"""
+        threading.setprofile(self._start_thread)
+        self._start_thread()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        """計測を終了する（終了していないスレッドは計測を続けるが、結果には含めない）"""
+        threading.setprofile(None)  # type: ignore
+        self._profiles[0].disable()
+
+    def stats(self) -> pstats.Stats:
+        """
+        全てのスレッドの計測結果をまとめる
+
+        Returns
+        -------
+        pstats.Stats
+            計測結果
+        """
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def dump(self, path: Union[str, Path]) -> Path:
+        """
+        計測結果を pstats 形式で保存する
+
+        Parameters
+        ----------
+        path : Union[str, Path]
+            保存先
+
+        Returns
+        -------
+        Path
+            保存先
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.stats().dump_stats(str(path))
+        return path
+
+    def summary(self, limit: int = 20, sort: str = "cumulative") -> str:
+        """
+        計測結果の上位を文字列にする
+
+        Parameters
+        ----------
+        limit : int, optional
+            出力する関数の数, by default 20
+        sort : str, optional
+            並び順, by default "cumulative"
+
+        Returns
+        -------
+        str
+            計測結果の上位
+        """
+        output = io.StringIO()
+        stats = self.stats()
+        stats.stream = output  # type: ignore
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def _start_thread(self, *args: Optional[Any]) -> None:
+        """
+        呼び出したスレッドの計測を開始する
+
+        NOTE: threading.setprofile に設定し、新しいスレッドの最初のイベントで呼び出される
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12 以降は1つのプロファイラで全てのスレッドを計測する（2つ目は有効にできない）
+            return
+        with self._lock:
+            self._profiles.append(profile)
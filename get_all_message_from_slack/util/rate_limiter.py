@@ -0,0 +1,287 @@
+"""Slack APIのメソッド単位のレート制限"""
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# https://api.slack.com/docs/rate-limits
+# Tier毎の (1分あたりの呼び出し回数, バースト許容数)
+TIER_LIMITS: Dict[str, Tuple[float, float]] = {
+    "tier1": (1, 1),
+    "tier2": (20, 3),
+    "tier3": (50, 5),
+    "tier4": (100, 10),
+    # chat.postMessage はチャンネルあたり1秒に1回程度の特別枠
+    "post_message": (60, 1),
+}
+
+# Slack APIのメソッド名とTierの対応
+METHOD_TIERS: Dict[str, str] = {
+    "conversations.history": "tier3",
+    "conversations.replies": "tier3",
+    "conversations.list": "tier2",
+    "users.list": "tier2",
+    "users.info": "tier4",
+    "chat.postMessage": "post_message",
+}
+
+DEFAULT_TIER = "tier3"
+
+# Retry-After を受け取った際にレートを下げる割合と、成功時に戻す割合
+PENALTY_FACTOR = 0.8
+RECOVERY_FACTOR = 1.05
+# レートを下げる際の下限（本来のレートに対する割合）
+MIN_RATE_RATIO = 0.1
+
+
+class TokenBucket:
+    """
+    トークンバケット
+
+    スレッド間、asyncioのタスク間で共有可能
+    ロックの中では待ち時間の計算（トークンの予約）のみ行い、待機はロックの外で行う
+    """
+
+    def __init__(
+        self,
+        per_minute: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        トークンバケットを作成
+
+        Parameters
+        ----------
+        per_minute : float
+            1分あたりの呼び出し回数
+        burst : float
+            バースト許容数（バケットの容量）
+        clock : Callable[[], float], optional
+            現在時刻（秒）を返す関数, by default time.monotonic
+        """
+        self._base_rate = per_minute / 60
+        self._rate = self._base_rate
+        self._capacity = max(1.0, burst)
+        self._tokens = self._capacity
+        self._clock = clock
+        # トークンを最後に補充した時刻（呼び出しを止めている間は待機明けの時刻）
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """現在のレート（1秒あたりの呼び出し回数）"""
+        return self._rate
+
+    def reserve(self) -> float:
+        """
+        トークンを1つ予約し、実行可能になるまでの待ち時間を返す
+
+        Returns
+        -------
+        float
+            待ち時間（秒）
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= 1
+            # 呼び出しを止めている間はトークンが増えないため、待機明けから不足分を順に割り当てる
+            wait = max(0.0, self._updated_at - now)
+            return wait if self._tokens >= 0 else wait - self._tokens / self._rate
+
+    def penalize(self, retry_after: float) -> None:
+        """
+        Retry-After を受け取った際に、指定秒数の間呼び出しを止めレートを下げる
+
+        Parameters
+        ----------
+        retry_after : float
+            待機する秒数
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._rate = max(self._base_rate * MIN_RATE_RATIO, self._rate * PENALTY_FACTOR)
+            # 待機明けまでトークンを増やさず、待機明けは1回のみ実行できるようにする
+            # （待機中に予約した呼び出しが待機明けに一斉に実行されないようにする）
+            self._updated_at = max(self._updated_at, now + retry_after)
+            self._tokens = min(self._tokens, 1.0)
+
+    def recover(self) -> None:
+        """呼び出しが成功した際に、下げたレートを少しずつ本来のレートに戻す"""
+        with self._lock:
+            self._rate = min(self._base_rate, self._rate * RECOVERY_FACTOR)
+
+    def _refill(self, now: float) -> None:
+        if now <= self._updated_at:
+            return
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+
+class RateLimiter:
+    """
+    Slack APIのメソッド単位のレート制限
+
+    メソッド毎にTierに応じたトークンバケットを持つ
+    レート制限はトークン（ワークスペース）単位のため、複数のプロセスで分担する場合は set_share で分け合う
+    """
+
+    def __init__(
+        self,
+        tier_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        method_tiers: Optional[Dict[str, str]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        レート制限を作成
+
+        Parameters
+        ----------
+        tier_limits : Optional[Dict[str, Tuple[float, float]]], optional
+            Tier毎の (1分あたりの呼び出し回数, バースト許容数), by default TIER_LIMITS
+        method_tiers : Optional[Dict[str, str]], optional
+            メソッド名とTierの対応, by default METHOD_TIERS
+        clock : Callable[[], float], optional
+            現在時刻（秒）を返す関数, by default time.monotonic
+        """
+        self._tier_limits = TIER_LIMITS if tier_limits is None else tier_limits
+        self._method_tiers = METHOD_TIERS if method_tiers is None else method_tiers
+        self._clock = clock
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._share = 1.0
+        self._lock = threading.Lock()
+
+    @property
+    def share(self) -> float:
+        """このプロセスが使用するレートの割合"""
+        return self._share
+
+    def set_share(self, share: float) -> None:
+        """
+        このプロセスが使用するレート（Tier毎の呼び出し回数とバースト許容数）の割合を設定する
+
+        NOTE: 作成済みのトークンバケットは破棄し、次の呼び出しから新しいレートで作成する
+
+        Parameters
+        ----------
+        share : float
+            レートの割合（例: 4 つのシャードで分担する場合は 0.25）
+        """
+        with self._lock:
+            self._share = share
+            self._buckets.clear()
+
+    def bucket(self, method: str) -> TokenBucket:
+        """
+        指定されたメソッドのトークンバケットを取得
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名（例: conversations.history）
+
+        Returns
+        -------
+        TokenBucket
+            トークンバケット
+        """
+        with self._lock:
+            if method not in self._buckets:
+                tier = self._method_tiers.get(method, DEFAULT_TIER)
+                per_minute, burst = self._tier_limits[tier]
+                self._buckets[method] = TokenBucket(
+                    per_minute * self._share, burst * self._share, self._clock
+                )
+            return self._buckets[method]
+
+    def acquire(self, method: str) -> float:
+        """
+        指定されたメソッドが実行可能になるまで待機する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+
+        Returns
+        -------
+        float
+            待機した秒数
+        """
+        wait = self.bucket(method).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+    async def acquire_async(self, method: str) -> float:
+        """
+        指定されたメソッドが実行可能になるまで待機する（asyncio版）
+
+        NOTE: 同期版のみ使用する場合の import を軽くするため、asyncio は使用する時点で import する
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+
+        Returns
+        -------
+        float
+            待機した秒数
+        """
+        import asyncio
+
+        wait = self.bucket(method).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return max(wait, 0.0)
+
+    def penalize(self, method: str, retry_after: float) -> None:
+        """
+        Retry-After に応じて指定されたメソッドの呼び出しを止めレートを下げる
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        retry_after : float
+            待機する秒数
+        """
+        self.bucket(method).penalize(retry_after)
+
+    def recover(self, method: str) -> None:
+        """
+        呼び出しの成功を通知し、下げたレートを戻す
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        """
+        self.bucket(method).recover()
+
+
+def method_name(func: Callable) -> str:
+    """
+    WebClientのメソッドからSlack APIのメソッド名を取得
+
+    例: client.conversations_history -> conversations.history
+
+    Parameters
+    ----------
+    func : Callable
+        WebClientのメソッド
+
+    Returns
+    -------
+    str
+        Slack APIのメソッド名
+        取得できない場合は空文字
+    """
+    name = getattr(func, "__name__", "")
+    return name.replace("_", ".", 1)
+
+
+rate_limiter = RateLimiter()
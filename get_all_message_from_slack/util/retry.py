@@ -0,0 +1,370 @@
+"""Slack APIの呼び出しのリトライ
+
+- 429（レート制限）は Retry-After に従って待機する
+- 5xx、タイムアウト、接続エラー等の一時的なエラーは指数バックオフ（ジッター付き）で待機する
+- 429 と一時的なエラーはそれぞれの最大試行回数を超えた場合にエラーを送出する
+- 短時間に一時的なエラーが続いた場合はサーキットブレーカーで全てのワーカーの呼び出しを一時的に止める
+"""
+import http.client
+import random
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple, Type
+from urllib.error import URLError
+
+from get_all_message_from_slack.util.metrics import ERROR, RATELIMITED, metrics
+from get_all_message_from_slack.util.page_size import PageSizer
+from get_all_message_from_slack.util.rate_limiter import RateLimiter
+
+# 一時的なエラー（リトライする例外）
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (
+    URLError,
+    ConnectionError,
+    socket.timeout,
+    TimeoutError,
+    http.client.HTTPException,
+)
+
+# 200 で返される一時的なエラー
+# https://api.slack.com/web#evaluating_responses
+TRANSIENT_ERROR_CODES = ("internal_error", "fatal_error", "service_unavailable", "request_timeout")
+
+
+def _is_slack_api_error(error: BaseException) -> bool:
+    """
+    SlackApiError か
+
+    NOTE: slack_sdk の import に時間がかかるため、エラーが発生した時点で import する
+    """
+    from slack_sdk.errors import SlackApiError
+
+    return isinstance(error, SlackApiError)
+
+
+class RetryPolicy:
+    """リトライの方針（最大試行回数と待機時間）"""
+
+    def __init__(
+        self,
+        max_attempts: int = 10,
+        max_ratelimited_attempts: int = 100,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        transient_errors: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS,
+        rand: Callable[[], float] = random.random,
+    ):
+        """
+        リトライの方針を作成
+
+        Parameters
+        ----------
+        max_attempts : int, optional
+            一時的なエラーの最大試行回数（初回を含む）, by default 10
+        max_ratelimited_attempts : int, optional
+            429 の最大試行回数（初回を含む）, by default 100
+        base_delay : float, optional
+            1回目のリトライの最大待機時間（秒）, by default 1.0
+        max_delay : float, optional
+            待機時間の上限（秒）, by default 60.0
+        transient_errors : Tuple[Type[BaseException], ...], optional
+            一時的なエラーとしてリトライする例外, by default TRANSIENT_ERRORS
+        rand : Callable[[], float], optional
+            0以上1未満の乱数を返す関数, by default random.random
+        """
+        self.max_attempts = max_attempts
+        self.max_ratelimited_attempts = max_ratelimited_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.transient_errors = transient_errors
+        self._rand = rand
+
+    def can_retry(self, attempt: int, ratelimited: bool = False) -> bool:
+        """
+        リトライできるか
+
+        NOTE: 429 は Retry-After の間待機するだけで、一時的なエラーの試行回数には数えない
+
+        Parameters
+        ----------
+        attempt : int
+            失敗した試行の回数（1から）
+        ratelimited : bool, optional
+            429 の試行回数か, by default False
+
+        Returns
+        -------
+        bool
+            最大試行回数に達していない場合True
+        """
+        return attempt < (self.max_ratelimited_attempts if ratelimited else self.max_attempts)
+
+    def retry_after(self, error: BaseException) -> Optional[float]:
+        """
+        429 の場合に待機する秒数
+
+        Parameters
+        ----------
+        error : BaseException
+            発生した例外
+
+        Returns
+        -------
+        Optional[float]
+            Retry-After の秒数
+            429 でない場合はNone
+        """
+        if not _is_slack_api_error(error) or error.response.status_code != 429:  # type: ignore
+            return None
+        # https://api.slack.com/lang/ja-jp/rate-limit
+        return int(error.response.headers.get("retry-after", 1))
+
+    def is_transient(self, error: BaseException) -> bool:
+        """
+        一時的なエラーか
+
+        Parameters
+        ----------
+        error : BaseException
+            発生した例外
+
+        Returns
+        -------
+        bool
+            5xx、Slackの一時的なエラーコード、または transient_errors の場合True
+        """
+        if _is_slack_api_error(error):
+            response = error.response  # type: ignore
+            if response.status_code >= 500:
+                return True
+            data = response.data if isinstance(response.data, dict) else {}
+            return data.get("error") in TRANSIENT_ERROR_CODES
+        return isinstance(error, self.transient_errors)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        一時的なエラーの後に待機する秒数
+
+        NOTE: 複数のワーカーが同時にリトライしないように、上限までの一様乱数とする（Full Jitter）
+
+        Parameters
+        ----------
+        attempt : int
+            失敗した試行の回数（1から）
+
+        Returns
+        -------
+        float
+            待機する秒数
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return ceiling * self._rand()
+
+
+class CircuitBreaker:
+    """
+    ワークスペース全体のサーキットブレーカー
+
+    window 秒の間に threshold 回失敗（一時的なエラー）した場合に開き、
+    cooldown 秒の間は全てのメソッドの呼び出しを待機させる
+    閉じた後もすぐに失敗が続く場合は cooldown を倍にし（max_cooldown まで）、成功すると元に戻す
+    複数のスレッドから同時に使用可能
+    """
+
+    def __init__(
+        self,
+        threshold: int = 5,
+        window: float = 10.0,
+        cooldown: float = 5.0,
+        max_cooldown: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        サーキットブレーカーを作成
+
+        Parameters
+        ----------
+        threshold : int, optional
+            開くまでの失敗回数, by default 5
+        window : float, optional
+            失敗を数える期間（秒）, by default 10.0
+        cooldown : float, optional
+            開いている秒数, by default 5.0
+        max_cooldown : float, optional
+            開いている秒数の上限, by default 60.0
+        clock : Callable[[], float], optional
+            現在時刻（秒）を返す関数, by default time.monotonic
+        """
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._clock = clock
+        self._failures: Deque[float] = deque()
+        self._next_cooldown = cooldown
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """開いているか"""
+        return self.delay() > 0
+
+    def delay(self) -> float:
+        """
+        閉じるまでの秒数
+
+        Returns
+        -------
+        float
+            閉じるまでの秒数（閉じている場合は0）
+        """
+        with self._lock:
+            return max(0.0, self._open_until - self._clock())
+
+    def record_failure(self) -> None:
+        """失敗を記録し、失敗が続いている場合は開く"""
+        with self._lock:
+            now = self._clock()
+            if now < self._open_until:
+                # 開いている間に送信済みだった呼び出しの失敗は数えない
+                return
+            self._failures.append(now)
+            while self._failures and self._failures[0] <= now - self.window:
+                self._failures.popleft()
+            if len(self._failures) >= self.threshold:
+                self._open_until = now + self._next_cooldown
+                self._next_cooldown = min(self.max_cooldown, self._next_cooldown * 2)
+                self._failures.clear()
+
+    def record_success(self) -> None:
+        """成功を記録し、開いている秒数を元に戻す"""
+        with self._lock:
+            if self._clock() >= self._open_until:
+                self._next_cooldown = self.cooldown
+
+
+class CallAttempts:
+    """
+    1回のAPI呼び出し（リトライを含む）の試行の記録
+
+    slack_api と async_slack_api で共有する、計測・レート制限・ページサイズ・サーキットブレーカーへの記録と
+    リトライまでの待機時間の計算を行う
+    待機（time.sleep / asyncio.sleep）とAPIの実行は呼び出し側で行う
+    """
+
+    def __init__(
+        self,
+        method: str,
+        adaptive: bool,
+        policy: RetryPolicy,
+        breaker: CircuitBreaker,
+        limiter: RateLimiter,
+        sizer: PageSizer,
+        is_transient: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        """
+        試行の記録を作成
+
+        Parameters
+        ----------
+        method : str
+            Slack APIのメソッド名
+        adaptive : bool
+            ページサイズを調整するか（呼び出し側で limit が指定されている場合はFalse）
+        policy : RetryPolicy
+            リトライの方針
+        breaker : CircuitBreaker
+            サーキットブレーカー
+        limiter : RateLimiter
+            レート制限
+        sizer : PageSizer
+            ページサイズ
+        is_transient : Optional[Callable[[BaseException], bool]], optional
+            一時的なエラーか, by default None（policy.is_transient）
+        """
+        self.method = method
+        self.adaptive = adaptive
+        self._policy = policy
+        self._breaker = breaker
+        self._limiter = limiter
+        self._sizer = sizer
+        self._is_transient = policy.is_transient if is_transient is None else is_transient
+        # 429 と一時的なエラーの失敗した試行の回数（別々の最大試行回数で打ち切る）
+        self.attempts: Dict[str, int] = {RATELIMITED: 0, ERROR: 0}
+
+    def limit(self) -> Optional[int]:
+        """
+        次の呼び出しで指定するページサイズ
+
+        Returns
+        -------
+        Optional[int]
+            ページサイズ（指定しない場合はNone）
+        """
+        return self._sizer.limit(self.method) if self.adaptive else None
+
+    def record_success(self, seconds: float, limit: Optional[int]) -> None:
+        """
+        成功した呼び出しを記録する
+
+        Parameters
+        ----------
+        seconds : float
+            呼び出しにかかった秒数
+        limit : Optional[int]
+            指定したページサイズ
+        """
+        metrics.record_call(self.method, seconds)
+        if limit is not None:
+            self._sizer.record(self.method, seconds)
+        self._limiter.recover(self.method)
+        self._breaker.record_success()
+
+    def retry_delay(self, error: BaseException, seconds: float) -> Optional[float]:
+        """
+        失敗した呼び出しを記録し、リトライする場合はリトライまでに待機する秒数を返す
+
+        NOTE: 429 の場合はレート制限に Retry-After を通知して次の実行を待たせるため、0 を返す
+
+        Parameters
+        ----------
+        error : BaseException
+            発生した例外
+        seconds : float
+            呼び出しにかかった秒数
+
+        Returns
+        -------
+        Optional[float]
+            リトライまでに待機する秒数
+            リトライしない場合はNone
+        """
+        method = self.method
+        retry_after = self._policy.retry_after(error)
+        if retry_after is not None:
+            metrics.record_call(method, seconds, RATELIMITED)
+            self.attempts[RATELIMITED] += 1
+            if not self._policy.can_retry(self.attempts[RATELIMITED], ratelimited=True):
+                return None
+            # 429 はメソッド毎のレート制限で待たせるため、サーキットブレーカーには数えない
+            metrics.record_retry(method, retry_after)
+            self._limiter.penalize(method, retry_after)
+            return 0.0
+        metrics.record_call(method, seconds, ERROR)
+        if not self._is_transient(error):
+            return None
+        # タイムアウト等はレスポンスが大きすぎる可能性があるため、次の呼び出しのページサイズを小さくする
+        self._sizer.shrink(method)
+        self._breaker.record_failure()
+        self.attempts[ERROR] += 1
+        if not self._policy.can_retry(self.attempts[ERROR]):
+            return None
+        delay = self._policy.backoff(self.attempts[ERROR])
+        metrics.record_retry(method, delay)
+        return delay
+
+
+retry_policy = RetryPolicy()
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,105 @@
+"""エクスポートするチャンネル・期間の選択"""
+import time
+from fnmatch import fnmatchcase
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from get_all_message_from_slack.util.export_state import ts_key
+
+
+def days_ago(days: float, now: Optional[float] = None) -> str:
+    """
+    指定された日数前のSlackのタイムスタンプ
+
+    Parameters
+    ----------
+    days : float
+        日数
+    now : Optional[float], optional
+        現在時刻（UNIX時間）, by default time.time()
+
+    Returns
+    -------
+    str
+        Slackのタイムスタンプ（例: '1638883139.000000'）
+    """
+    now = time.time() if now is None else now
+    return f"{now - days * 24 * 60 * 60:.6f}"
+
+
+class ExportFilter(NamedTuple):
+    """
+    エクスポートの対象
+
+    チャンネルはAPIでメッセージを取得する前にチャンネル一覧から絞り込み、
+    期間は conversations.history の oldest, latest で指定する
+    """
+
+    # 対象とするチャンネル名のパターン（fnmatch 形式、例: "proj-*"）。空の場合は全て
+    include: Tuple[str, ...] = ()
+    # 除外するチャンネル名のパターン（include より優先）
+    exclude: Tuple[str, ...] = ()
+    # アーカイブされたチャンネルを除外する
+    skip_archived: bool = False
+    # 最小のメンバー数
+    min_members: int = 0
+    # このts以降のメッセージのみ取得する（例: days_ago(30)）
+    oldest: Optional[str] = None
+    # このts以前のメッセージのみ取得する
+    latest: Optional[str] = None
+
+    def match(self, channel: Dict[str, Any]) -> bool:
+        """
+        対象のチャンネルか
+
+        Parameters
+        ----------
+        channel : Dict[str, Any]
+            conversations.list で取得したチャンネル情報
+
+        Returns
+        -------
+        bool
+            対象の場合True
+        """
+        name = channel.get("name", "")
+        if self.include and not any(fnmatchcase(name, pattern) for pattern in self.include):
+            return False
+        if any(fnmatchcase(name, pattern) for pattern in self.exclude):
+            return False
+        if self.skip_archived and channel.get("is_archived", False):
+            return False
+        return channel.get("num_members", 0) >= self.min_members
+
+    def select_channels(self, channels: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        対象のチャンネルを取り出す
+
+        Parameters
+        ----------
+        channels : List[Dict[str, Any]]
+            チャンネル一覧
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            対象のチャンネル一覧（元の順序）
+        """
+        return [channel for channel in channels if self.match(channel)]
+
+    def history_oldest(self, oldest: Optional[str]) -> Optional[str]:
+        """
+        差分取得の oldest と合わせて、メッセージを取得する oldest を決める
+
+        Parameters
+        ----------
+        oldest : Optional[str]
+            差分取得の oldest（ExportState.oldest）
+
+        Returns
+        -------
+        Optional[str]
+            より新しい方の oldest
+        """
+        if oldest is None or self.oldest is None:
+            return self.oldest if oldest is None else oldest
+        return oldest if ts_key(oldest) >= ts_key(self.oldest) else self.oldest
@@ -0,0 +1,85 @@
+"""出力する要素のJSONへの変換
+
+orjson、ujson がインストールされている場合は使用し、無い場合は標準の json にフォールバックする
+どの実装でも日本語等をエスケープせずに（UTF-8 のまま）、区切り文字の空白を入れずに出力する
+"""
+import json
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+# 優先して使用する順
+BACKENDS = ("orjson", "ujson", "json")
+AUTO = "auto"
+
+
+class Serializer(NamedTuple):
+    """JSONの変換"""
+
+    name: str
+    dumps: Callable[[Any], str]
+    loads: Callable[[Union[str, bytes]], Any]
+
+
+def _json() -> Serializer:
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    return Serializer("json", encoder.encode, json.loads)
+
+
+def _orjson() -> Serializer:
+    import orjson
+
+    def dumps(item: Any) -> str:
+        return orjson.dumps(item).decode("utf-8")
+
+    return Serializer("orjson", dumps, orjson.loads)
+
+
+def _ujson() -> Serializer:
+    import ujson
+
+    def dumps(item: Any) -> str:
+        return ujson.dumps(item, ensure_ascii=False, escape_forward_slashes=False)
+
+    return Serializer("ujson", dumps, ujson.loads)
+
+
+_FACTORIES = {"orjson": _orjson, "ujson": _ujson, "json": _json}
+
+
+def get_serializer(name: Optional[str] = AUTO) -> Serializer:
+    """
+    JSONの変換を取得
+
+    Parameters
+    ----------
+    name : Optional[str], optional
+        実装（"auto", "orjson", "ujson", "json"）, by default "auto"
+        auto（または None）の場合はインストールされている中で最も速いものを使用する
+
+    Returns
+    -------
+    Serializer
+        JSONの変換
+
+    Raises
+    ------
+    ValueError
+        未対応の実装の場合
+    ImportError
+        指定された実装がインストールされていない場合
+    """
+    if name is None or name == AUTO:
+        for backend in BACKENDS:
+            try:
+                return _FACTORIES[backend]()
+            except ImportError:
+                continue
+    if name not in _FACTORIES:
+        raise ValueError(f"not supported serializer. serializer: {name}")
+    try:
+        return _FACTORIES[name]()
+    except ImportError as e:
+        raise ImportError(f"{name} serializer requires {name}. `pip install {name}`") from e
+
+
+# 標準の json（インストールされているモジュールに依存しない出力が必要な場合に使用する）
+JSON = _json()
@@ -0,0 +1,218 @@
+"""複数のプロセス（ノード）でチャンネルを分担してエクスポートする
+
+チャンネル一覧を決定的に N 個のシャードに分割し、各プロセスは自身のシャードのチャンネルのみを
+出力先の「shard-<index>-of-<count>」以下に取得する
+全てのシャードの取得後に merge_shards で全体のマニフェスト（manifest.json）を作成する
+"""
+import json
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from get_all_message_from_slack.util.checkpoint import CHECKPOINT_FILE_NAME, Checkpoint
+from get_all_message_from_slack.util.export_state import ExportState
+from get_all_message_from_slack.util.writer import OutputFormat
+
+STRATEGIES = ("hash", "volume")
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+def channel_shard(channel_id: str, count: int) -> int:
+    """
+    チャンネルIDのハッシュからシャードを決める
+
+    NOTE: hash() はプロセス毎に値が変わるため、crc32 を使用する
+
+    Parameters
+    ----------
+    channel_id : str
+        チャンネルID
+    count : int
+        シャード数
+
+    Returns
+    -------
+    int
+        シャードのインデックス
+    """
+    return zlib.crc32(channel_id.encode("utf-8")) % count
+
+
+def estimate_volume(channel: Dict[str, Any]) -> int:
+    """
+    チャンネルのメッセージ量を見積もる
+
+    NOTE: conversations.list ではメッセージ数を取得できないため、メンバー数を目安とする
+
+    Parameters
+    ----------
+    channel : Dict[str, Any]
+        conversations.list で取得したチャンネル情報
+
+    Returns
+    -------
+    int
+        メッセージ量の見積もり（1以上）
+    """
+    return channel.get("num_members", 0) + 1
+
+
+def partition_channels(
+    channels: List[Dict[str, Any]], count: int, strategy: str = "hash"
+) -> List[List[Dict[str, Any]]]:
+    """
+    チャンネル一覧をシャードに分割する
+
+    同じチャンネル一覧からは、どのプロセスでも同じ分割になる
+    - hash: チャンネルIDのハッシュで分割する（チャンネルが増減しても他のチャンネルのシャードは変わらない）
+    - volume: メッセージ量の見積もりが大きい順に、合計が最も小さいシャードに割り当てる
+
+    Parameters
+    ----------
+    channels : List[Dict[str, Any]]
+        チャンネル一覧
+    count : int
+        シャード数
+    strategy : str, optional
+        分割方法（"hash", "volume"）, by default "hash"
+
+    Returns
+    -------
+    List[List[Dict[str, Any]]]
+        シャード毎のチャンネル一覧（各シャード内は元の順序）
+
+    Raises
+    ------
+    ValueError
+        未対応の分割方法、シャード数が1未満の場合
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"not supported shard strategy. strategy: {strategy}")
+    if count < 1:
+        raise ValueError(f"shard count must be positive. count: {count}")
+    if strategy == "hash":
+        indexes = {channel["id"]: channel_shard(channel["id"], count) for channel in channels}
+    else:
+        indexes = {}
+        totals = [0] * count
+        for channel in sorted(channels, key=lambda c: (-estimate_volume(c), c["id"])):
+            index = min(range(count), key=lambda i: (totals[i], i))
+            indexes[channel["id"]] = index
+            totals[index] += estimate_volume(channel)
+    shards: List[List[Dict[str, Any]]] = [[] for _ in range(count)]
+    for channel in channels:
+        shards[indexes[channel["id"]]].append(channel)
+    return shards
+
+
+class Shard(NamedTuple):
+    """エクスポートするシャード"""
+
+    index: int
+    count: int
+    strategy: str = "hash"
+
+    @property
+    def name(self) -> str:
+        """出力先のディレクトリ名"""
+        return shard_name(self.index, self.count)
+
+    def select(self, channels: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        チャンネル一覧から、このシャードのチャンネルを取り出す
+
+        Parameters
+        ----------
+        channels : List[Dict[str, Any]]
+            全てのチャンネル一覧
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            このシャードのチャンネル一覧
+        """
+        return partition_channels(channels, self.count, self.strategy)[self.index]
+
+
+def shard_name(index: int, count: int) -> str:
+    """
+    シャードの出力先のディレクトリ名
+
+    Parameters
+    ----------
+    index : int
+        シャードのインデックス
+    count : int
+        シャード数
+
+    Returns
+    -------
+    str
+        ディレクトリ名（例: shard-000-of-004）
+    """
+    return f"shard-{index:03d}-of-{count:03d}"
+
+
+def merge_shards(base_path: Path, count: int, output_format: Optional[OutputFormat] = None) -> Path:
+    """
+    全てのシャードの出力から、全体のマニフェスト（manifest.json）を作成する
+
+    マニフェストにはチャンネル毎に、取得したシャード、出力先（base_path からの相対パス）、
+    取得済みの最新のts、取得が完了したかを記録する
+    ユーザ一覧は最初のシャード（index=0）で取得される
+
+    Parameters
+    ----------
+    base_path : Path
+        全てのシャードの出力先
+    count : int
+        シャード数
+    output_format : Optional[OutputFormat], optional
+        エクスポートの出力形式, by default OutputFormat()
+
+    Returns
+    -------
+    Path
+        マニフェストのPath
+    """
+    output_format = OutputFormat() if output_format is None else output_format
+    channels: List[Dict[str, Any]] = []
+    missing_shards = []
+    for index in range(count):
+        name = shard_name(index, count)
+        shard_path = base_path / name
+        if not (shard_path / CHECKPOINT_FILE_NAME).exists():
+            missing_shards.append(index)
+            continue
+        checkpoint = Checkpoint.load(shard_path)
+        state = ExportState.load(shard_path)
+        channel_path = shard_path / "channel_master"
+        if not output_format.exists(channel_path):
+            continue
+        for channel in output_format.iter_items(channel_path):
+            channels.append(
+                {
+                    "id": channel["id"],
+                    "name": channel["name"],
+                    "shard": index,
+                    "path": f"{name}/{channel['id']}",
+                    "latest_ts": state.latest_ts(channel["id"]),
+                    "complete": checkpoint.is_channel_done(channel["id"]),
+                }
+            )
+    output_format.close()
+    manifest = {
+        "shard_count": count,
+        "format": output_format.name,
+        "compression": output_format.compression,
+        "user_master": f"{shard_name(0, count)}/user_master",
+        "missing_shards": missing_shards,
+        "incomplete_channels": [c["id"] for c in channels if not c["complete"]],
+        "channels": sorted(channels, key=lambda c: c["name"]),
+    }
+    path = base_path / MANIFEST_FILE_NAME
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    tmp_path.replace(path)
+    return path
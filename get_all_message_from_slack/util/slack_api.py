@@ -1,16 +1,45 @@
-"""Slack APIを操作する関数群"""
-from time import sleep
-from typing import Any, Callable, Dict, List, Optional
+"""Slack APIを操作する関数群
 
-from get_all_message_from_slack.settings import client
-from slack_sdk.errors import SlackApiError
-from slack_sdk.web.slack_response import SlackResponse
+全ての関数は client を指定しない場合、settings.get_client で共有するクライアントを使用する
+NOTE: クライアントは最初にAPIを呼び出す時点で作成するため、import にトークンは不要
+"""
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
 
+from get_all_message_from_slack.settings import LOOKUP_CACHE_TTL, get_client, lookup_cache_path
+from get_all_message_from_slack.util.lookup_cache import LookupCache
+from get_all_message_from_slack.util.metrics import metrics
+from get_all_message_from_slack.util.page_size import page_sizer
+from get_all_message_from_slack.util.rate_limiter import method_name, rate_limiter
+from get_all_message_from_slack.util.retry import CallAttempts, circuit_breaker, retry_policy
 
-def get_all_users() -> List[Dict[str, Any]]:
+if TYPE_CHECKING:
+    from slack_sdk.web.client import WebClient
+    from slack_sdk.web.slack_response import SlackResponse
+
+# チャンネル名・ユーザIDの検索用キャッシュ
+lookup_cache = LookupCache(lookup_cache_path(), LOOKUP_CACHE_TTL)
+
+
+class Page(list):
+    """
+    1ページ分のデータ
+
+    次のページを取得するためのカーソルを next_cursor に保持する（最後のページの場合はNone）
+    """
+
+    next_cursor: Optional[str] = None
+
+
+def get_all_users(client: Optional["WebClient"] = None) -> List[Dict[str, Any]]:
     """
     全てのユーザ情報を取得する
 
+    Parameters
+    ----------
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
+
     Returns
     -------
     List[Dict[str, Any]]
@@ -18,15 +47,42 @@ def get_all_users() -> List[Dict[str, Any]]:
         フォーマットは下記のchannels以下を参照
         https://api.slack.com/methods/users.list#responses
     """
-    return __get_all_data_by_iterating(client.users_list, {}, "members", False)
+    return __get_all_data_by_iterating(__client(client).users_list, {}, "members", False)
 
 
-def get_all_public_channels() -> List[Dict[str, Any]]:
+def iter_all_users(client: Optional["WebClient"] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    全てのユーザ情報を1ページずつ取得する
+
+    Parameters
+    ----------
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
+
+    Yields
+    -------
+    List[Dict[str, Any]]
+        1ページ分のユーザ情報
+        フォーマットは get_all_users を参照
+    """
+    return __iter_pages(__client(client).users_list, {}, "members", False)
+
+
+def get_all_public_channels(
+    exclude_archived: bool = False, client: Optional["WebClient"] = None
+) -> List[Dict[str, Any]]:
     """
     全てのpublicチャンネル情報を取得する
 
     NOTE: 全てのメッセージをメモリに乗せる事に注意
 
+    Parameters
+    ----------
+    exclude_archived : bool, optional
+        アーカイブされたチャンネルを除外する, by default False
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
+
     Returns
     -------
     List[Dict[str, Any]]
@@ -35,18 +91,46 @@ def get_all_public_channels() -> List[Dict[str, Any]]:
         https://api.slack.com/methods/conversations.list#responses
     """
     return __get_all_data_by_iterating(
-        client.conversations_list, {"type:": "public_channel"}, "channels", False
+        __client(client).conversations_list, __channels_option(exclude_archived), "channels", False
     )
 
 
-def get_channel_id(name: str) -> str:
+def iter_all_public_channels(
+    exclude_archived: bool = False, client: Optional["WebClient"] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    全てのpublicチャンネル情報を1ページずつ取得する
+
+    Parameters
+    ----------
+    exclude_archived : bool, optional
+        アーカイブされたチャンネルを除外する, by default False
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
+
+    Yields
+    -------
+    List[Dict[str, Any]]
+        1ページ分のチャンネル情報
+        フォーマットは get_all_public_channels を参照
+    """
+    return __iter_pages(
+        __client(client).conversations_list, __channels_option(exclude_archived), "channels", False
+    )
+
+
+def get_channel_id(name: str, client: Optional["WebClient"] = None) -> str:
     """
     指定されたチャンネルのチャンネルIDを取得
 
+    NOTE: キャッシュに無い場合はチャンネル一覧を取得し、取得したページをまとめてキャッシュに登録する
+
     Parameters
     ----------
     name : str
         チャンネル名
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
 
     Returns
     -------
@@ -58,35 +142,45 @@ def get_channel_id(name: str) -> str:
     ValueError
         存在しないチャンネル名の場合
     """
+    channel_id = lookup_cache.channel_id(name)
+    if channel_id is not None:
+        return channel_id
     # https://api.slack.com/methods/conversations.list
+    conversations_list = __client(client).conversations_list
     try:
         option = {}
         next_cursor = "DUMMY"  # whileを1度は回すためダミー値を設定
         while next_cursor:
-            response: Dict[str, Any] = __execute_api(client.conversations_list, **option).data  # type: ignore # noqa: E501
+            response: Dict[str, Any] = __execute_api(conversations_list, **option).data  # type: ignore # noqa: E501
+            lookup_cache.add_channels(response["channels"])
             target_channnels = [
                 channel["id"] for channel in response["channels"] if channel["name"] == name
             ]
             if target_channnels:
+                lookup_cache.save()
                 return target_channnels[0]
             # チャンネルが多い場合は1度で全てを取得できない
             # 尚、メッセージ取得系と異なり「has_more」属性は持っていない
             next_cursor = response["response_metadata"]["next_cursor"]
             option["cursor"] = next_cursor
-            sleep(1)  # need to wait 1 sec before next call due to rate limits
         raise ValueError("not exists channel name.")
     except StopIteration:
         raise ValueError("not exists channel name.")
 
 
-def get_user_name(user_id: str) -> str:
+def get_user_name(user_id: str, client: Optional["WebClient"] = None) -> str:
     """
     指定されたユーザIDのユーザ名を取得
 
+    NOTE: キャッシュに無い場合のみ users.info を呼び出し、取得したユーザ情報をキャッシュに登録する
+    NOTE: まとめて検索する場合は先に lookup_cache.add_users でユーザ一覧を登録する
+
     Parameters
     ----------
     user_id : str
         ユーザID
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
 
     Returns
     -------
@@ -98,8 +192,12 @@ def get_user_name(user_id: str) -> str:
     SlackApiError
         存在しないユーザIDの場合
     """
-    # https://api.slack.com/methods/users.info
-    return __execute_api(client.users_info, user=user_id)["user"]["real_name"]  # type: ignore
+    user = lookup_cache.user(user_id)
+    if user is None:
+        # https://api.slack.com/methods/users.info
+        user = __execute_api(__client(client).users_info, user=user_id)["user"]  # type: ignore
+        lookup_cache.add_users([{"id": user_id, **user}])
+    return user["real_name"]
 
 
 def post_message(
@@ -107,6 +205,7 @@ def post_message(
     text: str,
     thread_ts: Optional[str] = None,
     mention_users: Optional[List[str]] = None,
+    client: Optional["WebClient"] = None,
 ) -> Dict[str, Any]:
     """
     指定されたチャンネルにメッセージをポスト
@@ -123,6 +222,8 @@ def post_message(
         メンションを指定するユーザID
         テキストの先頭に空白区切りで付与します
         2人以上が指定されている場合はメンション後に改行を追加します, by default []
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
 
     Returns
     -------
@@ -136,12 +237,17 @@ def post_message(
     send_message = " ".join(mentions) + mentions_postfix + text
 
     res = __execute_api(
-        client.chat_postMessage, channel=channel_id, text=send_message, thread_ts=thread_ts
+        __client(client).chat_postMessage,
+        channel=channel_id,
+        text=send_message,
+        thread_ts=thread_ts,
     )
     return res.data  # type: ignore
 
 
-def get_channel_message(channel_id: str) -> List[Dict[str, Any]]:
+def get_channel_message(
+    channel_id: str, oldest: Optional[str] = None, client: Optional["WebClient"] = None
+) -> List[Dict[str, Any]]:
     """
     指定されたチャンネルのメッセージを取得
 
@@ -149,18 +255,65 @@ def get_channel_message(channel_id: str) -> List[Dict[str, Any]]:
     ----------
     channel_id : str
         チャンネルID
+    oldest : Optional[str], optional
+        指定された場合はこのts以降のメッセージのみ取得, by default None
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
 
     Returns
     -------
     List[Dict[str, Any]]
         指定されたチャンネルのメッセージ
     """
-    # https://api.slack.com/methods/conversations.history
-    option = {"channel": channel_id, "limit": 1000}
-    return __get_all_message_by_iterating(client.conversations_history, option)
+    pages = iter_channel_message(channel_id, oldest, client=client)
+    return [message for page in pages for message in page]
 
 
-def get_replies(channel_id: str, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+def iter_channel_message(
+    channel_id: str,
+    oldest: Optional[str] = None,
+    cursor: Optional[str] = None,
+    latest: Optional[str] = None,
+    client: Optional["WebClient"] = None,
+    inclusive: bool = False,
+) -> Iterator[Page]:
+    """
+    指定されたチャンネルのメッセージを1ページずつ取得
+
+    Parameters
+    ----------
+    channel_id : str
+        チャンネルID
+    oldest : Optional[str], optional
+        指定された場合はこのts以降のメッセージのみ取得, by default None
+    cursor : Optional[str], optional
+        指定された場合はこのカーソルのページから取得（中断したページングの再開）, by default None
+    latest : Optional[str], optional
+        指定された場合はこのts以前のメッセージのみ取得, by default None
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
+    inclusive : bool, optional
+        oldest, latest と同じtsのメッセージも取得する, by default False
+
+    Yields
+    -------
+    Page
+        1ページ分のメッセージ
+    """
+    # https://api.slack.com/methods/conversations.history
+    option: Dict[str, Any] = {"channel": channel_id}
+    if oldest is not None:
+        option["oldest"] = oldest
+    if latest is not None:
+        option["latest"] = latest
+    if inclusive:
+        option["inclusive"] = True
+    return __iter_pages(__client(client).conversations_history, option, "messages", True, cursor)
+
+
+def get_replies(
+    channel_id: str, message: Dict[str, Any], client: Optional["WebClient"] = None
+) -> List[Dict[str, Any]]:
     """
     指定されたメッセージのリプライを取得
 
@@ -170,6 +323,8 @@ def get_replies(channel_id: str, message: Dict[str, Any]) -> List[Dict[str, Any]
         チャンネルID
     message : Dict[str, Any]
         リプライを取得する対象のメッセージ
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
 
     Returns
     -------
@@ -177,57 +332,110 @@ def get_replies(channel_id: str, message: Dict[str, Any]) -> List[Dict[str, Any]
         リプライメッセージ
         リプライがついていない場合は空のリスト
     """
+    return [message for page in iter_replies(channel_id, message, client) for message in page]
+
+
+def iter_replies(
+    channel_id: str, message: Dict[str, Any], client: Optional["WebClient"] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    指定されたメッセージのリプライを1ページずつ取得
+
+    Parameters
+    ----------
+    channel_id : str
+        チャンネルID
+    message : Dict[str, Any]
+        リプライを取得する対象のメッセージ
+    client : Optional[WebClient], optional
+        使用するクライアント, by default None（settings.get_client で共有するクライアント）
+
+    Yields
+    -------
+    List[Dict[str, Any]]
+        1ページ分のリプライメッセージ
+        リプライがついていない場合は何も返さない
+    """
     # https://api.slack.com/methods/conversations.replies
     if "thread_ts" not in message:
-        return []
+        return iter([])
     option = {"channel": channel_id, "ts": message["thread_ts"]}
-    return __get_all_message_by_iterating(client.conversations_replies, option)
+    return __iter_pages(__client(client).conversations_replies, option, "messages", True)
 
 
-def __get_all_message_by_iterating(
-    func: Callable[..., SlackResponse], option: Dict[str, Any]
-) -> List[Dict[str, Any]]:
-    """繰り返し処理ですべてのメッセージを取得"""
-    return __get_all_data_by_iterating(func, option, "messages", True)
+def __client(client: Optional["WebClient"]) -> "WebClient":
+    """指定されたクライアント（指定されていない場合は共有するクライアント）"""
+    return get_client() if client is None else client
+
+
+def __channels_option(exclude_archived: bool) -> Dict[str, Any]:
+    """conversations.list のオプション"""
+    # https://api.slack.com/methods/conversations.list
+    option: Dict[str, Any] = {"type:": "public_channel"}
+    if exclude_archived:
+        option["exclude_archived"] = True
+    return option
 
 
 def __get_all_data_by_iterating(
-    func: Callable[..., SlackResponse],
+    func: Callable[..., "SlackResponse"],
     option: Dict[str, Any],
     data_key: str,
     has_more_attribute: bool,
 ) -> List[Dict[str, Any]]:
     """繰り返し処理ですべてのデータを取得"""
+    data_all: List[Dict[str, Any]] = []
+    for data in __iter_pages(func, option, data_key, has_more_attribute):
+        data_all.extend(data)
+    return data_all
+
 
-    def has_more(r):
+def __iter_pages(
+    func: Callable[..., "SlackResponse"],
+    option: Dict[str, Any],
+    data_key: str,
+    has_more_attribute: bool,
+    cursor: Optional[str] = None,
+) -> Iterator[Page]:
+    """
+    繰り返し処理でデータを1ページずつ取得
+
+    NOTE: 次のページは前のページが消費されてから取得するため、メモリに乗るのは1ページ分のみ
+    """
+
+    def has_more(response: Dict[str, Any]) -> bool:
         return bool(
             response["has_more"]
             if has_more_attribute
             else response["response_metadata"]["next_cursor"]
         )
 
-    response: Dict[str, Any] = __execute_api(func, **option).data  # type: ignore
-    data_all = response[data_key]
-
-    while has_more(response):
-        sleep(1)  # need to wait 1 sec before next call due to rate limits
-        response = __execute_api(
-            func, **option, cursor=response["response_metadata"]["next_cursor"]  # type: ignore
-        ).data
-        data = response[data_key]
-        data_all = data_all + data
-    return data_all
-
-
-def __execute_api(func: Callable[..., SlackResponse], **option) -> SlackResponse:
+    while True:
+        if cursor is None:
+            response: Dict[str, Any] = __execute_api(func, **option).data  # type: ignore
+        else:
+            response = __execute_api(func, **option, cursor=cursor).data  # type: ignore
+        page = Page(response[data_key])
+        metrics.record_page(method_name(func), option.get("channel"))
+        if has_more(response):
+            page.next_cursor = response["response_metadata"]["next_cursor"]
+        cursor = page.next_cursor
+        yield page
+        if cursor is None:
+            return
+
+
+def __execute_api(func: Callable[..., "SlackResponse"], **option) -> "SlackResponse":
     """
     APIを実行する
 
-    ※API制限に引っかかった場合にリトライを行う
+    ※メソッド毎のレート制限に従って実行し、API制限（429）や一時的なエラーの場合は
+    retry_policy に従ってリトライを行う（最大試行回数を超えた場合は例外を送出する）
+    ※ページングするメソッドは、limit が指定されていない場合は page_sizer のページサイズを指定する
 
     Parameters
     ----------
-    func : Callable[..., SlackResponse]
+    func : Callable[..., "SlackResponse"]
         実行するAPI（の関数）
     option : Dict[str, Any]
         APIに渡されるOption
@@ -237,14 +445,29 @@ def __execute_api(func: Callable[..., SlackResponse], **option) -> SlackResponse
     SlackResponse
         APIのレスポンス
     """
-    try:
-        return func(**option)
-    except SlackApiError as e:
-        res = e.response
-        if res.status_code != 429:
-            # not ratelimited
-            raise e
-        # https://api.slack.com/lang/ja-jp/rate-limit
-        # 念のため1秒多く待機
-        sleep(int(res.headers["retry-after"]) + 1)
-        return __execute_api(func, **option)
+    method = method_name(func)
+    # 呼び出し側で limit が指定されている場合は、ページサイズを調整しない
+    call = CallAttempts(
+        method, "limit" not in option, retry_policy, circuit_breaker, rate_limiter, page_sizer
+    )
+    while True:
+        # サーキットブレーカーが開いている間は、全てのメソッドの呼び出しを待機させる
+        delay = circuit_breaker.delay()
+        if delay > 0:
+            time.sleep(delay)
+        metrics.record_wait(method, delay + rate_limiter.acquire(method))
+        limit = call.limit()
+        start = time.perf_counter()
+        try:
+            if limit is None:
+                response = func(**option)
+            else:
+                response = func(**option, limit=limit)
+        except Exception as e:
+            delay = call.retry_delay(e, time.perf_counter() - start)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        call.record_success(time.perf_counter() - start, limit)
+        return response
@@ -0,0 +1,430 @@
+"""取得したデータを1つのSQLiteデータベース（アーカイブ）に書き込む
+
+出力先のファイル構成と同じ単位（チャンネル情報、ユーザ情報、チャンネル毎のメッセージ、スレッド毎のリプライ）で
+テーブルに書き込み、チャンネル・ユーザ・ts・thread_ts で検索できるようにインデックスを作成する
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from get_all_message_from_slack.util.serializer import JSON, Serializer
+from get_all_message_from_slack.util.writer import BaseWriter
+
+ARCHIVE_FILE_NAME = "archive.sqlite3"
+
+# テーブル毎の (書き込みの単位となるキー, 検索用に取り出す項目)
+# 全てのテーブルは キー, seq（書き込み順）, 取り出した項目, data（json）の列を持つ
+TABLES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "channels": ((), ("id", "name")),
+    "users": ((), ("id", "name", "real_name")),
+    "messages": (("channel_id",), ("ts", "thread_ts", "user")),
+    "replies": (("channel_id", "thread_ts"), ("ts", "user")),
+}
+
+INDEXES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("channels", ("id",)),
+    ("channels", ("name",)),
+    ("users", ("id",)),
+    ("users", ("name",)),
+    ("messages", ("channel_id", "ts")),
+    ("messages", ("ts",)),
+    ("messages", ("user",)),
+    ("messages", ("thread_ts",)),
+    ("replies", ("ts",)),
+    ("replies", ("user",)),
+]
+
+# 保存先の名前とテーブルの対応
+MASTER_TABLES = {"channel_master": "channels", "user_master": "users"}
+MESSAGES_NAME = "nomal_messages"
+
+# 1トランザクションで書き込む件数
+DEFAULT_BATCH_SIZE = 1000
+# 保存済みの要素を読み込む際に1度に取得する件数
+READ_BATCH_SIZE = 1000
+
+
+class Target(NamedTuple):
+    """書き込みの単位（テーブルとキーの値）"""
+
+    table: str
+    keys: Tuple[str, ...] = ()
+
+    def row(
+        self, seq: int, item: Dict[str, Any], dumps: Callable[[Any], str] = JSON.dumps
+    ) -> Tuple[Any, ...]:
+        """
+        要素をテーブルの行に変換
+
+        Parameters
+        ----------
+        seq : int
+            書き込み順
+        item : Dict[str, Any]
+            要素
+        dumps : Callable[[Any], str], optional
+            要素をJSONに変換する関数, by default JSON.dumps
+
+        Returns
+        -------
+        Tuple[Any, ...]
+            行（キー, seq, 取り出した項目, data）
+        """
+        _, fields = TABLES[self.table]
+        values = tuple(item.get(field) for field in fields)
+        return self.keys + (seq,) + values + (dumps(item),)
+
+    def where(self) -> Tuple[str, Tuple[str, ...]]:
+        """
+        キーで絞り込む条件
+
+        Returns
+        -------
+        Tuple[str, Tuple[str, ...]]
+            WHERE句（キーが無い場合は常に真）とパラメータ
+        """
+        key_columns, _ = TABLES[self.table]
+        if not key_columns:
+            return "1 = 1", ()
+        return " AND ".join(f"{column} = ?" for column in key_columns), self.keys
+
+
+def locate(base: Path) -> Tuple[Path, Target]:
+    """
+    拡張子を除いた保存先（例: <channel_id>/nomal_messages）からアーカイブと書き込みの単位を決める
+
+    - <出力先>/channel_master, <出力先>/user_master: channels, users テーブル
+    - <出力先>/<channel_id>/nomal_messages: messages テーブル
+    - <出力先>/<channel_id>/<thread_ts（「.」を「_」に置換）>: replies テーブル
+
+    Parameters
+    ----------
+    base : Path
+        拡張子を除いた保存先
+
+    Returns
+    -------
+    Tuple[Path, Target]
+        アーカイブのPathと書き込みの単位
+    """
+    if base.name in MASTER_TABLES:
+        return base.parent / ARCHIVE_FILE_NAME, Target(MASTER_TABLES[base.name])
+    db_path = base.parent.parent / ARCHIVE_FILE_NAME
+    channel_id = base.parent.name
+    if base.name == MESSAGES_NAME:
+        return db_path, Target("messages", (channel_id,))
+    return db_path, Target("replies", (channel_id, base.name.replace("_", ".")))
+
+
+class SqliteArchive:
+    """
+    SQLiteのアーカイブ
+
+    1つの接続をロックで共有し、複数のスレッドから書き込む
+    書き込み途中のデータはテーブル毎のステージング（staging_<table>）に置き、
+    書き込み先を閉じた時点で1トランザクションで置き換える
+    """
+
+    def __init__(self, path: Path):
+        """
+        アーカイブを開く（存在しない場合はテーブルとインデックスを作成する）
+
+        Parameters
+        ----------
+        path : Path
+            データベースファイルのPath
+        """
+        self.path = path
+        self._connection = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+            self._create_tables()
+
+    def close(self) -> None:
+        """アーカイブを閉じる"""
+        with self._lock:
+            self._connection.close()
+
+    def insert_staging(self, target: Target, rows: List[Tuple[Any, ...]]) -> None:
+        """
+        書き込み途中の行をステージングに追加する
+
+        Parameters
+        ----------
+        target : Target
+            書き込みの単位
+        rows : List[Tuple[Any, ...]]
+            追加する行
+        """
+        with self._transaction():
+            self._insert(f"staging_{target.table}", rows)
+
+    def truncate_staging(self, target: Target, count: int) -> int:
+        """
+        ステージングの行を指定された件数まで削除する
+
+        Parameters
+        ----------
+        target : Target
+            書き込みの単位
+        count : int
+            残す件数（seq が count 未満の行を残す）
+
+        Returns
+        -------
+        int
+            残った件数
+        """
+        where, params = target.where()
+        table = f"staging_{target.table}"
+        with self._transaction():
+            self._connection.execute(
+                f"DELETE FROM {table} WHERE {where} AND seq >= ?", params + (count,)
+            )
+            cursor = self._connection.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params)
+            return cursor.fetchone()[0]
+
+    def commit(self, target: Target, rows: List[Tuple[Any, ...]]) -> None:
+        """
+        書き込み先の行をステージングと指定された行で置き換える
+
+        Parameters
+        ----------
+        target : Target
+            書き込みの単位
+        rows : List[Tuple[Any, ...]]
+            ステージングに追加されていない残りの行
+        """
+        where, params = target.where()
+        table = target.table
+        with self._transaction():
+            self._connection.execute(f"DELETE FROM {table} WHERE {where}", params)
+            self._connection.execute(
+                f"INSERT INTO {table} SELECT * FROM staging_{table} WHERE {where}", params
+            )
+            self._connection.execute(f"DELETE FROM staging_{table} WHERE {where}", params)
+            self._insert(table, rows)
+
+    def exists(self, target: Target) -> bool:
+        """
+        保存済みか
+
+        Parameters
+        ----------
+        target : Target
+            書き込みの単位
+
+        Returns
+        -------
+        bool
+            1件以上保存されている場合True
+        """
+        where, params = target.where()
+        with self._lock:
+            cursor = self._connection.execute(
+                f"SELECT 1 FROM {target.table} WHERE {where} LIMIT 1", params
+            )
+            return cursor.fetchone() is not None
+
+    def iter_items(self, target: Target) -> Iterator[Any]:
+        """
+        保存済みの要素を書き込み順に1件ずつ読み込む
+
+        NOTE: 一定件数ずつ取得するため、読み込み中も他の書き込みを妨げない
+
+        Parameters
+        ----------
+        target : Target
+            書き込みの単位
+
+        Yields
+        -------
+        Any
+            要素
+        """
+        where, params = target.where()
+        seq = -1
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT seq, data FROM {target.table} WHERE {where} AND seq > ?"
+                    " ORDER BY seq LIMIT ?",
+                    params + (seq, READ_BATCH_SIZE),
+                ).fetchall()
+            for _, data in rows:
+                yield json.loads(data)
+            if len(rows) < READ_BATCH_SIZE:
+                return
+            seq = rows[-1][0]
+
+    def _insert(self, table: str, rows: List[Tuple[Any, ...]]) -> None:
+        if rows:
+            placeholders = ", ".join("?" * len(rows[0]))
+            self._connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection, self._lock)
+
+    def _create_tables(self) -> None:
+        for table, (key_columns, fields) in TABLES.items():
+            columns = ", ".join(
+                [f"{column} TEXT" for column in key_columns]
+                + ["seq INTEGER"]
+                + [f"{field} TEXT" for field in fields]
+                + ["data TEXT"]
+            )
+            primary_key = ", ".join(key_columns + ("seq",))
+            for name in (table, f"staging_{table}"):
+                self._connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} ({columns}, PRIMARY KEY ({primary_key}))"
+                )
+        for table, columns in INDEXES:
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(columns)}"
+                f" ON {table} ({', '.join(columns)})"
+            )
+
+
+class _Transaction:
+    """ロックを取得し、1トランザクションで実行する"""
+
+    def __init__(self, connection: sqlite3.Connection, lock: threading.Lock):
+        self._connection = connection
+        self._lock = lock
+
+    def __enter__(self) -> None:
+        self._lock.acquire()
+        try:
+            self._connection.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def __exit__(self, exc_type: Optional[type], *args: Any) -> None:
+        try:
+            self._connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self._lock.release()
+
+
+class SqliteWriter(BaseWriter):
+    """
+    アーカイブに1要素ずつ書き込む
+
+    batch_size 件毎にステージングに追加し、閉じた時点で書き込み先を置き換える
+    batch_size 件未満で閉じた場合は、ステージングを経由せずに1トランザクションで書き込む
+    """
+
+    def __init__(
+        self,
+        archive: SqliteArchive,
+        target: Target,
+        skip_empty: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        serializer: Serializer = JSON,
+    ):
+        """
+        書き込み先を指定して作成
+
+        Parameters
+        ----------
+        archive : SqliteArchive
+            アーカイブ
+        target : Target
+            書き込みの単位
+        skip_empty : bool, optional
+            1件も書き込まれなかった場合に書き込み先を置き換えない, by default False
+        batch_size : int, optional
+            1トランザクションで書き込む件数, by default DEFAULT_BATCH_SIZE
+        serializer : Serializer, optional
+            JSONの変換, by default JSON
+        """
+        super().__init__(skip_empty)
+        self.archive = archive
+        self.target = target
+        self._batch_size = batch_size
+        self._dumps = serializer.dumps
+        self._rows: List[Tuple[Any, ...]] = []
+        self._staged = False
+
+    def write(self, item: Any) -> None:
+        """
+        要素を1件書き込む
+
+        Parameters
+        ----------
+        item : Any
+            書き込む要素
+        """
+        self._rows.append(self.target.row(self.count, item, self._dumps))
+        self.count += 1
+        if len(self._rows) >= self._batch_size:
+            self._flush()
+
+    def close(self) -> Optional[Path]:
+        """
+        書き込み先を置き換える
+
+        Returns
+        -------
+        Optional[Path]
+            アーカイブのPath
+            skip_empty が指定され、1件も書き込まれなかった場合はNone
+        """
+        if self.count == 0 and self._skip_empty:
+            return None
+        self.archive.commit(self.target, self._rows)
+        self._rows = []
+        return self.archive.path
+
+    def abort(self) -> None:
+        """書き込みを中止し、ステージングを削除する（checkpoint 済みの場合は残す）"""
+        self._rows = []
+        if self._staged and not self._checkpointed:
+            self.archive.truncate_staging(self.target, 0)
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        ここまでの書き込みをステージングに反映し、再開するための位置を返す
+
+        Returns
+        -------
+        Dict[str, Any]
+            再開するための位置
+        """
+        self._checkpointed = True
+        self._flush()
+        return {"count": self.count}
+
+    def resume(self, position: Dict[str, Any]) -> None:
+        """
+        checkpoint の位置から書き込みを再開する
+
+        Parameters
+        ----------
+        position : Dict[str, Any]
+            checkpoint で返された位置
+
+        Raises
+        ------
+        FileNotFoundError
+            ステージングに checkpoint までの行が残っていない場合
+        """
+        count = position["count"]
+        if self.archive.truncate_staging(self.target, count) < count:
+            raise FileNotFoundError(f"staging rows not found. target: {self.target}")
+        self._checkpointed = True
+        self._staged = True
+        self.count = count
+
+    def _flush(self) -> None:
+        if not self._staged:
+            # 前回中断された書き込みが残っていれば削除する
+            self.archive.truncate_staging(self.target, 0)
+            self._staged = True
+        self.archive.insert_staging(self.target, self._rows)
+        self._rows = []
@@ -0,0 +1,102 @@
+"""リプライを取得するスレッドの計画
+
+メッセージの1ページから、conversations.replies を呼び出す必要のあるスレッドの親メッセージを選び、
+呼び出さずに済んだスレッドを理由毎に数える
+
+thread_ts を持つメッセージは全てリプライの取得対象になり得るが、下記は呼び出しを省略する
+- スレッドの親ではない（thread_ts != ts、チャンネルにも投稿されたリプライ（thread_broadcast））
+- リプライが無い（reply_count が無い、または0）
+- 今回のエクスポートで取得済み（再開時にチェックポイントに記録されているスレッド、ページ間の重複）
+- 前回の取得から更新されていない（latest_reply が前回と同じ）
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Set
+
+# 呼び出しを省略した理由
+NOT_PARENT = "not_parent"
+NO_REPLIES = "no_replies"
+ALREADY_FETCHED = "already_fetched"
+UNCHANGED = "unchanged"
+SKIP_REASONS = (NOT_PARENT, NO_REPLIES, ALREADY_FETCHED, UNCHANGED)
+
+# スレッドの親にならないサブタイプ
+NOT_PARENT_SUBTYPES = ("thread_broadcast",)
+
+
+class ThreadPlan(NamedTuple):
+    """1ページ分のリプライ取得の計画"""
+
+    # リプライを取得するスレッドの親メッセージ
+    fetch: List[Dict[str, Any]]
+    # 省略した理由毎のスレッド数
+    skipped: Dict[str, int]
+
+    @property
+    def calls_saved(self) -> int:
+        """省略した conversations.replies の呼び出し回数（1スレッド1ページとした場合）"""
+        return sum(self.skipped.values())
+
+
+def skip_reason(message: Dict[str, Any]) -> str:
+    """
+    メッセージ単体から判断できる、リプライの取得を省略する理由
+
+    Parameters
+    ----------
+    message : Dict[str, Any]
+        thread_ts を持つメッセージ
+
+    Returns
+    -------
+    str
+        省略する理由（NOT_PARENT, NO_REPLIES）
+        取得が必要な可能性がある場合は空文字
+    """
+    if message["thread_ts"] != message.get("ts"):
+        return NOT_PARENT
+    if message.get("subtype") in NOT_PARENT_SUBTYPES:
+        return NOT_PARENT
+    if not message.get("reply_count"):
+        return NO_REPLIES
+    return ""
+
+
+def plan_threads(
+    messages: List[Dict[str, Any]],
+    fetched_threads: Set[str],
+    is_updated: Callable[[Dict[str, Any]], bool],
+) -> ThreadPlan:
+    """
+    リプライを取得するスレッドを計画する
+
+    Parameters
+    ----------
+    messages : List[Dict[str, Any]]
+        1ページ分のメッセージ
+    fetched_threads : Set[str]
+        取得済みのスレッドの thread_ts
+        取得するスレッドの thread_ts が追加される
+    is_updated : Callable[[Dict[str, Any]], bool]
+        親メッセージのスレッドが前回の取得から更新されているか（ExportState.is_thread_updated）
+
+    Returns
+    -------
+    ThreadPlan
+        リプライ取得の計画
+    """
+    fetch = []
+    skipped = dict.fromkeys(SKIP_REASONS, 0)
+    for message in messages:
+        thread_ts = message.get("thread_ts")
+        if thread_ts is None:
+            continue
+        reason = skip_reason(message)
+        if not reason and thread_ts in fetched_threads:
+            reason = ALREADY_FETCHED
+        if not reason and not is_updated(message):
+            reason = UNCHANGED
+        if reason:
+            skipped[reason] += 1
+            continue
+        fetched_threads.add(thread_ts)
+        fetch.append(message)
+    return ThreadPlan(fetch, skipped)
@@ -0,0 +1,284 @@
+"""チャンネルの全てのスレッドのリプライを1つのファイルにまとめて保存する
+
+スレッド毎にファイルを作成すると、スレッドの多いチャンネルでは大量の小さなファイルができるため、
+チャンネル毎に下記の2ファイルにまとめる
+- threads.ndjson: 1行に1スレッド（{"thread_ts": ..., "replies": [...]}）を追記する
+- threads.index.json: thread_ts からファイル内の位置（offset, length）への索引
+
+同じスレッドを再取得した場合は追記し、索引は最新の行を指す（古い行は compact で削除する）
+索引は閉じた時点で保存し、中断された場合は次に開いた時点で索引以降の行を読み込んで再作成する
+"""
+import json
+import threading
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from get_all_message_from_slack.util.serializer import JSON, Serializer
+from get_all_message_from_slack.util.writer import BaseWriter
+
+THREADS_FILE_NAME = "threads.ndjson"
+INDEX_FILE_NAME = "threads.index.json"
+
+# 古い行の割合がこれを超えた場合、閉じる際に compact する
+COMPACT_RATIO = 0.5
+
+
+class ThreadStore:
+    """
+    チャンネルの全てのスレッドのリプライを保存するファイル
+
+    複数のスレッドから同時に使用可能
+    """
+
+    def __init__(self, channel_path: Path, serializer: Serializer = JSON):
+        """
+        ファイルを開く（索引が無い、または古い場合は再作成する）
+
+        Parameters
+        ----------
+        channel_path : Path
+            チャンネルの出力先（<出力先>/<channel_id>）
+        serializer : Serializer, optional
+            JSONの変換, by default JSON
+        """
+        self.path = channel_path / THREADS_FILE_NAME
+        self.index_path = channel_path / INDEX_FILE_NAME
+        self._serializer = serializer
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._size = 0
+        self._garbage = 0
+        self._file: Optional[IO[bytes]] = None
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def __contains__(self, thread_ts: str) -> bool:
+        """保存済みのスレッドか"""
+        with self._lock:
+            return thread_ts in self._index
+
+    def __len__(self) -> int:
+        """保存済みのスレッド数"""
+        with self._lock:
+            return len(self._index)
+
+    def append(self, thread_ts: str, replies: List[Dict[str, Any]]) -> None:
+        """
+        スレッドのリプライを追記する（保存済みの場合は置き換える）
+
+        Parameters
+        ----------
+        thread_ts : str
+            スレッドの thread_ts
+        replies : List[Dict[str, Any]]
+            リプライ（親メッセージを含む）
+        """
+        record = self._serializer.dumps({"thread_ts": thread_ts, "replies": replies})
+        line = (record + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(line)
+            # 中断された場合も、スレッドの取得完了を記録する前に書き込む
+            self._file.flush()
+            self._put(thread_ts, self._size, len(line))
+            self._size += len(line)
+
+    def get(self, thread_ts: str) -> List[Dict[str, Any]]:
+        """
+        スレッドのリプライを読み込む
+
+        Parameters
+        ----------
+        thread_ts : str
+            スレッドの thread_ts
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            リプライ
+
+        Raises
+        ------
+        KeyError
+            保存されていないスレッドの場合
+        """
+        with self._lock:
+            offset, length = self._index[thread_ts]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return self._serializer.loads(f.read(length))["replies"]
+
+    def iter_threads(self) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        保存済みの全てのスレッドを読み込む（thread_ts の順）
+
+        Yields
+        -------
+        Tuple[str, List[Dict[str, Any]]]
+            thread_ts とリプライ
+        """
+        with self._lock:
+            thread_ts_list = sorted(self._index)
+        for thread_ts in thread_ts_list:
+            yield thread_ts, self.get(thread_ts)
+
+    def close(self) -> None:
+        """ファイルを閉じて索引を保存する（古い行が多い場合は compact する）"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._size and self._garbage > self._size * COMPACT_RATIO:
+                self._compact()
+            self._save_index()
+
+    def compact(self) -> None:
+        """置き換えられた古い行を削除する"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._compact()
+            self._save_index()
+
+    def _put(self, thread_ts: str, offset: int, length: int) -> None:
+        """索引に追加する（ロックの中で呼び出す）"""
+        old = self._index.get(thread_ts)
+        if old is not None:
+            self._garbage += old[1]
+        self._index[thread_ts] = (offset, length)
+
+    def _compact(self) -> None:
+        """ロックの中で呼び出す"""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        index: Dict[str, Tuple[int, int]] = {}
+        offset = 0
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            for thread_ts, (old_offset, length) in sorted(self._index.items()):
+                src.seek(old_offset)
+                dst.write(src.read(length))
+                index[thread_ts] = (offset, length)
+                offset += length
+        tmp_path.replace(self.path)
+        self._index = index
+        self._size = offset
+        self._garbage = 0
+
+    def _load_index(self) -> None:
+        """保存された索引を読み込み、索引以降に追記された行を読み込む"""
+        if not self.path.exists():
+            return
+        if self.index_path.exists():
+            with open(self.index_path) as f:
+                saved = json.load(f)
+            self._index = {
+                ts: (offset, length) for ts, (offset, length) in saved["threads"].items()
+            }
+            self._size = saved["size"]
+            self._garbage = saved["garbage"]
+        with open(self.path, "r+b") as f:
+            f.seek(self._size)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # 書き込み途中で中断された行は削除する
+                    f.truncate(self._size)
+                    break
+                self._put(self._serializer.loads(line)["thread_ts"], self._size, len(line))
+                self._size += len(line)
+
+    def _save_index(self) -> None:
+        """ロックの中で呼び出す"""
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "size": self._size,
+                    "garbage": self._garbage,
+                    "threads": {ts: list(position) for ts, position in self._index.items()},
+                },
+                f,
+            )
+        tmp_path.replace(self.index_path)
+
+
+class ThreadWriter(BaseWriter):
+    """
+    1スレッドのリプライを ThreadStore に書き込む
+
+    閉じるまで要素をメモリに溜め、閉じた時点で1行として追記する
+    """
+
+    def __init__(self, store: ThreadStore, thread_ts: str, skip_empty: bool = False):
+        """
+        書き込み先を作成
+
+        Parameters
+        ----------
+        store : ThreadStore
+            チャンネルのスレッドの保存先
+        thread_ts : str
+            スレッドの thread_ts
+        skip_empty : bool, optional
+            1件も書き込まれなかった場合に追記しない, by default False
+        """
+        super().__init__(skip_empty)
+        self.store = store
+        self.thread_ts = thread_ts
+        self._replies: List[Dict[str, Any]] = []
+
+    def write(self, item: Any) -> None:
+        """
+        要素を1件書き込む
+
+        Parameters
+        ----------
+        item : Any
+            書き込む要素
+        """
+        self._replies.append(item)
+        self.count += 1
+
+    def close(self) -> Optional[Path]:
+        """
+        スレッドを追記する
+
+        Returns
+        -------
+        Optional[Path]
+            保存先のPath
+            skip_empty が指定され、1件も書き込まれなかった場合はNone
+        """
+        if self.count == 0 and self._skip_empty:
+            return None
+        self.store.append(self.thread_ts, self._replies)
+        self._replies = []
+        return self.store.path
+
+    def abort(self) -> None:
+        """書き込みを中止する"""
+        self._replies = []
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        再開するための位置を返す
+
+        NOTE: スレッドは閉じた時点で追記されるため、途中から再開することは無い
+
+        Returns
+        -------
+        Dict[str, Any]
+            再開するための位置（書き込み済みの件数）
+        """
+        return {"count": 0}
+
+    def resume(self, position: Dict[str, Any]) -> None:
+        """
+        最初から書き込む（途中から再開することは無い）
+
+        Parameters
+        ----------
+        position : Dict[str, Any]
+            checkpoint で返された位置
+        """
+        self._replies = []
+        self.count = 0
@@ -0,0 +1,298 @@
+"""Slack APIの通信（コネクションプール）
+
+slack_sdk の WebClient はリクエスト毎に urllib で接続するため、TLSハンドシェイクを毎回行う
+PooledWebClient は keep-alive した接続をプールして再利用し、レスポンスを gzip で圧縮して受け取る
+
+NOTE: PooledWebClient は WebClient の内部メソッド（_perform_urllib_http_request_internal）を上書きする
+      slack_sdk の更新で変わる可能性があるため、setup.py で動作を確認したバージョンに固定している
+      （更新する場合は tests/.../test_transport.py の TestWebClientCompatibility を確認する）
+"""
+import gzip
+import http.client
+import io
+import threading
+from ssl import SSLContext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import Request
+
+from slack_sdk.errors import SlackRequestError
+from slack_sdk.web.client import WebClient
+
+DEFAULT_POOL_SIZE = 10
+
+# 再利用した接続がサーバ側で閉じられていた場合に発生するエラー
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+# 上記のうち、レスポンスを1バイトも受信していない（送信中またはレスポンスを受信する前に切断された）エラー
+_UNANSWERED_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError)
+
+# 再送しても副作用の無い（読み取りのみの）Slack APIのメソッド
+IDEMPOTENT_METHODS = frozenset(
+    {
+        "auth.test",
+        "conversations.history",
+        "conversations.info",
+        "conversations.list",
+        "conversations.replies",
+        "users.info",
+        "users.list",
+    }
+)
+
+_Key = Tuple[str, str, int]
+
+
+class ConnectionPool:
+    """
+    ホスト毎の keep-alive した接続のプール
+
+    複数のスレッドから同時に使用可能
+    プールのサイズを超えて同時に使用された場合は新しく接続し、返却時にプールが一杯であれば閉じる
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_POOL_SIZE,
+        timeout: float = 30,
+        ssl: Optional[SSLContext] = None,
+        proxy: Optional[str] = None,
+    ):
+        """
+        プールを作成
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            ホスト毎に保持する接続数, by default DEFAULT_POOL_SIZE
+        timeout : float, optional
+            接続・受信のタイムアウト（秒）, by default 30
+        ssl : Optional[SSLContext], optional
+            https で使用するSSLコンテキスト, by default None
+        proxy : Optional[str], optional
+            プロキシのURL（例: http://proxy:8080）, by default None
+        """
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.ssl = ssl
+        self.proxy = proxy
+        # 新しく接続した回数（再利用の確認用）
+        self.connections_created = 0
+        self._idle: Dict[_Key, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def resize(self, maxsize: int) -> None:
+        """
+        ホスト毎に保持する接続数を変更する
+
+        Parameters
+        ----------
+        maxsize : int
+            ホスト毎に保持する接続数
+        """
+        with self._lock:
+            self.maxsize = max(1, maxsize)
+            for connections in self._idle.values():
+                while len(connections) > self.maxsize:
+                    connections.pop(0).close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+        resend: bool = True,
+    ) -> http.client.HTTPResponse:
+        """
+        リクエストを送信し、レスポンスを読み込む
+
+        NOTE: 再利用した接続が閉じられていた場合は、新しい接続で1度だけ再送する
+              レスポンスを受信し始めた後に切断された場合は、サーバで処理された可能性があるため再送しない
+
+        Parameters
+        ----------
+        method : str
+            HTTPメソッド
+        url : str
+            リクエストするURL
+        body : Optional[bytes]
+            リクエストボディ
+        headers : Dict[str, str]
+            リクエストヘッダ
+        resend : bool, optional
+            閉じられていた接続で送信した場合に再送する, by default True
+            副作用のあるリクエスト（メッセージの投稿等）の場合は False を指定する
+
+        Returns
+        -------
+        http.client.HTTPResponse
+            ボディを読み込み済み（response.data）のレスポンス
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        if self.proxy is not None and scheme == "http":
+            # http のプロキシには絶対URLで送信する
+            path = url
+        connection, reused = self._get(key)
+        try:
+            response = self._send(connection, method, path, body, headers)
+        except _STALE_CONNECTION_ERRORS as e:
+            connection.close()
+            if not (reused and resend and isinstance(e, _UNANSWERED_ERRORS)):
+                raise
+            connection = self._connect(key)
+            response = self._send(connection, method, path, body, headers)
+        except BaseException:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._put(key, connection)
+        return response
+
+    def close(self) -> None:
+        """全ての接続を閉じる"""
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    def _send(
+        self,
+        connection: http.client.HTTPConnection,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> http.client.HTTPResponse:
+        connection.request(method, path, body, headers)
+        response = connection.getresponse()
+        # 接続を返却する前にボディを読み切る
+        response.data = response.read()  # type: ignore
+        return response
+
+    def _get(self, key: _Key) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            connections = self._idle.get(key)
+            if connections:
+                return connections.pop(), True
+        return self._connect(key), False
+
+    def _put(self, key: _Key, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.maxsize:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def _connect(self, key: _Key) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        with self._lock:
+            self.connections_created += 1
+        if self.proxy is None:
+            if scheme == "https":
+                return http.client.HTTPSConnection(
+                    host, port, timeout=self.timeout, context=self.ssl
+                )
+            return http.client.HTTPConnection(host, port, timeout=self.timeout)
+        proxy = urlsplit(self.proxy)
+        proxy_host = proxy.hostname or ""
+        proxy_port = proxy.port or 8080
+        if scheme == "https":
+            # https はプロキシにCONNECTしてトンネルを張る
+            connection: http.client.HTTPConnection = http.client.HTTPSConnection(
+                proxy_host, proxy_port, timeout=self.timeout, context=self.ssl
+            )
+            connection.set_tunnel(host, port)
+            return connection
+        return http.client.HTTPConnection(proxy_host, proxy_port, timeout=self.timeout)
+
+
+class PooledWebClient(WebClient):
+    """
+    コネクションプールを使用する WebClient
+
+    timeout, ssl, proxy は WebClient と同じく指定する（proxy は環境変数 HTTPS_PROXY 等も使用される）
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        compress: bool = True,
+        on_response: Optional[Callable[[str, int], None]] = None,
+        **kwargs: Any,
+    ):
+        """
+        クライアントを作成
+
+        Parameters
+        ----------
+        args : Any
+            WebClient の引数
+        pool_size : int, optional
+            ホスト毎に保持する接続数, by default DEFAULT_POOL_SIZE
+            同時にAPIを呼び出すスレッド数に合わせる
+        compress : bool, optional
+            レスポンスを gzip で圧縮して受け取る, by default True
+        on_response : Optional[Callable[[str, int], None]], optional
+            レスポンスを受信する毎に (Slack APIのメソッド名, 受信したバイト数) で呼び出す関数
+            , by default None
+        kwargs : Any
+            WebClient の引数
+        """
+        super().__init__(*args, **kwargs)
+        self.compress = compress
+        self.on_response = on_response
+        self.pool = ConnectionPool(pool_size, self.timeout, self.ssl, self.proxy)
+
+    def _perform_urllib_http_request_internal(self, url: str, req: Request) -> Dict[str, Any]:
+        """
+        プールした接続でリクエストを送信する
+
+        NOTE: WebClient と同じく、2xx 以外のレスポンスは HTTPError を送出する
+        """
+        if not url.lower().startswith("http"):
+            raise SlackRequestError(f"Invalid URL detected: {url}")
+        headers = dict(req.header_items())
+        headers["Connection"] = "keep-alive"
+        if self.compress:
+            headers["Accept-Encoding"] = "gzip"
+        body = req.data if isinstance(req.data, bytes) or req.data is None else None
+        api_method = urlsplit(url).path.rsplit("/", 1)[-1]
+        # 閉じられていた接続での再送は、読み取りのみのメソッドに限る
+        response = self.pool.request(
+            req.get_method(), url, body, headers, resend=api_method in IDEMPOTENT_METHODS
+        )
+        data: bytes = response.data  # type: ignore
+        if self.on_response is not None:
+            # 受信したバイト数は圧縮された状態で数える
+            self.on_response(api_method, len(data))
+        if response.headers.get("Content-Encoding", "").lower() == "gzip":
+            data = gzip.decompress(data)
+        if not 200 <= response.status < 300:
+            raise HTTPError(
+                url, response.status, response.reason, response.headers, io.BytesIO(data)
+            )
+        if response.headers.get_content_type() == "application/gzip":
+            # admin.analytics.getFile
+            return {"status": response.status, "headers": response.headers, "body": data}
+        charset = response.headers.get_content_charset() or "utf-8"
+        return {
+            "status": response.status,
+            "headers": response.headers,
+            "body": data.decode(charset),
+        }
@@ -0,0 +1,270 @@
+"""取得したデータのファイルへの書き込みを専用のスレッドで行う（write-behind）
+
+APIの呼び出しと並行して、取得済みのページのシリアライズと書き込みを行う
+- 書き込み先の順序を保つため、1つの書き込み先は常に同じ書き込みスレッドで処理する
+- キューの長さに上限を設け、書き込みが追いつかない場合は取得側を待機させる（バックプレッシャー）
+- スレッドのリプライのような小さなファイルは、閉じるまでメモリに溜めて1回の処理で書き込む
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from get_all_message_from_slack.util.writer import BaseWriter
+
+# 書き込みスレッド毎のキューの長さ（ページ数）の既定値
+DEFAULT_QUEUE_SIZE = 64
+# 1回の処理で書き込む最大の要素数（保存済みのメッセージのマージ等で全てをメモリに乗せないため）
+CHUNK_SIZE = 1000
+
+_Task = Tuple[Future, Callable[..., Any], Tuple[Any, ...]]
+
+
+class WriterStage:
+    """
+    書き込みを行う専用のスレッド
+
+    submit された処理をレーン（書き込みスレッド）毎に順番に実行する
+    複数のスレッドから同時に使用可能
+    """
+
+    def __init__(self, threads: int = 1, queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        書き込みスレッドを開始する
+
+        Parameters
+        ----------
+        threads : int, optional
+            書き込みスレッド数, by default 1
+        queue_size : int, optional
+            書き込みスレッド毎のキューの長さ, by default DEFAULT_QUEUE_SIZE
+            キューが一杯の場合、submit は空くまで待機する
+        """
+        self._queues: List["queue.Queue[Optional[_Task]]"] = [
+            queue.Queue(maxsize=max(1, queue_size)) for _ in range(max(1, threads))
+        ]
+        self._threads = [
+            threading.Thread(target=_run, args=(q,), name=f"writer-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        self._next_lane = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        for thread in self._threads:
+            thread.start()
+
+    def lane(self) -> int:
+        """
+        書き込み先に割り当てるレーン（順番に割り当てる）
+
+        Returns
+        -------
+        int
+            レーン
+        """
+        with self._lock:
+            lane = self._next_lane
+            self._next_lane = (lane + 1) % len(self._queues)
+        return lane
+
+    def submit(self, lane: int, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        処理を書き込みスレッドで実行する
+
+        Parameters
+        ----------
+        lane : int
+            実行するレーン（同じレーンの処理は submit した順に実行される）
+        fn : Callable[..., Any]
+            実行する処理
+        *args : Any
+            処理の引数
+
+        Returns
+        -------
+        Future
+            処理の結果
+
+        Raises
+        ------
+        RuntimeError
+            既に閉じられている場合
+        """
+        if self._closed:
+            raise RuntimeError("writer stage is closed.")
+        future: Future = Future()
+        self._queues[lane].put((future, fn, args))
+        return future
+
+    def close(self) -> None:
+        """キューに残った処理を全て実行し、書き込みスレッドを終了する"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for q in self._queues:
+            q.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+def _run(tasks: "queue.Queue[Optional[_Task]]") -> None:
+    """書き込みスレッドの処理"""
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        future, fn, args = task
+        if not future.set_running_or_notify_cancel():
+            continue
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+
+class WriteBehindWriter(BaseWriter):
+    """
+    書き込みを WriterStage で行う書き込み先
+
+    write_all は書き込みを待たずに戻り、close、checkpoint、resume は書き込みの完了を待つ
+    書き込みスレッドで発生した例外は、次の書き込み、または close で送出される
+    """
+
+    def __init__(self, writer: BaseWriter, stage: WriterStage, buffer_until_close: bool = False):
+        """
+        書き込み先を作成
+
+        Parameters
+        ----------
+        writer : BaseWriter
+            実際に書き込む書き込み先
+        stage : WriterStage
+            書き込みスレッド
+        buffer_until_close : bool, optional
+            close まで要素をメモリに溜め、まとめて書き込む, by default False
+            スレッドのリプライのような小さなファイルで、ファイルの作成と書き込みを1回の処理にする
+        """
+        super().__init__()
+        self._writer = writer
+        self._stage = stage
+        self._lane = stage.lane()
+        self._buffer: Optional[List[Any]] = [] if buffer_until_close else None
+        self._error: Optional[BaseException] = None
+
+    def write(self, item: Any) -> None:
+        """
+        要素を1件書き込む
+
+        Parameters
+        ----------
+        item : Any
+            書き込む要素
+        """
+        self.write_all([item])
+
+    def write_all(self, items: Iterable[Any]) -> None:
+        """
+        複数の要素を書き込む（書き込みを待たずに戻る）
+
+        NOTE: 書き込みまで要素を保持するため、渡した要素は変更しないこと
+
+        Parameters
+        ----------
+        items : Iterable[Any]
+            書き込む要素
+        """
+        iterator = iter(items)
+        while True:
+            chunk = list(islice(iterator, CHUNK_SIZE))
+            if not chunk:
+                return
+            self.count += len(chunk)
+            if self._buffer is not None:
+                self._buffer.extend(chunk)
+            else:
+                self._submit(self._writer.write_all, chunk)
+
+    def close(self) -> Optional[Path]:
+        """
+        書き込みの完了を待ち、保存先に置き換える
+
+        Returns
+        -------
+        Optional[Path]
+            保存されたPath
+            skip_empty が指定され、1件も書き込まれなかった場合はNone
+        """
+        if self._buffer:
+            items, self._buffer = self._buffer, None
+            return self._submit(self._write_and_close, items).result()
+        return self._submit(self._writer.close).result()
+
+    def abort(self) -> None:
+        """書き込み中の要素を待ってから、書き込みを中止する"""
+        self._buffer = None
+        self._stage.submit(self._lane, self._writer.abort).result()
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        ここまでの書き込みの完了を待ち、再開するための位置を返す
+
+        Returns
+        -------
+        Dict[str, Any]
+            再開するための位置
+        """
+        return self.checkpoint_async().result()
+
+    def checkpoint_async(self) -> "Future[Dict[str, Any]]":
+        """
+        ここまでの書き込みが完了した後の、再開するための位置を返す（書き込みを待たずに戻る）
+
+        Returns
+        -------
+        Future[Dict[str, Any]]
+            再開するための位置
+        """
+        if self._buffer:
+            items, self._buffer = self._buffer, []
+            self._submit(self._writer.write_all, items)
+        return self._submit(self._writer.checkpoint)
+
+    def resume(self, position: Dict[str, Any]) -> None:
+        """
+        checkpoint の位置から書き込みを再開する
+
+        Parameters
+        ----------
+        position : Dict[str, Any]
+            checkpoint で返された位置
+
+        Raises
+        ------
+        FileNotFoundError
+            一時ファイルが存在しない場合
+        """
+        # 再開できない場合は最初から書き込み直せるように、失敗として扱わない
+        self._stage.submit(self._lane, self._writer.resume, position).result()
+        self.count = self._writer.count
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        if self._error is not None:
+            raise self._error
+        return self._stage.submit(self._lane, self._call, fn, *args)
+
+    def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """書き込みスレッドで実行する（失敗した後の書き込みは行わない）"""
+        if self._error is not None:
+            raise self._error
+        try:
+            return fn(*args)
+        except BaseException as e:
+            self._error = e
+            raise
+
+    def _write_and_close(self, items: List[Any]) -> Optional[Path]:
+        self._writer.write_all(items)
+        return self._writer.close()
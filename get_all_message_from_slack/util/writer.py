@@ -0,0 +1,874 @@
+"""取得したデータをファイルに逐次書き込む"""
+import gzip
+import io
+import json
+import re
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from get_all_message_from_slack.util.serializer import JSON, Serializer, get_serializer
+
+READ_CHUNK_SIZE = 1024 * 1024
+# json の要素間の空白
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+FORMATS = ("json", "ndjson", "sqlite", "dedup")
+# スレッドのリプライの保存方法（file: スレッド毎のファイル、channel: チャンネル毎に1ファイル）
+THREAD_STORAGES = ("file", "channel")
+COMPRESSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def open_text(path: Path, mode: str, compression: Optional[str] = None) -> IO[str]:
+    """
+    圧縮形式に応じてテキストファイルを開く
+
+    Parameters
+    ----------
+    path : Path
+        ファイルのPath
+    mode : str
+        "r" または "w"
+    compression : Optional[str], optional
+        圧縮形式（None, "gzip", "zstd"）, by default None
+
+    Returns
+    -------
+    IO[str]
+        ファイルオブジェクト
+
+    Raises
+    ------
+    ValueError
+        未対応の圧縮形式の場合
+    ImportError
+        zstd が指定され zstandard がインストールされていない場合
+    """
+    if compression is None:
+        return open(path, mode, encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd compression requires zstandard. `pip install zstandard`") from e
+        return io.TextIOWrapper(zstandard.open(path, mode + "b"), encoding="utf-8")
+    raise ValueError(f"not supported compression. compression: {compression}")
+
+
+class BaseWriter:
+    """
+    要素を1件ずつファイルに書き込む基底クラス
+
+    一時ファイルに書き込み、正常に閉じられた場合のみ保存先に置き換える
+    checkpoint を呼び出した後は、中止されても一時ファイルを残し resume で続きから書き込める
+    """
+
+    def __init__(self, skip_empty: bool = False):
+        """
+        書き込み先を作成
+
+        Parameters
+        ----------
+        skip_empty : bool, optional
+            1件も書き込まれなかった場合にファイルを作成しない, by default False
+        """
+        self.count = 0
+        self._skip_empty = skip_empty
+        self._checkpointed = False
+
+    def write(self, item: Any) -> None:
+        """
+        要素を1件書き込む
+
+        Parameters
+        ----------
+        item : Any
+            書き込む要素
+        """
+        raise NotImplementedError
+
+    def write_all(self, items: Iterable[Any]) -> None:
+        """
+        複数の要素を書き込む
+
+        Parameters
+        ----------
+        items : Iterable[Any]
+            書き込む要素
+        """
+        for item in items:
+            self.write(item)
+
+    def close(self) -> Optional[Path]:
+        """
+        書き込みを完了して保存先に置き換える
+
+        Returns
+        -------
+        Optional[Path]
+            保存されたPath
+            skip_empty が指定され、1件も書き込まれなかった場合はNone
+        """
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        """書き込みを中止し、一時ファイルを削除する（checkpoint 済みの場合は残す）"""
+        raise NotImplementedError
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        ここまでの書き込みをファイルに反映し、再開するための位置を返す
+
+        NOTE: 圧縮している場合はストリームを閉じ、次の書き込みは追記で再開する
+
+        Returns
+        -------
+        Dict[str, Any]
+            再開するための位置（json形式で保存可能）
+        """
+        raise NotImplementedError
+
+    def checkpoint_async(self) -> "Future[Dict[str, Any]]":
+        """
+        checkpoint を書き込みの完了後に行う
+
+        NOTE: 書き込みスレッドで書き込む場合（write_behind を参照）以外は、すぐに checkpoint を行う
+
+        Returns
+        -------
+        Future[Dict[str, Any]]
+            再開するための位置
+        """
+        future: Future = Future()
+        future.set_result(self.checkpoint())
+        return future
+
+    def resume(self, position: Dict[str, Any]) -> None:
+        """
+        checkpoint の位置から書き込みを再開する
+
+        一時ファイルを指定された位置で切り詰め、続きを追記する
+
+        Parameters
+        ----------
+        position : Dict[str, Any]
+            checkpoint で返された位置
+
+        Raises
+        ------
+        FileNotFoundError
+            一時ファイルが存在しない場合
+        """
+        raise NotImplementedError
+
+    def __enter__(self) -> "BaseWriter":
+        """with文で使用する"""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """例外が発生していなければ保存し、発生していれば書き込みを中止する"""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class JsonArrayWriter(BaseWriter):
+    """
+    json形式の配列を1要素ずつファイルに書き込む
+
+    全ての要素をメモリに乗せずに、全体を1度に変換した場合と同じ形式のファイルを作成する
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        skip_empty: bool = False,
+        compression: Optional[str] = None,
+        serializer: Serializer = JSON,
+    ):
+        """
+        書き込み先を指定して作成
+
+        Parameters
+        ----------
+        path : Path
+            保存先
+        skip_empty : bool, optional
+            1件も書き込まれなかった場合にファイルを作成しない, by default False
+        compression : Optional[str], optional
+            圧縮形式（None, "gzip", "zstd"）, by default None
+        serializer : Serializer, optional
+            JSONの変換, by default JSON
+        """
+        super().__init__(skip_empty)
+        self.path = path
+        self._compression = compression
+        self._serializer = serializer
+        self._tmp_path = path.with_name(path.name + ".tmp")
+        self._file: Optional[IO[str]] = None
+        self._append = False
+
+    def write(self, item: Any) -> None:
+        """
+        要素を1件書き込む
+
+        Parameters
+        ----------
+        item : Any
+            書き込む要素
+        """
+        f = self._open()
+        f.write(("," if self.count else "[") + self._serializer.dumps(item))
+        self.count += 1
+
+    def close(self) -> Optional[Path]:
+        """
+        配列を閉じて保存先に置き換える
+
+        Returns
+        -------
+        Optional[Path]
+            保存されたPath
+            skip_empty が指定され、1件も書き込まれなかった場合はNone
+        """
+        if self.count == 0:
+            if self._skip_empty:
+                return None
+            self._open().write("[")
+        f = self._open()
+        f.write("]")
+        f.close()
+        self._tmp_path.replace(self.path)
+        return self.path
+
+    def abort(self) -> None:
+        """書き込みを中止し、一時ファイルを削除する（checkpoint 済みの場合は残す）"""
+        if self._file is not None:
+            self._file.close()
+        if not self._checkpointed and self._tmp_path.exists():
+            self._tmp_path.unlink()
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        ここまでの書き込みをファイルに反映し、再開するための位置を返す
+
+        Returns
+        -------
+        Dict[str, Any]
+            再開するための位置
+        """
+        self._checkpointed = True
+        if self._file is None:
+            offset = self._tmp_path.stat().st_size if self._append else 0
+            return {"count": self.count, "offset": offset}
+        if self._compression is None:
+            self._file.flush()
+        else:
+            self._file.close()
+            self._file = None
+            self._append = True
+        return {"count": self.count, "offset": self._tmp_path.stat().st_size}
+
+    def resume(self, position: Dict[str, Any]) -> None:
+        """
+        checkpoint の位置から書き込みを再開する
+
+        Parameters
+        ----------
+        position : Dict[str, Any]
+            checkpoint で返された位置
+
+        Raises
+        ------
+        FileNotFoundError
+            一時ファイルが存在しない場合
+        """
+        self._checkpointed = True
+        self.count = position["count"]
+        if self.count == 0:
+            return
+        with open(self._tmp_path, "r+b") as f:
+            f.truncate(position["offset"])
+        self._append = True
+
+    def _open(self) -> IO[str]:
+        if self._file is None:
+            mode = "a" if self._append else "w"
+            self._file = open_text(self._tmp_path, mode, self._compression)
+        return self._file
+
+
+class NdjsonWriter(BaseWriter):
+    """
+    NDJSON（1行に1要素）形式でファイルに書き込む
+
+    max_bytes が指定された場合は、書き込んだサイズ（圧縮前）が超えた時点で次のファイルに切り替える
+    ファイル名は「<name>.part-00000.ndjson」のように連番になる
+    """
+
+    def __init__(
+        self,
+        base: Path,
+        skip_empty: bool = False,
+        compression: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        serializer: Serializer = JSON,
+    ):
+        """
+        書き込み先を指定して作成
+
+        Parameters
+        ----------
+        base : Path
+            拡張子を除いた保存先（例: <channel_id>/nomal_messages）
+        skip_empty : bool, optional
+            1件も書き込まれなかった場合にファイルを作成しない, by default False
+        compression : Optional[str], optional
+            圧縮形式（None, "gzip", "zstd"）, by default None
+        max_bytes : Optional[int], optional
+            1ファイルあたりの最大サイズ（圧縮前）, by default None
+        serializer : Serializer, optional
+            JSONの変換, by default JSON
+        """
+        super().__init__(skip_empty)
+        self.base = base
+        self._serializer = serializer
+        self.paths: List[Path] = []
+        self._compression = compression
+        self._max_bytes = max_bytes
+        self._file: Optional[IO[str]] = None
+        self._file_bytes = 0
+        self._append = False
+
+    def write(self, item: Any) -> None:
+        """
+        要素を1件書き込む
+
+        Parameters
+        ----------
+        item : Any
+            書き込む要素
+        """
+        line = self._serializer.dumps(item) + "\n"
+        if self._max_bytes is not None and self._file_bytes >= self._max_bytes:
+            self._close_file()
+        f = self._open()
+        f.write(line)
+        self._file_bytes += len(line.encode("utf-8"))
+        self.count += 1
+
+    def close(self) -> Optional[Path]:
+        """
+        全てのファイルを閉じて保存先に置き換える
+
+        前回保存された同じ名前のファイル（パート）は削除する
+
+        Returns
+        -------
+        Optional[Path]
+            保存された最初のPath
+            skip_empty が指定され、1件も書き込まれなかった場合はNone
+        """
+        if self.count == 0 and self._skip_empty:
+            return None
+        self._open()
+        self._close_file()
+        saved = [path.with_name(path.name[: -len(".tmp")]) for path in self.paths]
+        for path in ndjson_paths(self.base, self._compression):
+            if path not in saved:
+                path.unlink()
+        for tmp_path, path in zip(self.paths, saved):
+            tmp_path.replace(path)
+        return saved[0]
+
+    def abort(self) -> None:
+        """書き込みを中止し、一時ファイルを削除する（checkpoint 済みの場合は残す）"""
+        self._close_file()
+        if not self._checkpointed:
+            for path in self.paths:
+                path.unlink()
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        ここまでの書き込みをファイルに反映し、再開するための位置を返す
+
+        Returns
+        -------
+        Dict[str, Any]
+            再開するための位置
+        """
+        self._checkpointed = True
+        if self._file is not None:
+            if self._compression is None:
+                self._file.flush()
+            else:
+                self._close_file()
+                self._append = True
+        offset = self.paths[-1].stat().st_size if self.paths else 0
+        return {
+            "count": self.count,
+            "parts": len(self.paths),
+            "offset": offset,
+            "file_bytes": self._file_bytes,
+        }
+
+    def resume(self, position: Dict[str, Any]) -> None:
+        """
+        checkpoint の位置から書き込みを再開する
+
+        Parameters
+        ----------
+        position : Dict[str, Any]
+            checkpoint で返された位置
+
+        Raises
+        ------
+        FileNotFoundError
+            一時ファイルが存在しない場合
+        """
+        self._checkpointed = True
+        self.count = position["count"]
+        self.paths = [self._tmp_part_path(i) for i in range(position["parts"])]
+        # checkpoint 以降に作成されたパートは削除する
+        index = position["parts"]
+        while self._max_bytes is not None and self._tmp_part_path(index).exists():
+            self._tmp_part_path(index).unlink()
+            index += 1
+        if not self.paths:
+            return
+        with open(self.paths[-1], "r+b") as f:
+            f.truncate(position["offset"])
+        self._file_bytes = position["file_bytes"]
+        self._append = True
+
+    def _open(self) -> IO[str]:
+        if self._file is None:
+            if self._append:
+                self._file = open_text(self.paths[-1], "a", self._compression)
+            else:
+                self.paths.append(self._tmp_part_path(len(self.paths)))
+                self._file = open_text(self.paths[-1], "w", self._compression)
+                self._file_bytes = 0
+        return self._file
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._append = False
+
+    def _tmp_part_path(self, index: int) -> Path:
+        path = self._part_path(index)
+        return path.with_name(path.name + ".tmp")
+
+    def _part_path(self, index: int) -> Path:
+        suffix = ".ndjson" + COMPRESSIONS[self._compression]
+        if self._max_bytes is None:
+            return self.base.with_name(self.base.name + suffix)
+        return self.base.with_name(f"{self.base.name}.part-{index:05d}{suffix}")
+
+
+def ndjson_paths(base: Path, compression: Optional[str] = None) -> List[Path]:
+    """
+    保存されているNDJSONファイルを取得
+
+    Parameters
+    ----------
+    base : Path
+        拡張子を除いた保存先
+    compression : Optional[str], optional
+        圧縮形式, by default None
+
+    Returns
+    -------
+    List[Path]
+        保存されているファイル（パートの順）
+    """
+    suffix = ".ndjson" + COMPRESSIONS[compression]
+    single = base.with_name(base.name + suffix)
+    parts = sorted(base.parent.glob(f"{base.name}.part-*{suffix}"))
+    return ([single] if single.exists() else []) + parts
+
+
+def iter_ndjson(
+    paths: Iterable[Path], compression: Optional[str] = None, serializer: Serializer = JSON
+) -> Iterator[Any]:
+    """
+    NDJSON形式のファイルを1要素ずつ読み込む
+
+    Parameters
+    ----------
+    paths : Iterable[Path]
+        読み込むファイル
+    compression : Optional[str], optional
+        圧縮形式, by default None
+    serializer : Serializer, optional
+        JSONの変換, by default JSON
+
+    Yields
+    -------
+    Any
+        要素
+    """
+    for path in paths:
+        with open_text(path, "r", compression) as f:
+            for line in f:
+                if line.strip():
+                    yield serializer.loads(line)
+
+
+def iter_json_array(
+    path: Path, chunk_size: int = READ_CHUNK_SIZE, compression: Optional[str] = None
+) -> Iterator[Any]:
+    """
+    json形式の配列のファイルを1要素ずつ読み込む
+
+    NOTE: ファイル全体をメモリに乗せずに読み込む
+    NOTE: 読み込んだ位置を進め、次のチャンクを読み込む時点でのみ読み込み済みの部分を切り捨てる
+
+    Parameters
+    ----------
+    path : Path
+        読み込むファイル
+    chunk_size : int, optional
+        1度に読み込む文字数, by default READ_CHUNK_SIZE
+    compression : Optional[str], optional
+        圧縮形式, by default None
+
+    Yields
+    -------
+    Any
+        配列の要素
+    """
+    decoder = json.JSONDecoder()
+    with open_text(path, "r", compression) as f:
+        buffer = f.read(chunk_size)
+        index = WHITESPACE.match(buffer).end()  # type: ignore
+        if not buffer.startswith("[", index):
+            raise ValueError(f"not json array. path: {path}")
+        index += 1
+        eof = False
+        while True:
+            index = WHITESPACE.match(buffer, index).end()  # type: ignore
+            if buffer.startswith(",", index):
+                index = WHITESPACE.match(buffer, index + 1).end()  # type: ignore
+            if buffer.startswith("]", index):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, index)
+                # 数値などはチャンクの境界で途切れていても読み込めてしまうため、次の区切りまで読む
+                end = WHITESPACE.match(buffer, end).end()  # type: ignore
+                complete = eof or buffer.startswith((",", "]"), end)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[index:] + chunk
+                index = 0
+                continue
+            yield item
+            index = end
+
+
+class OutputFormat:
+    """
+    出力形式
+
+    拡張子を除いた保存先（例: <channel_id>/nomal_messages）を指定して書き込み、読み込みを行う
+    """
+
+    def __init__(
+        self,
+        name: str = "json",
+        compression: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        write_queue_size: int = 0,
+        serializer: Optional[str] = "auto",
+        thread_storage: str = "file",
+    ):
+        """
+        出力形式を作成
+
+        Parameters
+        ----------
+        name : str, optional
+            形式（"json", "ndjson", "sqlite", "dedup"）, by default "json"
+            sqlite の場合は出力先の archive.sqlite3 に書き込む（sqlite_archive を参照）
+            dedup の場合は出力先の親ディレクトリの objects に内容のハッシュをキーとして重複なく書き込み、
+            出力先の snapshot.jsonl にオブジェクトの一覧を記録する（object_store を参照）
+        compression : Optional[str], optional
+            圧縮形式（None, "gzip", "zstd"）, by default None
+        max_bytes : Optional[int], optional
+            1ファイルあたりの最大サイズ（圧縮前）, by default None
+            ndjson の場合のみ有効
+        write_queue_size : int, optional
+            書き込みスレッドのキューの長さ, by default 0
+            1以上の場合は専用のスレッドで書き込み、取得側は書き込みを待たずに次のページを取得する
+            キューが一杯の場合は書き込みが追いつくまで待機する（write_behind を参照）
+        serializer : Optional[str], optional
+            JSONの変換の実装（"auto", "orjson", "ujson", "json"）, by default "auto"
+            auto の場合はインストールされている中で最も速いものを使用する（serializer を参照）
+        thread_storage : str, optional
+            スレッドのリプライの保存方法（"file", "channel"）, by default "file"
+            file の場合はスレッド毎に「<channel_id>/<thread_ts>」に保存する
+            channel の場合はチャンネル毎に「<channel_id>/threads.ndjson」にまとめて保存する
+            （thread_store を参照。json, ndjson の圧縮しない場合のみ）
+
+        Raises
+        ------
+        ValueError
+            未対応の形式、圧縮形式、JSONの変換の実装、リプライの保存方法の場合
+        ImportError
+            指定されたJSONの変換の実装がインストールされていない場合
+        """
+        if name not in FORMATS:
+            raise ValueError(f"not supported format. format: {name}")
+        if compression not in COMPRESSIONS or (name == "sqlite" and compression is not None):
+            raise ValueError(f"not supported compression. compression: {compression}")
+        if thread_storage not in THREAD_STORAGES or (
+            thread_storage == "channel" and (name in ("sqlite", "dedup") or compression is not None)
+        ):
+            raise ValueError(f"not supported thread storage. thread_storage: {thread_storage}")
+        self.name = name
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.write_queue_size = write_queue_size
+        self.serializer = get_serializer(serializer)
+        self.thread_storage = thread_storage
+        self._stage: Any = None
+        # sqlite の場合の アーカイブのPath -> アーカイブ
+        self._archives: Dict[Path, Any] = {}
+        # thread_storage が channel の場合の チャンネルの出力先 -> スレッドの保存先
+        self._thread_stores: Dict[Path, Any] = {}
+        # dedup の場合の スナップショットのPath -> スナップショット
+        self._snapshots: Dict[Path, Any] = {}
+        self._lock = threading.Lock()
+
+    def writer(self, base: Path, skip_empty: bool = False, small: bool = False) -> BaseWriter:
+        """
+        書き込み先を作成
+
+        Parameters
+        ----------
+        base : Path
+            拡張子を除いた保存先
+        skip_empty : bool, optional
+            1件も書き込まれなかった場合にファイルを作成しない, by default False
+        small : bool, optional
+            スレッドのリプライのような小さなファイルか, by default False
+            書き込みスレッドで書き込む場合、閉じるまで要素をメモリに溜めてまとめて書き込む
+
+        Returns
+        -------
+        BaseWriter
+            書き込み先
+        """
+        return self._write_behind(self._create_writer(base, skip_empty), small)
+
+    def replies_writer(self, channel_path: Path, thread_ts: str) -> BaseWriter:
+        """
+        スレッドのリプライの書き込み先を作成
+
+        NOTE: 1件も書き込まれなかった場合は保存しない
+
+        Parameters
+        ----------
+        channel_path : Path
+            チャンネルの出力先（<出力先>/<channel_id>）
+        thread_ts : str
+            スレッドの thread_ts
+
+        Returns
+        -------
+        BaseWriter
+            書き込み先
+        """
+        if self.thread_storage == "file":
+            return self.writer(_replies_base(channel_path, thread_ts), skip_empty=True, small=True)
+        from get_all_message_from_slack.util.thread_store import ThreadWriter
+
+        writer = ThreadWriter(self._thread_store(channel_path), thread_ts, skip_empty=True)
+        return self._write_behind(writer, small=True)
+
+    def iter_replies(self, channel_path: Path, thread_ts: str) -> Iterator[Any]:
+        """
+        保存済みのスレッドのリプライを1件ずつ読み込む
+
+        Parameters
+        ----------
+        channel_path : Path
+            チャンネルの出力先（<出力先>/<channel_id>）
+        thread_ts : str
+            スレッドの thread_ts
+
+        Yields
+        -------
+        Any
+            リプライ
+        """
+        if self.thread_storage == "file":
+            return self.iter_items(_replies_base(channel_path, thread_ts))
+        return iter(self._thread_store(channel_path).get(thread_ts))
+
+    def close_channel(self, channel_path: Path) -> None:
+        """
+        チャンネルのスレッドの保存先を閉じる（thread_storage が channel の場合のみ）
+
+        Parameters
+        ----------
+        channel_path : Path
+            チャンネルの出力先（<出力先>/<channel_id>）
+        """
+        with self._lock:
+            store = self._thread_stores.pop(channel_path, None)
+        if store is not None:
+            store.close()
+
+    def _write_behind(self, writer: BaseWriter, small: bool) -> BaseWriter:
+        if self.write_queue_size <= 0:
+            return writer
+        from get_all_message_from_slack.util.write_behind import WriteBehindWriter, WriterStage
+
+        with self._lock:
+            if self._stage is None:
+                self._stage = WriterStage(queue_size=self.write_queue_size)
+            stage = self._stage
+        return WriteBehindWriter(writer, stage, buffer_until_close=small)
+
+    def exists(self, base: Path) -> bool:
+        """
+        保存済みか
+
+        Parameters
+        ----------
+        base : Path
+            拡張子を除いた保存先
+
+        Returns
+        -------
+        bool
+            保存済みの場合True
+        """
+        if self.name == "ndjson":
+            return bool(ndjson_paths(base, self.compression))
+        if self.name == "sqlite":
+            archive, target = self._locate(base)
+            return archive.exists(target)
+        if self.name == "dedup":
+            snapshot, key = self._locate_snapshot(base)
+            return snapshot.exists(key)
+        return self._json_path(base).exists()
+
+    def iter_items(self, base: Path) -> Iterator[Any]:
+        """
+        保存済みの要素を1件ずつ読み込む
+
+        Parameters
+        ----------
+        base : Path
+            拡張子を除いた保存先
+
+        Yields
+        -------
+        Any
+            要素
+        """
+        if self.name == "ndjson":
+            paths = ndjson_paths(base, self.compression)
+            return iter_ndjson(paths, self.compression, self.serializer)
+        if self.name == "sqlite":
+            archive, target = self._locate(base)
+            return archive.iter_items(target)
+        if self.name == "dedup":
+            snapshot, key = self._locate_snapshot(base)
+            return snapshot.iter_items(key, self.serializer)
+        return iter_json_array(self._json_path(base), compression=self.compression)
+
+    def close(self) -> None:
+        """書き込みスレッドを終了し、開いているアーカイブ、スレッドの保存先、スナップショットを閉じる"""
+        with self._lock:
+            if self._stage is not None:
+                self._stage.close()
+                self._stage = None
+            for store in self._thread_stores.values():
+                store.close()
+            self._thread_stores.clear()
+            for archive in self._archives.values():
+                archive.close()
+            self._archives.clear()
+            for snapshot in self._snapshots.values():
+                snapshot.compact()
+            self._snapshots.clear()
+
+    def _create_writer(self, base: Path, skip_empty: bool) -> BaseWriter:
+        if self.name == "ndjson":
+            return NdjsonWriter(base, skip_empty, self.compression, self.max_bytes, self.serializer)
+        if self.name == "sqlite":
+            from get_all_message_from_slack.util.sqlite_archive import SqliteWriter
+
+            archive, target = self._locate(base)
+            return SqliteWriter(archive, target, skip_empty, serializer=self.serializer)
+        if self.name == "dedup":
+            from get_all_message_from_slack.util.object_store import ObjectWriter
+
+            snapshot, key = self._locate_snapshot(base)
+            return ObjectWriter(snapshot, key, skip_empty, self.serializer)
+        return JsonArrayWriter(self._json_path(base), skip_empty, self.compression, self.serializer)
+
+    def _thread_store(self, channel_path: Path) -> Any:
+        from get_all_message_from_slack.util.thread_store import ThreadStore
+
+        with self._lock:
+            store = self._thread_stores.get(channel_path)
+            if store is None:
+                store = self._thread_stores[channel_path] = ThreadStore(
+                    channel_path, self.serializer
+                )
+        return store
+
+    def _locate(self, base: Path) -> Tuple[Any, Any]:
+        from get_all_message_from_slack.util.sqlite_archive import SqliteArchive, locate
+
+        path, target = locate(base)
+        with self._lock:
+            archive = self._archives.get(path)
+            if archive is None:
+                archive = self._archives[path] = SqliteArchive(path)
+        return archive, target
+
+    def _locate_snapshot(self, base: Path) -> Tuple[Any, str]:
+        from get_all_message_from_slack.util.object_store import (
+            OBJECTS_DIR_NAME,
+            ObjectStore,
+            Snapshot,
+            locate,
+        )
+
+        path, key = locate(base)
+        with self._lock:
+            snapshot = self._snapshots.get(path)
+            if snapshot is None:
+                store = ObjectStore(path.parent / OBJECTS_DIR_NAME, self.compression)
+                snapshot = self._snapshots[path] = Snapshot(path, store)
+        return snapshot, key
+
+    def _json_path(self, base: Path) -> Path:
+        return base.with_name(base.name + ".json" + COMPRESSIONS[self.compression])
+
+
+def _replies_base(channel_path: Path, thread_ts: str) -> Path:
+    # NOTE: '1638883139.000600' のように「.」が入るとファイル名として不適格なので「_」に置換
+    return channel_path / thread_ts.replace(".", "_")
@@ -3,11 +3,14 @@ from setuptools import find_packages, setup
 
 setup(
     name="get_all_message_from_slack",
-    packages=find_packages(exclude=["tests", "tests.*"]),
+    packages=find_packages(exclude=["tests", "tests.*", "benchmarks", "benchmarks.*"]),
     python_requires=">=3.8",
-    install_requires=["slack-sdk"],
+    # transport.PooledWebClient が WebClient の内部メソッドを上書きするため、動作を確認したバージョンに固定する
+    install_requires=["slack-sdk>=3.43,<3.44"],
+    # 任意の機能で使用するモジュール
+    extras_require={"zstd": ["zstandard"], "async": ["aiohttp"]},
     # コマンドが実行されたときのエントリーポイント.
     entry_points={
-        "console_scripts": ["get_all_message_from_slack=get_all_message_from_slack.main:main"]
+        "console_scripts": ["get_all_message_from_slack=get_all_message_from_slack.cli:main"]
     },
 )
@@ -0,0 +1,121 @@
+from unittest import mock
+
+import pytest
+from benchmarks.fake_slack import FakeSlackServer, WorkspaceSpec
+from get_all_message_from_slack.util import slack_api
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.client import WebClient
+
+
+@pytest.fixture(autouse=True)
+def disable_rate_limiter():
+    with mock.patch("get_all_message_from_slack.util.slack_api.rate_limiter") as m:
+        m.acquire.return_value = 0.0
+        yield
+
+
+class TestFakeSlackServer:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        spec = WorkspaceSpec(channels=3, messages_per_channel=250, thread_every=100, users=250)
+        with FakeSlackServer(spec) as server, mock.patch(
+            "get_all_message_from_slack.util.slack_api.get_client",
+            return_value=WebClient(base_url=server.url),
+        ):
+            self.server = server
+            yield
+
+    def test_pagination(self):
+        pages = list(slack_api.iter_channel_message("C00000001"))
+
+        assert [len(page) for page in pages] == [250]
+        assert pages[0][0]["ts"] > pages[0][-1]["ts"]
+        assert len(slack_api.get_all_users()) == 250
+        assert len(slack_api.get_all_public_channels()) == 3
+        assert self.server.calls == {
+            "conversations.history": 1,
+            "users.list": 3,
+            "conversations.list": 1,
+        }
+
+    def test_cursor(self):
+        response = self.server.workspace.call(
+            "conversations.history", {"channel": "C00000000", "limit": "100"}
+        )
+        cursor = response["response_metadata"]["next_cursor"]
+
+        pages = list(slack_api.iter_channel_message("C00000000", cursor=cursor))
+
+        assert response["has_more"]
+        # 1ページ目の最後のメッセージの次から取得される
+        assert response["messages"][-1]["ts"] == "1600001500.000000"
+        assert pages[0][0]["ts"] == "1600001490.000000"
+        assert [len(page) for page in pages] == [150]
+        assert pages[-1].next_cursor is None
+
+    def test_oldest(self):
+        messages = slack_api.get_channel_message("C00000000", oldest="1600002480.000000")
+
+        assert [m["ts"] for m in messages] == ["1600002490.000000"]
+
+    def test_latest(self):
+        pages = slack_api.iter_channel_message(
+            "C00000000", oldest="1600000000.000000", latest="1600000030.000000"
+        )
+
+        assert [m["ts"] for page in pages for m in page] == [
+            "1600000020.000000",
+            "1600000010.000000",
+        ]
+
+    def test_inclusive(self):
+        pages = slack_api.iter_channel_message(
+            "C00000000", oldest="1600000000.000000", latest="1600000030.000000", inclusive=True
+        )
+
+        assert [m["ts"] for page in pages for m in page] == [
+            "1600000030.000000",
+            "1600000020.000000",
+            "1600000010.000000",
+            "1600000000.000000",
+        ]
+
+    def test_latest_cursor(self):
+        response = self.server.workspace.call(
+            "conversations.history",
+            {"channel": "C00000000", "latest": "1600001505.000000", "limit": "100"},
+        )
+        cursor = response["response_metadata"]["next_cursor"]
+
+        pages = list(
+            slack_api.iter_channel_message("C00000000", latest="1600001505.000000", cursor=cursor)
+        )
+
+        # latest より前のメッセージ（インデックス 0 から 150）を新しい順に取得する
+        assert response["messages"][0]["ts"] == "1600001500.000000"
+        assert pages[0][0]["ts"] == "1600000500.000000"
+        assert [len(page) for page in pages] == [51]
+        assert pages[-1][-1]["ts"] == "1600000000.000000"
+
+    def test_replies(self):
+        parent = slack_api.get_channel_message("C00000000")[-1]
+        replies = slack_api.get_replies("C00000000", parent)
+
+        assert parent["reply_count"] == 5
+        assert [m["ts"] for m in replies][0] == parent["thread_ts"]
+        assert replies[-1]["ts"] == parent["latest_reply"]
+        assert len(replies) == 6
+
+
+class TestRateLimit:
+    def test_retry_after(self):
+        spec = WorkspaceSpec(channels=1, messages_per_channel=10)
+        with FakeSlackServer(spec, rate_limit_every=2, retry_after=3) as server:
+            client = WebClient(base_url=server.url)
+            client.conversations_list()
+            with pytest.raises(SlackApiError) as e:
+                client.conversations_list()
+
+        assert e.value.response.status_code == 429
+        assert e.value.response.headers["retry-after"] == "3"
+        assert server.ratelimited == {"conversations.list": 1}
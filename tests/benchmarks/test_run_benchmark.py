@@ -0,0 +1,30 @@
+from benchmarks.run_benchmark import find_regressions
+
+
+def result(scenario, messages_per_sec=100.0, peak_rss_mb=50.0, api_calls=100):
+    return {
+        "scenario": scenario,
+        "messages_per_sec": messages_per_sec,
+        "peak_rss_mb": peak_rss_mb,
+        "api_calls": api_calls,
+    }
+
+
+class TestFindRegressions:
+    def test_within_tolerance(self):
+        baseline = [result("small")]
+        results = [result("small", 85.0, 55.0, 110), result("medium")]
+
+        assert find_regressions(results, baseline, 0.2) == []
+
+    def test_regressions(self):
+        baseline = [result("small")]
+        results = [result("small", 70.0, 70.0, 130)]
+
+        actual = find_regressions(results, baseline, 0.2)
+
+        assert actual == [
+            "small: messages/sec 100.0 -> 70.0",
+            "small: peak RSS 50.0MB -> 70.0MB",
+            "small: API calls 100 -> 130",
+        ]
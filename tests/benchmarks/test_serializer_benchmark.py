@@ -0,0 +1,18 @@
+from benchmarks.serializer_benchmark import ASCII_JSON, format_results, measure, sample_messages
+from get_all_message_from_slack.util.serializer import get_serializer
+
+
+class TestMeasure:
+    def test_nomal_case(self):
+        messages = sample_messages(20, text_size=50)
+
+        ascii_result = measure(ASCII_JSON, messages, repeat=1)
+        result = measure(get_serializer("json"), messages, repeat=1)
+
+        assert len(messages[0]["text"]) == 50
+        assert result["messages"] == 20
+        # 日本語をエスケープしない分、出力が小さくなる
+        assert result["output_bytes"] < ascii_result["output_bytes"]
+        lines = format_results([ascii_result, result]).splitlines()
+        assert len(lines) == 4
+        assert lines[2].endswith("1.00")
@@ -0,0 +1,28 @@
+from benchmarks.startup_benchmark import check_budgets, format_results, measure
+
+
+class TestMeasure:
+    def test_import_without_token(self):
+        # SLACK_TOKEN を設定せずに import でき、slack_sdk は読み込まれない
+        actual = measure("get_all_message_from_slack.util.slack_api", repeat=1)
+
+        assert actual["module"] == "get_all_message_from_slack.util.slack_api"
+        assert actual["seconds"] > 0
+        assert actual["heavy_modules"] == []
+
+
+class TestCheckBudgets:
+    def test_nomal_case(self):
+        results = [
+            {"module": "a", "seconds": 0.01, "heavy_modules": []},
+            {"module": "b", "seconds": 0.3, "heavy_modules": []},
+            {"module": "c", "seconds": 0.01, "heavy_modules": ["slack_sdk"]},
+            {"module": "d", "seconds": 1.0, "heavy_modules": []},
+        ]
+
+        actual = check_budgets(results, {"a": 0.1, "b": 0.1, "c": 0.1})
+
+        assert actual == ["b: 0.300s > 0.100s", "c: imports slack_sdk"]
+        lines = format_results(results, {"a": 0.1}).splitlines()
+        assert len(lines) == 6
+        assert lines[4].endswith("slack_sdk")
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack.async_main import (
+    _get_all_channel_message,
+    _get_channel_message,
+    main,
+    main_async,
+)
+from get_all_message_from_slack.main import ExportContext
+from get_all_message_from_slack.util.checkpoint import Checkpoint
+from get_all_message_from_slack.util.export_state import ExportState
+from get_all_message_from_slack.util.writer import BaseWriter
+
+
+async def async_iter(items):
+    for item in items:
+        yield item
+
+
+class TestMain:
+    def test_logging_config(self):
+        with mock.patch("get_all_message_from_slack.async_main.config") as mock_config, mock.patch(
+            "get_all_message_from_slack.async_main.main_async", new_callable=mock.AsyncMock
+        ) as mock_main_async:
+            main(max_workers=2)
+
+        mock_config.dictConfig.assert_called_once()
+        mock_main_async.assert_awaited_once_with(max_workers=2)
+
+
+class TestMainAsync:
+    def test_client(self, tmp_path: Path):
+        client = mock.MagicMock()
+
+        async def get_channels(context):
+            assert context.client is client
+            return []
+
+        with mock.patch(
+            "get_all_message_from_slack.async_main._create_base_path", return_value=tmp_path
+        ), mock.patch(
+            "get_all_message_from_slack.async_main._get_channels", side_effect=get_channels
+        ), mock.patch(
+            "get_all_message_from_slack.async_main._get_users", new_callable=mock.AsyncMock
+        ), mock.patch(
+            "get_all_message_from_slack.async_main.lookup_cache"
+        ), mock.patch(
+            "get_all_message_from_slack.async_main.use_session"
+        ) as mock_use_session:
+            asyncio.run(main_async(client=client))
+
+        assert mock_use_session.call_args_list == [
+            mock.call(mock.ANY, client),
+            mock.call(None, client),
+        ]
+
+
+class TestGetAllChannelMessage:
+    def test_failed_channel_does_not_stop_others(self, tmp_path: Path):
+        async def side_effect(context, channel_id, channel_name):
+            if channel_id == "CHANNEL_ID1":
+                raise RuntimeError("error")
+
+        channels = [
+            {"id": "CHANNEL_ID1", "name": "CHANNEL_NAME1"},
+            {"id": "CHANNEL_ID2", "name": "CHANNEL_NAME2"},
+        ]
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path))
+        with mock.patch(
+            "get_all_message_from_slack.async_main._get_channel_message", side_effect=side_effect
+        ) as mock_method:
+            actual = asyncio.run(_get_all_channel_message(context, channels, 2))
+
+        assert actual == ["CHANNEL_ID1"]
+        assert mock_method.call_count == 2
+
+
+class TestGetChannelMessage:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        with mock.patch(
+            "get_all_message_from_slack.async_main.iter_channel_message",
+        ) as mock_get_channel_message, mock.patch(
+            "get_all_message_from_slack.async_main.iter_replies",
+        ) as mock_get_replies:
+            self.mock_get_channel_message = mock_get_channel_message
+            self.mock_get_replies = mock_get_replies
+            yield
+
+    def test_nomal_case(self, tmp_path: Path):
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path))
+        self.mock_get_channel_message.return_value = async_iter(
+            [
+                [
+                    {
+                        "ts": "1.000002",
+                        "thread_ts": "1.000002",
+                        "reply_count": 1,
+                        "latest_reply": "1.000010",
+                    },
+                    {
+                        "ts": "1.000001",
+                        "thread_ts": "1.000001",
+                        "reply_count": 1,
+                        "latest_reply": "1.000020",
+                    },
+                ]
+            ]
+        )
+        self.mock_get_replies.side_effect = lambda channel_id, message, client: async_iter(
+            [[{"ts": message["latest_reply"]}]]
+        )
+        asyncio.run(_get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME"))
+
+        with open(tmp_path / "CHANNEL_ID" / "nomal_messages.json") as f:
+            assert [m["ts"] for m in json.load(f)] == ["1.000002", "1.000001"]
+        with open(tmp_path / "CHANNEL_ID" / "1_000002.json") as f:
+            assert json.load(f) == [{"ts": "1.000010"}]
+        with open(tmp_path / "CHANNEL_ID" / "1_000001.json") as f:
+            assert json.load(f) == [{"ts": "1.000020"}]
+        assert context.state.latest_ts("CHANNEL_ID") == "1.000002"
+
+    def test_write_off_event_loop(self, tmp_path: Path):
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path))
+        self.mock_get_channel_message.return_value = async_iter(
+            [[{"ts": "1.000002", "thread_ts": "1.000002", "reply_count": 1}]]
+        )
+        self.mock_get_replies.side_effect = lambda channel_id, message, client: async_iter(
+            [[{"ts": "1.000010"}]]
+        )
+        write_threads = []
+        write_all = BaseWriter.write_all
+
+        def record_thread(writer, items):
+            write_threads.append(threading.get_ident())
+            write_all(writer, items)
+
+        with mock.patch.object(BaseWriter, "write_all", autospec=True, side_effect=record_thread):
+            asyncio.run(_get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME"))
+
+        # メッセージ・リプライの書き込みはイベントループのスレッドでは行わない
+        assert len(write_threads) == 2
+        assert threading.get_ident() not in write_threads
+        with open(tmp_path / "CHANNEL_ID" / "1_000002.json") as f:
+            assert json.load(f) == [{"ts": "1.000010"}]
@@ -0,0 +1,165 @@
+import pstats
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack import cli
+from get_all_message_from_slack.util.estimate import ExportEstimate
+from get_all_message_from_slack.util.export_config import ExportConfig
+from get_all_message_from_slack.util.selection import ExportFilter
+
+
+class TestMain:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        with mock.patch("get_all_message_from_slack.main.main") as mock_main, mock.patch(
+            "get_all_message_from_slack.main.estimate"
+        ) as mock_estimate, mock.patch(
+            "get_all_message_from_slack.main.verify"
+        ) as mock_verify, mock.patch(
+            "get_all_message_from_slack.cli._configure_logging"
+        ) as mock_configure_logging:
+            self.mock_main = mock_main
+            self.mock_estimate = mock_estimate
+            self.mock_verify = mock_verify
+            self.mock_configure_logging = mock_configure_logging
+            yield
+
+    def test_default(self):
+        assert cli.main([]) == 0
+
+        self.mock_main.assert_called_once_with(ExportConfig())
+        self.mock_estimate.assert_not_called()
+        self.mock_configure_logging.assert_called_once_with()
+
+    def test_options(self):
+        cli.main(
+            [
+                "-o",
+                "/tmp/export",
+                "-w",
+                "8",
+                "--reply-workers",
+                "4",
+                "-f",
+                "ndjson",
+                "--compression",
+                "gzip",
+                "--max-file-bytes",
+                "1024",
+                "--include",
+                "proj-*",
+                "--include",
+                "team-*",
+                "--exclude",
+                "proj-old",
+                "--skip-archived",
+                "--min-members",
+                "3",
+                "--oldest",
+                "1638316800",
+                "--latest",
+                "1638403200",
+                "--shard-index",
+                "1",
+                "--shard-count",
+                "4",
+            ]
+        )
+
+        config = self.mock_main.call_args.args[0]
+        assert config.output_dir == "/tmp/export"
+        assert config.max_workers == 8
+        assert config.max_reply_workers == 4
+        assert config.output_format == "ndjson"
+        assert config.compression == "gzip"
+        assert config.max_file_bytes == 1024
+        assert config.shard_index == 1
+        assert config.shard_count == 4
+        assert config.export_filter == ExportFilter(
+            include=("proj-*", "team-*"),
+            exclude=("proj-old",),
+            skip_archived=True,
+            min_members=3,
+            oldest="1638316800",
+            latest="1638403200",
+        )
+
+    def test_days(self):
+        with mock.patch("get_all_message_from_slack.cli.days_ago", return_value="1.000000") as d:
+            cli.main(["--days", "30"])
+
+        d.assert_called_once_with(30.0)
+        assert self.mock_main.call_args.args[0].export_filter.oldest == "1.000000"
+
+    def test_days_and_oldest(self, capsys):
+        with pytest.raises(SystemExit) as e:
+            cli.main(["--days", "30", "--oldest", "1638316800"])
+
+        assert e.value.code == 2
+        assert "--days and --oldest" in capsys.readouterr().err
+        self.mock_main.assert_not_called()
+        self.mock_configure_logging.assert_not_called()
+
+    def test_invalid_format(self):
+        with pytest.raises(SystemExit):
+            cli.main(["-f", "csv"])
+
+        self.mock_main.assert_not_called()
+
+    def test_dry_run(self, capsys):
+        self.mock_estimate.return_value = ExportEstimate(
+            2,
+            1500,
+            150,
+            {"conversations.list": 1, "conversations.history": 3, "conversations.replies": 150},
+            3725.0,
+        )
+
+        assert cli.main(["--dry-run", "-w", "4", "--include", "proj-*"]) == 0
+
+        self.mock_main.assert_not_called()
+        self.mock_estimate.assert_called_once_with(
+            ExportConfig(max_workers=4, export_filter=ExportFilter(include=("proj-*",)))
+        )
+        out = capsys.readouterr().out
+        assert "channels: 2" in out
+        assert "calls (estimated): 154" in out
+        assert "  conversations.replies: 150" in out
+        assert "time (estimated): 1:02:05" in out
+
+    def test_dry_run_messages_per_member(self):
+        self.mock_estimate.return_value = ExportEstimate(0, 0, 0, {}, 0.0)
+
+        cli.main(["--dry-run", "--messages-per-member", "10"])
+
+        assert self.mock_estimate.call_args.kwargs["messages_per_member"] == 10.0
+
+    def test_verify(self, capsys):
+        self.mock_verify.return_value = {"channels": {}, "summary": {"channels": 2, "edited": 1}}
+
+        assert cli.main(["--verify", "./work/nightly", "-f", "ndjson", "--include", "proj-*"]) == 0
+
+        self.mock_main.assert_not_called()
+        self.mock_verify.assert_called_once_with(
+            "./work/nightly",
+            ExportConfig(output_format="ndjson", export_filter=ExportFilter(include=("proj-*",))),
+        )
+        assert "edited: 1" in capsys.readouterr().out
+
+    def test_profile(self, tmp_path, capsys):
+        path = tmp_path / "profile" / "export.prof"
+
+        assert cli.main(["--profile", str(path)]) == 0
+
+        self.mock_main.assert_called_once()
+        assert pstats.Stats(str(path)).total_calls > 0
+        assert f"profile saved: {path}" in capsys.readouterr().err
+
+    def test_profile_on_error(self, tmp_path):
+        path = tmp_path / "export.prof"
+        self.mock_main.side_effect = RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            cli.main(["--profile", str(path)])
+
+        assert path.exists()
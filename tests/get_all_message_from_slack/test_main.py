@@ -1 +1,591 @@
-pass
+import gzip
+import json
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack.main import (
+    REPLY_QUEUE_FACTOR,
+    ExportContext,
+    _compare_windows,
+    _get_all_channel_message,
+    _get_channel_message,
+    _get_channels,
+    _load_state,
+    _select_threads,
+    estimate,
+    main,
+    verify,
+)
+from get_all_message_from_slack.util.checkpoint import Checkpoint
+from get_all_message_from_slack.util.export_config import ExportConfig
+from get_all_message_from_slack.util.export_state import ExportState
+from get_all_message_from_slack.util.fingerprint import (
+    Fingerprints,
+    fingerprint_channel,
+    fingerprint_windows,
+)
+from get_all_message_from_slack.util.selection import ExportFilter
+from get_all_message_from_slack.util.sharding import merge_shards
+from get_all_message_from_slack.util.slack_api import Page
+from get_all_message_from_slack.util.writer import OutputFormat
+
+
+class TestGetAllChannelMessage:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        with mock.patch(
+            "get_all_message_from_slack.main._get_channel_message",
+        ) as mock_method:
+            self.mock_method = mock_method
+            yield
+
+    def test_nomal_case(self, tmp_path: Path):
+        channels = [
+            {"id": "CHANNEL_ID1", "name": "CHANNEL_NAME1"},
+            {"id": "CHANNEL_ID2", "name": "CHANNEL_NAME2"},
+        ]
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path))
+        actual = _get_all_channel_message(context, channels, 2)
+
+        assert actual == []
+        self.mock_method.assert_has_calls(
+            [
+                mock.call(context, "CHANNEL_ID1", "CHANNEL_NAME1"),
+                mock.call(context, "CHANNEL_ID2", "CHANNEL_NAME2"),
+            ],
+            any_order=True,
+        )
+
+    def test_failed_channel_does_not_stop_others(self, tmp_path: Path):
+        def side_effect(context, channel_id, channel_name):
+            if channel_id == "CHANNEL_ID1":
+                raise RuntimeError("error")
+
+        self.mock_method.side_effect = side_effect
+        channels = [
+            {"id": "CHANNEL_ID1", "name": "CHANNEL_NAME1"},
+            {"id": "CHANNEL_ID2", "name": "CHANNEL_NAME2"},
+            {"id": "CHANNEL_ID3", "name": "CHANNEL_NAME3"},
+        ]
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path))
+        actual = _get_all_channel_message(context, channels, 2)
+
+        assert actual == ["CHANNEL_ID1"]
+        assert self.mock_method.call_count == 3
+
+
+class TestGetChannelMessage:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        with mock.patch(
+            "get_all_message_from_slack.main.iter_channel_message",
+        ) as mock_get_channel_message, mock.patch(
+            "get_all_message_from_slack.main.iter_replies",
+        ) as mock_get_replies:
+            self.mock_get_channel_message = mock_get_channel_message
+            self.mock_get_replies = mock_get_replies
+            yield
+
+    def test_incremental(self, tmp_path: Path):
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path))
+        self.mock_get_channel_message.return_value = [
+            Page(
+                [
+                    {
+                        "ts": "1.000002",
+                        "thread_ts": "1.000002",
+                        "reply_count": 1,
+                        "latest_reply": "1.000010",
+                    }
+                ]
+            ),
+            Page([{"ts": "1.000001"}]),
+        ]
+        self.mock_get_replies.return_value = [[{"ts": "1.000010"}]]
+        _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        self.mock_get_channel_message.assert_called_once_with(
+            "CHANNEL_ID", None, None, None, client=None
+        )
+        assert self.mock_get_replies.call_count == 1
+        with open(tmp_path / "CHANNEL_ID" / "1_000002.json") as f:
+            assert json.load(f) == [{"ts": "1.000010"}]
+        # 状態は main の最後にまとめて保存する
+        assert not (tmp_path / "export_state.json").exists()
+        context.state.save()
+
+        self.mock_get_channel_message.reset_mock()
+        self.mock_get_replies.reset_mock()
+        self.mock_get_channel_message.return_value = [
+            Page(
+                [
+                    {"ts": "1.000003"},
+                    {
+                        "ts": "1.000002",
+                        "thread_ts": "1.000002",
+                        "reply_count": 1,
+                        "latest_reply": "1.000010",
+                    },
+                ]
+            )
+        ]
+        context = ExportContext(
+            tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path), lookback_seconds=1
+        )
+        _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        self.mock_get_channel_message.assert_called_once_with(
+            "CHANNEL_ID", "0.000002", None, None, client=None
+        )
+        self.mock_get_replies.assert_not_called()
+        with open(tmp_path / "CHANNEL_ID" / "nomal_messages.json") as f:
+            actual = [m["ts"] for m in json.load(f)]
+        assert actual == ["1.000003", "1.000002", "1.000001"]
+
+    def test_thread_storage_channel(self, tmp_path: Path):
+        output_format = OutputFormat("ndjson", thread_storage="channel")
+        context = ExportContext(
+            tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path), output_format
+        )
+        self.mock_get_channel_message.return_value = [
+            Page(
+                [
+                    {"ts": "1.000002", "thread_ts": "1.000002", "reply_count": 1},
+                    {"ts": "1.000001", "thread_ts": "1.000001", "reply_count": 1},
+                ]
+            )
+        ]
+        self.mock_get_replies.side_effect = lambda channel_id, message, client: [
+            [{"ts": message["ts"] + "0"}]
+        ]
+        _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        channel_path = tmp_path / "CHANNEL_ID"
+        assert sorted(p.name for p in channel_path.iterdir()) == [
+            "nomal_messages.ndjson",
+            "threads.index.json",
+            "threads.ndjson",
+        ]
+        actual = list(output_format.iter_replies(channel_path, "1.000001"))
+        assert actual == [{"ts": "1.0000010"}]
+
+    def test_ndjson_gzip(self, tmp_path: Path):
+        context = ExportContext(
+            tmp_path,
+            ExportState.load(tmp_path),
+            Checkpoint.create(tmp_path),
+            OutputFormat("ndjson", "gzip"),
+        )
+        self.mock_get_channel_message.return_value = [
+            Page([{"ts": "1.000002"}, {"ts": "1.000001"}])
+        ]
+        _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        with gzip.open(tmp_path / "CHANNEL_ID" / "nomal_messages.ndjson.gz", "rt") as f:
+            actual = [json.loads(line) for line in f]
+        assert actual == [{"ts": "1.000002"}, {"ts": "1.000001"}]
+
+    @pytest.mark.parametrize(
+        "compression, write_queue_size", [(None, 0), ("gzip", 0), (None, 2), ("gzip", 2)]
+    )
+    def test_resume(self, tmp_path: Path, compression, write_queue_size):
+        output_format = OutputFormat("json", compression, write_queue_size=write_queue_size)
+        context = ExportContext(
+            tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path), output_format
+        )
+        first_page = Page(
+            [{"ts": "1.000003", "thread_ts": "1.000003", "reply_count": 1}, {"ts": "1.000002"}]
+        )
+        first_page.next_cursor = "CURSOR"
+
+        def interrupted(channel_id, oldest, cursor, latest, client):
+            yield first_page
+            raise KeyboardInterrupt
+
+        self.mock_get_channel_message.side_effect = interrupted
+        self.mock_get_replies.return_value = [[{"ts": "1.000010"}]]
+        with pytest.raises(KeyboardInterrupt):
+            _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        self.mock_get_channel_message.reset_mock(side_effect=True)
+        self.mock_get_replies.reset_mock()
+        self.mock_get_channel_message.return_value = [Page([{"ts": "1.000001"}])]
+        context = context._replace(checkpoint=Checkpoint.load(tmp_path))
+        _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        self.mock_get_channel_message.assert_called_once_with(
+            "CHANNEL_ID", None, "CURSOR", None, client=None
+        )
+        self.mock_get_replies.assert_not_called()
+        actual = [
+            m["ts"] for m in output_format.iter_items(tmp_path / "CHANNEL_ID" / "nomal_messages")
+        ]
+        assert actual == ["1.000003", "1.000002", "1.000001"]
+        assert context.state.latest_ts("CHANNEL_ID") == "1.000003"
+        assert Checkpoint.load(tmp_path).is_channel_done("CHANNEL_ID")
+        output_format.close()
+
+    def test_restore_state_on_resume(self, tmp_path: Path):
+        checkpoint = Checkpoint.create(tmp_path)
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), checkpoint)
+        self.mock_get_channel_message.return_value = [Page([{"ts": "1.000002"}])]
+        _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        # 状態を保存する前に中断しても、チェックポイントから復元する
+        actual = _load_state(tmp_path, Checkpoint.load(tmp_path))
+
+        assert not (tmp_path / "export_state.json").exists()
+        assert actual.latest_ts("CHANNEL_ID") == "1.000002"
+
+    def test_skip_done_channel(self, tmp_path: Path):
+        checkpoint = Checkpoint.create(tmp_path)
+        checkpoint.mark_channel_done("CHANNEL_ID")
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), checkpoint)
+        _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        self.mock_get_channel_message.assert_not_called()
+
+    def test_export_filter_range(self, tmp_path: Path):
+        context = ExportContext(
+            tmp_path,
+            ExportState.load(tmp_path),
+            Checkpoint.create(tmp_path),
+            export_filter=ExportFilter(oldest="100.000000", latest="200.000000"),
+        )
+        self.mock_get_channel_message.return_value = [Page([{"ts": "150.000001"}])]
+        _get_channel_message(context, "CHANNEL_ID", "CHANNEL_NAME")
+
+        self.mock_get_channel_message.assert_called_once_with(
+            "CHANNEL_ID", "100.000000", None, "200.000000", client=None
+        )
+
+    def test_bounded_reply_queue(self, tmp_path: Path):
+        context = ExportContext(
+            tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path), max_reply_workers=1
+        )
+        fetched_pages = []
+        release = threading.Event()
+
+        def pages(*args, **kwargs):
+            for i in range(1, 21):
+                fetched_pages.append(i)
+                ts = f"{i}.000001"
+                yield Page([{"ts": ts, "thread_ts": ts, "reply_count": 1, "latest_reply": ts}])
+
+        def replies(channel_id, message, client=None):
+            release.wait(10)
+            yield [message]
+
+        self.mock_get_channel_message.side_effect = pages
+        self.mock_get_replies.side_effect = replies
+        thread = threading.Thread(
+            target=_get_channel_message, args=(context, "CHANNEL_ID", "CHANNEL_NAME")
+        )
+        thread.start()
+        time.sleep(0.3)
+
+        # 実行中・実行待ちのリプライの取得が上限（1 * REPLY_QUEUE_FACTOR）に達すると次のページを取得しない
+        assert len(fetched_pages) == REPLY_QUEUE_FACTOR + 1
+        release.set()
+        thread.join(10)
+        assert len(fetched_pages) == 20
+        assert self.mock_get_replies.call_count == 20
+
+
+class TestGetChannels:
+    @mock.patch("get_all_message_from_slack.main.get_all_public_channels")
+    def test_export_filter(self, mock_get_all_public_channels, tmp_path: Path):
+        mock_get_all_public_channels.return_value = [
+            {"id": "C1", "name": "proj-a", "num_members": 3},
+            {"id": "C2", "name": "proj-b", "num_members": 1},
+            {"id": "C3", "name": "random", "num_members": 3},
+        ]
+        context = ExportContext(
+            tmp_path,
+            ExportState.load(tmp_path),
+            Checkpoint.create(tmp_path),
+            export_filter=ExportFilter(include=("proj-*",), skip_archived=True, min_members=2),
+        )
+        actual = _get_channels(context)
+
+        assert actual == [{"id": "C1", "name": "proj-a", "num_members": 3}]
+        mock_get_all_public_channels.assert_called_once_with(True, client=None)
+        with open(tmp_path / "channel_master.json") as f:
+            assert json.load(f) == actual
+
+
+class TestSelectThreads:
+    @mock.patch("get_all_message_from_slack.main.metrics")
+    def test_nomal_case(self, mock_metrics, tmp_path: Path):
+        context = ExportContext(tmp_path, ExportState.load(tmp_path), Checkpoint.create(tmp_path))
+        context.state.update_channel(
+            "CHANNEL_ID",
+            [{"ts": "1.000005", "thread_ts": "1.000005", "reply_count": 1, "latest_reply": "2"}],
+        )
+        messages = [
+            # スレッドではない
+            {"ts": "1.000001"},
+            # リプライが0件
+            {"ts": "1.000002", "thread_ts": "1.000002", "reply_count": 0},
+            # チャンネルにも投稿されたリプライ
+            {"ts": "1.000003", "thread_ts": "1.000004", "subtype": "thread_broadcast"},
+            # 取得対象
+            {"ts": "1.000004", "thread_ts": "1.000004", "reply_count": 2, "latest_reply": "1"},
+            # 取得済み
+            {"ts": "1.000004", "thread_ts": "1.000004", "reply_count": 2, "latest_reply": "1"},
+            # 前回から更新なし
+            {"ts": "1.000005", "thread_ts": "1.000005", "reply_count": 1, "latest_reply": "2"},
+        ]
+        fetched_threads = set()
+
+        actual = _select_threads(context, "CHANNEL_ID", messages, fetched_threads)
+
+        assert actual == [messages[3]]
+        assert fetched_threads == {"1.000004"}
+        mock_metrics.record_threads.assert_called_once_with(
+            1, {"not_parent": 1, "no_replies": 1, "already_fetched": 1, "unchanged": 1}
+        )
+
+
+class TestShardExport:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        with mock.patch(
+            "get_all_message_from_slack.main.get_all_public_channels",
+            return_value=[{"id": f"C{i}", "name": f"channel{i}"} for i in range(10)],
+        ), mock.patch(
+            "get_all_message_from_slack.main.iter_all_users",
+            return_value=iter([[{"id": "U1", "name": "user1"}]]),
+        ) as mock_iter_all_users, mock.patch(
+            "get_all_message_from_slack.main.lookup_cache",
+        ), mock.patch(
+            "get_all_message_from_slack.main._get_all_channel_message", return_value=[]
+        ) as mock_get_all_channel_message, mock.patch(
+            "get_all_message_from_slack.main.rate_limiter"
+        ) as mock_rate_limiter:
+            self.mock_iter_all_users = mock_iter_all_users
+            self.mock_get_all_channel_message = mock_get_all_channel_message
+            self.mock_rate_limiter = mock_rate_limiter
+            yield
+
+    def test_nomal_case(self, tmp_path: Path):
+        for index in range(2):
+            main(ExportConfig(incremental_path=str(tmp_path), shard_index=index, shard_count=2))
+
+        shards = [
+            [channel["id"] for channel in call.args[1]]
+            for call in self.mock_get_all_channel_message.call_args_list
+        ]
+        assert sorted(shards[0] + shards[1]) == [f"C{i}" for i in range(10)]
+        assert not set(shards[0]) & set(shards[1])
+        # ユーザ一覧は最初のシャードのみ取得する
+        assert self.mock_iter_all_users.call_count == 1
+        assert (tmp_path / "shard-000-of-002" / "user_master.json").exists()
+        assert not (tmp_path / "shard-001-of-002" / "user_master.json").exists()
+
+        with open(merge_shards(tmp_path, 2)) as f:
+            manifest = json.load(f)
+        assert len(manifest["channels"]) == 10
+        assert manifest["user_master"] == "shard-000-of-002/user_master"
+        # 各シャードはレート制限をシャード数で分け合う
+        self.mock_rate_limiter.set_share.assert_called_with(0.5)
+
+    def test_requires_incremental_path(self):
+        with pytest.raises(ValueError):
+            main(ExportConfig(shard_index=0, shard_count=2))
+
+    def test_index_out_of_range(self, tmp_path: Path):
+        with pytest.raises(ValueError):
+            main(ExportConfig(incremental_path=str(tmp_path), shard_index=2, shard_count=2))
+
+
+class TestEstimate:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        with mock.patch(
+            "get_all_message_from_slack.main.get_all_public_channels",
+            return_value=[
+                {"id": "C1", "name": "proj-a", "num_members": 3},
+                {"id": "C2", "name": "random", "num_members": 9},
+            ],
+        ) as mock_get_all_public_channels, mock.patch(
+            "get_all_message_from_slack.main.estimate_export"
+        ) as mock_estimate_export:
+            self.mock_get_all_public_channels = mock_get_all_public_channels
+            self.mock_estimate_export = mock_estimate_export
+            yield
+
+    def test_nomal_case(self, tmp_path: Path):
+        export_filter = ExportFilter(include=("proj-*",), skip_archived=True)
+
+        actual = estimate(
+            ExportConfig(max_workers=4, export_filter=export_filter), messages_per_member=10
+        )
+
+        assert actual is self.mock_estimate_export.return_value
+        self.mock_get_all_public_channels.assert_called_once_with(True, client=None)
+        self.mock_estimate_export.assert_called_once_with(
+            [{"id": "C1", "name": "proj-a", "num_members": 3}],
+            export_filter,
+            None,
+            0,
+            4,
+            1,
+            10,
+            2,
+            rate_share=1.0,
+        )
+
+    def test_incremental_shard(self, tmp_path: Path):
+        estimate(ExportConfig(incremental_path=str(tmp_path), shard_index=0, shard_count=2))
+
+        state = self.mock_estimate_export.call_args.args[2]
+        assert state.path.parent == tmp_path / "shard-000-of-002"
+        assert self.mock_estimate_export.call_args.kwargs["rate_share"] == 0.5
+        # 見積もりでは何も書き込まない
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestVerify:
+    PARENT = {"ts": "2.000001", "thread_ts": "2.000001", "reply_count": 1, "latest_reply": "2.5"}
+    MESSAGES = [{"ts": "90000.000001"}, PARENT, {"ts": "1.000001"}]
+    REPLIES = [PARENT, {"ts": "2.5", "thread_ts": "2.000001"}]
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path: Path):
+        with mock.patch(
+            "get_all_message_from_slack.main.iter_channel_message",
+        ) as mock_iter_channel_message, mock.patch(
+            "get_all_message_from_slack.main.iter_replies", return_value=[self.REPLIES]
+        ), mock.patch(
+            "get_all_message_from_slack.main.get_replies"
+        ) as mock_get_replies:
+            self.mock_iter_channel_message = mock_iter_channel_message
+            self.mock_get_replies = mock_get_replies
+            self.tmp_path = tmp_path
+            # フィンガープリントを保存してエクスポートしておく
+            mock_iter_channel_message.return_value = [Page(self.MESSAGES)]
+            context = ExportContext(
+                tmp_path,
+                ExportState.load(tmp_path),
+                Checkpoint.create(tmp_path),
+                fingerprints=Fingerprints.load(tmp_path),
+            )
+            _get_channel_message(context, "C1", "general")
+            context.fingerprints.save()
+            writer = context.output_format.writer(tmp_path / "channel_master")
+            writer.write_all([{"id": "C1", "name": "general"}])
+            writer.close()
+            mock_iter_channel_message.reset_mock()
+            yield
+
+    def test_unchanged(self):
+        self.mock_iter_channel_message.return_value = [Page(self.MESSAGES)]
+
+        actual = verify(str(self.tmp_path))
+
+        self.mock_iter_channel_message.assert_called_once_with(
+            "C1", "1.000001", latest="90000.000001", client=None, inclusive=True
+        )
+        # ウィンドウもスレッドも変わっていないため、突き合わせもリプライの取得もしない
+        self.mock_get_replies.assert_not_called()
+        assert actual["channels"] == {}
+        assert actual["summary"]["windows_checked"] == 2
+        assert actual["summary"]["windows_changed"] == 0
+        assert actual["summary"]["threads_fetched"] == 0
+        with open(self.tmp_path / "verification.json") as f:
+            assert json.load(f) == actual
+
+    def test_edited_and_deleted(self):
+        self.mock_iter_channel_message.return_value = [
+            Page(
+                [
+                    {"ts": "90000.000001", "edited": {"ts": "90001.000001"}},
+                    dict(self.PARENT, reply_count=2, latest_reply="2.6"),
+                ]
+            )
+        ]
+        self.mock_get_replies.return_value = [
+            self.PARENT,
+            {"ts": "2.6", "thread_ts": "2.000001"},
+        ]
+
+        actual = verify(str(self.tmp_path))
+
+        self.mock_get_replies.assert_called_once()
+        assert actual["channels"] == {
+            "C1": {
+                "name": "general",
+                "edited": ["90000.000001"],
+                "deleted": ["1.000001"],
+                "added": [],
+                "threads": {"2.000001": {"edited": [], "deleted": ["2.5"], "added": ["2.6"]}},
+            }
+        }
+        assert actual["summary"]["edited"] == 1
+        assert actual["summary"]["deleted"] == 1
+        assert actual["summary"]["replies_deleted"] == 1
+        assert actual["summary"]["windows_changed"] == 2
+
+    def test_incremental_fingerprint(self):
+        self.mock_iter_channel_message.return_value = [Page([{"ts": "90001.000001"}])]
+        context = ExportContext(
+            self.tmp_path,
+            ExportState.load(self.tmp_path),
+            Checkpoint.create(self.tmp_path),
+            fingerprints=Fingerprints.load(self.tmp_path),
+        )
+
+        with mock.patch(
+            "get_all_message_from_slack.main._saved_replies", return_value=self.REPLIES
+        ) as mock_saved_replies:
+            _get_channel_message(context, "C1", "general")
+
+        # 保存済みのデータは読み込み直さず、スレッドは前回のフィンガープリントを引き継ぐ
+        mock_saved_replies.assert_not_called()
+        expected = fingerprint_channel(
+            [{"ts": "90001.000001"}] + self.MESSAGES, lambda message: self.REPLIES
+        )
+        # ファイルにはエクスポートの最後（main）にまとめて保存する
+        assert Fingerprints.load(self.tmp_path).get("C1") != expected
+        context.fingerprints.save()
+        assert Fingerprints.load(self.tmp_path).get("C1") == expected
+
+    def test_without_fingerprints(self):
+        (self.tmp_path / "fingerprints.json").unlink()
+        self.mock_iter_channel_message.return_value = [Page(self.MESSAGES[1:])]
+
+        actual = verify(str(self.tmp_path))
+
+        # 保存済みのデータからフィンガープリントを作成して比較する
+        assert actual["channels"]["C1"]["deleted"] == ["90000.000001"]
+        assert actual["summary"]["windows_changed"] == 1
+
+
+class TestCompareWindows:
+    def test_nomal_case(self):
+        messages = [{"ts": "90000.000001"}, {"ts": "2.000001"}, {"ts": "1.000001"}]
+        saved = fingerprint_windows(messages)
+
+        fetched, changed = _compare_windows(
+            iter([messages[0], {"ts": "2.000001", "edited": {"ts": "3.0"}}, messages[2]]),
+            saved,
+            86400,
+        )
+
+        assert list(fetched) == ["0", "86400"]
+        assert fetched["86400"] == saved["86400"]
+        # フィンガープリントが異なったウィンドウのメッセージのみ保持する
+        assert [message["ts"] for message in changed] == ["2.000001", "1.000001"]
+
+    def test_split_window(self):
+        messages = [{"ts": "2.000001"}, {"ts": "90000.000001"}, {"ts": "1.000001"}]
+
+        fetched, changed = _compare_windows(iter(messages), fingerprint_windows(messages), 86400)
+
+        assert fetched == fingerprint_windows(messages)
+        # 分かれたウィンドウは全体で比較できるように保持する
+        assert changed == [{"ts": "2.000001"}, {"ts": "1.000001"}]
@@ -0,0 +1,64 @@
+import asyncio
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack import settings
+from get_all_message_from_slack.util.transport import PooledWebClient
+
+
+class TestClient:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        with mock.patch("get_all_message_from_slack.settings._client", None):
+            yield
+
+    def test_create_client(self):
+        client = settings.create_client("xoxp-test")
+
+        assert isinstance(client, PooledWebClient)
+        assert client.token == "xoxp-test"
+
+    def test_get_client_lazily(self):
+        with mock.patch(
+            "get_all_message_from_slack.settings.create_client", return_value=mock.sentinel.client
+        ) as mock_create_client:
+            mock_create_client.assert_not_called()
+            assert settings.get_client() is mock.sentinel.client
+            assert settings.get_client() is mock.sentinel.client
+
+        mock_create_client.assert_called_once_with()
+
+    def test_set_client(self):
+        settings.set_client(mock.sentinel.client)
+        assert settings.get_client() is mock.sentinel.client
+
+        settings.set_client(None)
+        with mock.patch(
+            "get_all_message_from_slack.settings.create_client", return_value=mock.sentinel.other
+        ):
+            assert settings.get_client() is mock.sentinel.other
+
+    def test_create_async_session(self):
+        async def create():
+            async with settings.create_async_session(5) as session:
+                return session.connector.limit, len(session.trace_configs)
+
+        assert asyncio.run(create()) == (5, 1)
+
+    def test_token_required_on_first_call(self, monkeypatch):
+        monkeypatch.delenv("SLACK_TOKEN")
+
+        with pytest.raises(KeyError):
+            settings.get_client()
+
+
+class TestLookupCachePath:
+    def test_output_dir(self):
+        with mock.patch("get_all_message_from_slack.settings.LOOKUP_CACHE_PATH", None):
+            assert settings.lookup_cache_path() == Path("./work/lookup_cache.json")
+            assert settings.lookup_cache_path("/tmp/out") == Path("/tmp/out/lookup_cache.json")
+
+    def test_environment(self):
+        with mock.patch("get_all_message_from_slack.settings.LOOKUP_CACHE_PATH", "/tmp/cache.json"):
+            assert settings.lookup_cache_path("/tmp/out") == Path("/tmp/cache.json")
@@ -0,0 +1,223 @@
+import asyncio
+import sys
+from typing import Any, Dict
+from unittest import mock
+
+import aiohttp
+import pytest
+from get_all_message_from_slack.util.async_slack_api import (
+    get_all_public_channels,
+    get_all_users,
+    get_channel_message,
+    get_replies,
+    import_aiohttp,
+    use_session,
+)
+from get_all_message_from_slack.util.page_size import PageSizer
+from get_all_message_from_slack.util.retry import CircuitBreaker
+from slack_sdk.errors import SlackApiError
+
+
+@pytest.fixture(autouse=True)
+def slack_client():
+    client = mock.MagicMock()
+    with mock.patch(
+        "get_all_message_from_slack.util.async_slack_api.get_client", return_value=client
+    ):
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def disable_rate_limiter():
+    with mock.patch(
+        "get_all_message_from_slack.util.async_slack_api.rate_limiter"
+    ) as m, mock.patch(
+        "get_all_message_from_slack.util.async_slack_api.circuit_breaker", CircuitBreaker()
+    ):
+        m.acquire_async = mock.AsyncMock(return_value=0.0)
+        yield m
+
+
+class ReturnValue:
+    data = {}
+
+
+def create_return_object(data: Dict[str, Any]):
+    return_value = ReturnValue()
+    return_value.data = data
+    return return_value
+
+
+class TestImportAiohttp:
+    def test_installed(self):
+        assert import_aiohttp() is aiohttp
+
+    def test_not_installed(self):
+        with mock.patch.dict(sys.modules, {"aiohttp": None}):
+            with pytest.raises(ImportError, match="get_all_message_from_slack\\[async\\]"):
+                import_aiohttp()
+
+
+class TestUseSession:
+    def test_shared_client(self, slack_client):
+        session = mock.MagicMock()
+
+        use_session(session)
+
+        assert slack_client.session is session
+
+    def test_client(self, slack_client):
+        client = mock.MagicMock()
+        session = mock.MagicMock()
+
+        use_session(session, client)
+
+        assert client.session is session
+        assert slack_client.session is not session
+
+
+class TestGetChannelMessage:
+    @pytest.fixture(autouse=True)
+    def setUp(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "conversations_history",
+            new_callable=mock.AsyncMock,
+        ) as mock_method, mock.patch(
+            "get_all_message_from_slack.util.async_slack_api.page_sizer", PageSizer()
+        ):
+            mock_method.__name__ = "conversations_history"
+            self.mock_method = mock_method
+            yield
+
+    def test_has_more(self):
+        self.mock_method.side_effect = [
+            create_return_object(
+                {
+                    "has_more": True,
+                    "messages": [{"ts": "1234567890.000001"}],
+                    "response_metadata": {"next_cursor": "abcdefg"},
+                }
+            ),
+            create_return_object({"has_more": False, "messages": [{"ts": "1234567890.000002"}]}),
+        ]
+
+        actual = asyncio.run(get_channel_message("CHANNEL_ID", "1234567890.000000"))
+        expected = [{"ts": "1234567890.000001"}, {"ts": "1234567890.000002"}]
+
+        assert actual == expected
+        self.mock_method.assert_has_awaits(
+            [
+                mock.call(channel="CHANNEL_ID", limit=1000, oldest="1234567890.000000"),
+                mock.call(
+                    channel="CHANNEL_ID",
+                    limit=1000,
+                    oldest="1234567890.000000",
+                    cursor="abcdefg",
+                ),
+            ]
+        )
+
+    def test_retry_when_ratelimited(self, disable_rate_limiter):
+        slack_response = mock.MagicMock()
+        slack_response.status_code = 429
+        slack_response.headers = {"retry-after": "3"}
+        self.mock_method.side_effect = [
+            SlackApiError("message", slack_response),
+            create_return_object({"has_more": False, "messages": []}),
+        ]
+
+        actual = asyncio.run(get_channel_message("CHANNEL_ID"))
+
+        assert actual == []
+        assert self.mock_method.await_count == 2
+        disable_rate_limiter.penalize.assert_called_once_with(mock.ANY, 3)
+
+    def test_retry_transient_error(self):
+        self.mock_method.side_effect = [
+            aiohttp.ClientConnectionError(),
+            create_return_object({"has_more": False, "messages": []}),
+        ]
+        with mock.patch(
+            "get_all_message_from_slack.util.async_slack_api.retry_policy.backoff", return_value=0
+        ):
+            actual = asyncio.run(get_channel_message("CHANNEL_ID"))
+
+        assert actual == []
+        assert self.mock_method.await_count == 2
+        # タイムアウト等の後はページサイズを小さくする
+        assert self.mock_method.await_args == mock.call(channel="CHANNEL_ID", limit=500)
+
+    def test_not_ratelimited_error(self):
+        slack_response = mock.MagicMock()
+        slack_response.status_code = 200
+        self.mock_method.side_effect = SlackApiError("message", slack_response)
+
+        with pytest.raises(SlackApiError):
+            asyncio.run(get_channel_message("CHANNEL_ID"))
+
+
+class TestGetReplies:
+    @pytest.fixture(autouse=True)
+    def setUp(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "conversations_replies",
+            new_callable=mock.AsyncMock,
+        ) as mock_method:
+            self.mock_method = mock_method
+            yield
+
+    def test_not_exists_thread_ts_in_message(self):
+        actual = asyncio.run(get_replies("CHANNEL_ID", {}))
+
+        assert actual == []
+        self.mock_method.assert_not_awaited()
+
+    def test_exists_thread_ts_in_message(self):
+        self.mock_method.return_value = create_return_object(
+            {"has_more": False, "messages": [{"ts": "1234567890.000010"}]}
+        )
+        actual = asyncio.run(get_replies("CHANNEL_ID", {"thread_ts": "1234567890.000001"}))
+
+        assert actual == [{"ts": "1234567890.000010"}]
+        self.mock_method.assert_awaited_once_with(channel="CHANNEL_ID", ts="1234567890.000001")
+
+
+class TestGetAllPublicChannels:
+    def test_next_cursor_true(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "conversations_list",
+            new_callable=mock.AsyncMock,
+        ) as mock_method:
+            mock_method.side_effect = [
+                create_return_object(
+                    {
+                        "channels": [{"id": "CHANNEL_ID1"}],
+                        "response_metadata": {"next_cursor": "NEXT_CURSOR"},
+                    }
+                ),
+                create_return_object(
+                    {"channels": [{"id": "CHANNEL_ID2"}], "response_metadata": {"next_cursor": ""}}
+                ),
+            ]
+            actual = asyncio.run(get_all_public_channels())
+
+        assert actual == [{"id": "CHANNEL_ID1"}, {"id": "CHANNEL_ID2"}]
+
+
+class TestGetAllUsers:
+    def test_nomal_case(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "users_list",
+            new_callable=mock.AsyncMock,
+        ) as mock_method:
+            mock_method.return_value = create_return_object(
+                {"members": [{"id": "USER_ID1"}], "response_metadata": {"next_cursor": ""}}
+            )
+            actual = asyncio.run(get_all_users())
+
+        assert actual == [{"id": "USER_ID1"}]
+        mock_method.assert_awaited_once_with()
@@ -0,0 +1,47 @@
+import asyncio
+from unittest import mock
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from benchmarks.fake_slack import FakeSlackServer, WorkspaceSpec
+from get_all_message_from_slack.util.async_transport import create_trace_config
+
+
+async def _get(url: str, on_response: mock.Mock) -> bytes:
+    trace_configs = [create_trace_config(on_response)]
+    async with aiohttp.ClientSession(trace_configs=trace_configs) as session:
+        async with session.get(url) as response:
+            return await response.read()
+
+
+class TestCreateTraceConfig:
+    def test_content_length(self):
+        on_response = mock.Mock()
+        spec = WorkspaceSpec(channels=3, messages_per_channel=10)
+        with FakeSlackServer(spec) as server:
+            body = asyncio.run(_get(f"{server.url}conversations.list", on_response))
+
+        # 圧縮された状態のバイト数で数える
+        on_response.assert_called_once_with("conversations.list", mock.ANY)
+        assert 0 < on_response.call_args.args[1] < len(body)
+
+    def test_chunked(self):
+        async def handler(request: web.Request) -> web.StreamResponse:
+            response = web.StreamResponse()
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            await response.write(b'{"ok": ')
+            await response.write(b"true}")
+            return response
+
+        async def run() -> bytes:
+            app = web.Application()
+            app.router.add_get("/api/users.list", handler)
+            async with TestServer(app) as server:
+                return await _get(str(server.make_url("/api/users.list")), on_response)
+
+        on_response = mock.Mock()
+        body = asyncio.run(run())
+
+        on_response.assert_called_once_with("users.list", len(body))
@@ -0,0 +1,80 @@
+from pathlib import Path
+
+from get_all_message_from_slack.util.checkpoint import CHECKPOINT_FILE_NAME, Checkpoint
+
+
+class TestCheckpoint:
+    def test_not_exists_checkpoint_file(self, tmp_path: Path):
+        checkpoint = Checkpoint.load(tmp_path)
+
+        assert not checkpoint.is_done("channel_master")
+        assert not checkpoint.is_channel_done("CHANNEL_ID")
+        assert checkpoint.threads_done("CHANNEL_ID") == set()
+        assert checkpoint.channel_progress("CHANNEL_ID") is None
+
+    def test_record_and_load(self, tmp_path: Path):
+        checkpoint = Checkpoint.create(tmp_path)
+        checkpoint.mark_done("channel_master")
+        checkpoint.mark_channel_done("CHANNEL_ID1")
+        checkpoint.mark_thread_done("CHANNEL_ID2", "1.000003")
+        checkpoint.mark_page(
+            "CHANNEL_ID2",
+            "CURSOR1",
+            {"count": 1, "offset": 10},
+            {"latest_ts": "1.000003", "threads": {"1.000003": "1.000004"}},
+            ["1.000003"],
+        )
+        checkpoint.mark_page(
+            "CHANNEL_ID2",
+            None,
+            {"count": 2, "offset": 20},
+            {"latest_ts": "1.000001", "threads": {}},
+            ["1.000001"],
+        )
+
+        actual = Checkpoint.load(tmp_path)
+
+        assert actual.is_done("channel_master")
+        assert not actual.is_done("user_master")
+        assert actual.is_channel_done("CHANNEL_ID1")
+        assert not actual.is_channel_done("CHANNEL_ID2")
+        assert actual.threads_done("CHANNEL_ID2") == {"1.000003"}
+        assert actual.channel_progress("CHANNEL_ID2") == {
+            "cursor": None,
+            "position": {"count": 2, "offset": 20},
+            "summary": {"latest_ts": "1.000003", "threads": {"1.000003": "1.000004"}},
+            "ts": ["1.000003", "1.000001"],
+        }
+
+    def test_channel_done_clears_progress(self, tmp_path: Path):
+        checkpoint = Checkpoint.create(tmp_path)
+        checkpoint.mark_thread_done("CHANNEL_ID", "1.000001")
+        checkpoint.mark_page("CHANNEL_ID", None, {"count": 1, "offset": 10}, None)
+        checkpoint.mark_channel_done("CHANNEL_ID")
+
+        assert checkpoint.threads_done("CHANNEL_ID") == set()
+        assert checkpoint.channel_progress("CHANNEL_ID") is None
+
+    def test_channel_summaries(self, tmp_path: Path):
+        summary = {"latest_ts": "1.000003", "threads": {"1.000003": "1.000004"}}
+        checkpoint = Checkpoint.create(tmp_path)
+        checkpoint.mark_channel_done("CHANNEL_ID1", summary)
+        checkpoint.mark_channel_done("CHANNEL_ID2")
+
+        assert Checkpoint.load(tmp_path).channel_summaries() == {"CHANNEL_ID1": summary}
+
+    def test_ignore_broken_last_line(self, tmp_path: Path):
+        checkpoint = Checkpoint.create(tmp_path)
+        checkpoint.mark_channel_done("CHANNEL_ID1")
+        with open(tmp_path / CHECKPOINT_FILE_NAME, "a") as f:
+            f.write('{"event": "channel_done", "chan')
+
+        actual = Checkpoint.load(tmp_path)
+
+        assert actual.is_channel_done("CHANNEL_ID1")
+
+    def test_create_discards_previous_records(self, tmp_path: Path):
+        Checkpoint.create(tmp_path).mark_channel_done("CHANNEL_ID")
+        Checkpoint.create(tmp_path)
+
+        assert not Checkpoint.load(tmp_path).is_channel_done("CHANNEL_ID")
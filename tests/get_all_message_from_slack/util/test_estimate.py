@@ -0,0 +1,115 @@
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack.util.estimate import (
+    ExportEstimate,
+    estimate_export,
+    estimate_messages,
+)
+from get_all_message_from_slack.util.export_state import ExportState
+from get_all_message_from_slack.util.page_size import PageSizer
+from get_all_message_from_slack.util.selection import ExportFilter
+
+
+class TestEstimateMessages:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.channel = {"id": "C1", "num_members": 9, "created": 1000}
+
+    def test_nomal_case(self):
+        assert estimate_messages(self.channel, now=2000) == 500
+
+    def test_oldest(self):
+        assert estimate_messages(self.channel, oldest="1500.000000", now=2000) == 250
+
+    def test_latest_before_oldest(self):
+        actual = estimate_messages(self.channel, oldest="1500.000000", latest="1250.0", now=2000)
+
+        assert actual == 0
+
+    def test_unknown_created(self):
+        actual = estimate_messages(
+            {"id": "C1", "num_members": 9}, oldest="1500.000000", messages_per_member=10, now=2000
+        )
+
+        assert actual == 100
+
+
+class TestEstimateExport:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.channels = [
+            {"id": "C1", "num_members": 9, "created": 1000},
+            {"id": "C2", "num_members": 199, "created": 1000},
+        ]
+        with mock.patch("get_all_message_from_slack.util.estimate.page_sizer", PageSizer()):
+            yield
+
+    def test_nomal_case(self):
+        actual = estimate_export(self.channels, listed_channels=5, now=2000)
+
+        assert actual == ExportEstimate(
+            2,
+            10500,
+            1050,
+            {
+                "conversations.list": 1,
+                "users.list": 2,
+                "conversations.history": 11,
+                "conversations.replies": 1050,
+            },
+            # conversations.replies（tier3: 50回/分）のレート制限で決まる
+            1260.0,
+        )
+        assert actual.total_calls == 1064
+
+    def test_workers_limited_by_rate(self):
+        actual = estimate_export(self.channels, max_workers=8, max_reply_workers=4, now=2000)
+
+        # 並列数を増やしてもレート制限より速くはならない
+        assert actual.seconds == 1260.0
+
+    def test_rate_share(self):
+        actual = estimate_export(self.channels, max_workers=8, now=2000, rate_share=0.5)
+
+        # シャードで分担する場合は分け合ったレートで見積もる
+        assert actual.seconds == 2520.0
+
+    def test_latency_bound(self):
+        with mock.patch("get_all_message_from_slack.util.estimate.LATENCY_SECONDS", 10):
+            actual = estimate_export(self.channels, max_workers=2, now=2000)
+
+        assert actual.seconds == 1064 * 10 / 4
+
+    def test_incremental(self, tmp_path: Path):
+        state = ExportState.load(tmp_path)
+        state.update_channel("C2", [{"ts": "1500.000000"}])
+
+        actual = estimate_export(self.channels, state=state, now=2000)
+
+        assert actual.messages == 500 + 5000
+        assert actual.calls["conversations.history"] == 1 + 5
+
+    def test_export_filter(self):
+        actual = estimate_export(
+            self.channels, ExportFilter(oldest="1900.000000", latest="1950.000000"), now=2000
+        )
+
+        assert actual.messages == 25 + 500
+        # メッセージが無くてもチャンネル毎に1回は呼び出す
+        assert actual.calls["conversations.history"] == 2
+
+    def test_page_size(self):
+        sizer = PageSizer({"conversations.history": 100})
+        with mock.patch("get_all_message_from_slack.util.estimate.page_sizer", sizer):
+            actual = estimate_export(self.channels, now=2000)
+
+        assert actual.calls["conversations.history"] == 5 + 100
+
+    def test_no_channels(self):
+        actual = estimate_export([], now=2000)
+
+        assert actual.channels == 0
+        assert actual.messages == 0
+        assert actual.calls["conversations.history"] == 0
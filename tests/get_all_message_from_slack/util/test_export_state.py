@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from get_all_message_from_slack.util.export_state import (
+    ExportState,
+    merge_summaries,
+    summarize_messages,
+    ts_key,
+)
+
+
+class TestTsKey:
+    def test_nomal_case(self):
+        assert ts_key("1638883139.000600") == (1638883139, 600)
+        assert ts_key("1638883139.000600") < ts_key("1638883139.001000")
+
+
+class TestExportState:
+    def test_not_exists_state_file(self, tmp_path: Path):
+        state = ExportState.load(tmp_path)
+
+        assert state.latest_ts("CHANNEL_ID") is None
+        assert state.oldest("CHANNEL_ID") is None
+
+    def test_save_and_load(self, tmp_path: Path):
+        state = ExportState.load(tmp_path)
+        state.update_channel(
+            "CHANNEL_ID",
+            [
+                {"ts": "1638883139.000600"},
+                {"ts": "1638883140.000100", "thread_ts": "1638883140.000100"},
+                {"ts": "1638883100.000100", "thread_ts": "1638883100.000100", "latest_reply": "1"},
+            ],
+        )
+        state.save()
+
+        actual = ExportState.load(tmp_path)
+
+        assert actual.latest_ts("CHANNEL_ID") == "1638883140.000100"
+        assert actual.oldest("CHANNEL_ID", 100) == "1638883040.000100"
+
+    def test_is_thread_updated(self, tmp_path: Path):
+        state = ExportState.load(tmp_path)
+        message = {"ts": "1.000001", "thread_ts": "1.000001", "latest_reply": "1.000002"}
+
+        assert not state.is_thread_updated("CHANNEL_ID", {"ts": "1.000001"})
+        assert state.is_thread_updated("CHANNEL_ID", message)
+        state.update_channel("CHANNEL_ID", [message])
+        assert not state.is_thread_updated("CHANNEL_ID", message)
+        assert state.is_thread_updated("CHANNEL_ID", {**message, "latest_reply": "1.000003"})
+
+
+class TestSummarizeMessages:
+    def test_nomal_case(self):
+        summary = summarize_messages([{"ts": "1.000002"}])
+        actual = summarize_messages(
+            [
+                {"ts": "1.000003", "thread_ts": "1.000003", "latest_reply": "1.000004"},
+                {"ts": "1.000001"},
+            ],
+            summary,
+        )
+        expected = {"latest_ts": "1.000003", "threads": {"1.000003": "1.000004"}}
+
+        assert actual == expected
+
+
+class TestMergeSummaries:
+    def test_nomal_case(self):
+        summary = {"latest_ts": "1.000002", "threads": {"1.000001": "1.000005"}}
+        other = {"latest_ts": "1.000003", "threads": {"1.000003": "1.000004"}}
+        expected = {
+            "latest_ts": "1.000003",
+            "threads": {"1.000001": "1.000005", "1.000003": "1.000004"},
+        }
+
+        assert merge_summaries(summary, other) == expected
+
+    def test_none(self):
+        other = {"latest_ts": "1.000003", "threads": {}}
+
+        assert merge_summaries(None, None) is None
+        assert merge_summaries(None, other) == other
+        assert merge_summaries(other, None) == other
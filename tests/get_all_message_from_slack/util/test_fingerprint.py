@@ -0,0 +1,183 @@
+from pathlib import Path
+
+import pytest
+from get_all_message_from_slack.util.fingerprint import (
+    ChannelFingerprint,
+    Fingerprints,
+    changed_windows,
+    diff_messages,
+    fingerprint_channel,
+    fingerprint_messages,
+    fingerprint_windows,
+    is_thread_changed,
+    merge_fingerprints,
+    message_hash,
+    window_key,
+)
+
+
+class TestMessageHash:
+    def test_edited(self):
+        message = {"ts": "1.000001", "text": "a"}
+
+        assert message_hash(message) == message_hash({"ts": "1.000001", "text": "b"})
+        assert message_hash(message) != message_hash(
+            {"ts": "1.000001", "edited": {"ts": "2.000001"}}
+        )
+        assert message_hash(message) != message_hash({"ts": "1.000001", "subtype": "tombstone"})
+
+
+class TestWindowKey:
+    def test_nomal_case(self):
+        assert window_key("86399.999999") == "0"
+        assert window_key("86400.000001") == "86400"
+        assert window_key("130.000001", window_seconds=60) == "120"
+
+
+class TestFingerprintWindows:
+    def test_order_independent(self):
+        messages = [{"ts": "1.000001"}, {"ts": "2.000001"}, {"ts": "86401.000001"}]
+
+        actual = fingerprint_windows(messages)
+
+        assert list(actual) == ["0", "86400"]
+        assert actual["0"]["count"] == 2
+        assert actual["0"]["latest_ts"] == "2.000001"
+        assert actual == fingerprint_windows(reversed(messages))
+
+    def test_changed_windows(self):
+        saved = fingerprint_windows([{"ts": "1.000001"}, {"ts": "86401.000001"}])
+        fetched = fingerprint_windows(
+            [{"ts": "1.000001", "edited": {"ts": "5.000001"}}, {"ts": "86401.000001"}]
+        )
+
+        assert changed_windows(saved, fetched) == {"0"}
+        assert changed_windows(saved, saved) == set()
+        assert changed_windows(saved, {}) == {"0", "86400"}
+
+
+class TestFingerprintChannel:
+    def test_nomal_case(self):
+        messages = [
+            {"ts": "2.000001"},
+            {"ts": "1.000001", "thread_ts": "1.000001", "reply_count": 1, "latest_reply": "3.0"},
+        ]
+        replies = {"1.000001": [messages[1], {"ts": "3.0", "thread_ts": "1.000001"}]}
+
+        actual = fingerprint_channel(iter(messages), lambda m: replies[m["thread_ts"]])
+
+        assert actual["oldest_ts"] == "1.000001"
+        assert actual["windows"]["0"]["count"] == 2
+        thread = actual["threads"]["1.000001"]
+        assert (thread["reply_count"], thread["latest_reply"], thread["count"]) == (1, "3.0", 2)
+
+    def test_empty(self):
+        assert fingerprint_channel([], lambda m: []) == {
+            "oldest_ts": None,
+            "windows": {},
+            "threads": {},
+        }
+
+
+class TestMergeFingerprints:
+    def test_nomal_case(self):
+        messages = [{"ts": "1.000001"}, {"ts": "3.000001"}, {"ts": "2.000001"}]
+
+        actual = merge_fingerprints(
+            fingerprint_messages(messages[:2]), fingerprint_messages(messages[2:])
+        )
+
+        assert actual == fingerprint_messages(messages)
+        assert merge_fingerprints(actual, fingerprint_messages([])) == actual
+
+
+class TestChannelFingerprint:
+    PARENT = {"ts": "1.000001", "thread_ts": "1.000001", "reply_count": 1, "latest_reply": "3.0"}
+    REPLIES = [PARENT, {"ts": "3.0", "thread_ts": "1.000001"}]
+
+    def test_same_as_fingerprint_channel(self):
+        messages = [{"ts": "2.000001"}, self.PARENT]
+        fingerprint = ChannelFingerprint()
+
+        fingerprint.add_all(messages[:1])
+        assert list(fingerprint.scan(messages[1:])) == messages[1:]
+        fingerprint.add_replies("1.000001", self.REPLIES[:1])
+        fingerprint.add_replies("1.000001", self.REPLIES[1:])
+
+        actual = fingerprint.result(lambda m: pytest.fail("replies should not be read"))
+        assert actual == fingerprint_channel(messages, lambda m: self.REPLIES)
+
+    def test_saved_thread(self):
+        saved = fingerprint_channel([self.PARENT], lambda m: self.REPLIES)
+        fingerprint = ChannelFingerprint(saved=saved)
+        fingerprint.add_all([self.PARENT, {"ts": "2.000001", "thread_ts": "2.000001"}])
+
+        actual = fingerprint.result(lambda m: pytest.fail("replies should not be read"))
+
+        assert actual["threads"] == saved["threads"]
+
+    def test_changed_thread_without_replies(self):
+        saved = fingerprint_channel([self.PARENT], lambda m: self.REPLIES)
+        parent = dict(self.PARENT, reply_count=2, latest_reply="4.0")
+        replies = self.REPLIES + [{"ts": "4.0", "thread_ts": "1.000001"}]
+        fingerprint = ChannelFingerprint(saved=saved)
+        fingerprint.add_all([parent])
+
+        actual = fingerprint.result(lambda m: replies)
+
+        # 取得していない、引き継げないスレッドは保存済みのリプライから作成する
+        assert actual["threads"] == fingerprint_channel([parent], lambda m: replies)["threads"]
+
+
+class TestIsThreadChanged:
+    def test_nomal_case(self):
+        saved = {"reply_count": 1, "latest_reply": "3.0"}
+
+        assert not is_thread_changed(saved, {"ts": "1.0", "reply_count": 1, "latest_reply": "3.0"})
+        assert is_thread_changed(saved, {"ts": "1.0", "reply_count": 2, "latest_reply": "4.0"})
+        assert is_thread_changed(saved, {"ts": "1.0"})
+
+    def test_not_saved(self):
+        assert is_thread_changed(None, {"ts": "1.0", "reply_count": 1})
+        assert not is_thread_changed(None, {"ts": "1.0"})
+
+
+class TestDiffMessages:
+    def test_nomal_case(self):
+        saved = [{"ts": "1.000001"}, {"ts": "2.000001"}, {"ts": "3.000001"}, {"ts": "4.000001"}]
+        fetched = [
+            {"ts": "1.000001"},
+            {"ts": "2.000001", "edited": {"ts": "9.000001"}},
+            {"ts": "4.000001", "subtype": "tombstone"},
+            {"ts": "5.000001"},
+        ]
+
+        assert diff_messages(saved, fetched) == {
+            "edited": ["2.000001"],
+            "deleted": ["3.000001", "4.000001"],
+            "added": ["5.000001"],
+        }
+
+
+class TestFingerprints:
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path: Path):
+        self.tmp_path = tmp_path
+
+    def test_save_and_load(self):
+        fingerprints = Fingerprints.load(self.tmp_path)
+        assert fingerprints.get("C1") is None
+
+        expected = fingerprints.update_channel("C1", [{"ts": "1.000001"}], lambda m: [])
+        path = fingerprints.save()
+
+        assert path == self.tmp_path / "fingerprints.json"
+        assert not path.with_suffix(".tmp").exists()
+        actual = Fingerprints.load(self.tmp_path)
+        assert actual.get("C1") == expected
+        assert actual.window_seconds == fingerprints.window_seconds
+
+    def test_window_seconds(self):
+        Fingerprints(self.tmp_path / "fingerprints.json", window_seconds=60).save()
+
+        assert Fingerprints.load(self.tmp_path).window_seconds == 60
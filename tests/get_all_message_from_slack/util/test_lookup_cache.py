@@ -0,0 +1,134 @@
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack.util.lookup_cache import LookupCache, user_profile
+from get_all_message_from_slack.util.writer import OutputFormat
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+USER = {
+    "id": "USER_ID",
+    "name": "user",
+    "real_name": "REAL_NAME",
+    "profile": {"display_name": "DISPLAY_NAME", "image_72": "https://example.com/a.png"},
+}
+
+
+class TestUserProfile:
+    def test_nomal_case(self):
+        assert user_profile(USER) == {
+            "id": "USER_ID",
+            "name": "user",
+            "real_name": "REAL_NAME",
+            "display_name": "DISPLAY_NAME",
+        }
+
+
+class TestLookupCache:
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path: Path):
+        self.clock = FakeClock()
+        self.path = tmp_path / "cache" / "lookup_cache.json"
+        self.cache = LookupCache(self.path, ttl_seconds=60, clock=self.clock)
+
+    def test_lookup(self):
+        self.cache.add_channels([{"id": "CHANNEL_ID", "name": "general"}])
+        self.cache.add_users([USER])
+
+        assert self.cache.channel_id("general") == "CHANNEL_ID"
+        assert self.cache.channel_id("random") is None
+        assert self.cache.user("USER_ID")["real_name"] == "REAL_NAME"
+        assert self.cache.user("OTHER_ID") is None
+
+    def test_expire(self):
+        self.cache.add_channels([{"id": "CHANNEL_ID", "name": "general"}])
+        self.clock.now += 61
+
+        assert self.cache.channel_id("general") is None
+
+    def test_save_and_load(self):
+        self.cache.add_channels([{"id": "CHANNEL_ID1", "name": "old"}])
+        self.clock.now += 30
+        self.cache.add_channels([{"id": "CHANNEL_ID2", "name": "general"}])
+        self.cache.add_users([USER])
+        self.cache.save()
+
+        self.clock.now += 40
+        actual = LookupCache(self.path, ttl_seconds=60, clock=self.clock)
+
+        assert actual.channel_id("old") is None
+        assert actual.channel_id("general") == "CHANNEL_ID2"
+        assert actual.user("USER_ID")["display_name"] == "DISPLAY_NAME"
+
+    def test_not_save_without_path(self):
+        assert LookupCache().save() is None
+
+    def test_not_save_unchanged(self):
+        assert self.cache.save() is None
+        assert not self.path.exists()
+
+        self.cache.add_channels([{"id": "CHANNEL_ID", "name": "general"}])
+        assert self.cache.save() == self.path
+        assert self.cache.save() is None
+
+    def test_save_from_multiple_caches(self):
+        # 複数のプロセス（シャード）から同じファイルに保存しても、一時ファイルが衝突しない
+        other = LookupCache(self.path, ttl_seconds=60, clock=self.clock)
+        self.cache.add_channels([{"id": "CHANNEL_ID", "name": "general"}])
+        other.add_users([USER])
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+
+        with mock.patch(
+            "get_all_message_from_slack.util.lookup_cache.os.getpid", side_effect=[1, 2]
+        ):
+            self.cache.save()
+            other.save()
+
+        assert not tmp_path.exists()
+        assert list(self.path.parent.iterdir()) == [self.path]
+        assert LookupCache(self.path, clock=self.clock).user("USER_ID") is not None
+
+    def test_set_path(self, tmp_path: Path):
+        self.cache.add_channels([{"id": "CHANNEL_ID", "name": "general"}])
+        path = tmp_path / "other" / "lookup_cache.json"
+
+        self.cache.set_path(path)
+
+        assert self.cache.save() == path
+        assert not self.path.exists()
+        assert LookupCache(path, clock=self.clock).channel_id("general") == "CHANNEL_ID"
+
+    def test_load_masters(self, tmp_path: Path):
+        output_format = OutputFormat("ndjson", "gzip")
+        with output_format.writer(tmp_path / "channel_master") as writer:
+            writer.write({"id": "CHANNEL_ID", "name": "general"})
+        with output_format.writer(tmp_path / "user_master") as writer:
+            writer.write(USER)
+
+        self.cache.load_masters(tmp_path, output_format)
+
+        assert self.cache.channel_id("general") == "CHANNEL_ID"
+        assert self.cache.user("USER_ID")["name"] == "user"
+
+    def test_add_masters(self, tmp_path: Path):
+        output_format = mock.Mock(wraps=OutputFormat())
+        with output_format.writer(tmp_path / "channel_master") as writer:
+            writer.write({"id": "CHANNEL_ID", "name": "general"})
+
+        self.cache.add_masters(tmp_path, output_format)
+
+        # 検索するまでは読み込まず、保存もしない
+        output_format.iter_items.assert_not_called()
+        assert self.cache.save() is None
+        assert self.cache.channel_id("general") == "CHANNEL_ID"
+        assert self.cache.user("USER_ID") is None
+        assert output_format.iter_items.call_count == 1
+        assert self.cache.save() == self.path
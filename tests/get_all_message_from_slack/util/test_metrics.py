@@ -0,0 +1,105 @@
+import json
+from pathlib import Path
+
+import pytest
+from get_all_message_from_slack.util.metrics import (
+    ERROR,
+    RATELIMITED,
+    Histogram,
+    Metrics,
+)
+
+
+class TestHistogram:
+    def test_nomal_case(self):
+        histogram = Histogram((0.1, 1))
+        for value in [0.05, 0.1, 0.5, 3]:
+            histogram.observe(value)
+
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(3.65)
+        assert histogram.max == 3
+        assert histogram.cumulative() == [("0.1", 2), ("1", 3), ("+Inf", 4)]
+
+
+class TestMetrics:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.metrics = Metrics()
+        self.metrics.record_wait("conversations.history", 0.5)
+        self.metrics.record_wait("conversations.history", 0)
+        self.metrics.record_call("conversations.history", 0.2)
+        self.metrics.record_call("conversations.history", 0.1, RATELIMITED)
+        self.metrics.record_retry("conversations.history", 4)
+        self.metrics.record_bytes("conversations.history", 1000)
+        self.metrics.record_page("conversations.history", "C1")
+        self.metrics.record_page("conversations.replies", "C1")
+        self.metrics.record_call("users.list", 0.3, ERROR)
+        self.metrics.record_page("users.list")
+        self.metrics.record_threads(2, {"no_replies": 3, "unchanged": 1})
+        self.metrics.record_threads(1, {"no_replies": 1})
+        self.metrics.record_object(100, stored=True)
+        self.metrics.record_object(100, stored=False)
+        self.metrics.record_object(50, stored=False)
+
+    def test_summary(self):
+        actual = self.metrics.summary()
+
+        history = actual["methods"]["conversations.history"]
+        assert history["calls"] == 2
+        assert history["ratelimited"] == 1
+        assert history["retries"] == 1
+        assert history["retry_after_seconds"] == 4
+        assert history["wait_seconds"] == 0.5
+        assert history["received_bytes"] == 1000
+        assert history["latency_seconds"]["avg"] == pytest.approx(0.15)
+        assert history["latency_seconds"]["max"] == 0.2
+        assert actual["methods"]["users.list"]["errors"] == 1
+        assert actual["total"]["calls"] == 3
+        assert actual["total"]["pages"] == 3
+        assert actual["total"]["latency_seconds"] == pytest.approx(0.6)
+        assert actual["channel_pages"] == {"C1": 2}
+        assert actual["threads"] == {
+            "fetched": 3,
+            "skipped": {"no_replies": 4, "unchanged": 1},
+            "calls_saved": 5,
+        }
+        assert actual["objects"] == {
+            "stored": 1,
+            "reused": 2,
+            "stored_bytes": 100,
+            "reused_bytes": 150,
+        }
+
+    def test_prometheus(self):
+        actual = self.metrics.prometheus().splitlines()
+
+        assert "# TYPE slack_api_call_duration_seconds histogram" in actual
+        assert 'slack_api_calls_total{method="conversations.history",status="ok"} 1' in actual
+        assert (
+            'slack_api_call_duration_seconds_bucket{method="conversations.history",le="0.25"} 2'
+            in actual
+        )
+        assert 'slack_api_call_duration_seconds_count{method="users.list"} 1' in actual
+        assert 'slack_api_retries_total{method="conversations.history"} 1' in actual
+        assert 'slack_api_received_bytes_total{method="conversations.history"} 1000' in actual
+        assert 'slack_export_channel_pages_total{channel="C1"} 2' in actual
+        assert 'slack_export_threads_total{decision="fetch"} 3' in actual
+        assert 'slack_export_threads_total{decision="skip",reason="no_replies"} 4' in actual
+        assert 'slack_export_objects_total{result="reused"} 2' in actual
+        assert 'slack_export_object_bytes_total{result="stored"} 100' in actual
+
+    def test_save(self, tmp_path: Path):
+        with open(self.metrics.save(tmp_path / "metrics.json")) as f:
+            assert json.load(f) == json.loads(json.dumps(self.metrics.summary()))
+        path = self.metrics.save_prometheus(tmp_path / "slack.prom")
+
+        assert path.read_text() == self.metrics.prometheus()
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["metrics.json", "slack.prom"]
+
+    def test_reset(self):
+        self.metrics.reset()
+
+        assert self.metrics.summary()["methods"] == {}
+        assert self.metrics.summary()["channel_pages"] == {}
+        assert self.metrics.summary()["objects"]["reused"] == 0
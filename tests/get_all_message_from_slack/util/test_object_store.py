@@ -0,0 +1,220 @@
+import json
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack.util.object_store import (
+    OBJECTS_DIR_NAME,
+    SNAPSHOT_FILE_NAME,
+    ObjectStore,
+    ObjectWriter,
+    Snapshot,
+    locate,
+    prune_objects,
+)
+from get_all_message_from_slack.util.writer import OutputFormat
+
+
+class TestLocate:
+    @pytest.mark.parametrize(
+        "base, expected",
+        [
+            ("channel_master", "channel_master"),
+            ("user_master", "user_master"),
+            ("C1/nomal_messages", "C1/nomal_messages"),
+            ("C1/1638316800_000100", "C1/1638316800_000100"),
+        ],
+    )
+    def test_nomal_case(self, tmp_path: Path, base: str, expected: str):
+        assert locate(tmp_path / base) == (tmp_path, expected)
+
+
+class TestObjectStore:
+    @pytest.mark.parametrize("compression", [None, "gzip"])
+    def test_put(self, tmp_path: Path, compression):
+        store = ObjectStore(tmp_path / OBJECTS_DIR_NAME, compression)
+        with mock.patch("get_all_message_from_slack.util.object_store.metrics") as mock_metrics:
+            digest = store.put('{"ts": "1"}\n')
+            path = store.object_path(digest)
+            mtime = path.stat().st_mtime_ns
+
+            assert store.put('{"ts": "1"}\n') == digest
+
+        # 同じ内容は書き込まない
+        assert path.stat().st_mtime_ns == mtime
+        assert [p for p in path.parent.iterdir()] == [path]
+        assert path.parent.name == digest[:2]
+        assert mock_metrics.record_object.call_args_list == [
+            mock.call(12, stored=True),
+            mock.call(12, stored=False),
+        ]
+        assert list(store.iter_items([digest, digest])) == [{"ts": "1"}, {"ts": "1"}]
+
+
+class TestObjectWriter:
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path: Path):
+        self.root = tmp_path / "20211208_120000"
+        self.root.mkdir()
+        self.store = ObjectStore(tmp_path / OBJECTS_DIR_NAME)
+        self.snapshot = Snapshot(self.root, self.store)
+        self.data = [{"ts": str(i), "text": "テキスト"} for i in range(100)]
+
+    def _write(self, data, snapshot=None):
+        snapshot = self.snapshot if snapshot is None else snapshot
+        with ObjectWriter(snapshot, "C1/nomal_messages", chunk_items=8) as writer:
+            writer.write_all(data)
+        return writer
+
+    def test_nomal_case(self):
+        writer = self._write(self.data)
+
+        assert writer.count == 100
+        assert len(writer.digests) > 1
+        assert self.snapshot.exists("C1/nomal_messages")
+        assert list(self.snapshot.iter_items("C1/nomal_messages")) == self.data
+        # 再読み込みしても同じ内容
+        snapshot = Snapshot(self.root, self.store)
+        assert list(snapshot.iter_items("C1/nomal_messages")) == self.data
+
+    def test_deduplicate(self):
+        first = self._write(self.data)
+        # 新しいメッセージが先頭に追加され、途中のメッセージが編集された
+        changed = [{"ts": "100"}] + self.data
+        changed[50] = {**changed[50], "text": "edited"}
+        (self.root.parent / "next").mkdir()
+        second = self._write(changed, Snapshot(self.root.parent / "next", self.store))
+
+        shared = set(first.digests) & set(second.digests)
+        # 追加・編集されたチャンク以外は同じオブジェクトを参照する
+        assert len(shared) >= len(first.digests) - 2
+        assert len(list(self.store.path.glob("*/*"))) <= len(first.digests) + 2
+
+    def test_max_chunk_bytes(self):
+        with ObjectWriter(
+            self.snapshot, "C1/nomal_messages", chunk_items=1 << 30, max_chunk_bytes=1
+        ) as writer:
+            writer.write_all(self.data[:3])
+
+        assert len(writer.digests) == 3
+
+    def test_skip_empty(self):
+        with ObjectWriter(self.snapshot, "C1/1_000000", skip_empty=True) as writer:
+            pass
+
+        assert writer.close() is None
+        assert not self.snapshot.exists("C1/1_000000")
+
+    def test_checkpoint_and_resume(self):
+        with pytest.raises(RuntimeError):
+            with ObjectWriter(self.snapshot, "C1/nomal_messages", chunk_items=8) as writer:
+                writer.write_all(self.data[:30])
+                position = writer.checkpoint()
+                # checkpoint 以降の書き込みは再開時に破棄される
+                writer.write_all([{"ts": "x"}])
+                raise RuntimeError("error")
+
+        assert not self.snapshot.exists("C1/nomal_messages")
+        with ObjectWriter(self.snapshot, "C1/nomal_messages", chunk_items=8) as writer:
+            writer.resume(json.loads(json.dumps(position)))
+            writer.write_all(self.data[30:])
+
+        assert writer.count == 100
+        assert list(self.snapshot.iter_items("C1/nomal_messages")) == self.data
+        # 再開後も区切りは変わらない
+        assert writer.digests == self._write(self.data).digests
+        assert not list(self.root.rglob("*.tmp"))
+
+    def test_resume_without_pending(self):
+        writer = ObjectWriter(self.snapshot, "C1/nomal_messages")
+        with pytest.raises(FileNotFoundError):
+            writer.resume({"count": 3, "objects": [], "pending": 3})
+
+
+class TestSnapshot:
+    def test_compact(self, tmp_path: Path):
+        store = ObjectStore(tmp_path / OBJECTS_DIR_NAME)
+        snapshot = Snapshot(tmp_path, store)
+        snapshot.record("channel_master", ["a"], 1)
+        snapshot.record("channel_master", ["b"], 1)
+        snapshot.record("user_master", ["c"], 1)
+        snapshot.compact()
+
+        lines = (tmp_path / SNAPSHOT_FILE_NAME).read_text().splitlines()
+        assert [json.loads(line)["objects"] for line in lines] == [["b"], ["c"]]
+        assert Snapshot(tmp_path, store).digests() == {"b", "c"}
+
+    def test_ignore_broken_line(self, tmp_path: Path):
+        (tmp_path / SNAPSHOT_FILE_NAME).write_text(
+            json.dumps({"key": "channel_master", "objects": ["a"], "count": 1}) + '\n{"key": '
+        )
+
+        snapshot = Snapshot(tmp_path, ObjectStore(tmp_path / OBJECTS_DIR_NAME))
+
+        assert snapshot.exists("channel_master")
+        assert snapshot.digests() == {"a"}
+
+
+class TestDedupOutputFormat:
+    def _export(self, root: Path, messages):
+        root.mkdir()
+        output_format = OutputFormat("dedup", "gzip")
+        with output_format.writer(root / "channel_master") as writer:
+            writer.write({"id": "C1", "name": "general"})
+        with output_format.writer(root / "C1" / "nomal_messages") as writer:
+            writer.write_all(messages)
+        with output_format.replies_writer(root / "C1", "1.000000") as writer:
+            writer.write({"ts": "1.1", "thread_ts": "1.000000"})
+        return output_format
+
+    def test_write_and_read(self, tmp_path: Path):
+        root = tmp_path / "20211208_120000"
+        messages = [{"ts": str(i)} for i in range(5)]
+
+        output_format = self._export(root, messages)
+        assert output_format.exists(root / "C1" / "nomal_messages")
+        output_format.close()
+
+        output_format = OutputFormat("dedup", "gzip")
+        assert list(output_format.iter_items(root / "C1" / "nomal_messages")) == messages
+        assert list(output_format.iter_replies(root / "C1", "1.000000")) == [
+            {"ts": "1.1", "thread_ts": "1.000000"}
+        ]
+        assert not output_format.exists(root / "user_master")
+        # スナップショットにはマニフェストのみ保存する
+        assert [p.name for p in root.iterdir()] == [SNAPSHOT_FILE_NAME]
+        assert all(p.suffix == ".gz" for p in (tmp_path / OBJECTS_DIR_NAME).glob("*/*"))
+
+    def test_snapshots_share_objects(self, tmp_path: Path):
+        messages = [{"ts": str(i)} for i in range(5)]
+        self._export(tmp_path / "20211208_120000", messages).close()
+        objects = sorted((tmp_path / OBJECTS_DIR_NAME).glob("*/*"))
+
+        self._export(tmp_path / "20211209_120000", messages).close()
+
+        assert sorted((tmp_path / OBJECTS_DIR_NAME).glob("*/*")) == objects
+
+    def test_not_supported_thread_storage(self):
+        with pytest.raises(ValueError):
+            OutputFormat("dedup", thread_storage="channel")
+
+
+class TestPruneObjects:
+    def test_nomal_case(self, tmp_path: Path):
+        store = ObjectStore(tmp_path / OBJECTS_DIR_NAME)
+        kept = store.put('{"ts": "1"}\n')
+        sharded = store.put('{"ts": "2"}\n')
+        removed = store.put('{"ts": "3"}\n')
+        (tmp_path / "20211208_120000").mkdir()
+        Snapshot(tmp_path / "20211208_120000", store).record("channel_master", [kept], 1)
+        (tmp_path / "big" / "shard-000-of-002").mkdir(parents=True)
+        Snapshot(tmp_path / "big" / "shard-000-of-002", store).record("user_master", [sharded], 1)
+
+        assert prune_objects(tmp_path) == 1
+
+        assert store.object_path(kept).exists()
+        assert store.object_path(sharded).exists()
+        assert not store.object_path(removed).exists()
+
+    def test_no_objects(self, tmp_path: Path):
+        assert prune_objects(tmp_path) == 0
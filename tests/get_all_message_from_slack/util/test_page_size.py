@@ -0,0 +1,75 @@
+import pytest
+from get_all_message_from_slack.util.page_size import PageSizer, parse_page_sizes
+
+
+class TestParsePageSizes:
+    def test_parse(self):
+        actual = parse_page_sizes(" conversations.history=200, conversations.replies = 0 ,")
+        assert actual == {"conversations.history": 200, "conversations.replies": 0}
+
+    def test_empty(self):
+        assert parse_page_sizes("") == {}
+
+    @pytest.mark.parametrize("value", ["conversations.history", "conversations.history=a"])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            parse_page_sizes(value)
+
+
+class TestPageSizer:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.sizer = PageSizer(
+            {"conversations.history": 1000}, min_size=100, slow_seconds=5.0, grow_after=2
+        )
+
+    def test_limit(self):
+        assert self.sizer.limit("conversations.history") == 1000
+        assert self.sizer.limit("users.list") is None
+
+    def test_shrink(self):
+        for expected in (500, 250, 125, 100, 100):
+            self.sizer.shrink("conversations.history")
+            assert self.sizer.limit("conversations.history") == expected
+
+    def test_shrink_not_configured(self):
+        self.sizer.shrink("users.list")
+        assert self.sizer.limit("users.list") is None
+
+    def test_shrink_when_slow(self):
+        self.sizer.record("conversations.history", 5.0)
+        assert self.sizer.limit("conversations.history") == 500
+
+    def test_grow_after_fast_responses(self):
+        self.sizer.shrink("conversations.history")
+        self.sizer.shrink("conversations.history")
+
+        self.sizer.record("conversations.history", 0.1)
+        assert self.sizer.limit("conversations.history") == 250
+        self.sizer.record("conversations.history", 0.1)
+        assert self.sizer.limit("conversations.history") == 500
+        self.sizer.record("conversations.history", 0.1)
+        self.sizer.record("conversations.history", 0.1)
+        assert self.sizer.limit("conversations.history") == 1000
+        self.sizer.record("conversations.history", 0.1)
+        self.sizer.record("conversations.history", 0.1)
+        assert self.sizer.limit("conversations.history") == 1000
+
+    def test_slow_response_resets_streak(self):
+        self.sizer.shrink("conversations.history")
+        self.sizer.record("conversations.history", 0.1)
+        self.sizer.record("conversations.history", 9.0)
+        self.sizer.record("conversations.history", 0.1)
+        assert self.sizer.limit("conversations.history") == 250
+
+    def test_update(self):
+        self.sizer.shrink("conversations.history")
+        self.sizer.update({"conversations.history": 200, "conversations.replies": 0})
+
+        assert self.sizer.limit("conversations.history") == 200
+        assert self.sizer.limit("conversations.replies") is None
+
+    def test_min_size_larger_than_configured(self):
+        sizer = PageSizer({"conversations.history": 20}, min_size=100)
+        sizer.shrink("conversations.history")
+        assert sizer.limit("conversations.history") == 20
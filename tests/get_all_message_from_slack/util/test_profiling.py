@@ -0,0 +1,43 @@
+import pstats
+import threading
+
+import pytest
+from get_all_message_from_slack.util.profiling import Profiler
+
+
+def _work_in_thread():
+    return sum(range(1000))
+
+
+class TestProfiler:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.profiler = Profiler()
+
+    def test_profile_threads(self, tmp_path):
+        with self.profiler:
+            thread = threading.Thread(target=_work_in_thread)
+            thread.start()
+            thread.join()
+
+        path = self.profiler.dump(tmp_path / "out" / "export.prof")
+
+        functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+        assert "_work_in_thread" in functions
+
+    def test_summary(self):
+        with self.profiler:
+            _work_in_thread()
+
+        summary = self.profiler.summary(limit=5)
+
+        assert "function calls" in summary
+        assert "_work_in_thread" in summary
+
+    def test_stop_profiling_on_exit(self):
+        with self.profiler:
+            pass
+
+        _work_in_thread()
+        functions = {name for _, _, name in self.profiler.stats().stats}
+        assert "_work_in_thread" not in functions
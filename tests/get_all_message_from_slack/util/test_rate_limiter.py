@@ -0,0 +1,135 @@
+import asyncio
+import threading
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack.util.rate_limiter import (
+    RateLimiter,
+    TokenBucket,
+    method_name,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBucket:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.clock = FakeClock()
+        # 1秒に1回、バースト2回
+        self.bucket = TokenBucket(60, 2, self.clock)
+
+    def test_burst(self):
+        assert self.bucket.reserve() == 0
+        assert self.bucket.reserve() == 0
+        assert self.bucket.reserve() == pytest.approx(1.0)
+        assert self.bucket.reserve() == pytest.approx(2.0)
+
+    def test_refill(self):
+        self.bucket.reserve()
+        self.bucket.reserve()
+        self.clock.now = 1.0
+        assert self.bucket.reserve() == 0
+
+    def test_penalize(self):
+        self.bucket.penalize(10)
+
+        assert self.bucket.reserve() == pytest.approx(10)
+        assert self.bucket.rate == pytest.approx(0.8)
+
+    def test_penalize_spreads_waiting_calls(self):
+        self.bucket.penalize(10)
+        # 待機中はトークンが増えないため、待機中に予約した呼び出しは待機明けからレートに従って実行する
+        self.clock.now = 5.0
+
+        assert self.bucket.reserve() == pytest.approx(5)
+        assert self.bucket.reserve() == pytest.approx(5 + 1.25)
+        assert self.bucket.reserve() == pytest.approx(5 + 2.5)
+
+    def test_refill_after_penalize(self):
+        self.bucket.penalize(10)
+        self.clock.now = 11.25
+
+        # 待機明けの1回分と、待機明けから1.25秒分（0.8回/秒）のトークンのみ使用できる
+        assert self.bucket.reserve() == 0
+        assert self.bucket.reserve() == 0
+        assert self.bucket.reserve() == pytest.approx(1.25)
+
+    def test_recover(self):
+        self.bucket.penalize(1)
+        for _ in range(100):
+            self.bucket.recover()
+
+        assert self.bucket.rate == pytest.approx(1.0)
+
+    def test_thread_safe(self):
+        bucket = TokenBucket(60, 1000, self.clock)
+
+        def reserve():
+            for _ in range(100):
+                bucket.reserve()
+
+        threads = [threading.Thread(target=reserve) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # 1000回分のトークンをちょうど使い切っている
+        assert bucket.reserve() == pytest.approx(1.0)
+
+
+class TestRateLimiter:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(
+            tier_limits={"fast": (600, 10), "slow": (60, 1)},
+            method_tiers={"users.info": "fast", "users.list": "slow"},
+            clock=self.clock,
+        )
+
+    def test_bucket_per_method(self):
+        assert self.limiter.bucket("users.info").rate == pytest.approx(10)
+        assert self.limiter.bucket("users.list").rate == pytest.approx(1)
+        assert self.limiter.bucket("users.info") is self.limiter.bucket("users.info")
+
+    def test_set_share(self):
+        before = self.limiter.bucket("users.info")
+        self.limiter.set_share(0.25)
+
+        assert self.limiter.share == 0.25
+        assert self.limiter.bucket("users.info") is not before
+        assert self.limiter.bucket("users.info").rate == pytest.approx(2.5)
+
+    def test_acquire(self):
+        with mock.patch("get_all_message_from_slack.util.rate_limiter.time.sleep") as mock_sleep:
+            self.limiter.acquire("users.list")
+            self.limiter.acquire("users.list")
+
+        mock_sleep.assert_called_once_with(pytest.approx(1.0))
+
+    def test_acquire_async(self):
+        with mock.patch("asyncio.sleep") as mock_sleep:
+            asyncio.run(self.limiter.acquire_async("users.list"))
+            asyncio.run(self.limiter.acquire_async("users.list"))
+
+        mock_sleep.assert_called_once_with(pytest.approx(1.0))
+
+
+class TestMethodName:
+    def test_nomal_case(self):
+        class Client:
+            def chat_postMessage(self):
+                pass
+
+        assert method_name(Client().chat_postMessage) == "chat.postMessage"
+
+    def test_not_has_name(self):
+        assert method_name(mock.MagicMock()) == ""
@@ -0,0 +1,162 @@
+from unittest import mock
+from urllib.error import URLError
+
+import pytest
+from get_all_message_from_slack.util.retry import CallAttempts, CircuitBreaker, RetryPolicy
+from slack_sdk.errors import SlackApiError
+
+
+def slack_api_error(status_code: int, headers=None, data=None) -> SlackApiError:
+    response = mock.MagicMock()
+    response.status_code = status_code
+    response.headers = {} if headers is None else headers
+    response.data = {"ok": False} if data is None else data
+    return SlackApiError("message", response)
+
+
+class TestRetryPolicy:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.policy = RetryPolicy(
+            max_attempts=3, max_ratelimited_attempts=5, base_delay=1, max_delay=5, rand=lambda: 0.5
+        )
+
+    def test_retry_after(self):
+        assert self.policy.retry_after(slack_api_error(429, {"retry-after": "3"})) == 3
+        assert self.policy.retry_after(slack_api_error(500)) is None
+        assert self.policy.retry_after(ValueError()) is None
+
+    @pytest.mark.parametrize(
+        "error, expected",
+        [
+            (slack_api_error(500), True),
+            (slack_api_error(503), True),
+            (slack_api_error(200, data={"ok": False, "error": "internal_error"}), True),
+            (slack_api_error(200, data={"ok": False, "error": "channel_not_found"}), False),
+            (slack_api_error(404), False),
+            (URLError("timed out"), True),
+            (ConnectionResetError(), True),
+            (TimeoutError(), True),
+            (ValueError(), False),
+        ],
+    )
+    def test_is_transient(self, error, expected):
+        assert self.policy.is_transient(error) == expected
+
+    def test_backoff(self):
+        # 上限（base_delay * 2 ** (attempt - 1)、最大 max_delay）の半分
+        assert [self.policy.backoff(attempt) for attempt in range(1, 6)] == [
+            0.5,
+            1.0,
+            2.0,
+            2.5,
+            2.5,
+        ]
+
+    def test_can_retry(self):
+        assert self.policy.can_retry(2)
+        assert not self.policy.can_retry(3)
+
+    def test_can_retry_ratelimited(self):
+        assert self.policy.can_retry(4, ratelimited=True)
+        assert not self.policy.can_retry(5, ratelimited=True)
+
+
+class TestCircuitBreaker:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(
+            threshold=3, window=10, cooldown=5, max_cooldown=15, clock=lambda: self.now
+        )
+
+    def test_open_and_close(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        assert not self.breaker.is_open
+
+        self.breaker.record_failure()
+        assert self.breaker.delay() == 5
+
+        self.now = 5.0
+        assert not self.breaker.is_open
+
+    def test_failures_outside_window(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 10.0
+        self.breaker.record_failure()
+
+        assert not self.breaker.is_open
+
+    def test_cooldown_grows_until_success(self):
+        for expected in [5, 10, 15, 15]:
+            for _ in range(3):
+                self.breaker.record_failure()
+            assert self.breaker.delay() == expected
+            self.now += expected
+
+        self.breaker.record_success()
+        for _ in range(3):
+            self.breaker.record_failure()
+        assert self.breaker.delay() == 5
+
+
+class TestCallAttempts:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.breaker = mock.MagicMock()
+        self.limiter = mock.MagicMock()
+        self.sizer = mock.MagicMock()
+        self.sizer.limit.return_value = 200
+        self.policy = RetryPolicy(max_attempts=2, max_ratelimited_attempts=2, rand=lambda: 0.5)
+        self.call = CallAttempts(
+            "users.list", True, self.policy, self.breaker, self.limiter, self.sizer
+        )
+
+    def test_limit(self):
+        assert self.call.limit() == 200
+
+        call = CallAttempts(
+            "users.list", False, self.policy, self.breaker, self.limiter, self.sizer
+        )
+        assert call.limit() is None
+
+    def test_record_success(self):
+        self.call.record_success(0.1, 200)
+
+        self.sizer.record.assert_called_once_with("users.list", 0.1)
+        self.limiter.recover.assert_called_once_with("users.list")
+        self.breaker.record_success.assert_called_once_with()
+
+    def test_ratelimited(self):
+        error = slack_api_error(429, {"retry-after": "3"})
+
+        assert self.call.retry_delay(error, 0.1) == 0.0
+        assert self.call.retry_delay(error, 0.1) is None
+        # 429 はサーキットブレーカーに数えず、レート制限で待たせる
+        self.limiter.penalize.assert_called_once_with("users.list", 3)
+        self.breaker.record_failure.assert_not_called()
+
+    def test_transient(self):
+        assert self.call.retry_delay(URLError("timeout"), 0.1) == 0.5
+        assert self.call.retry_delay(URLError("timeout"), 0.1) is None
+        assert self.sizer.shrink.call_count == 2
+        assert self.breaker.record_failure.call_count == 2
+
+    def test_not_transient(self):
+        assert self.call.retry_delay(ValueError(), 0.1) is None
+        self.breaker.record_failure.assert_not_called()
+
+    def test_is_transient(self):
+        call = CallAttempts(
+            "users.list",
+            True,
+            self.policy,
+            self.breaker,
+            self.limiter,
+            self.sizer,
+            lambda error: isinstance(error, ValueError),
+        )
+
+        assert call.retry_delay(ValueError(), 0.1) == 0.5
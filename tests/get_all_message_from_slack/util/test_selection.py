@@ -0,0 +1,44 @@
+import pytest
+from get_all_message_from_slack.util.selection import ExportFilter, days_ago
+
+
+class TestDaysAgo:
+    def test_nomal_case(self):
+        assert days_ago(30, now=1638883139.5) == "1636291139.500000"
+
+
+class TestExportFilter:
+    @pytest.mark.parametrize(
+        "export_filter, expected",
+        [
+            (ExportFilter(), ["proj-a", "proj-b", "random", "old"]),
+            (ExportFilter(include=("proj-*",)), ["proj-a", "proj-b"]),
+            (ExportFilter(include=("proj-*", "random")), ["proj-a", "proj-b", "random"]),
+            (ExportFilter(include=("proj-*",), exclude=("*-b",)), ["proj-a"]),
+            (ExportFilter(skip_archived=True), ["proj-a", "proj-b", "random"]),
+            (ExportFilter(min_members=5), ["proj-a", "old"]),
+        ],
+    )
+    def test_select_channels(self, export_filter: ExportFilter, expected):
+        channels = [
+            {"id": "C1", "name": "proj-a", "num_members": 10},
+            {"id": "C2", "name": "proj-b", "num_members": 2},
+            {"id": "C3", "name": "random"},
+            {"id": "C4", "name": "old", "num_members": 5, "is_archived": True},
+        ]
+        actual = export_filter.select_channels(channels)
+
+        assert [channel["name"] for channel in actual] == expected
+
+    @pytest.mark.parametrize(
+        "filter_oldest, oldest, expected",
+        [
+            (None, None, None),
+            ("100.000000", None, "100.000000"),
+            (None, "50.000001", "50.000001"),
+            ("100.000000", "50.000001", "100.000000"),
+            ("100.000000", "100.000001", "100.000001"),
+        ],
+    )
+    def test_history_oldest(self, filter_oldest, oldest, expected):
+        assert ExportFilter(oldest=filter_oldest).history_oldest(oldest) == expected
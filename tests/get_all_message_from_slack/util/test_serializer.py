@@ -0,0 +1,43 @@
+import json
+import sys
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack.util.serializer import JSON, get_serializer
+
+ITEM = {"ts": "1.000001", "text": "テキスト <https://example.com/a|リンク>", "n": [1, 2.5, None]}
+
+
+class TestGetSerializer:
+    @pytest.mark.parametrize("name", ["json", "orjson", "ujson"])
+    def test_dumps_and_loads(self, name):
+        pytest.importorskip(name)
+        serializer = get_serializer(name)
+        actual = serializer.dumps(ITEM)
+
+        assert serializer.name == name
+        # 日本語、「/」をエスケープせず、区切り文字に空白を入れない
+        assert actual == json.dumps(ITEM, ensure_ascii=False, separators=(",", ":"))
+        assert serializer.loads(actual) == ITEM
+
+    def test_auto(self):
+        with mock.patch.dict(sys.modules, {"orjson": None, "ujson": None}):
+            assert get_serializer("auto").name == "json"
+            assert get_serializer(None).name == "json"
+
+    def test_auto_prefer_orjson(self):
+        pytest.importorskip("orjson")
+
+        assert get_serializer().name == "orjson"
+
+    def test_not_installed(self):
+        with mock.patch.dict(sys.modules, {"orjson": None}):
+            with pytest.raises(ImportError, match="pip install orjson"):
+                get_serializer("orjson")
+
+    def test_not_supported(self):
+        with pytest.raises(ValueError):
+            get_serializer("pickle")
+
+    def test_default_json(self):
+        assert JSON.dumps(ITEM) == get_serializer("json").dumps(ITEM)
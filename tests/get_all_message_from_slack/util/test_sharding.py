@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+
+import pytest
+from get_all_message_from_slack.util.checkpoint import Checkpoint
+from get_all_message_from_slack.util.export_state import ExportState
+from get_all_message_from_slack.util.sharding import (
+    Shard,
+    channel_shard,
+    merge_shards,
+    partition_channels,
+)
+from get_all_message_from_slack.util.writer import OutputFormat
+
+
+class TestPartitionChannels:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.channels = [{"id": f"C{i:03d}", "num_members": i} for i in range(100)]
+
+    @pytest.mark.parametrize("strategy", ["hash", "volume"])
+    def test_nomal_case(self, strategy: str):
+        actual = partition_channels(self.channels, 4, strategy)
+
+        assert len(actual) == 4
+        assert sorted(c["id"] for shard in actual for c in shard) == [
+            c["id"] for c in self.channels
+        ]
+        assert all(actual)
+        # 一覧の順序が異なっても同じ分割になる
+        reversed_shards = partition_channels(self.channels[::-1], 4, strategy)
+        assert [shard[::-1] for shard in reversed_shards] == actual
+
+    def test_hash(self):
+        actual = partition_channels(self.channels, 4, "hash")
+
+        for index, shard in enumerate(actual):
+            assert all(channel_shard(c["id"], 4) == index for c in shard)
+
+    def test_volume_balanced(self):
+        actual = partition_channels(self.channels, 4, "volume")
+
+        totals = [sum(c["num_members"] + 1 for c in shard) for shard in actual]
+        assert max(totals) - min(totals) <= 100
+
+    def test_shard_select(self):
+        actual = Shard(1, 4, "volume").select(self.channels)
+
+        assert actual == partition_channels(self.channels, 4, "volume")[1]
+        assert Shard(1, 4).name == "shard-001-of-004"
+
+    @pytest.mark.parametrize("count, strategy", [(0, "hash"), (2, "random")])
+    def test_invalid(self, count: int, strategy: str):
+        with pytest.raises(ValueError):
+            partition_channels(self.channels, count, strategy)
+
+
+class TestMergeShards:
+    def test_nomal_case(self, tmp_path: Path):
+        output_format = OutputFormat()
+        for index, channels in enumerate([["C1", "C2"], ["C3"]]):
+            shard_path = tmp_path / Shard(index, 3).name
+            shard_path.mkdir()
+            checkpoint = Checkpoint.create(shard_path)
+            with output_format.writer(shard_path / "channel_master") as writer:
+                writer.write_all([{"id": c, "name": c.lower()} for c in channels])
+            state = ExportState.load(shard_path)
+            state.apply(channels[0], {"latest_ts": "100.000001", "threads": {}})
+            state.save()
+            checkpoint.mark_channel_done(channels[0])
+
+        with open(merge_shards(tmp_path, 3, output_format)) as f:
+            actual = json.load(f)
+
+        assert actual["shard_count"] == 3
+        assert actual["missing_shards"] == [2]
+        assert actual["incomplete_channels"] == ["C2"]
+        assert actual["channels"] == [
+            {
+                "id": "C1",
+                "name": "c1",
+                "shard": 0,
+                "path": "shard-000-of-003/C1",
+                "latest_ts": "100.000001",
+                "complete": True,
+            },
+            {
+                "id": "C2",
+                "name": "c2",
+                "shard": 0,
+                "path": "shard-000-of-003/C2",
+                "latest_ts": None,
+                "complete": False,
+            },
+            {
+                "id": "C3",
+                "name": "c3",
+                "shard": 1,
+                "path": "shard-001-of-003/C3",
+                "latest_ts": "100.000001",
+                "complete": True,
+            },
+        ]
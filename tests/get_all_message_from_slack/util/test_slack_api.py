@@ -9,11 +9,44 @@ from get_all_message_from_slack.util.slack_api import (
     get_channel_message,
     get_replies,
     get_user_name,
+    iter_channel_message,
     post_message,
 )
+from get_all_message_from_slack.util.lookup_cache import LookupCache
+from get_all_message_from_slack.util.metrics import metrics
+from get_all_message_from_slack.util.page_size import PageSizer
+from get_all_message_from_slack.util.retry import CircuitBreaker
 from slack_sdk.errors import SlackApiError
 
 
+@pytest.fixture(autouse=True)
+def slack_client():
+    client = mock.MagicMock()
+    with mock.patch("get_all_message_from_slack.util.slack_api.get_client", return_value=client):
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def disable_rate_limiter():
+    with mock.patch("get_all_message_from_slack.util.slack_api.rate_limiter") as m, mock.patch(
+        "get_all_message_from_slack.util.slack_api.circuit_breaker", CircuitBreaker()
+    ):
+        m.acquire.return_value = 0.0
+        yield
+
+
+@pytest.fixture(autouse=True)
+def default_page_sizer():
+    with mock.patch("get_all_message_from_slack.util.slack_api.page_sizer", PageSizer()):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def empty_lookup_cache():
+    with mock.patch("get_all_message_from_slack.util.slack_api.lookup_cache", LookupCache()):
+        yield
+
+
 class ReturnValue:
     data = {}
 
@@ -26,9 +59,10 @@ def create_return_object(data: Dict[str, Any]):
 
 class TestGetUserName:
     @pytest.fixture(autouse=True)
-    def setUp(self):
-        with mock.patch(
-            "get_all_message_from_slack.util.slack_api.client.users_info",
+    def setUp(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "users_info",
         ) as mock_method:
             self.mock_method = mock_method
             yield
@@ -42,6 +76,15 @@ class TestGetUserName:
         assert actual == expected
         self.mock_method.assert_called_once_with(user="USER_ID")
 
+    def test_cached(self):
+        self.mock_method.return_value = {"user": {"real_name": "REAL_NAME"}}
+
+        get_user_name("USER_ID")
+        actual = get_user_name("USER_ID")
+
+        assert actual == "REAL_NAME"
+        self.mock_method.assert_called_once_with(user="USER_ID")
+
     def test_not_exists_user_id(self):
         # APIにアクセスしたくないため、モックで例外を投げている
         # ユニットテストとしては意味がないが、仕様記載の意味で記載しておく
@@ -55,12 +98,13 @@ class TestGetUserName:
 
 class TestGetChannelId:
     @pytest.fixture(autouse=True)
-    def setUp(self):
+    def setUp(self, slack_client):
 
         self.return_value: Dict[str, Any] = {"response_metadata": {"next_cursor": ""}}
 
-        with mock.patch(
-            "get_all_message_from_slack.util.slack_api.client.conversations_list",
+        with mock.patch.object(
+            slack_client,
+            "conversations_list",
         ) as mock_method:
             self.mock_method = mock_method
             yield
@@ -80,6 +124,21 @@ class TestGetChannelId:
         assert actual == expected
         self.mock_method.assert_called_once_with()
 
+    def test_cached(self):
+        self.mock_method.return_value = create_return_object(
+            {
+                "channels": [
+                    {"name": "CHANNEL_NAME1", "id": "CHANNEL_ID1"},
+                    {"name": "CHANNEL_NAME2", "id": "CHANNEL_ID2"},
+                ]
+            }
+        )
+        get_channel_id("CHANNEL_NAME1")
+        actual = get_channel_id("CHANNEL_NAME2")
+
+        assert actual == "CHANNEL_ID2"
+        self.mock_method.assert_called_once_with()
+
     def test_not_exists_channel_name(self):
         self.mock_method.return_value = create_return_object(
             {
@@ -119,12 +178,13 @@ class TestGetChannelId:
 
 class TestPostMessage:
     @pytest.fixture(autouse=True)
-    def setUp(self):
+    def setUp(self, slack_client):
         class ReturnValue:
             data = {"ok": True, "ts": "1234567890.000002", "message": {}}
 
-        with mock.patch(
-            "get_all_message_from_slack.util.slack_api.client.chat_postMessage",
+        with mock.patch.object(
+            slack_client,
+            "chat_postMessage",
             return_value=ReturnValue(),
         ) as mock_method:
             self.mock_method = mock_method
@@ -158,10 +218,12 @@ class TestPostMessage:
 
 class TestGetChannelMessage:
     @pytest.fixture(autouse=True)
-    def setUp(self):
-        with mock.patch(
-            "get_all_message_from_slack.util.slack_api.client.conversations_history",
+    def setUp(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "conversations_history",
         ) as mock_method:
+            mock_method.__name__ = "conversations_history"
             self.mock_method = mock_method
             yield
 
@@ -185,6 +247,15 @@ class TestGetChannelMessage:
         assert actual == expected
         self.mock_method.assert_called_once_with(channel="CHANNEL_ID", limit=1000)
 
+    def test_oldest(self):
+        self.mock_method.return_value = create_return_object({"has_more": False, "messages": []})
+        actual = get_channel_message("CHANNEL_ID", "1234567890.000001")
+
+        assert actual == []
+        self.mock_method.assert_called_once_with(
+            channel="CHANNEL_ID", limit=1000, oldest="1234567890.000001"
+        )
+
     def test_has_more(self):
         messages_1 = [
             {
@@ -228,11 +299,62 @@ class TestGetChannelMessage:
         )
 
 
+class TestIterChannelMessage:
+    @pytest.fixture(autouse=True)
+    def setUp(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "conversations_history",
+        ) as mock_method:
+            mock_method.__name__ = "conversations_history"
+            self.mock_method = mock_method
+            yield
+
+    def test_yield_pages_lazily(self):
+        messages_1 = [{"ts": "1234567890.000001"}]
+        messages_2 = [{"ts": "1234567890.000002"}]
+        self.mock_method.side_effect = [
+            create_return_object(
+                {
+                    "has_more": True,
+                    "messages": messages_1,
+                    "response_metadata": {"next_cursor": "abcdefg"},
+                }
+            ),
+            create_return_object({"has_more": False, "messages": messages_2}),
+        ]
+
+        pages = iter_channel_message("CHANNEL_ID")
+        self.mock_method.assert_not_called()
+
+        assert next(pages) == messages_1
+        assert self.mock_method.call_count == 1
+        assert list(pages) == [messages_2]
+        assert self.mock_method.call_count == 2
+
+    def test_time_range(self):
+        self.mock_method.return_value = create_return_object({"has_more": False, "messages": []})
+
+        assert list(iter_channel_message("CHANNEL_ID", "1.000000", latest="2.000000")) == [[]]
+        self.mock_method.assert_called_once_with(
+            channel="CHANNEL_ID", limit=1000, oldest="1.000000", latest="2.000000"
+        )
+
+    def test_inclusive(self):
+        self.mock_method.return_value = create_return_object({"has_more": False, "messages": []})
+
+        list(iter_channel_message("CHANNEL_ID", "1.000000", latest="2.000000", inclusive=True))
+        self.mock_method.assert_called_once_with(
+            channel="CHANNEL_ID", limit=1000, oldest="1.000000", latest="2.000000", inclusive=True
+        )
+
+
 class TestGetReplies:
     @pytest.fixture(autouse=True)
-    def setUp(self):
-        with mock.patch(
-            "get_all_message_from_slack.util.slack_api.client.conversations_replies",
+    def setUp(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "conversations_replies",
         ) as mock_method:
             self.mock_method = mock_method
             yield
@@ -322,10 +444,11 @@ class TestGetReplies:
 
 class TestGetAllPublicChannels:
     @pytest.fixture(autouse=True)
-    def setUp(self):
+    def setUp(self, slack_client):
 
-        with mock.patch(
-            "get_all_message_from_slack.util.slack_api.client.conversations_list",
+        with mock.patch.object(
+            slack_client,
+            "conversations_list",
         ) as mock_method:
             self.mock_method = mock_method
             yield
@@ -379,13 +502,24 @@ class TestGetAllPublicChannels:
             ]
         )
 
+    def test_exclude_archived(self):
+        self.mock_method.return_value = create_return_object(
+            {"channels": [], "response_metadata": {"next_cursor": ""}}
+        )
+        get_all_public_channels(exclude_archived=True)
+
+        self.mock_method.assert_called_once_with(
+            **{"type:": "public_channel", "exclude_archived": True}
+        )
+
 
 class TestGetAllUsers:
     @pytest.fixture(autouse=True)
-    def setUp(self):
+    def setUp(self, slack_client):
 
-        with mock.patch(
-            "get_all_message_from_slack.util.slack_api.client.users_list",
+        with mock.patch.object(
+            slack_client,
+            "users_list",
         ) as mock_method:
             self.mock_method = mock_method
             yield
@@ -437,3 +571,173 @@ class TestGetAllUsers:
                 mock.call(cursor="NEXT_CURSOR"),
             ]
         )
+
+
+class TestExecuteApi:
+    @pytest.fixture(autouse=True)
+    def setUp(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "users_info",
+        ) as mock_method, mock.patch(
+            "get_all_message_from_slack.util.slack_api.rate_limiter",
+        ) as mock_rate_limiter:
+            mock_rate_limiter.acquire.return_value = 0.0
+            self.mock_method = mock_method
+            self.mock_rate_limiter = mock_rate_limiter
+            yield
+
+    def test_retry_when_ratelimited(self):
+        slack_response = mock.MagicMock()
+        slack_response.status_code = 429
+        slack_response.headers = {"retry-after": "3"}
+        self.mock_method.side_effect = [
+            SlackApiError("message", slack_response),
+            {"user": {"real_name": "REAL_NAME"}},
+        ]
+
+        actual = get_user_name("USER_ID")
+        expected = "REAL_NAME"
+
+        assert actual == expected
+        assert self.mock_method.call_count == 2
+        self.mock_rate_limiter.penalize.assert_called_once_with("", 3)
+        assert self.mock_rate_limiter.acquire.call_count == 2
+
+    def test_retry_transient_error(self):
+        self.mock_method.side_effect = [
+            ConnectionResetError(),
+            {"user": {"real_name": "REAL_NAME"}},
+        ]
+        with mock.patch(
+            "get_all_message_from_slack.util.slack_api.retry_policy.backoff", return_value=0.25
+        ), mock.patch("get_all_message_from_slack.util.slack_api.time.sleep") as mock_sleep:
+            actual = get_user_name("USER_ID")
+
+        assert actual == "REAL_NAME"
+        mock_sleep.assert_called_once_with(0.25)
+        self.mock_rate_limiter.penalize.assert_not_called()
+
+    def test_not_retry_error(self):
+        self.mock_method.side_effect = ValueError("error")
+
+        with pytest.raises(ValueError):
+            get_user_name("USER_ID")
+        assert self.mock_method.call_count == 1
+
+    def test_max_attempts(self):
+        slack_response = mock.MagicMock()
+        slack_response.status_code = 429
+        slack_response.headers = {"retry-after": "0"}
+        self.mock_method.side_effect = SlackApiError("message", slack_response)
+
+        with mock.patch(
+            "get_all_message_from_slack.util.slack_api.retry_policy.max_ratelimited_attempts", 3
+        ):
+            with pytest.raises(SlackApiError):
+                get_user_name("USER_ID")
+        assert self.mock_method.call_count == 3
+
+    def test_ratelimited_not_counted_as_error(self):
+        slack_response = mock.MagicMock()
+        slack_response.status_code = 429
+        slack_response.headers = {"retry-after": "0"}
+        self.mock_method.side_effect = [SlackApiError("message", slack_response)] * 5 + [
+            ConnectionResetError(),
+            {"user": {"real_name": "REAL_NAME"}},
+        ]
+
+        with mock.patch(
+            "get_all_message_from_slack.util.slack_api.retry_policy.max_attempts", 2
+        ), mock.patch(
+            "get_all_message_from_slack.util.slack_api.retry_policy.backoff", return_value=0
+        ), mock.patch(
+            "get_all_message_from_slack.util.slack_api.circuit_breaker"
+        ) as mock_breaker:
+            mock_breaker.delay.return_value = 0.0
+            actual = get_user_name("USER_ID")
+
+        assert actual == "REAL_NAME"
+        assert self.mock_method.call_count == 7
+        # 429 はサーキットブレーカーに数えない
+        mock_breaker.record_failure.assert_called_once_with()
+
+    def test_metrics(self):
+        slack_response = mock.MagicMock()
+        slack_response.status_code = 429
+        slack_response.headers = {"retry-after": "3"}
+        self.mock_method.side_effect = [
+            SlackApiError("message", slack_response),
+            {"user": {"real_name": "REAL_NAME"}},
+        ]
+        self.mock_rate_limiter.acquire.return_value = 0.5
+        metrics.reset()
+
+        get_user_name("USER_ID")
+
+        actual = metrics.summary()["methods"][""]
+        assert actual["calls"] == 2
+        assert actual["ratelimited"] == 1
+        assert actual["retries"] == 1
+        assert actual["retry_after_seconds"] == 3
+        assert actual["wait_seconds"] == 1.0
+
+
+class TestPageSize:
+    @pytest.fixture(autouse=True)
+    def setUp(self, slack_client):
+        with mock.patch.object(
+            slack_client,
+            "conversations_history",
+        ) as mock_method, mock.patch(
+            "get_all_message_from_slack.util.slack_api.retry_policy.backoff", return_value=0
+        ), mock.patch("get_all_message_from_slack.util.slack_api.time.sleep"):
+            mock_method.__name__ = "conversations_history"
+            self.mock_method = mock_method
+            yield
+
+    def test_shrink_on_transient_error(self):
+        self.mock_method.side_effect = [
+            ConnectionResetError(),
+            create_return_object({"has_more": False, "messages": []}),
+        ]
+
+        assert get_channel_message("CHANNEL_ID") == []
+        self.mock_method.assert_has_calls(
+            [
+                mock.call(channel="CHANNEL_ID", limit=1000),
+                mock.call(channel="CHANNEL_ID", limit=500),
+            ]
+        )
+
+    def test_not_shrink_when_ratelimited(self):
+        slack_response = mock.MagicMock()
+        slack_response.status_code = 429
+        slack_response.headers = {"retry-after": "0"}
+        self.mock_method.side_effect = [
+            SlackApiError("message", slack_response),
+            create_return_object({"has_more": False, "messages": []}),
+        ]
+
+        assert get_channel_message("CHANNEL_ID") == []
+        assert self.mock_method.call_args == mock.call(channel="CHANNEL_ID", limit=1000)
+
+    def test_configured_page_size(self):
+        self.mock_method.return_value = create_return_object({"has_more": False, "messages": []})
+        with mock.patch(
+            "get_all_message_from_slack.util.slack_api.page_sizer",
+            PageSizer({"conversations.history": 200}),
+        ):
+            get_channel_message("CHANNEL_ID")
+
+        self.mock_method.assert_called_once_with(channel="CHANNEL_ID", limit=200)
+
+
+class TestInjectClient:
+    def test_use_given_client(self, slack_client):
+        client = mock.MagicMock()
+        client.users_info.return_value = {"user": {"real_name": "REAL_NAME"}}
+
+        assert get_user_name("USER_ID", client=client) == "REAL_NAME"
+        client.users_info.assert_called_once_with(user="USER_ID")
+        slack_client.users_info.assert_not_called()
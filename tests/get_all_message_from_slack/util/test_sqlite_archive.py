@@ -0,0 +1,153 @@
+import json
+import sqlite3
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from get_all_message_from_slack.util.sqlite_archive import (
+    ARCHIVE_FILE_NAME,
+    SqliteArchive,
+    SqliteWriter,
+    Target,
+    locate,
+)
+from get_all_message_from_slack.util.writer import OutputFormat
+
+
+class TestLocate:
+    @pytest.mark.parametrize(
+        "base, expected",
+        [
+            ("channel_master", Target("channels")),
+            ("user_master", Target("users")),
+            ("C1/nomal_messages", Target("messages", ("C1",))),
+            ("C1/1638316800_000100", Target("replies", ("C1", "1638316800.000100"))),
+        ],
+    )
+    def test_nomal_case(self, tmp_path: Path, base: str, expected: Target):
+        path, target = locate(tmp_path / base)
+
+        assert path == tmp_path / ARCHIVE_FILE_NAME
+        assert target == expected
+
+
+class TestSqliteWriter:
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path: Path):
+        self.archive = SqliteArchive(tmp_path / ARCHIVE_FILE_NAME)
+        self.target = Target("messages", ("C1",))
+        yield
+        self.archive.close()
+
+    def _rows(self, sql: str):
+        connection = sqlite3.connect(str(self.archive.path))
+        try:
+            return connection.execute(sql).fetchall()
+        finally:
+            connection.close()
+
+    @pytest.mark.parametrize("batch_size", [1, 2, 1000])
+    def test_nomal_case(self, batch_size: int):
+        data = [
+            {"ts": "1", "user": "U1", "text": "テキスト"},
+            {"ts": "2", "user": "U2", "thread_ts": "2"},
+            {"ts": "3"},
+        ]
+        with SqliteWriter(self.archive, self.target, batch_size=batch_size) as writer:
+            writer.write_all(data)
+
+        assert writer.count == 3
+        assert list(self.archive.iter_items(self.target)) == data
+        assert self._rows("SELECT channel_id, seq, ts, thread_ts, user FROM messages") == [
+            ("C1", 0, "1", None, "U1"),
+            ("C1", 1, "2", "2", "U2"),
+            ("C1", 2, "3", None, None),
+        ]
+        assert self._rows("SELECT COUNT(*) FROM staging_messages") == [(0,)]
+
+    def test_replace(self):
+        other = Target("messages", ("C2",))
+        with SqliteWriter(self.archive, other) as writer:
+            writer.write({"ts": "9"})
+        with SqliteWriter(self.archive, self.target) as writer:
+            writer.write_all([{"ts": "1"}, {"ts": "2"}])
+        with SqliteWriter(self.archive, self.target, batch_size=1) as writer:
+            writer.write({"ts": "3"})
+
+        assert list(self.archive.iter_items(self.target)) == [{"ts": "3"}]
+        assert list(self.archive.iter_items(other)) == [{"ts": "9"}]
+
+    def test_skip_empty(self):
+        with SqliteWriter(self.archive, self.target) as writer:
+            writer.write({"ts": "1"})
+        with SqliteWriter(self.archive, self.target, skip_empty=True) as writer:
+            pass
+
+        assert writer.close() is None
+        assert list(self.archive.iter_items(self.target)) == [{"ts": "1"}]
+
+    def test_abort(self):
+        with pytest.raises(RuntimeError):
+            with SqliteWriter(self.archive, self.target, batch_size=1) as writer:
+                writer.write({"ts": "1"})
+                raise RuntimeError("error")
+
+        assert not self.archive.exists(self.target)
+        assert self._rows("SELECT COUNT(*) FROM staging_messages") == [(0,)]
+
+    def test_checkpoint_and_resume(self):
+        with pytest.raises(RuntimeError):
+            with SqliteWriter(self.archive, self.target, batch_size=2) as writer:
+                writer.write_all([{"ts": "1"}, {"ts": "2"}, {"ts": "3"}])
+                position = writer.checkpoint()
+                # checkpoint 以降の書き込みは再開時に破棄される
+                writer.write_all([{"ts": "4"}, {"ts": "5"}])
+                raise RuntimeError("error")
+
+        assert not self.archive.exists(self.target)
+        with SqliteWriter(self.archive, self.target) as writer:
+            writer.resume(json.loads(json.dumps(position)))
+            writer.write({"ts": "6"})
+
+        assert writer.count == 4
+        expected = [{"ts": "1"}, {"ts": "2"}, {"ts": "3"}, {"ts": "6"}]
+        assert list(self.archive.iter_items(self.target)) == expected
+
+    def test_resume_without_staging(self):
+        writer = SqliteWriter(self.archive, self.target)
+        with pytest.raises(FileNotFoundError):
+            writer.resume({"count": 1})
+
+
+class TestSqliteOutputFormat:
+    @mock.patch("get_all_message_from_slack.util.sqlite_archive.READ_BATCH_SIZE", 2)
+    def test_write_and_read(self, tmp_path: Path):
+        output_format = OutputFormat("sqlite")
+        channel_path = tmp_path / "channel_master"
+        messages_path = tmp_path / "C1" / "nomal_messages"
+        replies_path = tmp_path / "C1" / "1_000000"
+        data = [{"ts": str(i)} for i in range(5)]
+
+        assert not output_format.exists(messages_path)
+        with output_format.writer(channel_path) as writer:
+            writer.write({"id": "C1", "name": "general"})
+        with output_format.writer(messages_path) as writer:
+            writer.write_all(data)
+            # 書き込み中も保存済みの要素を読み込める
+            assert list(output_format.iter_items(messages_path)) == []
+        with output_format.writer(replies_path) as writer:
+            writer.write({"ts": "1.1", "thread_ts": "1.000000"})
+        output_format.close()
+
+        assert output_format.exists(messages_path)
+        assert list(output_format.iter_items(messages_path)) == data
+        assert list(output_format.iter_items(channel_path)) == [{"id": "C1", "name": "general"}]
+        assert list(output_format.iter_items(replies_path)) == [
+            {"ts": "1.1", "thread_ts": "1.000000"}
+        ]
+        assert list(tmp_path.glob("*.sqlite3")) == [tmp_path / ARCHIVE_FILE_NAME]
+        output_format.close()
+
+    def test_not_supported_compression(self):
+        with pytest.raises(ValueError):
+            OutputFormat("sqlite", "gzip")
@@ -0,0 +1,46 @@
+from get_all_message_from_slack.util.thread_plan import (
+    ALREADY_FETCHED,
+    NO_REPLIES,
+    NOT_PARENT,
+    UNCHANGED,
+    plan_threads,
+    skip_reason,
+)
+
+
+class TestSkipReason:
+    def test_nomal_case(self):
+        assert skip_reason({"ts": "1", "thread_ts": "1", "reply_count": 2}) == ""
+        # history に含まれたリプライ
+        assert skip_reason({"ts": "2", "thread_ts": "1"}) == NOT_PARENT
+        assert skip_reason({"ts": "1", "thread_ts": "1", "subtype": "thread_broadcast"}) == (
+            NOT_PARENT
+        )
+        assert skip_reason({"ts": "1", "thread_ts": "1", "reply_count": 0}) == NO_REPLIES
+        assert skip_reason({"ts": "1", "thread_ts": "1"}) == NO_REPLIES
+        # 親メッセージが削除されていてもリプライは取得する
+        assert (
+            skip_reason({"ts": "1", "thread_ts": "1", "subtype": "tombstone", "reply_count": 1})
+            == ""
+        )
+
+
+class TestPlanThreads:
+    def test_nomal_case(self):
+        messages = [
+            {"ts": "1"},
+            {"ts": "2", "thread_ts": "2", "reply_count": 1, "latest_reply": "3"},
+            {"ts": "4", "thread_ts": "2", "subtype": "thread_broadcast"},
+            {"ts": "5", "thread_ts": "5", "reply_count": 0},
+            {"ts": "6", "thread_ts": "6", "reply_count": 1, "latest_reply": "7"},
+            {"ts": "8", "thread_ts": "8", "reply_count": 1, "latest_reply": "9"},
+            {"ts": "2", "thread_ts": "2", "reply_count": 1, "latest_reply": "3"},
+        ]
+        fetched_threads = {"6"}
+
+        plan = plan_threads(messages, fetched_threads, lambda m: m["ts"] != "8")
+
+        assert plan.fetch == [messages[1]]
+        assert plan.skipped == {NOT_PARENT: 1, NO_REPLIES: 1, ALREADY_FETCHED: 2, UNCHANGED: 1}
+        assert plan.calls_saved == 5
+        assert fetched_threads == {"2", "6"}
@@ -0,0 +1,148 @@
+import json
+from pathlib import Path
+
+import pytest
+from get_all_message_from_slack.util.thread_store import (
+    INDEX_FILE_NAME,
+    THREADS_FILE_NAME,
+    ThreadStore,
+    ThreadWriter,
+)
+from get_all_message_from_slack.util.writer import OutputFormat
+
+
+def replies(thread_ts, count):
+    return [{"ts": f"{thread_ts}{i}", "thread_ts": thread_ts, "text": "返信"} for i in range(count)]
+
+
+class TestThreadStore:
+    def test_nomal_case(self, tmp_path: Path):
+        store = ThreadStore(tmp_path)
+        store.append("1.000001", replies("1.000001", 2))
+        store.append("1.000002", replies("1.000002", 3))
+
+        assert store.get("1.000002") == replies("1.000002", 3)
+        assert "1.000001" in store
+        assert "1.000003" not in store
+        store.close()
+
+        assert [p.name for p in sorted(tmp_path.iterdir())] == [INDEX_FILE_NAME, THREADS_FILE_NAME]
+        lines = (tmp_path / THREADS_FILE_NAME).read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["thread_ts"] for line in lines] == ["1.000001", "1.000002"]
+
+        reopened = ThreadStore(tmp_path)
+        assert len(reopened) == 2
+        assert reopened.get("1.000001") == replies("1.000001", 2)
+        assert [ts for ts, _ in reopened.iter_threads()] == ["1.000001", "1.000002"]
+
+    def test_not_found(self, tmp_path: Path):
+        with pytest.raises(KeyError):
+            ThreadStore(tmp_path).get("1.000001")
+
+    def test_replace_and_compact(self, tmp_path: Path):
+        store = ThreadStore(tmp_path)
+        store.append("1.000001", replies("1.000001", 5))
+        store.append("1.000002", replies("1.000002", 1))
+        store.append("1.000001", replies("1.000001", 6))
+
+        assert store.get("1.000001") == replies("1.000001", 6)
+        before = (tmp_path / THREADS_FILE_NAME).stat().st_size
+        store.compact()
+        store.close()
+
+        assert (tmp_path / THREADS_FILE_NAME).stat().st_size < before
+        reopened = ThreadStore(tmp_path)
+        assert reopened.get("1.000001") == replies("1.000001", 6)
+        assert reopened.get("1.000002") == replies("1.000002", 1)
+
+    def test_compact_on_close(self, tmp_path: Path):
+        store = ThreadStore(tmp_path)
+        for count in range(1, 4):
+            store.append("1.000001", replies("1.000001", count))
+        # 古い行が半分を超えるため、閉じる際に削除される
+        store.close()
+
+        lines = (tmp_path / THREADS_FILE_NAME).read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 1
+        assert ThreadStore(tmp_path).get("1.000001") == replies("1.000001", 3)
+
+    def test_rebuild_index_after_interruption(self, tmp_path: Path):
+        store = ThreadStore(tmp_path)
+        store.append("1.000001", replies("1.000001", 1))
+        store.close()
+        store = ThreadStore(tmp_path)
+        store.append("1.000002", replies("1.000002", 1))
+        # 閉じずに中断され、書き込み途中の行が残った場合
+        with open(tmp_path / THREADS_FILE_NAME, "ab") as f:
+            f.write(b'{"thread_ts": "1.0000')
+
+        reopened = ThreadStore(tmp_path)
+
+        assert len(reopened) == 2
+        assert reopened.get("1.000002") == replies("1.000002", 1)
+        reopened.append("1.000003", replies("1.000003", 1))
+        assert reopened.get("1.000003") == replies("1.000003", 1)
+
+    def test_rebuild_without_index(self, tmp_path: Path):
+        store = ThreadStore(tmp_path)
+        store.append("1.000001", replies("1.000001", 1))
+        store.close()
+        (tmp_path / INDEX_FILE_NAME).unlink()
+
+        assert ThreadStore(tmp_path).get("1.000001") == replies("1.000001", 1)
+
+
+class TestThreadWriter:
+    def test_nomal_case(self, tmp_path: Path):
+        store = ThreadStore(tmp_path)
+        with ThreadWriter(store, "1.000001") as writer:
+            writer.write_all(replies("1.000001", 2))
+            writer.write({"ts": "1.0000019"})
+            assert "1.000001" not in store
+
+        assert writer.count == 3
+        assert store.get("1.000001")[-1] == {"ts": "1.0000019"}
+
+    def test_skip_empty_and_abort(self, tmp_path: Path):
+        store = ThreadStore(tmp_path)
+        with ThreadWriter(store, "1.000001", skip_empty=True):
+            pass
+        with pytest.raises(RuntimeError):
+            with ThreadWriter(store, "1.000002") as writer:
+                writer.write({"ts": "1"})
+                raise RuntimeError("error")
+
+        assert len(store) == 0
+
+
+class TestOutputFormatThreadStorage:
+    @pytest.mark.parametrize("write_queue_size", [0, 2])
+    def test_replies_writer(self, tmp_path: Path, write_queue_size):
+        output_format = OutputFormat(
+            "ndjson", thread_storage="channel", write_queue_size=write_queue_size
+        )
+        with output_format.replies_writer(tmp_path, "1.000001") as writer:
+            writer.write_all(replies("1.000001", 2))
+        with output_format.replies_writer(tmp_path, "1.000002"):
+            pass
+        output_format.close_channel(tmp_path)
+
+        assert list(output_format.iter_replies(tmp_path, "1.000001")) == replies("1.000001", 2)
+        assert len(ThreadStore(tmp_path)) == 1
+        output_format.close()
+
+    def test_file(self, tmp_path: Path):
+        output_format = OutputFormat("json")
+        with output_format.replies_writer(tmp_path, "1.000001") as writer:
+            writer.write_all(replies("1.000001", 2))
+
+        assert (tmp_path / "1_000001.json").exists()
+        assert list(output_format.iter_replies(tmp_path, "1.000001")) == replies("1.000001", 2)
+
+    @pytest.mark.parametrize(
+        "name, compression, thread_storage",
+        [("sqlite", None, "channel"), ("ndjson", "gzip", "channel"), ("json", None, "dir")],
+    )
+    def test_not_supported(self, name, compression, thread_storage):
+        with pytest.raises(ValueError):
+            OutputFormat(name, compression, thread_storage=thread_storage)
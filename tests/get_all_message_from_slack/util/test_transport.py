@@ -0,0 +1,133 @@
+import http.client
+import inspect
+from unittest import mock
+from urllib.parse import urlsplit
+
+import pytest
+from benchmarks.fake_slack import FakeSlackServer, WorkspaceSpec
+from get_all_message_from_slack.util.transport import ConnectionPool, PooledWebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.base_client import BaseClient
+from slack_sdk.web.client import WebClient
+
+
+class TestPooledWebClient:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        spec = WorkspaceSpec(channels=3, messages_per_channel=10)
+        with FakeSlackServer(spec, rate_limit_every=4, retry_after=2) as server:
+            self.server = server
+            self.client = PooledWebClient(token="xoxp-test", base_url=server.url, retry_handlers=[])
+            yield
+            self.client.pool.close()
+
+    def test_reuse_connection(self):
+        for _ in range(3):
+            response = self.client.conversations_list()
+            assert len(response["channels"]) == 3
+
+        assert self.server.calls == {"conversations.list": 3}
+        assert self.client.pool.connections_created == 1
+
+    def test_on_response(self):
+        received = []
+        self.client.on_response = lambda method, size: received.append((method, size))
+        self.client.conversations_list()
+
+        assert len(received) == 1
+        assert received[0][0] == "conversations.list"
+        assert received[0][1] > 0
+
+    def test_not_compress(self):
+        self.client.compress = False
+        response = self.client.conversations_history(channel="C00000000")
+
+        assert len(response["messages"]) == 10
+
+    @pytest.mark.parametrize(
+        "method, resend", [("conversations.history", True), ("chat.postMessage", False)]
+    )
+    def test_resend_only_idempotent_methods(self, method: str, resend: bool):
+        with mock.patch.object(self.client.pool, "request") as mock_request:
+            mock_request.side_effect = http.client.RemoteDisconnected()
+            with pytest.raises(http.client.RemoteDisconnected):
+                self.client.api_call(method, params={"channel": "C00000000"})
+
+        assert mock_request.call_args.kwargs["resend"] is resend
+
+    def test_ratelimited(self):
+        for _ in range(3):
+            self.client.users_list()
+        with pytest.raises(SlackApiError) as e:
+            self.client.users_list()
+
+        assert e.value.response.status_code == 429
+        assert e.value.response.headers["retry-after"] == "2"
+        # エラーのレスポンスでも接続は再利用される
+        assert self.client.pool.connections_created == 1
+
+
+class TestConnectionPool:
+    def test_retry_stale_connection(self):
+        spec = WorkspaceSpec(channels=1, messages_per_channel=1)
+        with FakeSlackServer(spec) as server:
+            url = urlsplit(server.url)
+            key = ("http", url.hostname, url.port)
+            pool = ConnectionPool()
+            stale = mock.MagicMock()
+            stale.request.side_effect = http.client.RemoteDisconnected()
+            pool._idle[key] = [stale]
+
+            response = pool.request("POST", server.url + "conversations.list", b"", {})
+
+        assert response.status == 200
+        stale.close.assert_called_once()
+        assert pool.connections_created == 1
+
+    @pytest.mark.parametrize(
+        "error", [http.client.BadStatusLine("HTTP/1.1 2"), ConnectionResetError()]
+    )
+    def test_not_retry_after_response_started(self, error: Exception):
+        pool = ConnectionPool()
+        stale = mock.MagicMock()
+        stale.getresponse.side_effect = error
+        pool._idle[("http", "localhost", 80)] = [stale]
+
+        with pytest.raises(type(error)):
+            pool.request("POST", "http://localhost/api/conversations.list", b"", {})
+
+        assert pool.connections_created == 0
+
+    def test_not_resend(self):
+        pool = ConnectionPool()
+        stale = mock.MagicMock()
+        stale.request.side_effect = http.client.RemoteDisconnected()
+        pool._idle[("http", "localhost", 80)] = [stale]
+
+        with pytest.raises(http.client.RemoteDisconnected):
+            pool.request("POST", "http://localhost/api/chat.postMessage", b"", {}, resend=False)
+
+        assert pool.connections_created == 0
+
+    def test_resize(self):
+        pool = ConnectionPool(maxsize=3)
+        connections = [mock.MagicMock() for _ in range(3)]
+        pool._idle[("http", "localhost", 80)] = list(connections)
+
+        pool.resize(1)
+
+        assert pool._idle[("http", "localhost", 80)] == [connections[2]]
+        connections[0].close.assert_called_once()
+        connections[1].close.assert_called_once()
+        connections[2].close.assert_not_called()
+
+
+class TestWebClientCompatibility:
+    def test_internal_method(self):
+        # PooledWebClient が上書きする WebClient の内部メソッドが、同じ引数で呼び出されていること
+        signature = inspect.signature(WebClient._perform_urllib_http_request_internal)
+
+        assert list(signature.parameters) == ["self", "url", "req"]
+        assert "self._perform_urllib_http_request_internal(url, req)" in inspect.getsource(
+            BaseClient._perform_urllib_http_request
+        )
@@ -0,0 +1,176 @@
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from get_all_message_from_slack.util import write_behind
+from get_all_message_from_slack.util.write_behind import WriteBehindWriter, WriterStage
+from get_all_message_from_slack.util.writer import JsonArrayWriter, OutputFormat
+
+
+class TestWriterStage:
+    def test_order_in_lane(self):
+        stage = WriterStage(threads=2, queue_size=2)
+        results = []
+        lane = stage.lane()
+        futures = [stage.submit(lane, results.append, i) for i in range(10)]
+        stage.close()
+
+        assert results == list(range(10))
+        assert all(future.done() for future in futures)
+
+    def test_lane_round_robin(self):
+        stage = WriterStage(threads=2)
+        lanes = [stage.lane() for _ in range(4)]
+        stage.close()
+
+        assert lanes == [0, 1, 0, 1]
+
+    def test_backpressure(self):
+        stage = WriterStage(queue_size=1)
+        blocked = threading.Event()
+        release = threading.Event()
+
+        def wait():
+            blocked.set()
+            release.wait()
+
+        stage.submit(0, wait)
+        blocked.wait()
+        stage.submit(0, lambda: None)
+        submitted = threading.Event()
+        thread = threading.Thread(target=lambda: (stage.submit(0, lambda: None), submitted.set()))
+        thread.start()
+
+        # 書き込み中の処理の後ろにキューが一杯のため、空くまで待機する
+        assert not submitted.wait(0.1)
+        release.set()
+        thread.join()
+        stage.close()
+        assert submitted.is_set()
+
+    def test_exception(self):
+        stage = WriterStage()
+        future = stage.submit(0, lambda: 1 / 0)
+        stage.close()
+
+        with pytest.raises(ZeroDivisionError):
+            future.result()
+
+    def test_closed(self):
+        stage = WriterStage()
+        stage.close()
+
+        with pytest.raises(RuntimeError):
+            stage.submit(0, lambda: None)
+
+
+class TestWriteBehindWriter:
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.stage = WriterStage()
+        yield
+        self.stage.close()
+
+    def test_nomal_case(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        with WriteBehindWriter(JsonArrayWriter(path), self.stage) as writer:
+            writer.write({"ts": "1"})
+            writer.write_all(iter([{"ts": "2"}, {"ts": "3"}]))
+            assert writer.count == 3
+
+        with open(path) as f:
+            assert json.load(f) == [{"ts": "1"}, {"ts": "2"}, {"ts": "3"}]
+        assert list(tmp_path.iterdir()) == [path]
+
+    def test_chunk(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        with WriteBehindWriter(JsonArrayWriter(path), self.stage) as writer:
+            writer.write_all({"ts": str(i)} for i in range(write_behind.CHUNK_SIZE * 2 + 1))
+
+        with open(path) as f:
+            assert len(json.load(f)) == write_behind.CHUNK_SIZE * 2 + 1
+
+    def test_buffer_until_close(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        inner = JsonArrayWriter(path)
+        with WriteBehindWriter(inner, self.stage, buffer_until_close=True) as writer:
+            writer.write_all([{"ts": "1"}])
+            writer.write_all([{"ts": "2"}])
+            # close まで書き込まない
+            assert inner.count == 0
+
+        with open(path) as f:
+            assert json.load(f) == [{"ts": "1"}, {"ts": "2"}]
+
+    def test_skip_empty(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        inner = JsonArrayWriter(path, skip_empty=True)
+        with WriteBehindWriter(inner, self.stage, buffer_until_close=True) as writer:
+            pass
+
+        assert writer.count == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_abort(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        with pytest.raises(RuntimeError):
+            with WriteBehindWriter(JsonArrayWriter(path), self.stage) as writer:
+                writer.write({"ts": "1"})
+                raise RuntimeError("error")
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_checkpoint_async_and_resume(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        with pytest.raises(RuntimeError):
+            with WriteBehindWriter(JsonArrayWriter(path), self.stage) as writer:
+                writer.write_all([{"ts": "1"}, {"ts": "2"}])
+                position = writer.checkpoint_async()
+                writer.write_all([{"ts": "3"}])
+                raise RuntimeError("error")
+
+        with WriteBehindWriter(JsonArrayWriter(path), self.stage) as writer:
+            writer.resume(position.result())
+            writer.write({"ts": "4"})
+
+        assert writer.count == 3
+        with open(path) as f:
+            assert json.load(f) == [{"ts": "1"}, {"ts": "2"}, {"ts": "4"}]
+
+    def test_resume_without_tmp_file(self, tmp_path: Path):
+        writer = WriteBehindWriter(JsonArrayWriter(tmp_path / "data.json"), self.stage)
+        with pytest.raises(FileNotFoundError):
+            writer.resume({"count": 1, "offset": 10})
+
+        # 再開できない場合も最初から書き込める
+        with writer:
+            writer.write({"ts": "1"})
+        assert writer.count == 1
+
+    def test_write_error(self, tmp_path: Path):
+        writer = WriteBehindWriter(JsonArrayWriter(tmp_path / "data.json"), self.stage)
+        writer.write_all([object()])
+
+        with pytest.raises(TypeError):
+            writer.close()
+        with pytest.raises(TypeError):
+            writer.write({"ts": "1"})
+
+
+class TestOutputFormatWriteBehind:
+    @pytest.mark.parametrize("name", ["json", "ndjson", "sqlite"])
+    def test_write_and_read(self, tmp_path: Path, name):
+        output_format = OutputFormat(name, write_queue_size=2)
+        base = tmp_path / "C0001" / "nomal_messages"
+        base.parent.mkdir()
+        data = [{"ts": str(i), "text": "テキスト"} for i in range(10)]
+
+        with output_format.writer(base) as writer:
+            for item in data:
+                writer.write_all([item])
+                writer.checkpoint_async()
+
+        assert isinstance(writer, WriteBehindWriter)
+        assert list(output_format.iter_items(base)) == data
+        output_format.close()
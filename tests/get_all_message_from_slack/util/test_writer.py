@@ -0,0 +1,204 @@
+import json
+from pathlib import Path
+
+import pytest
+from get_all_message_from_slack.util.writer import (
+    JsonArrayWriter,
+    NdjsonWriter,
+    OutputFormat,
+    iter_json_array,
+    iter_ndjson,
+    ndjson_paths,
+)
+
+
+class TestJsonArrayWriter:
+    def test_nomal_case(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        with JsonArrayWriter(path) as writer:
+            writer.write({"ts": "1"})
+            writer.write_all([{"ts": "2"}, {"ts": "3"}])
+
+        with open(path) as f:
+            actual = json.load(f)
+        expected = [{"ts": "1"}, {"ts": "2"}, {"ts": "3"}]
+
+        assert actual == expected
+        assert writer.count == 3
+        assert list(tmp_path.iterdir()) == [path]
+
+    def test_empty(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        with JsonArrayWriter(path):
+            pass
+
+        with open(path) as f:
+            assert json.load(f) == []
+
+    def test_skip_empty(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        with JsonArrayWriter(path, skip_empty=True):
+            pass
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_abort(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        with pytest.raises(RuntimeError):
+            with JsonArrayWriter(path) as writer:
+                writer.write({"ts": "1"})
+                raise RuntimeError("error")
+
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestIterJsonArray:
+    @pytest.mark.parametrize("chunk_size", [1, 3, 1024])
+    def test_nomal_case(self, tmp_path: Path, chunk_size: int):
+        data = [{"ts": "1", "text": "テキスト, ]"}, 12345, [1, 2], "STRING"]
+        path = tmp_path / "data.json"
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+        actual = list(iter_json_array(path, chunk_size))
+
+        assert actual == data
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 4, 8])
+    def test_number_at_chunk_boundary(self, tmp_path: Path, chunk_size: int):
+        path = tmp_path / "data.json"
+        path.write_text('[ 1 , 2.5 ,\n"a", 30 ]')
+
+        assert list(iter_json_array(path, chunk_size)) == [1, 2.5, "a", 30]
+
+    def test_empty(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        path.write_text("[]")
+
+        assert list(iter_json_array(path)) == []
+
+    def test_not_json_array(self, tmp_path: Path):
+        path = tmp_path / "data.json"
+        path.write_text("{}")
+
+        with pytest.raises(ValueError):
+            list(iter_json_array(path))
+
+
+class TestNdjsonWriter:
+    def test_nomal_case(self, tmp_path: Path):
+        base = tmp_path / "data"
+        with NdjsonWriter(base) as writer:
+            writer.write_all([{"ts": "1"}, {"ts": "2"}])
+
+        assert (tmp_path / "data.ndjson").read_text() == '{"ts":"1"}\n{"ts":"2"}\n'
+        assert list(tmp_path.iterdir()) == [tmp_path / "data.ndjson"]
+
+    def test_rolling_parts(self, tmp_path: Path):
+        base = tmp_path / "data"
+        with NdjsonWriter(base, compression="gzip", max_bytes=20) as writer:
+            writer.write_all([{"ts": str(i)} for i in range(5)])
+
+        paths = ndjson_paths(base, "gzip")
+
+        assert [p.name for p in paths] == [
+            "data.part-00000.ndjson.gz",
+            "data.part-00001.ndjson.gz",
+            "data.part-00002.ndjson.gz",
+        ]
+        assert list(iter_ndjson(paths, "gzip")) == [{"ts": str(i)} for i in range(5)]
+
+    def test_remove_stale_parts(self, tmp_path: Path):
+        base = tmp_path / "data"
+        with NdjsonWriter(base, max_bytes=10) as writer:
+            writer.write_all([{"ts": str(i)} for i in range(3)])
+        with NdjsonWriter(base, max_bytes=10) as writer:
+            writer.write({"ts": "0"})
+
+        assert [p.name for p in ndjson_paths(base)] == ["data.part-00000.ndjson"]
+
+    def test_skip_empty(self, tmp_path: Path):
+        with NdjsonWriter(tmp_path / "data", skip_empty=True):
+            pass
+
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestOutputFormat:
+    @pytest.mark.parametrize(
+        "name, compression, max_bytes",
+        [
+            ("json", None, None),
+            ("json", "gzip", None),
+            ("ndjson", None, None),
+            ("ndjson", "gzip", 10),
+        ],
+    )
+    def test_write_and_read(self, tmp_path: Path, name, compression, max_bytes):
+        output_format = OutputFormat(name, compression, max_bytes)
+        base = tmp_path / "data"
+        data = [{"ts": "1", "text": "テキスト"}, {"ts": "2"}]
+
+        assert not output_format.exists(base)
+        with output_format.writer(base) as writer:
+            writer.write_all(data)
+
+        assert output_format.exists(base)
+        assert list(output_format.iter_items(base)) == data
+
+    @pytest.mark.parametrize(
+        "name, compression, max_bytes",
+        [
+            ("json", None, None),
+            ("json", "gzip", None),
+            ("ndjson", None, None),
+            ("ndjson", "gzip", 10),
+        ],
+    )
+    def test_checkpoint_and_resume(self, tmp_path: Path, name, compression, max_bytes):
+        output_format = OutputFormat(name, compression, max_bytes)
+        base = tmp_path / "data"
+        with pytest.raises(RuntimeError):
+            with output_format.writer(base) as writer:
+                writer.write_all([{"ts": "1"}, {"ts": "2"}])
+                position = writer.checkpoint()
+                # checkpoint 以降の書き込みは再開時に破棄される
+                writer.write_all([{"ts": str(i)} for i in range(3, 10)])
+                writer.checkpoint()
+                raise RuntimeError("error")
+
+        assert not output_format.exists(base)
+        with output_format.writer(base) as writer:
+            writer.resume(json.loads(json.dumps(position)))
+            writer.write({"ts": "3"})
+
+        assert writer.count == 3
+        assert list(output_format.iter_items(base)) == [{"ts": "1"}, {"ts": "2"}, {"ts": "3"}]
+
+    @pytest.mark.parametrize("name", ["json", "ndjson"])
+    @pytest.mark.parametrize("serializer", ["json", "orjson"])
+    def test_serializer(self, tmp_path: Path, name, serializer):
+        pytest.importorskip(serializer)
+        output_format = OutputFormat(name, serializer=serializer)
+        base = tmp_path / "data"
+        data = [{"ts": "1", "text": "テキスト"}, {"ts": "2"}]
+        with output_format.writer(base) as writer:
+            writer.write_all(data)
+
+        (path,) = tmp_path.iterdir()
+        # 日本語をエスケープせずに UTF-8 で書き込む
+        assert "テキスト" in path.read_text(encoding="utf-8")
+        assert list(output_format.iter_items(base)) == data
+
+    def test_resume_without_tmp_file(self, tmp_path: Path):
+        writer = OutputFormat("ndjson").writer(tmp_path / "data")
+        with pytest.raises(FileNotFoundError):
+            writer.resume({"count": 1, "parts": 1, "offset": 10, "file_bytes": 10})
+
+    def test_not_supported_format(self):
+        with pytest.raises(ValueError):
+            OutputFormat("csv")
+
+    def test_not_supported_compression(self):
+        with pytest.raises(ValueError):
+            OutputFormat("json", "bz2")